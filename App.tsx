@@ -1,5 +1,5 @@
-import React, { useState, useEffect, useCallback } from 'react';
-import { Page, Notification, Station, Sensor, Camera } from './types';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
+import { Page, Notification, Station, Sensor, Camera, SensorHealthStatus } from './types';
 import Sidebar from './components/layout/Sidebar';
 import Header from './components/layout/Header';
 import Dashboard from './pages/Dashboard';
@@ -14,8 +14,15 @@ import CameraDetail from './pages/CameraDetail';
 import { ThemeProvider } from './components/ThemeContext';
 import Notifications from './pages/Notifications';
 import GeminiAssistant from './components/GeminiAssistant';
-import { getNotifications, markAllNotificationsAsRead, getAgentStatus, getStations, getSensors, getCameras } from './services/apiService';
+import { markAllNotificationsAsRead, getAgentStatus, getSync } from './services/apiService';
 import { ExclamationIcon } from './components/icons/Icons';
+import { useLiveEvents } from './services/liveEvents';
+import { mergeById } from './utils/helpers';
+
+const byNewest = (a: Notification, b: Notification) => (a.timestamp < b.timestamp ? 1 : a.timestamp > b.timestamp ? -1 : 0);
+
+const INITIAL_SYNC_RETRY_DELAY_MS = 2000;
+const INITIAL_SYNC_MAX_DELAY_MS = 60000;
 
 const App: React.FC = () => {
   const [currentPage, setCurrentPage] = useState<Page>(Page.Dashboard);
@@ -30,37 +37,99 @@ const App: React.FC = () => {
   const [isMobileSidebarOpen, setIsMobileSidebarOpen] = useState(false);
   const [globalError, setGlobalError] = useState<string | null>(null);
 
-  const refreshAllData = useCallback(async () => {
+  // Version of the last sync; 0 until the first one, which returns a full snapshot.
+  const syncVersionRef = useRef(0);
+
+  // Fetches only what changed since the last sync and merges it into the state.
+  // Resolves to whether the sync succeeded.
+  const refreshAllData = useCallback(async (): Promise<boolean> => {
     try {
-      const [notificationsData, agentStatusData, stationsData, sensorsData, camerasData] = await Promise.all([
-        getNotifications(),
+      const [agentStatusData, sync] = await Promise.all([
         getAgentStatus(),
-        getStations(),
-        getSensors(),
-        getCameras()
+        getSync(syncVersionRef.current),
       ]);
-      setNotifications(notificationsData);
       setAgentStatus(agentStatusData);
-      setStations(stationsData);
-      setSensors(sensorsData);
-      setCameras(camerasData);
+      const { changed, deleted } = sync;
+      if (sync.reset) {
+        setStations(changed.stations);
+        setSensors(changed.sensors);
+        setCameras(changed.cameras);
+        setNotifications([...changed.notifications].sort(byNewest));
+      } else {
+        setStations(prev => mergeById(prev, changed.stations, deleted.stations));
+        setSensors(prev => mergeById(prev, changed.sensors, deleted.sensors));
+        setCameras(prev => mergeById(prev, changed.cameras, deleted.cameras));
+        // Notifications pushed over the live stream are already in the list; merging by id
+        // keeps them from showing up twice.
+        setNotifications(prev => {
+          const merged = mergeById(prev, changed.notifications, deleted.notifications);
+          return merged === prev ? prev : merged.sort(byNewest);
+        });
+      }
+      syncVersionRef.current = sync.version;
       
       // Clear error on successful fetch
       if (globalError) setGlobalError(null);
+      return true;
 
     } catch (error: any) {
       console.error("Veri yenileme sırasında hata oluştu:", error.message);
       setGlobalError(`Veri yenilenemedi: Sunucuya ulaşılamıyor. Lütfen bağlantınızı ve sunucu durumunu kontrol edin.`);
+      return false;
     } finally {
       setIsLoading(false);
     }
   }, [globalError]);
 
+  const refreshRef = useRef(refreshAllData);
+  refreshRef.current = refreshAllData;
+
+  // Loaded once; after that the live event stream keeps the state current. Until the first
+  // sync succeeds it is retried with a growing delay, up to INITIAL_SYNC_MAX_DELAY_MS.
   useEffect(() => {
-    refreshAllData();
-    const intervalId = setInterval(refreshAllData, 20000); // Poll every 20 seconds
-    return () => clearInterval(intervalId);
-  }, [refreshAllData]);
+    let timer: number | null = null;
+    let cancelled = false;
+    const attempt = async (delay: number) => {
+      if (await refreshRef.current() || cancelled) return;
+      timer = window.setTimeout(() => attempt(Math.min(delay * 2, INITIAL_SYNC_MAX_DELAY_MS)), delay);
+    };
+    attempt(INITIAL_SYNC_RETRY_DELAY_MS);
+    return () => {
+      cancelled = true;
+      if (timer !== null) window.clearTimeout(timer);
+    };
+  }, []);
+
+  // A burst of config-changed events is answered with one delta sync shortly after.
+  const syncTimerRef = useRef<number | null>(null);
+
+  const scheduleSync = () => {
+    if (syncTimerRef.current !== null) return;
+    syncTimerRef.current = window.setTimeout(() => {
+      syncTimerRef.current = null;
+      refreshAllData();
+    }, 500);
+  };
+
+  useLiveEvents({
+    'reading': ({ sensorId, value, timestamp }) => {
+      // Late readings from an agent's offline backlog do not replace a newer value.
+      setSensors(prev => prev.map(s => s.id === sensorId && (!s.lastUpdate || s.lastUpdate <= timestamp)
+        ? { ...s, value, lastUpdate: timestamp, healthStatus: 'Sağlıklı' }
+        : s));
+    },
+    'sensor-status': ({ sensorId, healthStatus }) => {
+      setSensors(prev => prev.map(s => s.id === sensorId ? { ...s, healthStatus: healthStatus as SensorHealthStatus } : s));
+    },
+    'agent-status': setAgentStatus,
+    'notification': notification => setNotifications(prev => prev.some(n => n.id === notification.id) ? prev : [notification, ...prev]),
+    'photo': ({ cameraId, url }) => {
+      setCameras(prev => prev.map(c => c.id === cameraId ? { ...c, photos: [url, ...c.photos].slice(0, 20) } : c));
+    },
+    'config-changed': scheduleSync,
+    // Events were missed; a delta sync catches up, readings included (they update their sensor).
+    'resync': () => refreshAllData(),
+  });
 
   const handleMarkAllAsRead = async () => {
     try {
@@ -0,0 +1,191 @@
+import process from 'process';
+import { readPool } from './readPool.js';
+import { getLastValue } from './lastValueCache.js';
+import { SensorMeta } from './metadataCache.js';
+import { ROLLUP_TABLES, DAY_OFFSET_MS, Granularity, isRollupRebuildPending } from './rollups.js';
+import { numericFields, pickValueKey } from './values.js';
+import { epochTsSql } from './migrations.js';
+
+// Time-bucketed aggregates of reading values, one series per sensor.
+//
+// Buckets are aligned to local time (DAY_OFFSET_MS, Europe/Istanbul by default), so daily
+// buckets start at local midnight. Aggregates are merged from the rollup tables; while a
+// rollup rebuild is still running they are computed in SQL from the raw readings instead.
+
+const MINUTE_MS = 60 * 1000;
+const HOUR_MS = 60 * MINUTE_MS;
+const DAY_MS = 24 * HOUR_MS;
+
+export const BUCKET_SIZES: Record<string, number> = {
+    '1m': MINUTE_MS,
+    '5m': 5 * MINUTE_MS,
+    '15m': 15 * MINUTE_MS,
+    '30m': 30 * MINUTE_MS,
+    '1h': HOUR_MS,
+    '3h': 3 * HOUR_MS,
+    '6h': 6 * HOUR_MS,
+    '1d': DAY_MS,
+};
+
+export const AGGREGATE_FUNCTIONS = ['avg', 'min', 'max', 'sum', 'count', 'last'] as const;
+export type AggregateFn = typeof AGGREGATE_FUNCTIONS[number];
+
+export const MAX_BUCKETS_PER_SERIES = parseInt(process.env.AGGREGATE_MAX_BUCKETS || '5000', 10);
+
+export function alignBucket(ts: number, size: number): number {
+    const local = ts + DAY_OFFSET_MS;
+    return local - (((local % size) + size) % size) - DAY_OFFSET_MS;
+}
+
+interface BucketAggregate {
+    count: number;
+    min: number;
+    max: number;
+    sum: number;
+    last: number;
+    lastTs: number;
+}
+
+export interface AggregatePoint {
+    timestamp: string;
+    avg?: number;
+    min?: number;
+    max?: number;
+    sum?: number;
+    count?: number;
+    last?: number;
+}
+
+export interface AggregateSeries {
+    sensorId: string;
+    sensorName: string;
+    stationId: string | null;
+    sensorType: string;
+    unit: string | null;
+    interface: string;
+    key: string | null;
+    points: AggregatePoint[];
+}
+
+const sourceGranularity = (size: number): Granularity => {
+    if (size % DAY_MS === 0) return '1d';
+    if (size % HOUR_MS === 0) return '1h';
+    return '1m';
+};
+
+const toPoints = (buckets: Map<number, BucketAggregate>, fns: AggregateFn[]): AggregatePoint[] =>
+    [...buckets.entries()]
+        .sort((a, b) => a[0] - b[0])
+        .map(([bucket, agg]) => {
+            const point: AggregatePoint = { timestamp: new Date(bucket).toISOString() };
+            for (const fn of fns) {
+                point[fn] = fn === 'avg' ? agg.sum / agg.count : fn === 'last' ? agg.last : agg[fn];
+            }
+            return point;
+        });
+
+// Merges minute/hour/day rollup rows into the requested buckets.
+async function fromRollups(sensor: SensorMeta, size: number, start: number, end: number): Promise<{ key: string | null; buckets: Map<number, BucketAggregate> }> {
+    const buckets = new Map<number, BucketAggregate>();
+    const keys = await readPool.all<{ key: string }[]>(`SELECT DISTINCT key FROM ${ROLLUP_TABLES['1d']} WHERE sensor_id = ?`, [sensor.id]);
+    const key = pickValueKey(sensor.type, keys.map(k => k.key));
+    if (key === null) return { key, buckets };
+
+    const rows = await readPool.all(`
+        SELECT bucket, count, min, max, sum, last, last_ts
+        FROM ${ROLLUP_TABLES[sourceGranularity(size)]}
+        WHERE sensor_id = ? AND key = ? AND bucket >= ? AND bucket <= ?
+        ORDER BY bucket
+    `, [sensor.id, key, start, end]);
+
+    for (const r of rows) {
+        const bucket = alignBucket(r.bucket, size);
+        const agg = buckets.get(bucket);
+        if (!agg) {
+            buckets.set(bucket, { count: r.count, min: r.min, max: r.max, sum: r.sum, last: r.last, lastTs: r.last_ts });
+            continue;
+        }
+        agg.count += r.count;
+        agg.min = Math.min(agg.min, r.min);
+        agg.max = Math.max(agg.max, r.max);
+        agg.sum += r.sum;
+        if (r.last_ts >= agg.lastTs) {
+            agg.last = r.last;
+            agg.lastTs = r.last_ts;
+        }
+    }
+    return { key, buckets };
+}
+
+// Aggregates raw readings in SQL. Used while the rollups are being rebuilt.
+async function fromReadings(sensor: SensorMeta, size: number, start: number, end: number, fns: AggregateFn[]): Promise<{ key: string | null; buckets: Map<number, BucketAggregate> }> {
+    const buckets = new Map<number, BucketAggregate>();
+    const key = pickValueKey(sensor.type, numericFields(getLastValue(sensor.id)).map(([k]) => k));
+    if (key === null) return { key, buckets };
+
+    // A plain number value rolls up under 'value'; otherwise read the field from the object.
+    // Numbers sent as strings count when the string is itself a JSON number, as in numericFields.
+    const path = `$."${key.replace(/"/g, '""')}"`;
+    const numericText = (text: string) => `CASE WHEN json_valid(${text}) AND json_type(${text}) IN ('integer', 'real') THEN CAST(${text} AS REAL) END`;
+    const ts = epochTsSql();
+    const valueSql = `
+        SELECT (${ts} + ?) - ((${ts} + ?) % ?) - ? AS bucket, ${ts} AS ts,
+            CASE
+                WHEN NOT json_valid(value) THEN NULL
+                WHEN ? = 'value' AND json_type(value) IN ('integer', 'real') THEN CAST(value AS REAL)
+                WHEN ? = 'value' AND json_type(value) = 'text' THEN ${numericText("json_extract(value, '$')")}
+                WHEN json_type(value, ?) IN ('integer', 'real') THEN json_extract(value, ?)
+                WHEN json_type(value, ?) = 'text' THEN ${numericText('json_extract(value, ?)')}
+            END AS v
+        FROM readings
+        WHERE sensor_id = ? AND ${ts} >= ? AND ${ts} <= ?
+    `;
+    const params = [DAY_OFFSET_MS, DAY_OFFSET_MS, size, DAY_OFFSET_MS, key, key, path, path, path, path, path, path, sensor.id, start, end];
+
+    const rows = await readPool.all(`
+        SELECT bucket, COUNT(v) AS count, MIN(v) AS min, MAX(v) AS max, SUM(v) AS sum
+        FROM (${valueSql}) WHERE v IS NOT NULL
+        GROUP BY bucket
+    `, params);
+    rows.forEach(r => buckets.set(r.bucket, { count: r.count, min: r.min, max: r.max, sum: r.sum, last: NaN, lastTs: 0 }));
+
+    if (fns.includes('last')) {
+        // With a single MAX() aggregate SQLite takes the bare column `v` from the newest row.
+        const lastRows = await readPool.all(`
+            SELECT bucket, v AS last, MAX(ts) AS last_ts
+            FROM (${valueSql}) WHERE v IS NOT NULL
+            GROUP BY bucket
+        `, params);
+        lastRows.forEach(r => {
+            const agg = buckets.get(r.bucket);
+            if (agg) {
+                agg.last = r.last;
+                agg.lastTs = r.last_ts;
+            }
+        });
+    }
+    return { key, buckets };
+}
+
+export async function aggregateReadings(sensors: SensorMeta[], bucket: string, fns: AggregateFn[], start: number, end: number): Promise<{ source: 'rollup' | 'raw'; series: AggregateSeries[] }> {
+    const size = BUCKET_SIZES[bucket];
+    const alignedStart = alignBucket(start, size);
+    const source = (await isRollupRebuildPending()) ? 'raw' : 'rollup';
+
+    const series = await Promise.all(sensors.map(async sensor => {
+        const { key, buckets } = source === 'rollup'
+            ? await fromRollups(sensor, size, alignedStart, end)
+            : await fromReadings(sensor, size, alignedStart, end, fns);
+        return {
+            sensorId: sensor.id,
+            sensorName: sensor.name,
+            stationId: sensor.station_id,
+            sensorType: sensor.type,
+            unit: sensor.unit,
+            interface: sensor.interface,
+            key,
+            points: toPoints(buckets, fns),
+        };
+    }));
+    return { source, series };
+}
@@ -0,0 +1,286 @@
+import process from 'process';
+import { v4 as uuidv4 } from 'uuid';
+import { db, withTransaction } from './database.js';
+import { getSensorMeta, getStationMeta } from './metadataCache.js';
+import { numericValue } from './values.js';
+import { publish } from './events.js';
+
+// Threshold alarms, evaluated on the ingest path.
+//
+// Enabled rules are compiled into an index by sensor type and station, so a reading is only
+// checked against the rules that can match it: those for its station plus those for all
+// stations. A rule fires when the value crosses its threshold and only clears once the value
+// is back past the threshold by `hysteresis`, so a value hovering around the threshold does
+// not flap. After a notification the same rule stays quiet for the same sensor for its
+// cooldown. Notifications are buffered and written in one transaction per flush. The rule
+// routes call syncAlertRule() after every change; nothing else recompiles the index.
+
+const DEFAULT_COOLDOWN_MINUTES = parseInt(process.env.ALERT_COOLDOWN_MINUTES || '15', 10);
+const FLUSH_INTERVAL_MS = parseInt(process.env.ALERT_FLUSH_INTERVAL_MS || '1000', 10);
+const MAX_BATCH_ROWS = 100;
+// Notifications kept for another attempt when a flush fails.
+const MAX_PENDING = 1000;
+
+export interface CompiledRule {
+    id: string;
+    name: string;
+    sensorType: string;
+    stationIds: string[]; // empty: all stations
+    above: boolean;
+    threshold: number;
+    // The value at which an active alarm clears.
+    clearAt: number;
+    severity: string;
+    cooldownMs: number;
+}
+
+export interface RuleState {
+    active: boolean;
+    lastNotifiedAt: number | null;
+    // Timestamp of the last reading evaluated; older readings from a backlog are skipped.
+    lastTs: number;
+}
+
+interface PendingNotification {
+    id: string;
+    ruleId: string;
+    message: string;
+    stationName: string;
+    sensorName: string;
+    triggeredValue: string;
+    timestamp: string;
+    severity: string;
+}
+
+export interface EvaluatedReading {
+    sensor: string;
+    sensorType: string;
+    value: any;
+    timestamp: string;
+}
+
+const rules = new Map<string, CompiledRule>();
+// sensor type -> rules by station id, plus the rules that apply to every station
+let index = new Map<string, { byStation: Map<string, CompiledRule[]>; all: CompiledRule[] }>();
+// `${ruleId}|${sensorId}`
+const states = new Map<string, RuleState>();
+
+let pending: PendingNotification[] = [];
+let flushTimer: NodeJS.Timeout | null = null;
+let flushing: Promise<void> | null = null;
+const stats = { evaluated: 0, matched: 0, triggered: 0, suppressed: 0, written: 0, failedWrites: 0, compiles: 0 };
+
+const stateKey = (ruleId: string, sensorId: string) => `${ruleId}|${sensorId}`;
+
+function parseStationIds(value: string | null): string[] {
+    try {
+        const ids = value ? JSON.parse(value) : [];
+        return Array.isArray(ids) ? ids.map(String) : [];
+    } catch {
+        return [];
+    }
+}
+
+// Compiles an alert_rules row; null for a disabled or incomplete rule.
+export function compileAlertRule(row: any): CompiledRule | null {
+    const threshold = Number(row.threshold);
+    if (!row.is_enabled || !row.sensor_type || !Number.isFinite(threshold)) return null;
+    if (row.condition !== 'Büyüktür' && row.condition !== 'Küçüktür') return null;
+    const above = row.condition === 'Büyüktür';
+    const hysteresis = Math.max(0, Number(row.hysteresis) || 0);
+    const cooldownMinutes = row.cooldown_minutes ?? DEFAULT_COOLDOWN_MINUTES;
+    return {
+        id: row.id,
+        name: row.name,
+        sensorType: row.sensor_type,
+        stationIds: parseStationIds(row.station_ids),
+        above,
+        threshold,
+        clearAt: above ? threshold - hysteresis : threshold + hysteresis,
+        severity: row.severity,
+        cooldownMs: Math.max(0, Number(cooldownMinutes) || 0) * 60 * 1000,
+    };
+}
+
+function rebuildIndex() {
+    const next: typeof index = new Map();
+    for (const rule of rules.values()) {
+        let entry = next.get(rule.sensorType);
+        if (!entry) {
+            entry = { byStation: new Map(), all: [] };
+            next.set(rule.sensorType, entry);
+        }
+        if (rule.stationIds.length === 0) {
+            entry.all.push(rule);
+            continue;
+        }
+        for (const stationId of rule.stationIds) {
+            const list = entry.byStation.get(stationId);
+            if (list) list.push(rule);
+            else entry.byStation.set(stationId, [rule]);
+        }
+    }
+    index = next;
+    stats.compiles++;
+}
+
+const sameTrigger = (a: CompiledRule, b: CompiledRule) =>
+    a.sensorType === b.sensorType && a.above === b.above && a.threshold === b.threshold && a.clearAt === b.clearAt;
+
+function forgetStates(ruleId: string) {
+    const prefix = `${ruleId}|`;
+    for (const key of states.keys()) {
+        if (key.startsWith(prefix)) states.delete(key);
+    }
+}
+
+export async function loadAlertRules() {
+    const rows = await db.all("SELECT * FROM alert_rules");
+    rules.clear();
+    states.clear();
+    for (const row of rows) {
+        const rule = compileAlertRule(row);
+        if (rule) rules.set(rule.id, rule);
+    }
+    rebuildIndex();
+    console.log(`[Alarm] ${rules.size} etkin alarm kuralı yüklendi.`);
+}
+
+// Recompiles the index after one rule was added, changed or deleted. The alarm state of a
+// rule survives a change that leaves its trigger alone (e.g. a rename).
+export async function syncAlertRule(ruleId: string) {
+    const row = await db.get("SELECT * FROM alert_rules WHERE id = ?", ruleId);
+    const rule = row ? compileAlertRule(row) : null;
+    const previous = rules.get(ruleId);
+    if (rule) rules.set(ruleId, rule);
+    else rules.delete(ruleId);
+    if (previous && (!rule || !sameTrigger(previous, rule))) forgetStates(ruleId);
+    rebuildIndex();
+}
+
+export const newRuleState = (): RuleState => ({ active: false, lastNotifiedAt: null, lastTs: -Infinity });
+
+// Advances a rule's alarm state by one reading. Returns 'trigger' when the alarm starts and a
+// notification is due, 'suppressed' when it starts within the cooldown, and null otherwise.
+export function stepRuleState(rule: CompiledRule, state: RuleState, value: number, ts: number): 'trigger' | 'suppressed' | null {
+    if (ts < state.lastTs) return null;
+    state.lastTs = ts;
+
+    if (state.active) {
+        if (rule.above ? value < rule.clearAt : value > rule.clearAt) state.active = false;
+        return null;
+    }
+    if (rule.above ? value <= rule.threshold : value >= rule.threshold) return null;
+
+    state.active = true;
+    if (state.lastNotifiedAt !== null && ts - state.lastNotifiedAt < rule.cooldownMs) return 'suppressed';
+    state.lastNotifiedAt = ts;
+    return 'trigger';
+}
+
+// Checks committed readings against the rules and queues a notification for every alarm
+// that starts outside its cooldown.
+export async function evaluateAlerts(readings: EvaluatedReading[]) {
+    if (index.size === 0) return;
+    for (const reading of readings) {
+        const entry = index.get(reading.sensorType);
+        if (!entry) continue;
+        const value = numericValue(reading.value, reading.sensorType);
+        if (value === null) continue;
+        stats.evaluated++;
+
+        const sensor = await getSensorMeta(reading.sensor);
+        if (!sensor) continue;
+        const stationRules = sensor.station_id ? entry.byStation.get(sensor.station_id) : undefined;
+        if (entry.all.length === 0 && !stationRules) continue;
+
+        const ts = Date.parse(reading.timestamp);
+        for (const rule of stationRules ? [...stationRules, ...entry.all] : entry.all) {
+            stats.matched++;
+            const key = stateKey(rule.id, reading.sensor);
+            let state = states.get(key);
+            if (!state) {
+                state = newRuleState();
+                states.set(key, state);
+            }
+            const outcome = stepRuleState(rule, state, value, ts);
+            if (outcome === 'suppressed') stats.suppressed++;
+            if (outcome !== 'trigger') continue;
+            stats.triggered++;
+            const station = sensor.station_id ? await getStationMeta(sensor.station_id) : undefined;
+            const stationName = station?.name ?? 'Bilinmeyen İstasyon';
+            const triggeredValue = `${value}${sensor.unit ? ` ${sensor.unit}` : ''}`;
+            queueNotification({
+                id: `NTF_${uuidv4()}`,
+                ruleId: rule.id,
+                message: `${rule.name}: ${sensor.name} değeri ${triggeredValue}, eşik ${rule.above ? '>' : '<'} ${rule.threshold}.`,
+                stationName,
+                sensorName: sensor.name,
+                triggeredValue,
+                timestamp: reading.timestamp,
+                severity: rule.severity,
+            });
+        }
+    }
+}
+
+function queueNotification(notification: PendingNotification) {
+    pending.push(notification);
+    console.log(`[ALARM] ${notification.message}`);
+    if (pending.length >= MAX_BATCH_ROWS) {
+        flushNotifications();
+    } else if (!flushTimer) {
+        flushTimer = setTimeout(() => flushNotifications(), FLUSH_INTERVAL_MS);
+        flushTimer.unref();
+    }
+}
+
+// Writes the buffered notifications. Concurrent calls share the flush in progress.
+export function flushNotifications(): Promise<void> {
+    if (flushTimer) clearTimeout(flushTimer);
+    flushTimer = null;
+    if (flushing) return flushing.then(() => (pending.length > 0 ? flushNotifications() : undefined));
+    if (pending.length === 0) return Promise.resolve();
+
+    const batch = pending;
+    pending = [];
+    flushing = withTransaction(async () => {
+        const insert = await db.prepare(
+            "INSERT INTO notifications (id, rule_id, message, station_name, sensor_name, triggered_value, timestamp, severity, is_read) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)"
+        );
+        try {
+            for (const n of batch) {
+                await insert.run(n.id, n.ruleId, n.message, n.stationName, n.sensorName, n.triggeredValue, n.timestamp, n.severity);
+            }
+        } finally {
+            await insert.finalize();
+        }
+    }).then(() => {
+        stats.written += batch.length;
+        for (const n of batch) publish('notification', { ...n, isRead: false });
+    }, error => {
+        console.error("[Alarm] Bildirimler kaydedilemedi:", error);
+        const kept = batch.slice(0, Math.max(0, MAX_PENDING - pending.length));
+        stats.failedWrites += batch.length - kept.length;
+        pending = [...kept, ...pending];
+        if (pending.length > 0 && !flushTimer) {
+            flushTimer = setTimeout(() => flushNotifications(), FLUSH_INTERVAL_MS);
+            flushTimer.unref();
+        }
+    }).finally(() => {
+        flushing = null;
+    });
+    return flushing;
+}
+
+export function getAlertStats() {
+    let active = 0;
+    for (const state of states.values()) if (state.active) active++;
+    return {
+        rules: rules.size,
+        sensorTypes: index.size,
+        active,
+        pending: pending.length,
+        ...stats,
+    };
+}
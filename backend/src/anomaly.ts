@@ -0,0 +1,313 @@
+import process from 'process';
+import { db, withTransaction } from './database.js';
+import { jobScheduler } from './jobScheduler.js';
+import { numericValue } from './values.js';
+
+// Streaming anomaly detection for incoming readings.
+//
+// Every sensor keeps a small online state in memory, updated once per reading in constant
+// time. Several detectors look at the new value: a physical range check, a z-score against
+// an exponentially weighted mean and variance, a Hampel test against the median and MAD of
+// the last WINDOW_SIZE values, and a bound on the rate of change relative to the sensor's
+// usual rate. The range check flags a reading on its own; the statistical ones have to agree
+// (MIN_VOTES of them), which keeps single noisy tests from marking normal readings.
+// Statistical tests only vote once a sensor has MIN_SAMPLES readings and has been seen to
+// change at all, since their scale is learned from the data. The ingest path checks readings
+// through an AnomalyBatch, which works on copies of the states and only applies them once the
+// readings have committed, so a rolled back or retried batch does not teach the detectors
+// twice. The state of changed sensors is written to anomaly_state periodically and on
+// shutdown, so a restart does not relearn it.
+
+const EWMA_ALPHA = parseFloat(process.env.ANOMALY_EWMA_ALPHA || '0.05');
+const WINDOW_SIZE = parseInt(process.env.ANOMALY_WINDOW_SIZE || '31', 10);
+const MIN_VOTES = parseInt(process.env.ANOMALY_MIN_VOTES || '2', 10);
+const CHECKPOINT_INTERVAL_MS = parseInt(process.env.ANOMALY_CHECKPOINT_INTERVAL_MS || '60000', 10);
+const MIN_SAMPLES = 20;
+const EWMA_Z_LIMIT = 6;
+const HAMPEL_LIMIT = 5;
+const RATE_LIMIT = 10;
+// Scales the MAD to a standard deviation for normally distributed data.
+const MAD_SCALE = 1.4826;
+
+// What a detector sees of one reading.
+export interface Sample {
+    sensorType: string;
+    value: number;
+    ts: number;
+    // Readings of the sensor seen before this one.
+    count: number;
+    // Change since the previous reading; null for the first one.
+    step: number | null;
+    dtMs: number | null;
+    // Smallest non-zero change seen so far; a floor for the learned scales. Null while the
+    // sensor has never changed.
+    resolution: number | null;
+}
+
+export interface Detector<S = any> {
+    name: string;
+    // A hard detector flags a reading by itself; the others vote.
+    hard?: boolean;
+    init(): S;
+    // Returns the reason the value is anomalous, or null.
+    check(state: S, sample: Sample): string | null;
+    update(state: S, sample: Sample, isAnomaly: boolean): void;
+}
+
+interface SensorState {
+    count: number;
+    lastValue: number | null;
+    lastTs: number | null;
+    resolution: number | null;
+    detectors: Record<string, any>;
+}
+
+const round = (v: number) => Math.round(v * 100) / 100;
+
+// Plausible physical limits per sensor type.
+const RANGES: Record<string, [number, number]> = {
+    'Sıcaklık': [-50, 80],
+    'Nem': [0, 100],
+    'Rüzgar Hızı': [0, 250],
+    'Mesafe': [0, 1000],
+};
+
+const rangeDetector: Detector<null> = {
+    name: 'range',
+    hard: true,
+    init: () => null,
+    check(_state, { sensorType, value }) {
+        const range = RANGES[sensorType];
+        if (!range || (value >= range[0] && value <= range[1])) return null;
+        return `Değer Aralığı Dışı (${value} < ${range[0]} veya > ${range[1]})`;
+    },
+    update() {},
+};
+
+const ewmaDetector: Detector<{ mean: number; variance: number }> = {
+    name: 'ewma',
+    init: () => ({ mean: 0, variance: 0 }),
+    check(state, { value, count, resolution }) {
+        if (count < MIN_SAMPLES || resolution === null) return null;
+        const z = Math.abs(value - state.mean) / Math.max(Math.sqrt(state.variance), resolution);
+        return z > EWMA_Z_LIMIT ? `Ortalamadan Sapma (ort. ${round(state.mean)}, z=${round(z)})` : null;
+    },
+    update(state, { value, count, resolution }, isAnomaly) {
+        if (count === 0) {
+            state.mean = value;
+            return;
+        }
+        // An outlier is clipped so one bad reading barely moves the estimate, while a lasting
+        // level shift is still followed.
+        const limit = EWMA_Z_LIMIT * Math.max(Math.sqrt(state.variance), resolution ?? 0);
+        const x = isAnomaly ? Math.min(Math.max(value, state.mean - limit), state.mean + limit) : value;
+        const diff = x - state.mean;
+        state.mean += EWMA_ALPHA * diff;
+        state.variance = (1 - EWMA_ALPHA) * (state.variance + EWMA_ALPHA * diff * diff);
+    },
+};
+
+const median = (values: number[]) => {
+    const sorted = [...values].sort((a, b) => a - b);
+    const mid = sorted.length >> 1;
+    return sorted.length % 2 ? sorted[mid] : (sorted[mid - 1] + sorted[mid]) / 2;
+};
+
+const hampelDetector: Detector<{ window: number[]; next: number }> = {
+    name: 'hampel',
+    init: () => ({ window: [], next: 0 }),
+    check(state, { value, resolution }) {
+        if (state.window.length < Math.min(MIN_SAMPLES, WINDOW_SIZE) || resolution === null) return null;
+        const m = median(state.window);
+        const mad = median(state.window.map(v => Math.abs(v - m)));
+        const score = Math.abs(value - m) / Math.max(MAD_SCALE * mad, resolution);
+        return score > HAMPEL_LIMIT ? `Medyandan Sapma (medyan ${round(m)})` : null;
+    },
+    // Outliers enter the window too: the median ignores a few of them, and a real level shift
+    // becomes the new normal once it fills half the window.
+    update(state, { value }) {
+        if (state.window.length < WINDOW_SIZE) {
+            state.window.push(value);
+        } else {
+            state.window[state.next] = value;
+            state.next = (state.next + 1) % WINDOW_SIZE;
+        }
+    },
+};
+
+// Rate in units per minute; the usual rate is an EWMA of past rates.
+const rateDetector: Detector<{ usualRate: number | null }> = {
+    name: 'rate',
+    init: () => ({ usualRate: null }),
+    check(state, { value, step, dtMs, count, resolution }) {
+        if (step === null || !dtMs || count < MIN_SAMPLES || resolution === null || state.usualRate === null) return null;
+        const minutes = dtMs / 60000;
+        const rate = Math.abs(step) / minutes;
+        const bound = RATE_LIMIT * Math.max(state.usualRate, resolution / minutes);
+        return rate > bound ? `Ani Sıçrama (${round(value - step)} -> ${value})` : null;
+    },
+    update(state, { step, dtMs }, isAnomaly) {
+        if (step === null || !dtMs || isAnomaly) return;
+        const rate = Math.abs(step) / (dtMs / 60000);
+        state.usualRate = state.usualRate === null ? rate : state.usualRate + EWMA_ALPHA * (rate - state.usualRate);
+    },
+};
+
+const detectors: Detector[] = [rangeDetector, ewmaDetector, hampelDetector, rateDetector];
+
+const sensors = new Map<string, SensorState>();
+const dirty = new Set<string>();
+const stats = { checked: 0, anomalies: 0, outOfOrder: 0, checkpoints: 0, lastCheckpointMs: 0, flags: {} as Record<string, number> };
+
+// Adds a detector. Sensors pick it up with a fresh state on their next reading.
+export function registerAnomalyDetector(detector: Detector) {
+    if (detectors.some(d => d.name === detector.name)) throw new Error(`Anomaly detector "${detector.name}" already exists.`);
+    detectors.push(detector);
+}
+
+export interface AnomalyResult {
+    isAnomaly: boolean;
+    reason: string | null;
+}
+
+const newState = (): SensorState => ({ count: 0, lastValue: null, lastTs: null, resolution: null, detectors: {} });
+
+// Checks a reading against a sensor state and adds it to that state. Readings must arrive in
+// measurement order per sensor; an older one is only range checked.
+function evaluate(state: SensorState, sensorType: string, value: number, ts: number): AnomalyResult {
+    const late = state.lastTs !== null && ts < state.lastTs;
+    const sample: Sample = {
+        sensorType,
+        value,
+        ts,
+        count: state.count,
+        step: state.lastValue === null ? null : value - state.lastValue,
+        dtMs: state.lastTs === null ? null : ts - state.lastTs,
+        resolution: state.resolution,
+    };
+    stats.checked++;
+
+    const hard: string[] = [];
+    const votes: string[] = [];
+    for (const detector of detectors) {
+        if (late && !detector.hard) continue;
+        if (!(detector.name in state.detectors)) state.detectors[detector.name] = detector.init();
+        const reason = detector.check(state.detectors[detector.name], sample);
+        if (reason === null) continue;
+        stats.flags[detector.name] = (stats.flags[detector.name] ?? 0) + 1;
+        (detector.hard ? hard : votes).push(reason);
+    }
+    const reasons = hard.length > 0 ? hard : votes.length >= MIN_VOTES ? votes : [];
+    const isAnomaly = reasons.length > 0;
+
+    if (late) {
+        stats.outOfOrder++;
+    } else {
+        for (const detector of detectors) detector.update(state.detectors[detector.name], sample, isAnomaly);
+        if (sample.step) state.resolution = Math.min(state.resolution ?? Infinity, Math.abs(sample.step));
+        state.count++;
+        state.lastValue = value;
+        state.lastTs = ts;
+    }
+    return { isAnomaly, reason: isAnomaly ? reasons.join('; ') : null };
+}
+
+// Anomaly checks for one write. check() works on a copy of the sensor's state, accept()
+// keeps the copy for the following readings of the batch, and apply() publishes the accepted
+// states once the write has committed. A reading that is not accepted (its insert failed)
+// leaves no trace, and neither does a batch that is never applied.
+export class AnomalyBatch {
+    private states = new Map<string, SensorState>();
+    private anomalies = 0;
+
+    check(sensorId: string, sensorType: string, rawValue: any, timestamp: string): AnomalyResult & { accept: () => void } {
+        const value = numericValue(rawValue, sensorType);
+        const ts = Date.parse(timestamp);
+        if (value === null || isNaN(ts)) return { isAnomaly: false, reason: null, accept: () => {} };
+
+        const current = this.states.get(sensorId) ?? sensors.get(sensorId);
+        const next = current ? structuredClone(current) : newState();
+        const result = evaluate(next, sensorType, value, ts);
+        return {
+            ...result,
+            accept: () => {
+                this.states.set(sensorId, next);
+                if (result.isAnomaly) this.anomalies++;
+            },
+        };
+    }
+
+    apply() {
+        for (const [sensorId, state] of this.states) {
+            sensors.set(sensorId, state);
+            dirty.add(sensorId);
+        }
+        stats.anomalies += this.anomalies;
+        this.states.clear();
+        this.anomalies = 0;
+    }
+}
+
+export function forgetAnomalyState(sensorId: string) {
+    sensors.delete(sensorId);
+    dirty.add(sensorId);
+}
+
+// Writes the state of every sensor that changed since the last checkpoint.
+export async function checkpointAnomalyState() {
+    if (dirty.size === 0) return;
+    const started = Date.now();
+    const ids = [...dirty];
+    dirty.clear();
+    try {
+        await withTransaction(async () => {
+            const upsert = await db.prepare(
+                "INSERT INTO anomaly_state (sensor_id, state, updated_at) VALUES (?, ?, ?) ON CONFLICT(sensor_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at"
+            );
+            const remove = await db.prepare("DELETE FROM anomaly_state WHERE sensor_id = ?");
+            try {
+                for (const id of ids) {
+                    const state = sensors.get(id);
+                    if (state) await upsert.run(id, JSON.stringify(state), started);
+                    else await remove.run(id);
+                }
+            } finally {
+                await upsert.finalize();
+                await remove.finalize();
+            }
+        });
+        stats.checkpoints++;
+        stats.lastCheckpointMs = Date.now() - started;
+    } catch (error) {
+        ids.forEach(id => dirty.add(id));
+        console.error("[Anomali] Durum kaydedilemedi:", error);
+    }
+}
+
+export async function startAnomalyDetector() {
+    const rows = await db.all<{ sensor_id: string; state: string }[]>("SELECT sensor_id, state FROM anomaly_state");
+    sensors.clear();
+    for (const row of rows) {
+        try {
+            sensors.set(row.sensor_id, JSON.parse(row.state));
+        } catch {
+            // A corrupt row only costs that sensor its history.
+        }
+    }
+    await jobScheduler.schedule('anomaly:checkpoint', { kind: 'interval', everyMs: CHECKPOINT_INTERVAL_MS }, checkpointAnomalyState);
+    console.log(`[Anomali] ${sensors.size} sensörün istatistikleri yüklendi.`);
+}
+
+export async function stopAnomalyDetector() {
+    await jobScheduler.cancel('anomaly:checkpoint');
+    await checkpointAnomalyState();
+}
+
+export function getAnomalyStats() {
+    return {
+        sensors: sensors.size,
+        dirty: dirty.size,
+        detectors: detectors.map(d => d.name),
+        ...stats,
+    };
+}
@@ -0,0 +1,92 @@
+import process from 'process';
+import { db, withTransaction } from './database.js';
+import { jobScheduler } from './jobScheduler.js';
+import { SYNCED_TABLES } from './migrations.js';
+
+// Change versions for delta sync (GET /sync).
+//
+// Triggers on the synced tables (migrations.ts) stamp every inserted, updated or deleted row
+// in entity_versions with the next value of a single, monotonic version counter; a deleted
+// row stays behind as a tombstone. A client remembers the version of its last sync and asks
+// for what changed after it, which is one range scan of the version index. Tombstones are
+// kept for TOMBSTONE_RETENTION_DAYS; a client that last synced before the oldest one that
+// was pruned cannot be told about every deletion and gets a full snapshot instead.
+
+const TOMBSTONE_RETENTION_DAYS = parseInt(process.env.SYNC_TOMBSTONE_RETENTION_DAYS || '7', 10);
+const PRUNE_INTERVAL_MS = 24 * 60 * 60 * 1000;
+const MIN_VERSION_KEY = 'sync_min_version';
+
+export type SyncedEntity = 'stations' | 'sensors' | 'cameras' | 'notifications' | 'station_types' | 'sensor_types' | 'camera_types';
+
+export interface ChangeSet {
+    version: number;
+    // True when the client has to replace its state with a full snapshot.
+    reset: boolean;
+    changed: Map<SyncedEntity, string[]>;
+    deleted: Map<SyncedEntity, string[]>;
+}
+
+const stats = { syncs: 0, resets: 0, changedRows: 0, prunedTombstones: 0 };
+
+export async function getSyncVersion(): Promise<number> {
+    const row = await db.get("SELECT COALESCE(MAX(version), 0) AS version FROM entity_versions");
+    return row.version;
+}
+
+async function getMinVersion(): Promise<number> {
+    const row = await db.get("SELECT value FROM global_settings WHERE key = ?", MIN_VERSION_KEY);
+    return row ? Number(row.value) : 0;
+}
+
+// What changed after `since`. Rows changed again while the caller reads them are simply
+// reported again by the next sync.
+export async function getChangesSince(since: number): Promise<ChangeSet> {
+    stats.syncs++;
+    const version = await getSyncVersion();
+    const changed = new Map<SyncedEntity, string[]>();
+    const deleted = new Map<SyncedEntity, string[]>();
+
+    // A version from the future belongs to another database, e.g. one restored from a backup.
+    if (since <= 0 || since < await getMinVersion() || since > version) {
+        stats.resets++;
+        return { version, reset: true, changed, deleted };
+    }
+
+    const rows = await db.all<{ entity: SyncedEntity; entity_id: string; deleted: number }[]>(
+        "SELECT entity, entity_id, deleted FROM entity_versions WHERE version > ? AND version <= ? ORDER BY version",
+        since, version
+    );
+    for (const row of rows) {
+        if (!SYNCED_TABLES.includes(row.entity)) continue;
+        const target = row.deleted ? deleted : changed;
+        const ids = target.get(row.entity);
+        if (ids) ids.push(row.entity_id);
+        else target.set(row.entity, [row.entity_id]);
+    }
+    stats.changedRows += rows.length;
+    return { version, reset: false, changed, deleted };
+}
+
+async function pruneTombstones() {
+    try {
+        const cutoff = Date.now() - TOMBSTONE_RETENTION_DAYS * 24 * 60 * 60 * 1000;
+        await withTransaction(async () => {
+            const row = await db.get("SELECT MAX(version) AS version FROM entity_versions WHERE deleted = 1 AND changed_at < ?", cutoff);
+            if (row?.version === null || row?.version === undefined) return;
+            const { changes } = await db.run("DELETE FROM entity_versions WHERE deleted = 1 AND version <= ?", row.version);
+            await db.run("INSERT OR REPLACE INTO global_settings (key, value) VALUES (?, ?)", MIN_VERSION_KEY, String(row.version));
+            stats.prunedTombstones += changes ?? 0;
+        });
+    } catch (error) {
+        console.error("[Senkronizasyon] Eski silme kayıtları temizlenemedi:", error);
+    }
+}
+
+export async function startChangeLog() {
+    await jobScheduler.schedule('sync:prune', { kind: 'interval', everyMs: PRUNE_INTERVAL_MS }, pruneTombstones);
+    pruneTombstones();
+}
+
+export function getChangeLogStats() {
+    return { ...stats };
+}
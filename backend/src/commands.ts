@@ -0,0 +1,107 @@
+import process from 'process';
+
+// In-memory command queue for the agents, with long polling.
+//
+// An agent asks for its commands with GET /commands/:deviceId?wait=<seconds>. Pending commands
+// are returned at once; otherwise the request is held until a command is queued for that device
+// or the wait (at most MAX_WAIT_SECONDS) runs out. A command therefore reaches an idle agent as
+// soon as it is queued, with one request per wait period instead of one every few seconds.
+// Each device has at most one held request: a new one (e.g. after a dropped connection the
+// server has not noticed yet) releases the older one empty.
+
+const MAX_WAIT_SECONDS = parseInt(process.env.COMMAND_LONG_POLL_SECONDS || '30', 10);
+
+export interface QueuedCommand {
+    id: number;
+    command_type: string;
+    payload: any;
+    status: 'pending';
+}
+
+interface Waiter {
+    wake: () => void;
+    timer: NodeJS.Timeout;
+}
+
+const queues = new Map<string, QueuedCommand[]>();
+const waiters = new Map<string, Waiter>();
+let lastCommandId = 0;
+const stats = { queued: 0, delivered: 0, longPolls: 0, woken: 0, timedOut: 0, superseded: 0 };
+
+export function queueCommand(deviceId: string, command_type: string, payload: any = {}) {
+    // Ids stay unique when several commands are queued in the same millisecond.
+    lastCommandId = Math.max(Date.now(), lastCommandId + 1);
+    const command: QueuedCommand = { id: lastCommandId, command_type, payload, status: 'pending' };
+    const queue = queues.get(deviceId);
+    if (queue) queue.push(command);
+    else queues.set(deviceId, [command]);
+    stats.queued++;
+    console.log(`[COMMAND QUEUED] ${command_type} for device ${deviceId}`);
+
+    const waiter = waiters.get(deviceId);
+    if (waiter) {
+        stats.woken++;
+        waiter.wake();
+    }
+}
+
+// Removes and returns the device's pending commands.
+export function takeCommands(deviceId: string): QueuedCommand[] {
+    const queue = queues.get(deviceId);
+    if (!queue) return [];
+    queues.delete(deviceId);
+    stats.delivered += queue.length;
+    return queue;
+}
+
+// The wait the server grants for a requested one, in seconds; 0 means answer at once.
+export function grantedWaitSeconds(requested: unknown): number {
+    const seconds = Number(requested);
+    if (!Number.isFinite(seconds) || seconds <= 0) return 0;
+    return Math.min(Math.floor(seconds), MAX_WAIT_SECONDS);
+}
+
+// Resolves when a command is queued for the device, the wait runs out, or the request is
+// released. The caller takes the commands itself, after checking the client is still there.
+export function waitForCommands(deviceId: string, waitSeconds: number): { done: Promise<void>; cancel: () => void } {
+    const previous = waiters.get(deviceId);
+    if (previous) {
+        stats.superseded++;
+        previous.wake();
+    }
+    stats.longPolls++;
+
+    let waiter!: Waiter;
+    const done = new Promise<void>(resolve => {
+        const finish = () => {
+            clearTimeout(waiter.timer);
+            if (waiters.get(deviceId) === waiter) waiters.delete(deviceId);
+            resolve();
+        };
+        waiter = {
+            wake: finish,
+            timer: setTimeout(() => {
+                stats.timedOut++;
+                finish();
+            }, waitSeconds * 1000),
+        };
+        waiters.set(deviceId, waiter);
+    });
+    return { done, cancel: () => waiter.wake() };
+}
+
+// Answers every held request, e.g. on shutdown; server.close() would otherwise wait for them.
+export function releaseCommandWaiters() {
+    for (const waiter of [...waiters.values()]) waiter.wake();
+}
+
+export function getCommandStats() {
+    let pending = 0;
+    for (const queue of queues.values()) pending += queue.length;
+    return {
+        pending,
+        waiting: waiters.size,
+        maxWaitSeconds: MAX_WAIT_SECONDS,
+        ...stats,
+    };
+}
@@ -0,0 +1,68 @@
+import { createHash } from 'crypto';
+import { Request as ExpressRequest, Response as ExpressResponse, NextFunction as ExpressNextFunction } from 'express';
+import { db } from './database.js';
+
+// Conditional GET for endpoints whose responses rarely change.
+//
+// The ETag of such a response is built from the counters in table_versions, which triggers
+// bump on every write that can change it (migrations.ts), so it costs one small lookup
+// instead of building and hashing the body. A request whose If-None-Match still matches is
+// answered with an empty 304 before the route runs. The counters are read before the route
+// builds its body, so a write in between can only leave the tag older than the body, which
+// makes the next request fetch it again rather than miss the change.
+
+export type VersionedResource = 'stations' | 'sensors' | 'cameras' | 'definitions' | 'alert_rules' | 'report_schedules' | 'device_config';
+
+// Clients may keep the response but have to revalidate it before every use.
+const DEFAULT_CACHE_CONTROL = 'private, no-cache';
+
+const stats = { checked: 0, notModified: 0, errors: 0 };
+
+// If-None-Match uses the weak comparison: a W/ prefix on either side is ignored.
+function matches(ifNoneMatch: string | undefined, etag: string): boolean {
+    if (!ifNoneMatch) return false;
+    if (ifNoneMatch.trim() === '*') return true;
+    return ifNoneMatch.split(',').some(tag => tag.trim().replace(/^W\//, '') === etag);
+}
+
+// A short digest of values that shape a response without being stored in the database,
+// e.g. API keys taken from the environment.
+export function fingerprint(...values: (string | undefined)[]): string {
+    return createHash('sha1').update(values.map(v => v ?? '').join('\0')).digest('hex').slice(0, 8);
+}
+
+// Route middleware that sets ETag and Cache-Control from the given resources' versions and
+// answers 304 when the client's copy is current. If the versions cannot be read the route
+// just runs without a validator.
+export function conditionalGet(resources: VersionedResource[], options: { cacheControl?: string; extra?: string } = {}) {
+    const placeholders = resources.map(() => '?').join(',');
+    return async (req: ExpressRequest, res: ExpressResponse, next: ExpressNextFunction) => {
+        stats.checked++;
+        try {
+            const rows = await db.all<{ name: string; version: number }[]>(
+                `SELECT name, version FROM table_versions WHERE name IN (${placeholders})`, ...resources
+            );
+            const versions = new Map(rows.map(r => [r.name, r.version]));
+            const parts = resources.map(r => `${r}-${versions.get(r) ?? 0}`);
+            if (options.extra) parts.push(options.extra);
+            const etag = `"${parts.join('.')}"`;
+            res.set('ETag', etag);
+            res.set('Cache-Control', options.cacheControl ?? DEFAULT_CACHE_CONTROL);
+            if (matches(req.get('If-None-Match'), etag)) {
+                stats.notModified++;
+                return res.status(304).end();
+            }
+        } catch (error) {
+            stats.errors++;
+            console.error("[Önbellek] Kaynak sürümleri okunamadı:", error);
+        }
+        next();
+    };
+}
+
+export function getConditionalStats() {
+    return {
+        ...stats,
+        hitRate: stats.checked > 0 ? Math.round((stats.notModified / stats.checked) * 1000) / 1000 : null,
+    };
+}
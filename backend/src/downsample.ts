@@ -0,0 +1,91 @@
+import { numericValue } from './values.js';
+
+// Largest-Triangle-Three-Buckets downsampling (Steinarsson, 2013). Keeps the first and
+// last point and, from each of the (threshold - 2) buckets in between, the point forming
+// the largest triangle with the point kept before it and the average of the next bucket.
+// Peaks and spikes span large triangles, so they survive the reduction.
+export function lttb<T>(points: T[], threshold: number, x: (p: T) => number, y: (p: T) => number): T[] {
+    if (threshold >= points.length || threshold < 3) return points;
+
+    const sampled: T[] = [points[0]];
+    const bucketSize = (points.length - 2) / (threshold - 2);
+    let a = 0;
+
+    for (let i = 0; i < threshold - 2; i++) {
+        const bucketStart = Math.floor(i * bucketSize) + 1;
+        const bucketEnd = Math.floor((i + 1) * bucketSize) + 1;
+
+        // Average of the next bucket (the last point for the final bucket).
+        const nextStart = bucketEnd;
+        const nextEnd = Math.min(Math.floor((i + 2) * bucketSize) + 1, points.length);
+        let avgX = 0;
+        let avgY = 0;
+        for (let j = nextStart; j < nextEnd; j++) {
+            avgX += x(points[j]);
+            avgY += y(points[j]);
+        }
+        const nextCount = nextEnd - nextStart;
+        avgX /= nextCount;
+        avgY /= nextCount;
+
+        const ax = x(points[a]);
+        const ay = y(points[a]);
+        let maxArea = -1;
+        let maxIndex = bucketStart;
+        for (let j = bucketStart; j < bucketEnd; j++) {
+            const area = Math.abs((ax - avgX) * (y(points[j]) - ay) - (ax - x(points[j])) * (avgY - ay));
+            if (area > maxArea) {
+                maxArea = area;
+                maxIndex = j;
+            }
+        }
+        sampled.push(points[maxIndex]);
+        a = maxIndex;
+    }
+
+    sampled.push(points[points.length - 1]);
+    return sampled;
+}
+
+export interface DownsampleOptions {
+    maxPoints: number;
+    sensorTypes: Record<string, string>; // sensor id -> sensor type
+}
+
+// Downsamples reading rows (`sensor_id`, `ts`, JSON `value`, ordered by sensor and time)
+// to at most `maxPoints` per sensor. Rows without a numeric value cannot be plotted and are
+// dropped when the series has numeric rows; otherwise the series is thinned evenly.
+export function downsampleReadings<T extends { sensor_id: string; ts: number; value: string }>(rows: T[], options: DownsampleOptions): T[] {
+    const bySensor = new Map<string, T[]>();
+    for (const row of rows) {
+        const series = bySensor.get(row.sensor_id);
+        if (series) series.push(row);
+        else bySensor.set(row.sensor_id, [row]);
+    }
+
+    const result: T[] = [];
+    for (const [sensorId, series] of bySensor) {
+        if (series.length <= options.maxPoints) {
+            result.push(...series);
+            continue;
+        }
+        const sensorType = options.sensorTypes[sensorId] ?? '';
+        const numeric: { row: T; y: number }[] = [];
+        for (const row of series) {
+            let y: number | null = null;
+            try {
+                y = numericValue(JSON.parse(row.value), sensorType);
+            } catch {
+                // Unparseable values are not plottable.
+            }
+            if (y !== null) numeric.push({ row, y });
+        }
+        if (numeric.length > 0) {
+            result.push(...lttb(numeric, options.maxPoints, p => p.row.ts, p => p.y).map(p => p.row));
+        } else {
+            const step = series.length / options.maxPoints;
+            for (let i = 0; i < options.maxPoints; i++) result.push(series[Math.floor(i * step)]);
+        }
+    }
+    return result;
+}
@@ -0,0 +1,259 @@
+import nodemailer from 'nodemailer';
+import fs from 'fs/promises';
+import path from 'path';
+import process from 'process';
+import { db, DATA_DIR } from './database.js';
+import { jobScheduler } from './jobScheduler.js';
+
+// Outgoing e-mail (scheduled reports).
+//
+// Messages are not sent by the caller. enqueueEmail() stores them in the email_outbox table
+// and returns; the outbox worker sends them over a pooled SMTP transport, several at a time,
+// and retries failures with exponential backoff. When nothing is due the worker sleeps until
+// the next retry is. Because the outbox is persisted, queued messages survive a restart.
+// Attachments are linked or copied into OUTBOX_DIR when queued, so the original file can go
+// away (e.g. be evicted from the report cache) in the meantime.
+
+const OUTBOX_DIR = path.join(DATA_DIR, 'email-outbox');
+const MAX_CONNECTIONS = parseInt(process.env.EMAIL_MAX_CONNECTIONS || '5', 10);
+const RATE_LIMIT_PER_SECOND = parseInt(process.env.EMAIL_RATE_LIMIT_PER_SECOND || '0', 10);
+const MAX_ATTEMPTS = parseInt(process.env.EMAIL_MAX_ATTEMPTS || '6', 10);
+const RETRY_BASE_MS = parseInt(process.env.EMAIL_RETRY_BASE_MS || '30000', 10);
+const RETRY_MAX_MS = 60 * 60 * 1000;
+const RETENTION_DAYS = parseInt(process.env.EMAIL_OUTBOX_RETENTION_DAYS || '30', 10);
+const PRUNE_INTERVAL_MS = 60 * 60 * 1000;
+const MAX_TIMER_DELAY_MS = 2 ** 31 - 1;
+// Keeps every pooled connection busy without loading the whole backlog into memory.
+const MAX_IN_FLIGHT = MAX_CONNECTIONS * 2;
+
+const transporter = nodemailer.createTransport({
+    pool: true,
+    maxConnections: MAX_CONNECTIONS,
+    maxMessages: 100,
+    ...(RATE_LIMIT_PER_SECOND > 0 ? { rateDelta: 1000, rateLimit: RATE_LIMIT_PER_SECOND } : {}),
+    host: process.env.EMAIL_HOST,
+    port: parseInt(process.env.EMAIL_PORT || '587', 10),
+    secure: (process.env.EMAIL_PORT === '465'), // true for 465, false for other ports
+    auth: {
+        user: process.env.EMAIL_USER,
+        pass: process.env.EMAIL_PASS,
+    },
+});
+
+transporter.verify(function(error, success) {
+    if (error) {
+        console.error("❌ E-posta gönderici yapılandırma hatası:", error.message);
+        console.warn("   -> .env dosyanızda EMAIL_HOST, EMAIL_PORT, EMAIL_USER, ve EMAIL_PASS değişkenlerini kontrol edin.");
+    } else {
+        console.log("✅ E-posta gönderici (Nodemailer) başarıyla yapılandırıldı ve hazır.");
+    }
+});
+
+export interface EmailAttachment {
+    filename: string;
+    // Attachments are streamed from disk rather than held in memory.
+    path: string;
+    contentType: string;
+}
+
+interface OutboxRow {
+    id: number;
+    recipient: string;
+    subject: string;
+    html: string;
+    attachment_name: string | null;
+    attachment_path: string | null;
+    attachment_type: string | null;
+    attempts: number;
+    created_at: number;
+}
+
+let started = false;
+let retryTimer: NodeJS.Timeout | null = null;
+let pumping = false;
+let pumpAgain = false;
+const inFlight = new Set<Promise<void>>();
+const stats = { queued: 0, sent: 0, failed: 0, retries: 0, totalLatencyMs: 0, maxLatencyMs: 0 };
+
+// Queues a message and returns its outbox id. `reportRunId` ties it to a scheduled report run.
+export async function enqueueEmail(recipient: string, subject: string, body: string, attachment?: EmailAttachment, reportRunId?: number): Promise<number> {
+    let attachmentPath: string | null = null;
+    if (attachment) {
+        await fs.mkdir(OUTBOX_DIR, { recursive: true });
+        attachmentPath = path.join(OUTBOX_DIR, `${Date.now()}-${Math.random().toString(36).slice(2)}${path.extname(attachment.path)}`);
+        // A hard link costs nothing on the same file system; fall back to a copy elsewhere.
+        await fs.link(attachment.path, attachmentPath).catch(() => fs.copyFile(attachment.path, attachmentPath!));
+    }
+
+    const now = Date.now();
+    const { lastID } = await db.run(
+        `INSERT INTO email_outbox (recipient, subject, html, attachment_name, attachment_path, attachment_type, report_run_id, status, attempts, next_attempt_at, created_at)
+         VALUES (?, ?, ?, ?, ?, ?, ?, 'pending', 0, ?, ?)`,
+        recipient, subject, `<p>${body}</p>`,
+        attachment?.filename ?? null, attachmentPath, attachment?.contentType ?? null, reportRunId ?? null,
+        now, now
+    );
+    stats.queued++;
+    console.log(`[E-POSTA KUYRUĞA ALINDI] -> Alıcı: ${recipient}, Konu: ${subject}`);
+    pump();
+    return lastID!;
+}
+
+// Claims due messages until MAX_IN_FLIGHT are being sent. Only one pump runs at a time, so
+// a message is never claimed twice; a call made while pumping triggers another round.
+async function pump() {
+    if (!started) return;
+    if (pumping) {
+        pumpAgain = true;
+        return;
+    }
+    pumping = true;
+    try {
+        do {
+            pumpAgain = false;
+            const capacity = MAX_IN_FLIGHT - inFlight.size;
+            if (capacity <= 0) break;
+            const due = await db.all<OutboxRow[]>(
+                `SELECT id, recipient, subject, html, attachment_name, attachment_path, attachment_type, attempts, created_at
+                 FROM email_outbox WHERE status = 'pending' AND next_attempt_at <= ?
+                 ORDER BY next_attempt_at LIMIT ?`,
+                Date.now(), capacity
+            );
+            if (due.length === 0) {
+                await armRetryTimer();
+                break;
+            }
+            await db.run(
+                `UPDATE email_outbox SET status = 'sending' WHERE id IN (${due.map(() => '?').join(',')})`,
+                ...due.map(m => m.id)
+            );
+            for (const message of due) {
+                const sending: Promise<void> = deliver(message).finally(() => {
+                    inFlight.delete(sending);
+                    pump();
+                });
+                inFlight.add(sending);
+            }
+            if (due.length === capacity) pumpAgain = true;
+        } while (pumpAgain && started);
+    } catch (error) {
+        console.error("[E-posta Kuyruğu] Bekleyen iletiler okunamadı:", error);
+    } finally {
+        pumping = false;
+    }
+}
+
+// Wakes the worker when the earliest pending retry is due.
+async function armRetryTimer() {
+    const row = await db.get("SELECT MIN(next_attempt_at) AS nextAt FROM email_outbox WHERE status = 'pending'");
+    if (retryTimer) clearTimeout(retryTimer);
+    retryTimer = null;
+    if (row?.nextAt === null || row?.nextAt === undefined || !started) return;
+    retryTimer = setTimeout(() => {
+        retryTimer = null;
+        pump();
+    }, Math.min(Math.max(row.nextAt - Date.now(), 0), MAX_TIMER_DELAY_MS));
+    retryTimer.unref();
+}
+
+async function deliver(message: OutboxRow) {
+    const mailOptions: nodemailer.SendMailOptions = {
+        from: `"ORION Gözlem Platformu" <${process.env.EMAIL_USER}>`,
+        to: message.recipient,
+        subject: message.subject,
+        html: message.html,
+    };
+    if (message.attachment_path) {
+        mailOptions.attachments = [{
+            filename: message.attachment_name ?? path.basename(message.attachment_path),
+            path: message.attachment_path,
+            contentType: message.attachment_type ?? undefined,
+        }];
+    }
+
+    const attempts = message.attempts + 1;
+    try {
+        await transporter.sendMail(mailOptions);
+    } catch (error: any) {
+        await recordFailure(message, attempts, error);
+        return;
+    }
+
+    // Kept apart from the send: a failed status update must not make the message go out twice.
+    const sentAt = Date.now();
+    const latencyMs = sentAt - message.created_at;
+    stats.sent++;
+    stats.totalLatencyMs += latencyMs;
+    stats.maxLatencyMs = Math.max(stats.maxLatencyMs, latencyMs);
+    console.log(`✅ [E-POSTA BAŞARILI] -> Alıcı: ${message.recipient} (${latencyMs} ms, ${attempts}. deneme)`);
+    await db.run(
+        "UPDATE email_outbox SET status = 'sent', attempts = ?, sent_at = ?, latency_ms = ?, last_error = NULL WHERE id = ?",
+        attempts, sentAt, latencyMs, message.id
+    ).catch(e => console.error("[E-posta Kuyruğu] İleti durumu kaydedilemedi:", e));
+    await removeAttachment(message);
+}
+
+async function recordFailure(message: OutboxRow, attempts: number, error: any) {
+    const errorText = error?.message ?? String(error);
+    if (attempts >= MAX_ATTEMPTS) {
+        stats.failed++;
+        console.error(`❌ [E-POSTA HATASI] -> Alıcı: ${message.recipient}, ${attempts} denemeden sonra vazgeçildi. Hata:`, error);
+        await db.run(
+            "UPDATE email_outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+            attempts, errorText, message.id
+        ).catch(e => console.error("[E-posta Kuyruğu] İleti durumu kaydedilemedi:", e));
+        await removeAttachment(message);
+        return;
+    }
+    // Exponential backoff with jitter, so a recovering server is not hit by every retry at once.
+    const delay = Math.round(Math.min(RETRY_BASE_MS * 2 ** (attempts - 1), RETRY_MAX_MS) * (0.75 + Math.random() * 0.5));
+    stats.retries++;
+    console.warn(`[E-POSTA HATASI] -> Alıcı: ${message.recipient}, ${Math.round(delay / 1000)} sn sonra tekrar denenecek (${attempts}/${MAX_ATTEMPTS}): ${errorText}`);
+    await db.run(
+        "UPDATE email_outbox SET status = 'pending', attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+        attempts, Date.now() + delay, errorText, message.id
+    ).catch(e => console.error("[E-posta Kuyruğu] İleti durumu kaydedilemedi:", e));
+}
+
+// Finished messages are kept for RETENTION_DAYS as a delivery log.
+async function pruneOutbox() {
+    try {
+        const cutoff = Date.now() - RETENTION_DAYS * 24 * 60 * 60 * 1000;
+        await db.run("DELETE FROM email_outbox WHERE status IN ('sent', 'failed') AND created_at < ?", cutoff);
+    } catch (error) {
+        console.error("[E-posta Kuyruğu] Eski kayıtlar silinemedi:", error);
+    }
+}
+
+async function removeAttachment(message: OutboxRow) {
+    if (message.attachment_path) await fs.rm(message.attachment_path, { force: true }).catch(() => undefined);
+}
+
+export async function startEmailOutbox() {
+    if (started) return;
+    // Messages left 'sending' were interrupted by a shutdown or crash; send them again.
+    await db.run("UPDATE email_outbox SET status = 'pending' WHERE status = 'sending'");
+    started = true;
+    await jobScheduler.schedule('email:prune', { kind: 'interval', everyMs: PRUNE_INTERVAL_MS }, pruneOutbox);
+    pump();
+    pruneOutbox();
+}
+
+// Stops claiming messages, waits for the ones being sent and closes the SMTP connections.
+export async function stopEmailOutbox() {
+    started = false;
+    if (retryTimer) clearTimeout(retryTimer);
+    retryTimer = null;
+    await jobScheduler.cancel('email:prune');
+    await Promise.allSettled([...inFlight]);
+    transporter.close();
+}
+
+export function getEmailOutboxStats() {
+    return {
+        inFlight: inFlight.size,
+        maxConnections: MAX_CONNECTIONS,
+        ...stats,
+        avgLatencyMs: stats.sent > 0 ? Math.round(stats.totalLatencyMs / stats.sent) : 0,
+    };
+}
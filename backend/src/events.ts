@@ -0,0 +1,153 @@
+import process from 'process';
+import { Request as ExpressRequest, Response as ExpressResponse } from 'express';
+
+// Live updates for the dashboard over Server-Sent Events (GET /api/events).
+//
+// Backend modules publish() events as things happen; every connected client gets them as
+// SSE frames. Frames are queued per client and written once per event loop turn, and a
+// client whose socket is not draining has its frames held back; one that falls more than
+// MAX_QUEUED_FRAMES behind is disconnected rather than buffered without bound. A comment
+// line every HEARTBEAT_MS keeps proxies from closing idle streams. The last REPLAY_SIZE
+// events are kept so a client that reconnects with Last-Event-ID misses nothing; if it was
+// away for longer (or the server restarted) it gets a `resync` event and reloads instead.
+
+const HEARTBEAT_MS = parseInt(process.env.SSE_HEARTBEAT_MS || '15000', 10);
+const REPLAY_SIZE = 1000;
+const MAX_QUEUED_FRAMES = 2000;
+// How long an EventSource waits before reconnecting.
+const RETRY_MS = 3000;
+
+export type LiveEventType = 'reading' | 'sensor-status' | 'agent-status' | 'photo' | 'notification' | 'config-changed';
+export const LIVE_EVENT_TYPES: LiveEventType[] = ['reading', 'sensor-status', 'agent-status', 'photo', 'notification', 'config-changed'];
+
+interface SentEvent {
+    seq: number;
+    type: LiveEventType;
+    frame: string;
+}
+
+interface Client {
+    res: ExpressResponse;
+    types: Set<string> | null; // null: every type
+    queue: string[];
+    flushScheduled: boolean;
+    // Set while the socket buffer is full; cleared by 'drain'.
+    blocked: boolean;
+}
+
+// Event ids are `${BOOT_ID}-${seq}`, so an id from before a restart is recognised as stale.
+const BOOT_ID = Date.now().toString(36);
+let seq = 0;
+const replay: SentEvent[] = [];
+const clients = new Set<Client>();
+let heartbeat: NodeJS.Timeout | null = null;
+const stats = { published: 0, framesSent: 0, connections: 0, dropped: 0, resyncs: 0 };
+
+export function publish(type: LiveEventType, data: unknown) {
+    const id = ++seq;
+    const event: SentEvent = { seq: id, type, frame: `id: ${BOOT_ID}-${id}\nevent: ${type}\ndata: ${JSON.stringify(data)}\n\n` };
+    replay.push(event);
+    if (replay.length > REPLAY_SIZE) replay.shift();
+    stats.published++;
+    for (const client of clients) {
+        if (!client.types || client.types.has(type)) enqueue(client, event.frame);
+    }
+}
+
+function enqueue(client: Client, frame: string) {
+    if (client.queue.length >= MAX_QUEUED_FRAMES) {
+        stats.dropped++;
+        console.warn('[Canlı Yayın] Yavaş istemcinin bağlantısı kesildi.');
+        disconnect(client);
+        return;
+    }
+    client.queue.push(frame);
+    if (!client.flushScheduled && !client.blocked) {
+        client.flushScheduled = true;
+        setImmediate(() => flush(client));
+    }
+}
+
+function flush(client: Client) {
+    client.flushScheduled = false;
+    if (client.blocked || client.queue.length === 0 || !clients.has(client)) return;
+    const frames = client.queue;
+    client.queue = [];
+    stats.framesSent += frames.length;
+    if (!client.res.write(frames.join(''))) {
+        client.blocked = true;
+        client.res.once('drain', () => {
+            client.blocked = false;
+            flush(client);
+        });
+    }
+}
+
+function disconnect(client: Client) {
+    if (!clients.delete(client)) return;
+    client.res.end();
+    if (clients.size === 0 && heartbeat) {
+        clearInterval(heartbeat);
+        heartbeat = null;
+    }
+}
+
+// Handler of GET /events. `?types=reading,photo` limits the stream to those event types.
+export function handleEventStream(req: ExpressRequest, res: ExpressResponse) {
+    const requested = typeof req.query.types === 'string' ? req.query.types.split(',').filter(Boolean) : [];
+    const client: Client = {
+        res,
+        types: requested.length > 0 ? new Set(requested) : null,
+        queue: [],
+        flushScheduled: false,
+        blocked: false,
+    };
+
+    res.writeHead(200, {
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache, no-transform',
+        'Connection': 'keep-alive',
+        'X-Accel-Buffering': 'no', // nginx
+    });
+    res.write(`retry: ${RETRY_MS}\n\n`);
+    clients.add(client);
+    stats.connections++;
+    req.on('close', () => disconnect(client));
+
+    const lastEventId = req.get('Last-Event-ID');
+    if (lastEventId) {
+        const [boot, last] = lastEventId.split('-');
+        const lastSeq = Number(last);
+        const oldest = replay.length > 0 ? replay[0].seq : seq + 1;
+        if (boot === BOOT_ID && Number.isInteger(lastSeq) && lastSeq >= oldest - 1) {
+            for (const event of replay) {
+                if (event.seq > lastSeq && (!client.types || client.types.has(event.type))) enqueue(client, event.frame);
+            }
+        } else {
+            stats.resyncs++;
+            enqueue(client, `id: ${BOOT_ID}-${seq}\nevent: resync\ndata: {}\n\n`);
+        }
+    }
+
+    if (!heartbeat) {
+        heartbeat = setInterval(() => {
+            for (const c of clients) {
+                if (c.queue.length === 0) enqueue(c, ': ping\n\n');
+            }
+        }, HEARTBEAT_MS);
+        heartbeat.unref();
+    }
+}
+
+// Ends every stream, e.g. on shutdown; server.close() would otherwise wait for them.
+export function closeEventStreams() {
+    for (const client of [...clients]) disconnect(client);
+}
+
+export function getEventStats() {
+    return {
+        clients: clients.size,
+        queuedFrames: [...clients].reduce((sum, c) => sum + c.queue.length, 0),
+        ...stats,
+    };
+}
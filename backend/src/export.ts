@@ -0,0 +1,183 @@
+import { Request as ExpressRequest, Response as ExpressResponse } from 'express';
+import { Writable, pipeline } from 'stream';
+import { once } from 'events';
+import zlib from 'zlib';
+import process from 'process';
+import { readPool } from './readPool.js';
+import { SensorMeta, getStationMeta } from './metadataCache.js';
+import { numericValue } from './values.js';
+import { epochTsSql } from './migrations.js';
+
+// Streaming export of readings for arbitrary date ranges.
+//
+// Rows are read in chronological keyset chunks through the read pool, so memory use is
+// bounded by one chunk no matter how long the range is, and each chunk is a short query
+// that cannot starve other readers. A chunk is only fetched once the previous one has
+// been accepted by the response (or the gzip stream in front of it).
+
+const CHUNK_ROWS = parseInt(process.env.EXPORT_CHUNK_ROWS || '5000', 10);
+
+export const EXPORT_FORMATS = ['ndjson', 'csv'] as const;
+export type ExportFormat = typeof EXPORT_FORMATS[number];
+
+export interface ReadingRow {
+    id: number;
+    ts: number;
+    timestamp: string;
+    sensor_id: string;
+    value: string | null;
+    is_anomaly: number;
+}
+
+// Yields the readings of the given sensors in (ts, id) order, CHUNK_ROWS at a time.
+export async function* readingChunks(sensorIds: string[], start: number | null, end: number | null): AsyncGenerator<ReadingRow[]> {
+    if (sensorIds.length === 0) return;
+    // With several sensors, walk the ts index in order rather than sorting each chunk's
+    // remaining range; the unary + keeps the planner off the (sensor_id, ts) index.
+    const sensorColumn = sensorIds.length > 1 ? '+sensor_id' : 'sensor_id';
+    const ts = epochTsSql();
+    let after: { ts: number; id: number } | null = null;
+    while (true) {
+        const where = [`${sensorColumn} IN (${sensorIds.map(() => '?').join(',')})`];
+        const params: (string | number)[] = [...sensorIds];
+        if (start !== null) { where.push(`${ts} >= ?`); params.push(start); }
+        if (end !== null) { where.push(`${ts} <= ?`); params.push(end); }
+        if (after) {
+            where.push(`${ts} >= ? AND (${ts} > ? OR id > ?)`);
+            params.push(after.ts, after.ts, after.id);
+        }
+        const rows: ReadingRow[] = await readPool.all(`
+            SELECT id, ${ts} AS ts, timestamp, sensor_id, value, is_anomaly
+            FROM readings
+            WHERE ${where.join(' AND ')}
+            ORDER BY ${ts}, id
+            LIMIT ?
+        `, [...params, CHUNK_ROWS]);
+        if (rows.length === 0) return;
+        yield rows;
+        if (rows.length < CHUNK_ROWS) return;
+        const last = rows[rows.length - 1];
+        after = { ts: last.ts, id: last.id };
+    }
+}
+
+// Semicolon-separated with a BOM, like the CSV reports, so Excel opens it with Turkish locale settings.
+const CSV_HEADER = ['Zaman Damgası', 'İstasyon', 'Sensör Adı', 'Sensör Tipi', 'Değer', 'Birim', 'Anomali'];
+
+const csvField = (value: unknown): string => {
+    const text = value === null || value === undefined ? '' : String(value);
+    return /[;"\r\n]/.test(text) ? `"${text.replace(/"/g, '""')}"` : text;
+};
+
+const parseValue = (value: string | null) => {
+    if (value === null) return null;
+    try {
+        return JSON.parse(value);
+    } catch {
+        return null;
+    }
+};
+
+export async function streamReadingsExport(
+    req: ExpressRequest,
+    res: ExpressResponse,
+    sensors: SensorMeta[],
+    start: number | null,
+    end: number | null,
+    format: ExportFormat,
+) {
+    const startedAt = Date.now();
+    const sensorMap = new Map(sensors.map(s => [s.id, s]));
+    const stationNames = new Map<string, string>();
+    for (const s of sensors) {
+        if (s.station_id && !stationNames.has(s.station_id)) {
+            stationNames.set(s.station_id, (await getStationMeta(s.station_id))?.name ?? '');
+        }
+    }
+
+    // Errors in the first query (busy pool, timeout) reach the caller while a status can still be sent.
+    const chunks = readingChunks(sensors.map(s => s.id), start, end);
+    const first = await chunks.next();
+
+    const gzip = req.acceptsEncodings('gzip') === 'gzip';
+    const fileName = `orion_readings_${new Date().toISOString().split('T')[0]}.${format === 'csv' ? 'csv' : 'ndjson'}`;
+    res.status(200);
+    res.setHeader('Content-Type', format === 'csv' ? 'text/csv; charset=utf-8' : 'application/x-ndjson; charset=utf-8');
+    res.setHeader('Content-Disposition', `attachment; filename="${fileName}"`);
+    res.setHeader('Cache-Control', 'no-store');
+    res.setHeader('Vary', 'Accept-Encoding');
+    if (gzip) res.setHeader('Content-Encoding', 'gzip');
+
+    let out: Writable = res;
+    if (gzip) {
+        const gz = zlib.createGzip();
+        // pipeline tears down both streams if either fails; failures are logged below.
+        pipeline(gz, res, () => undefined);
+        out = gz;
+    }
+
+    // Aborts a pending wait for 'drain' when the client goes away.
+    const closed = new AbortController();
+    res.on('close', () => closed.abort());
+    const write = async (text: string) => {
+        if (!out.write(text)) await once(out, 'drain', { signal: closed.signal });
+    };
+
+    let rowCount = 0;
+    const writeRows = async (rows: ReadingRow[]) => {
+        let text = '';
+        for (const r of rows) {
+            const sensor = sensorMap.get(r.sensor_id)!;
+            const value = parseValue(r.value);
+            const stationName = sensor.station_id ? stationNames.get(sensor.station_id) ?? '' : '';
+            if (format === 'csv') {
+                text += [
+                    r.timestamp, stationName, sensor.name, sensor.type,
+                    numericValue(value, sensor.type) ?? '', sensor.unit ?? '', r.is_anomaly ? 1 : 0,
+                ].map(csvField).join(';') + '\n';
+            } else {
+                text += JSON.stringify({
+                    id: r.id,
+                    timestamp: r.timestamp,
+                    stationId: sensor.station_id,
+                    stationName,
+                    sensorId: sensor.id,
+                    sensorName: sensor.name,
+                    sensorType: sensor.type,
+                    value,
+                    unit: sensor.unit,
+                    isAnomaly: !!r.is_anomaly,
+                }) + '\n';
+            }
+        }
+        rowCount += rows.length;
+        await write(text);
+    };
+
+    try {
+        if (format === 'csv') await write(`\uFEFF${CSV_HEADER.join(';')}\n`);
+        if (!first.done) await writeRows(first.value);
+        for await (const rows of chunks) {
+            if (closed.signal.aborted) break;
+            await writeRows(rows);
+        }
+    } catch (error) {
+        if (closed.signal.aborted) {
+            console.warn(`[Export] İstemci bağlantıyı kapattı, ${rowCount} satırdan sonra durduruldu.`);
+            out.destroy();
+            return;
+        }
+        // Headers are already sent, so the only way to signal failure is to cut the stream short.
+        console.error("Error streaming readings export:", error);
+        out.destroy();
+        res.destroy();
+        return;
+    }
+
+    if (closed.signal.aborted) {
+        out.destroy();
+        return;
+    }
+    out.end();
+    console.log(`[Export] ${rowCount} satır ${format} olarak ${Date.now() - startedAt} ms içinde gönderildi.`);
+}
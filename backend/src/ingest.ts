@@ -0,0 +1,416 @@
+import fs, { FileHandle } from 'fs/promises';
+import path from 'path';
+import process from 'process';
+import { db, withTransaction, DATA_DIR } from './database.js';
+import { recordLastValue } from './lastValueCache.js';
+import { getSensorMeta } from './metadataCache.js';
+import { RollupBatch } from './rollups.js';
+import { evaluateAlerts } from './alertRules.js';
+import { AnomalyBatch } from './anomaly.js';
+import { publish } from './events.js';
+
+// --- READING VALIDATION & GROUP COMMIT ---
+export const MAX_READINGS_PER_BATCH = 1000;
+
+export interface IncomingReading {
+    id?: string | number; // Client-side reference, echoed back in the result
+    sensor: string;
+    value: any;
+    rawValue?: any;
+    timestamp?: string; // When the agent measured the value
+}
+
+// A reading that passed validation and is ready to be written.
+export interface ValidReading {
+    index: number; // Position in the submitted batch
+    sensor: string;
+    sensorType: string;
+    value: any;
+    rawValue?: any;
+    timestamp: string;
+}
+
+export interface ReadingResult {
+    index: number;
+    id: string | number | null;
+    status: 'accepted' | 'rejected' | 'failed';
+    error?: string;
+}
+
+// Normalizes the agent-provided measurement time, falling back to the receive time.
+const normalizeTimestamp = (timestamp: unknown, fallback: string): string | null => {
+    if (timestamp === undefined || timestamp === null || timestamp === '') return fallback;
+    if (typeof timestamp !== 'string' && typeof timestamp !== 'number') return null;
+    const date = new Date(timestamp);
+    return isNaN(date.getTime()) ? null : date.toISOString();
+};
+
+// Checks the payload shape and resolves every referenced sensor through the metadata cache.
+// Invalid items are 'rejected' and will never be accepted on retry.
+export async function validateReadings(items: IncomingReading[]): Promise<{ results: ReadingResult[]; valid: ValidReading[] }> {
+    const receivedAt = new Date().toISOString();
+    const results: ReadingResult[] = items.map((item, index) => ({
+        index,
+        id: item?.id ?? null,
+        status: 'accepted',
+    }));
+
+    const candidates: Omit<ValidReading, 'sensorType'>[] = [];
+    items.forEach((item, index) => {
+        if (!item || item.sensor === undefined || item.sensor === null || item.value === undefined) {
+            results[index] = { ...results[index], status: 'rejected', error: 'sensor and value fields are required.' };
+            return;
+        }
+        const timestamp = normalizeTimestamp(item.timestamp, receivedAt);
+        if (!timestamp) {
+            results[index] = { ...results[index], status: 'rejected', error: 'Invalid timestamp.' };
+            return;
+        }
+        candidates.push({ index, sensor: String(item.sensor), value: item.value, rawValue: item.rawValue, timestamp });
+    });
+
+    const sensorTypes = new Map<string, string>();
+    for (const sensorId of new Set(candidates.map(c => c.sensor))) {
+        const sensor = await getSensorMeta(sensorId);
+        if (sensor) sensorTypes.set(sensorId, sensor.type);
+    }
+
+    const valid: ValidReading[] = [];
+    for (const candidate of candidates) {
+        const sensorType = sensorTypes.get(candidate.sensor);
+        if (sensorType === undefined) {
+            console.warn(`Reading submitted for unknown sensor ID: ${candidate.sensor}`);
+            results[candidate.index] = { ...results[candidate.index], status: 'rejected', error: 'Sensor not found.' };
+            continue;
+        }
+        valid.push({ ...candidate, sensorType });
+    }
+
+    return { results, valid };
+}
+
+// Writes validated readings in one transaction with prepared statements and returns the
+// status of each reading, aligned with the input. `inTransaction` runs inside the same
+// transaction, with the statuses and the error of each failed reading, so callers can
+// persist bookkeeping atomically with the rows.
+export async function commitReadings(
+    readings: ValidReading[],
+    inTransaction?: (statuses: ('accepted' | 'failed')[], errors: (string | null)[]) => Promise<void>
+): Promise<('accepted' | 'failed')[]> {
+    const statuses: ('accepted' | 'failed')[] = readings.map(() => 'accepted');
+    const errors: (string | null)[] = readings.map(() => null);
+    if (readings.length === 0) return statuses;
+
+    // Process in measurement order so the anomaly detector sees each sensor's history in order.
+    const order = readings.map((_, i) => i).sort((a, b) => readings[a].timestamp.localeCompare(readings[b].timestamp));
+    const rollups = new RollupBatch();
+    const anomalyBatch = new AnomalyBatch();
+    const anomalies: boolean[] = readings.map(() => false);
+
+    await withTransaction(async () => {
+        const insertReading = await db.prepare("INSERT INTO readings (sensor_id, value, timestamp, ts, is_anomaly, anomaly_reason) VALUES (?, ?, ?, ?, ?, ?)");
+        const insertRaw = await db.prepare("INSERT INTO raw_readings (sensor_id, raw_value, timestamp, ts) VALUES (?, ?, ?, ?)");
+        // Offline backlogs arrive late; never let an older reading overwrite the sensor's current value.
+        const updateSensor = await db.prepare("UPDATE sensors SET value = ?, last_update = ?, health_status = ? WHERE id = ? AND (last_update IS NULL OR last_update <= ?)");
+        const latest = new Map<string, { valueStr: string; timestamp: string }>();
+
+        try {
+            for (const i of order) {
+                const { sensor: sensorId, sensorType, value, rawValue, timestamp } = readings[i];
+                const anomalyCheck = anomalyBatch.check(sensorId, sensorType, value, timestamp);
+                anomalies[i] = anomalyCheck.isAnomaly;
+                if (anomalyCheck.isAnomaly) {
+                    console.log(`[ANOMALY DETECTED] Sensor: ${sensorId} (${sensorType}), Reason: ${anomalyCheck.reason}, Value:`, value);
+                }
+
+                const valueStr = JSON.stringify(value);
+                const ts = Date.parse(timestamp);
+                // A savepoint per reading: if its raw row fails, its reading row is undone too.
+                await db.exec('SAVEPOINT reading');
+                try {
+                    await insertReading.run(sensorId, valueStr, timestamp, ts, anomalyCheck.isAnomaly ? 1 : 0, anomalyCheck.reason);
+                    if (rawValue !== undefined) {
+                        await insertRaw.run(sensorId, JSON.stringify(rawValue), timestamp, ts);
+                    }
+                    await db.exec('RELEASE reading');
+                    anomalyCheck.accept();
+                } catch (error) {
+                    console.error(`Error writing reading for sensor ${sensorId}:`, error);
+                    await db.exec('ROLLBACK TO reading');
+                    await db.exec('RELEASE reading');
+                    statuses[i] = 'failed';
+                    errors[i] = String(error);
+                    continue;
+                }
+
+                latest.set(sensorId, { valueStr, timestamp });
+                rollups.add(sensorId, ts, value);
+            }
+
+            for (const [sensorId, { valueStr, timestamp }] of latest) {
+                await updateSensor.run(valueStr, timestamp, 'Sağlıklı', sensorId, timestamp);
+            }
+        } finally {
+            await insertReading.finalize();
+            await insertRaw.finalize();
+            await updateSensor.finalize();
+        }
+
+        await rollups.apply();
+        if (inTransaction) await inTransaction(statuses, errors);
+    });
+
+    // Only publish to the cache and the anomaly detector once the transaction has committed.
+    anomalyBatch.apply();
+    const committed = order.filter(i => statuses[i] === 'accepted');
+    for (const i of committed) {
+        const { sensor, value, timestamp } = readings[i];
+        recordLastValue(sensor, value, timestamp);
+        publish('reading', { sensorId: sensor, value, timestamp, isAnomaly: anomalies[i] });
+    }
+    await evaluateAlerts(committed.map(i => readings[i])).catch(error => console.error("[Alarm] Kurallar değerlendirilemedi:", error));
+
+    return statuses;
+}
+
+
+// --- WRITE-BEHIND INGESTION QUEUE ---
+// Agent readings are appended to an fsync'ed journal and acknowledged immediately; a single
+// writer drains them into SQLite in group commits. The highest committed journal sequence is
+// stored in global_settings inside each commit, so a restart replays exactly the rows that
+// were acknowledged but not yet written. A reading that fails on its own after it was
+// acknowledged is moved to ingest_dead_letters in the same commit, from where it can be
+// replayed (POST /system/ingest/dead-letters/replay) once the cause is fixed.
+
+const JOURNAL_PATH = path.join(DATA_DIR, 'ingest-journal.ndjson');
+const COMMITTED_SEQ_KEY = 'ingest_journal_committed_seq';
+
+const FLUSH_INTERVAL_MS = parseInt(process.env.INGEST_FLUSH_INTERVAL_MS || '250', 10);
+const MAX_BATCH_ROWS = parseInt(process.env.INGEST_MAX_BATCH_ROWS || '500', 10);
+const MAX_QUEUE_DEPTH = parseInt(process.env.INGEST_MAX_QUEUE_DEPTH || '20000', 10);
+
+interface QueuedReading {
+    seq: number;
+    reading: ValidReading;
+}
+
+export class IngestQueue {
+    private pending: QueuedReading[] = [];
+    private journal: FileHandle | null = null;
+    private journalBuffer: string[] = [];
+    private journalWaiters: { resolve: () => void; reject: (error: unknown) => void }[] = [];
+    private journalWriting = false;
+    private inFlightAppends = 0;
+    private nextSeq = 1;
+    private flushTimer: ReturnType<typeof setInterval> | null = null;
+    private draining: Promise<void> | null = null;
+    private accepting = false;
+
+    private deadLetters = 0;
+    private stats = {
+        committedRows: 0,
+        failedRows: 0,
+        commits: 0,
+        syncWrites: 0,
+        lastCommitMs: 0,
+        maxCommitMs: 0,
+        totalCommitMs: 0,
+    };
+
+    async start() {
+        const committed = await db.get("SELECT value FROM global_settings WHERE key = ?", COMMITTED_SEQ_KEY);
+        const committedSeq = parseInt(committed?.value, 10) || 0;
+        this.nextSeq = committedSeq + 1;
+        const deadLetters = await db.get("SELECT COUNT(*) AS count FROM ingest_dead_letters");
+        this.deadLetters = deadLetters?.count ?? 0;
+
+        this.journal = await fs.open(JOURNAL_PATH, 'a+');
+        const content = await fs.readFile(JOURNAL_PATH, 'utf-8');
+        for (const line of content.split('\n')) {
+            if (!line.trim()) continue;
+            try {
+                const entry: QueuedReading = JSON.parse(line);
+                if (entry.seq > committedSeq) this.pending.push(entry);
+                this.nextSeq = Math.max(this.nextSeq, entry.seq + 1);
+            } catch {
+                // A torn last line from a crash mid-append was never acknowledged.
+                console.warn('[Ingest] Günlükte bozuk satır atlandı.');
+            }
+        }
+        if (this.pending.length > 0) {
+            console.log(`[Ingest] ${this.pending.length} onaylanmış ama yazılmamış okuma günlükten geri yüklendi.`);
+        }
+
+        this.accepting = true;
+        this.flushTimer = setInterval(() => { void this.drain(); }, FLUSH_INTERVAL_MS);
+        console.log(`✅ Okuma kuyruğu aktif (${FLUSH_INTERVAL_MS} ms / ${MAX_BATCH_ROWS} satır, en fazla ${MAX_QUEUE_DEPTH} bekleyen).`);
+    }
+
+    // Queues validated readings. Resolves once they are durable in the journal, or — when the
+    // queue is over its bound or shutting down — once they are written synchronously.
+    async submit(readings: ValidReading[]): Promise<{ queued: boolean; statuses: ('accepted' | 'failed')[] }> {
+        if (readings.length === 0) return { queued: true, statuses: [] };
+
+        if (!this.accepting || !this.journal || this.pending.length + readings.length > MAX_QUEUE_DEPTH) {
+            this.stats.syncWrites++;
+            const statuses = await this.timedCommit(readings);
+            return { queued: false, statuses };
+        }
+
+        const entries = readings.map(reading => ({ seq: this.nextSeq++, reading }));
+        this.inFlightAppends++;
+        try {
+            await this.appendToJournal(entries.map(e => JSON.stringify(e) + '\n').join(''));
+        } finally {
+            this.inFlightAppends--;
+        }
+        this.pending.push(...entries);
+        if (this.pending.length >= MAX_BATCH_ROWS) void this.drain();
+        return { queued: true, statuses: readings.map(() => 'accepted') };
+    }
+
+    // Appends are coalesced: requests arriving while an fsync is in flight share the next one.
+    private appendToJournal(data: string): Promise<void> {
+        return new Promise((resolve, reject) => {
+            this.journalBuffer.push(data);
+            this.journalWaiters.push({ resolve, reject });
+            if (!this.journalWriting) void this.writeJournal();
+        });
+    }
+
+    private async writeJournal() {
+        this.journalWriting = true;
+        while (this.journalBuffer.length > 0) {
+            const data = this.journalBuffer.join('');
+            const waiters = this.journalWaiters;
+            this.journalBuffer = [];
+            this.journalWaiters = [];
+            try {
+                await this.journal!.appendFile(data);
+                await this.journal!.datasync();
+                waiters.forEach(w => w.resolve());
+            } catch (error) {
+                waiters.forEach(w => w.reject(error));
+            }
+        }
+        this.journalWriting = false;
+    }
+
+    private async timedCommit(readings: ValidReading[], inTransaction?: Parameters<typeof commitReadings>[1]) {
+        const startedAt = Date.now();
+        const statuses = await commitReadings(readings, inTransaction);
+        const elapsed = Date.now() - startedAt;
+        this.stats.commits++;
+        this.stats.lastCommitMs = elapsed;
+        this.stats.maxCommitMs = Math.max(this.stats.maxCommitMs, elapsed);
+        this.stats.totalCommitMs += elapsed;
+        statuses.forEach(s => s === 'accepted' ? this.stats.committedRows++ : this.stats.failedRows++);
+        return statuses;
+    }
+
+    drain(): Promise<void> {
+        if (!this.draining) {
+            this.draining = this.drainLoop().finally(() => { this.draining = null; });
+        }
+        return this.draining;
+    }
+
+    private async drainLoop() {
+        while (this.pending.length > 0) {
+            const batch = this.pending.slice(0, MAX_BATCH_ROWS);
+            const lastSeq = batch[batch.length - 1].seq;
+            try {
+                let deadLettered = 0;
+                await this.timedCommit(batch.map(e => e.reading), async (statuses, errors) => {
+                    const failedAt = Date.now();
+                    for (let i = 0; i < batch.length; i++) {
+                        if (statuses[i] !== 'failed') continue;
+                        await db.run(
+                            "INSERT INTO ingest_dead_letters (seq, reading, error, failed_at) VALUES (?, ?, ?, ?)",
+                            batch[i].seq, JSON.stringify(batch[i].reading), errors[i], failedAt
+                        );
+                        deadLettered++;
+                        console.error(`[Ingest] Okuma yazılamadı, ingest_dead_letters tablosuna alındı (sensör ${batch[i].reading.sensor}).`);
+                    }
+                    await db.run("INSERT OR REPLACE INTO global_settings (key, value) VALUES (?, ?)", COMMITTED_SEQ_KEY, String(lastSeq));
+                });
+                this.deadLetters += deadLettered;
+            } catch (error) {
+                // The transaction rolled back; keep the batch and retry on the next tick.
+                console.error('[Ingest] Grup yazma başarısız, bir sonraki denemede tekrar denenecek:', error);
+                return;
+            }
+            this.pending.splice(0, batch.length);
+        }
+
+        // Everything acknowledged so far is in SQLite; start a fresh journal. Appends that
+        // arrive meanwhile wait in the buffer because the writer flag is held.
+        if (this.journal && !this.journalWriting && this.inFlightAppends === 0) {
+            this.journalWriting = true;
+            try {
+                await this.journal.truncate(0);
+            } catch (error) {
+                console.error('[Ingest] Günlük temizlenemedi:', error);
+            }
+            this.journalWriting = false;
+            if (this.journalBuffer.length > 0) void this.writeJournal();
+        }
+    }
+
+    // Writes up to one batch of dead-lettered readings again. Readings that now succeed leave
+    // the table; the others stay with their latest error.
+    async replayDeadLetters(): Promise<{ replayed: number; failed: number }> {
+        const rows = await db.all<{ id: number; reading: string }[]>(
+            "SELECT id, reading FROM ingest_dead_letters ORDER BY id LIMIT ?", MAX_BATCH_ROWS
+        );
+        if (rows.length === 0) return { replayed: 0, failed: 0 };
+        let replayed = 0;
+        const statuses = await this.timedCommit(rows.map(r => JSON.parse(r.reading)), async (statuses, errors) => {
+            for (let i = 0; i < rows.length; i++) {
+                if (statuses[i] === 'accepted') {
+                    await db.run("DELETE FROM ingest_dead_letters WHERE id = ?", rows[i].id);
+                    replayed++;
+                } else {
+                    await db.run("UPDATE ingest_dead_letters SET error = ?, failed_at = ? WHERE id = ?", errors[i], Date.now(), rows[i].id);
+                }
+            }
+        });
+        this.deadLetters -= replayed;
+        return { replayed, failed: statuses.length - replayed };
+    }
+
+    // Stops accepting new work into the queue and writes out everything that is pending.
+    // Anything that still cannot be written stays in the journal and is replayed on start.
+    async stop() {
+        this.accepting = false;
+        if (this.flushTimer) clearInterval(this.flushTimer);
+        this.flushTimer = null;
+        if (this.draining) await this.draining;
+        await this.drain();
+        if (this.pending.length > 0) {
+            console.warn(`[Ingest] ${this.pending.length} okuma yazılamadı; bir sonraki başlangıçta günlükten yüklenecek.`);
+        }
+        await this.journal?.close();
+        this.journal = null;
+    }
+
+    getStats() {
+        return {
+            depth: this.pending.length,
+            maxDepth: MAX_QUEUE_DEPTH,
+            flushIntervalMs: FLUSH_INTERVAL_MS,
+            maxBatchRows: MAX_BATCH_ROWS,
+            accepting: this.accepting,
+            committedRows: this.stats.committedRows,
+            failedRows: this.stats.failedRows,
+            deadLetters: this.deadLetters,
+            commits: this.stats.commits,
+            syncWrites: this.stats.syncWrites,
+            lastCommitMs: this.stats.lastCommitMs,
+            maxCommitMs: this.stats.maxCommitMs,
+            avgCommitMs: this.stats.commits > 0 ? Math.round(this.stats.totalCommitMs / this.stats.commits) : 0,
+        };
+    }
+}
+
+export const ingestQueue = new IngestQueue();
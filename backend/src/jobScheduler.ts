@@ -0,0 +1,337 @@
+import { db } from './database.js';
+
+// In-process job scheduler for recurring background work (scheduled reports, maintenance).
+//
+// Every job knows how to compute its next fire time. Pending fire times sit in a min-heap and
+// a single timer is armed for the earliest one, so an idle scheduler costs nothing and a job
+// fires when it is due rather than on the next polling tick. A run that is still going when
+// its next fire time comes around is not started twice: the next time is computed once it
+// finishes, and occurrences missed in the meantime are skipped, or, for `catchUp` jobs, the
+// latest one is run straight away. `catchUp` jobs also record their last fire time in
+// scheduled_jobs, so occurrences missed while the server was down are caught up on startup.
+// Changing a job's schedule counts as a fire at the time of the change, so occurrences that
+// only exist under the new schedule are not caught up.
+
+export const SYSTEM_TIME_ZONE = Intl.DateTimeFormat().resolvedOptions().timeZone;
+
+// Fires at `time` (HH:MM wall clock in `timeZone`) every day, or only on `weekday`
+// (0 = Sunday) or on `monthDay` (clamped to the length of the month).
+export interface CalendarSchedule {
+    kind: 'calendar';
+    time: string;
+    weekday?: number;
+    monthDay?: number;
+    timeZone?: string;
+}
+
+export interface IntervalSchedule {
+    kind: 'interval';
+    everyMs: number;
+}
+
+export type JobSchedule = CalendarSchedule | IntervalSchedule;
+
+export interface JobOptions {
+    catchUp?: boolean;
+}
+
+// --- Time zone arithmetic ---
+
+export interface ZonedParts {
+    year: number;
+    month: number; // 1-12
+    day: number;
+    hour: number;
+    minute: number;
+    second: number;
+}
+
+const formatters = new Map<string, Intl.DateTimeFormat>();
+
+// Wall-clock fields of an instant in the given IANA time zone.
+export function zonedParts(ts: number, timeZone: string): ZonedParts {
+    let formatter = formatters.get(timeZone);
+    if (!formatter) {
+        formatter = new Intl.DateTimeFormat('en-US', {
+            timeZone, hourCycle: 'h23',
+            year: 'numeric', month: 'numeric', day: 'numeric', hour: 'numeric', minute: 'numeric', second: 'numeric',
+        });
+        formatters.set(timeZone, formatter);
+    }
+    const parts: Record<string, number> = {};
+    for (const part of formatter.formatToParts(ts)) {
+        if (part.type !== 'literal') parts[part.type] = Number(part.value);
+    }
+    return { year: parts.year, month: parts.month, day: parts.day, hour: parts.hour, minute: parts.minute, second: parts.second };
+}
+
+const offsetMs = (ts: number, timeZone: string) => {
+    const p = zonedParts(ts, timeZone);
+    return Date.UTC(p.year, p.month - 1, p.day, p.hour, p.minute, p.second) - (ts - (((ts % 1000) + 1000) % 1000));
+};
+
+// The instant at which the wall clock in `timeZone` shows the given time. Out-of-range
+// fields roll over like Date.UTC (day 0 is the last day of the previous month). A time
+// skipped by a DST change maps to a nearby valid instant.
+export function zonedTimeToUtc(year: number, month: number, day: number, hour: number, minute: number, timeZone: string): number {
+    const wall = Date.UTC(year, month - 1, day, hour, minute);
+    const guess = wall - offsetMs(wall, timeZone);
+    const offset = offsetMs(guess, timeZone);
+    return wall - offset;
+}
+
+function parseTime(time: string): [number, number] {
+    const match = /^(\d{1,2}):(\d{2})$/.exec(time ?? '');
+    if (!match || Number(match[1]) > 23 || Number(match[2]) > 59) throw new Error(`Invalid schedule time "${time}".`);
+    return [Number(match[1]), Number(match[2])];
+}
+
+// The first fire time strictly after `after`.
+export function nextOccurrence(schedule: JobSchedule, after: number): number {
+    if (schedule.kind === 'interval') return after + schedule.everyMs;
+
+    const [hour, minute] = parseTime(schedule.time);
+    const timeZone = schedule.timeZone ?? SYSTEM_TIME_ZONE;
+    const from = zonedParts(after, timeZone);
+    // A monthly schedule matches within 31 days; a few extra cover the DST-shifted edge cases.
+    for (let i = 0; i < 40; i++) {
+        const date = new Date(Date.UTC(from.year, from.month - 1, from.day + i));
+        const year = date.getUTCFullYear();
+        const month = date.getUTCMonth() + 1;
+        const day = date.getUTCDate();
+        if (schedule.weekday !== undefined && date.getUTCDay() !== schedule.weekday) continue;
+        if (schedule.monthDay !== undefined) {
+            const daysInMonth = new Date(Date.UTC(year, month, 0)).getUTCDate();
+            if (day !== Math.min(schedule.monthDay, daysInMonth)) continue;
+        }
+        const ts = zonedTimeToUtc(year, month, day, hour, minute, timeZone);
+        if (ts > after) return ts;
+    }
+    throw new Error('Schedule never fires.');
+}
+
+// --- Scheduler ---
+
+interface Job {
+    id: string;
+    schedule: JobSchedule;
+    run: (fireAt: number) => Promise<void> | void;
+    catchUp: boolean;
+    // Bumped on every change, so heap entries of the previous schedule are recognised as stale.
+    generation: number;
+    running: Promise<void> | null;
+    nextAt: number | null;
+    lastFireAt: number | null;
+    runs: number;
+}
+
+interface HeapEntry {
+    at: number;     // when to start the run
+    fireAt: number; // the occurrence it stands for; earlier than `at` when catching up
+    id: string;
+    generation: number;
+}
+
+// Longest delay setTimeout accepts; later deadlines are reached in several hops.
+const MAX_TIMER_DELAY_MS = 2 ** 31 - 1;
+
+class JobScheduler {
+    private jobs = new Map<string, Job>();
+    private heap: HeapEntry[] = [];
+    private timer: NodeJS.Timeout | null = null;
+    private timerAt: number | null = null;
+    private stopping = false;
+    private stats = { fired: 0, failed: 0, caughtUp: 0, totalLatenessMs: 0, maxLatenessMs: 0 };
+
+    // Adds a job or changes the schedule of an existing one. Throws if the schedule is invalid.
+    async schedule(id: string, schedule: JobSchedule, run: (fireAt: number) => Promise<void> | void, options: JobOptions = {}) {
+        nextOccurrence(schedule, Date.now());
+        const catchUp = options.catchUp ?? false;
+
+        let lastFireAt = this.jobs.get(id)?.lastFireAt ?? null;
+        if (catchUp && lastFireAt === null) {
+            const row = await db.get('SELECT last_fire_at FROM scheduled_jobs WHERE id = ?', id);
+            lastFireAt = row?.last_fire_at ?? null;
+        }
+
+        let job = this.jobs.get(id);
+        if (job) {
+            if (JSON.stringify(job.schedule) !== JSON.stringify(schedule)) {
+                job.lastFireAt = Date.now();
+                if (catchUp) await this.saveLastFireAt(job);
+            }
+            Object.assign(job, { schedule, run, catchUp, generation: job.generation + 1 });
+        } else {
+            job = { id, schedule, run, catchUp, generation: 0, running: null, nextAt: null, lastFireAt, runs: 0 };
+            this.jobs.set(id, job);
+        }
+        // A running job is planned again when it finishes.
+        if (!job.running) this.plan(job, job.lastFireAt ?? Date.now());
+    }
+
+    // Removes a job. A catch-up job also forgets its last fire time, so adding it again later
+    // does not catch up the runs in between.
+    async cancel(id: string) {
+        const job = this.jobs.get(id);
+        this.jobs.delete(id);
+        if (!job || job.catchUp) await db.run('DELETE FROM scheduled_jobs WHERE id = ?', id);
+    }
+
+    private plan(job: Job, after: number) {
+        if (this.stopping) return;
+        const now = Date.now();
+        let fireAt = nextOccurrence(job.schedule, after);
+        let at = fireAt;
+        if (fireAt <= now) {
+            if (job.schedule.kind === 'interval') {
+                // Keep the original phase and skip the ticks that were missed.
+                const every = job.schedule.everyMs;
+                fireAt = after + (Math.floor((now - after) / every) + 1) * every;
+                at = fireAt;
+            } else {
+                let latest = fireAt;
+                let next = nextOccurrence(job.schedule, latest);
+                while (next <= now) {
+                    latest = next;
+                    next = nextOccurrence(job.schedule, latest);
+                }
+                if (job.catchUp) {
+                    fireAt = latest;
+                    at = now;
+                    this.stats.caughtUp++;
+                } else {
+                    fireAt = at = next;
+                }
+            }
+        }
+        job.nextAt = at;
+        this.push({ at, fireAt, id: job.id, generation: job.generation });
+        this.arm();
+    }
+
+    private fire(job: Job, fireAt: number) {
+        const lateness = Math.max(0, Date.now() - fireAt);
+        job.nextAt = null;
+        job.runs++;
+        this.stats.fired++;
+        this.stats.totalLatenessMs += lateness;
+        this.stats.maxLatenessMs = Math.max(this.stats.maxLatenessMs, lateness);
+
+        job.running = (async () => {
+            try {
+                await job.run(fireAt);
+            } catch (error) {
+                this.stats.failed++;
+                console.error(`[Zamanlayıcı] "${job.id}" görevi başarısız oldu:`, error);
+            }
+            // A schedule change during the run has already moved lastFireAt past this occurrence.
+            job.lastFireAt = Math.max(job.lastFireAt ?? fireAt, fireAt);
+            // A run cut short by shutdown is not recorded, so it is caught up after the restart.
+            if (job.catchUp && !this.stopping && this.jobs.get(job.id) === job) {
+                await this.saveLastFireAt(job);
+            }
+        })().finally(() => {
+            job.running = null;
+            if (this.jobs.get(job.id) === job) this.plan(job, job.lastFireAt ?? fireAt);
+        });
+    }
+
+    private saveLastFireAt(job: Job) {
+        return db.run(
+            'INSERT INTO scheduled_jobs (id, last_fire_at) VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET last_fire_at = excluded.last_fire_at',
+            job.id, job.lastFireAt
+        ).catch(error => console.error(`[Zamanlayıcı] "${job.id}" son çalışma zamanı kaydedilemedi:`, error));
+    }
+
+    private tick() {
+        this.timer = null;
+        this.timerAt = null;
+        const now = Date.now();
+        while (this.heap.length > 0 && this.heap[0].at <= now) {
+            const entry = this.pop()!;
+            const job = this.jobs.get(entry.id);
+            if (!job || job.generation !== entry.generation || job.running || job.nextAt !== entry.at) continue;
+            this.fire(job, entry.fireAt);
+        }
+        this.arm();
+    }
+
+    private arm() {
+        if (this.stopping) return;
+        // Stale entries at the top would only cause an empty wake-up; drop them here.
+        while (this.heap.length > 0) {
+            const top = this.heap[0];
+            const job = this.jobs.get(top.id);
+            if (job && job.generation === top.generation && job.nextAt === top.at) break;
+            this.pop();
+        }
+        if (this.heap.length === 0) {
+            if (this.timer) clearTimeout(this.timer);
+            this.timer = null;
+            this.timerAt = null;
+            return;
+        }
+        const at = this.heap[0].at;
+        if (this.timer && this.timerAt === at) return;
+        if (this.timer) clearTimeout(this.timer);
+        this.timerAt = at;
+        this.timer = setTimeout(() => this.tick(), Math.min(Math.max(at - Date.now(), 0), MAX_TIMER_DELAY_MS));
+        this.timer.unref();
+    }
+
+    private push(entry: HeapEntry) {
+        const heap = this.heap;
+        heap.push(entry);
+        let i = heap.length - 1;
+        while (i > 0) {
+            const parent = (i - 1) >> 1;
+            if (heap[parent].at <= heap[i].at) break;
+            [heap[parent], heap[i]] = [heap[i], heap[parent]];
+            i = parent;
+        }
+    }
+
+    private pop(): HeapEntry | undefined {
+        const heap = this.heap;
+        const top = heap[0];
+        const last = heap.pop();
+        if (heap.length > 0 && last) {
+            heap[0] = last;
+            let i = 0;
+            while (true) {
+                const left = 2 * i + 1;
+                const right = left + 1;
+                let smallest = i;
+                if (left < heap.length && heap[left].at < heap[smallest].at) smallest = left;
+                if (right < heap.length && heap[right].at < heap[smallest].at) smallest = right;
+                if (smallest === i) break;
+                [heap[smallest], heap[i]] = [heap[i], heap[smallest]];
+                i = smallest;
+            }
+        }
+        return top;
+    }
+
+    // Stops firing jobs. The returned promise settles once the running ones have finished.
+    stop(): Promise<unknown> {
+        this.stopping = true;
+        if (this.timer) clearTimeout(this.timer);
+        this.timer = null;
+        this.timerAt = null;
+        return Promise.allSettled([...this.jobs.values()].map(job => job.running).filter(Boolean));
+    }
+
+    getStats() {
+        const jobs = [...this.jobs.values()];
+        return {
+            jobs: jobs.length,
+            running: jobs.filter(job => job.running).length,
+            nextFireAt: this.timerAt !== null ? new Date(this.timerAt).toISOString() : null,
+            ...this.stats,
+            avgLatenessMs: this.stats.fired > 0 ? Math.round(this.stats.totalLatenessMs / this.stats.fired) : 0,
+            timeZone: SYSTEM_TIME_ZONE,
+        };
+    }
+}
+
+export const jobScheduler = new JobScheduler();
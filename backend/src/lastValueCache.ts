@@ -0,0 +1,46 @@
+import { db } from './database.js';
+
+// Per-sensor cache of the most recent processed value, so callers that only need a
+// sensor's latest value (value shape detection, manual readings) never query readings.
+
+interface LastValue {
+    value: any;
+    timestamp: string | null;
+}
+
+const lastValues = new Map<string, LastValue>();
+
+const parseValue = (str: string | null): any => {
+    if (str === null || str === undefined || str === '') return null;
+    try {
+        return JSON.parse(str);
+    } catch {
+        return null;
+    }
+};
+
+// Seeds the cache from the denormalized `sensors.value` / `last_update` columns.
+export async function warmLastValueCache() {
+    const sensors = await db.all("SELECT id, value, last_update FROM sensors");
+    lastValues.clear();
+    for (const s of sensors) {
+        lastValues.set(s.id, { value: parseValue(s.value), timestamp: s.last_update ?? null });
+    }
+    console.log(`[Cache] ${lastValues.size} sensör için son değerler yüklendi.`);
+}
+
+// Returns the last known value of a sensor, or null if none is known.
+export function getLastValue(sensorId: string): any {
+    return lastValues.get(sensorId)?.value ?? null;
+}
+
+// Records a successfully stored value. Late (older) readings never replace a newer one.
+export function recordLastValue(sensorId: string, value: any, timestamp: string) {
+    const current = lastValues.get(sensorId);
+    if (current?.timestamp && current.timestamp > timestamp) return;
+    lastValues.set(sensorId, { value, timestamp });
+}
+
+export function invalidateLastValue(sensorId: string) {
+    lastValues.delete(sensorId);
+}
@@ -0,0 +1,167 @@
+import { db } from './database.js';
+
+// Process-level cache of rarely changing sensor, station and camera metadata.
+// It is loaded once at startup and kept current by the write handlers in server.ts,
+// which call the refresh/remove helpers below after every successful write.
+// Lookups that miss fall through to SQLite, so an out-of-band edit is picked up
+// the first time the row is requested.
+
+export interface SensorMeta {
+    id: string;
+    name: string;
+    type: string;
+    station_id: string | null;
+    unit: string | null;
+    interface: string;
+    is_active: number;
+    read_frequency: number;
+    parser_config: string | null;
+    config: string | null;
+    reference_value: number | null;
+    reference_operation: string | null;
+    read_order: number;
+}
+
+export interface StationMeta {
+    id: string;
+    name: string;
+    lat: number | null;
+    lng: number | null;
+}
+
+export interface CameraMeta {
+    id: string;
+    name: string;
+    station_id: string | null;
+    rtsp_url: string | null;
+}
+
+const SENSOR_COLUMNS = 'id, name, type, station_id, unit, interface, is_active, read_frequency, parser_config, config, reference_value, reference_operation, read_order';
+const STATION_COLUMNS = 'id, name, lat, lng';
+const CAMERA_COLUMNS = 'id, name, station_id, rtsp_url';
+
+const sensors = new Map<string, SensorMeta>();
+const stations = new Map<string, StationMeta>();
+const cameras = new Map<string, CameraMeta>();
+let globalReadFrequencyMinutes: string | null = null;
+
+const counters = { hits: 0, misses: 0 };
+
+export async function warmMetadataCache() {
+    const [sensorRows, stationRows, cameraRows, globalFreq] = await Promise.all([
+        db.all<SensorMeta[]>(`SELECT ${SENSOR_COLUMNS} FROM sensors`),
+        db.all<StationMeta[]>(`SELECT ${STATION_COLUMNS} FROM stations`),
+        db.all<CameraMeta[]>(`SELECT ${CAMERA_COLUMNS} FROM cameras`),
+        db.get("SELECT value FROM global_settings WHERE key = 'global_read_frequency_minutes'"),
+    ]);
+    sensors.clear();
+    stations.clear();
+    cameras.clear();
+    sensorRows.forEach(s => sensors.set(s.id, s));
+    stationRows.forEach(s => stations.set(s.id, s));
+    cameraRows.forEach(c => cameras.set(c.id, c));
+    globalReadFrequencyMinutes = globalFreq?.value ?? '0';
+    console.log(`[Cache] Meta veriler yüklendi: ${sensors.size} sensör, ${stations.size} istasyon, ${cameras.size} kamera.`);
+}
+
+// --- Lookups ---
+export async function getSensorMeta(id: string): Promise<SensorMeta | undefined> {
+    const cached = sensors.get(id);
+    if (cached) {
+        counters.hits++;
+        return cached;
+    }
+    counters.misses++;
+    return refreshSensor(id);
+}
+
+export async function getStationMeta(id: string): Promise<StationMeta | undefined> {
+    const cached = stations.get(id);
+    if (cached) {
+        counters.hits++;
+        return cached;
+    }
+    counters.misses++;
+    return refreshStation(id);
+}
+
+export function getSensorsForStation(stationId: string): SensorMeta[] {
+    counters.hits++;
+    return [...sensors.values()].filter(s => s.station_id === stationId);
+}
+
+export function getCamerasForStation(stationId: string): CameraMeta[] {
+    counters.hits++;
+    return [...cameras.values()].filter(c => c.station_id === stationId);
+}
+
+export function findSensors(stationIds: string[], types: string[]): SensorMeta[] {
+    counters.hits++;
+    const stationSet = new Set(stationIds);
+    const typeSet = new Set(types);
+    return [...sensors.values()].filter(s => s.station_id !== null && stationSet.has(s.station_id) && typeSet.has(s.type));
+}
+
+export async function getGlobalReadFrequencyMinutes(): Promise<string> {
+    if (globalReadFrequencyMinutes !== null) {
+        counters.hits++;
+        return globalReadFrequencyMinutes;
+    }
+    counters.misses++;
+    const setting = await db.get("SELECT value FROM global_settings WHERE key = 'global_read_frequency_minutes'");
+    globalReadFrequencyMinutes = setting?.value ?? '0';
+    return globalReadFrequencyMinutes!;
+}
+
+// --- Write-through maintenance ---
+export async function refreshSensor(id: string): Promise<SensorMeta | undefined> {
+    const row = await db.get<SensorMeta>(`SELECT ${SENSOR_COLUMNS} FROM sensors WHERE id = ?`, id);
+    if (row) sensors.set(id, row);
+    else sensors.delete(id);
+    return row;
+}
+
+export async function refreshStation(id: string): Promise<StationMeta | undefined> {
+    const row = await db.get<StationMeta>(`SELECT ${STATION_COLUMNS} FROM stations WHERE id = ?`, id);
+    if (row) stations.set(id, row);
+    else stations.delete(id);
+    return row;
+}
+
+export async function refreshCamera(id: string): Promise<CameraMeta | undefined> {
+    const row = await db.get<CameraMeta>(`SELECT ${CAMERA_COLUMNS} FROM cameras WHERE id = ?`, id);
+    if (row) cameras.set(id, row);
+    else cameras.delete(id);
+    return row;
+}
+
+export function removeSensor(id: string) {
+    sensors.delete(id);
+}
+
+export function removeCamera(id: string) {
+    cameras.delete(id);
+}
+
+// Mirrors the ON DELETE SET NULL foreign keys on sensors and cameras.
+export function removeStation(id: string) {
+    stations.delete(id);
+    sensors.forEach(s => { if (s.station_id === id) s.station_id = null; });
+    cameras.forEach(c => { if (c.station_id === id) c.station_id = null; });
+}
+
+export function setGlobalReadFrequencyMinutes(value: string) {
+    globalReadFrequencyMinutes = value;
+}
+
+export function getMetadataCacheStats() {
+    const lookups = counters.hits + counters.misses;
+    return {
+        sensors: sensors.size,
+        stations: stations.size,
+        cameras: cameras.size,
+        hits: counters.hits,
+        misses: counters.misses,
+        hitRate: lookups > 0 ? Math.round((counters.hits / lookups) * 1000) / 1000 : null,
+    };
+}
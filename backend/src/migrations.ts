@@ -0,0 +1,574 @@
+import { db, withTransaction } from './database.js';
+import { createRollupTablesSql, beginRollupRebuild } from './rollups.js';
+
+// Numbered, idempotent schema migrations tracked in `PRAGMA user_version`.
+//
+// `up` holds fast schema changes. Pending `up` steps run in order, each in a transaction,
+// before the server starts listening; when the schema is current, startup costs a single
+// `PRAGMA user_version` read. `backgroundStep` holds long data work (backfills, index builds).
+// It runs after the server is up, one bounded chunk per call so the write lock is only held
+// briefly, and returns true when finished. `user_version` only advances past a migration once
+// its background part is done, so an interrupted backfill resumes on the next boot. Finished
+// `up` steps are recorded in migrations_applied, so the ones after an unfinished backfill are
+// not run again on every boot while it resumes.
+
+interface Migration {
+    version: number;
+    name: string;
+    up?: () => Promise<void>;
+    backgroundStep?: () => Promise<boolean>;
+}
+
+const BACKGROUND_PAUSE_MS = 50;
+const BACKFILL_BATCH_SIZE = 5000;
+
+// Converts an ISO-8601 / SQLite timestamp column to epoch milliseconds in SQL.
+// Unparseable timestamps map to 0 so the backfill always terminates.
+const epochMsSql = (column = 'timestamp') =>
+    `COALESCE(CAST(strftime('%s', ${column}) AS INTEGER) * 1000 + CAST(substr(strftime('%f', ${column}), 4, 3) AS INTEGER), 0)`;
+
+// Change tracking for GET /sync: every write to a synced table records the row in
+// entity_versions under the next version number (see changeLog.ts). A sensor or camera
+// moving between stations also bumps both stations, whose counts change with it.
+export const SYNCED_TABLES = ['stations', 'sensors', 'cameras', 'notifications', 'station_types', 'sensor_types', 'camera_types'];
+
+const bumpVersion = (entity: string, id: string, deleted: 0 | 1, when = '1') => `
+    INSERT INTO entity_versions (entity, entity_id, version, deleted, changed_at)
+    SELECT '${entity}', ${id}, (SELECT COALESCE(MAX(version), 0) + 1 FROM entity_versions), ${deleted}, CAST(strftime('%s', 'now') AS INTEGER) * 1000
+    WHERE ${when}
+    ON CONFLICT (entity, entity_id) DO UPDATE SET version = excluded.version, deleted = excluded.deleted, changed_at = excluded.changed_at;`;
+
+// A station that is being deleted keeps its tombstone when the ON DELETE SET NULL of its
+// sensors and cameras fires their update triggers.
+const stationExists = (id: string) => `${id} IS NOT NULL AND EXISTS (SELECT 1 FROM stations WHERE id = ${id})`;
+
+const changeTrackingSql = () => [
+    ...SYNCED_TABLES.map(table => `
+        CREATE TRIGGER IF NOT EXISTS trg_${table}_sync_insert AFTER INSERT ON ${table} BEGIN ${bumpVersion(table, 'NEW.id', 0)} END;
+        CREATE TRIGGER IF NOT EXISTS trg_${table}_sync_update AFTER UPDATE ON ${table} BEGIN ${bumpVersion(table, 'NEW.id', 0)} END;
+        CREATE TRIGGER IF NOT EXISTS trg_${table}_sync_delete AFTER DELETE ON ${table} BEGIN ${bumpVersion(table, 'OLD.id', 1)} END;
+    `),
+    ...['sensors', 'cameras'].map(table => `
+        CREATE TRIGGER IF NOT EXISTS trg_${table}_sync_station_insert AFTER INSERT ON ${table} BEGIN
+            ${bumpVersion('stations', 'NEW.station_id', 0, stationExists('NEW.station_id'))}
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_${table}_sync_station_delete AFTER DELETE ON ${table} BEGIN
+            ${bumpVersion('stations', 'OLD.station_id', 0, stationExists('OLD.station_id'))}
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_${table}_sync_station_update AFTER UPDATE OF station_id ON ${table} WHEN OLD.station_id IS NOT NEW.station_id BEGIN
+            ${bumpVersion('stations', 'OLD.station_id', 0, stationExists('OLD.station_id'))}
+            ${bumpVersion('stations', 'NEW.station_id', 0, stationExists('NEW.station_id'))}
+        END;
+    `),
+].join('\n');
+
+// Per-resource counters behind the ETags of the cacheable GET endpoints (see conditional.ts).
+// Every write that can change a response bumps its counter. Counters start at the time they
+// are created, in ms, so a recreated database does not hand out the tags of an older one.
+// device_config only counts the columns sent to agents, so a new reading (which updates
+// its sensor row) does not invalidate the agents' configuration.
+export const VERSIONED_RESOURCES = ['stations', 'sensors', 'cameras', 'definitions', 'alert_rules', 'report_schedules', 'device_config'];
+
+const bumpResource = (name: string) => `
+    INSERT INTO table_versions (name, version) VALUES ('${name}', CAST(strftime('%s', 'now') AS INTEGER) * 1000)
+    ON CONFLICT (name) DO UPDATE SET version = version + 1;`;
+
+const DEVICE_CONFIG_COLUMNS: Record<string, string> = {
+    stations: 'lat, lng',
+    sensors: 'name, type, station_id, interface, is_active, read_frequency, parser_config, config, reference_value, reference_operation, read_order',
+    cameras: 'name, station_id, rtsp_url',
+};
+
+const resourceTriggerSql = () => {
+    const triggers: string[] = [];
+    const onWrite = (table: string, name: string, resource: string, columns?: string) => {
+        const body = `BEGIN ${bumpResource(resource)} END;`;
+        triggers.push(
+            `CREATE TRIGGER IF NOT EXISTS trg_${table}_${name}_insert AFTER INSERT ON ${table} ${body}`,
+            `CREATE TRIGGER IF NOT EXISTS trg_${table}_${name}_update AFTER UPDATE${columns ? ` OF ${columns}` : ''} ON ${table} ${body}`,
+            `CREATE TRIGGER IF NOT EXISTS trg_${table}_${name}_delete AFTER DELETE ON ${table} ${body}`,
+        );
+    };
+    ['stations', 'sensors', 'cameras', 'alert_rules', 'report_schedules'].forEach(table => onWrite(table, 'version', table));
+    ['station_types', 'sensor_types', 'camera_types'].forEach(table => onWrite(table, 'version', 'definitions'));
+    // The station list carries sensor and camera counts.
+    ['sensors', 'cameras'].forEach(table => onWrite(table, 'station_version', 'stations', 'station_id'));
+    // The schedule list carries a summary of each schedule's latest run and its e-mail.
+    onWrite('report_runs', 'schedule_version', 'report_schedules');
+    triggers.push(`CREATE TRIGGER IF NOT EXISTS trg_email_outbox_schedule_version_update AFTER UPDATE OF status ON email_outbox WHEN NEW.report_run_id IS NOT NULL BEGIN ${bumpResource('report_schedules')} END;`);
+    Object.entries(DEVICE_CONFIG_COLUMNS).forEach(([table, columns]) => onWrite(table, 'config_version', 'device_config', columns));
+    triggers.push(
+        `CREATE TRIGGER IF NOT EXISTS trg_global_settings_config_version_insert AFTER INSERT ON global_settings WHEN NEW.key = 'global_read_frequency_minutes' BEGIN ${bumpResource('device_config')} END;`,
+        `CREATE TRIGGER IF NOT EXISTS trg_global_settings_config_version_update AFTER UPDATE ON global_settings WHEN NEW.key = 'global_read_frequency_minutes' BEGIN ${bumpResource('device_config')} END;`,
+    );
+    return triggers.join('\n');
+};
+
+// Adds a column that older databases may be missing. Reads each table's columns only once.
+const tableColumns = new Map<string, Set<string>>();
+const addColumn = async (tableName: string, columnName: string, columnDef: string) => {
+    if (!tableColumns.has(tableName)) {
+        const tableInfo = await db.all(`PRAGMA table_info(${tableName})`);
+        tableColumns.set(tableName, new Set(tableInfo.map(col => col.name)));
+    }
+    const columns = tableColumns.get(tableName)!;
+    if (!columns.has(columnName)) {
+        console.log(`Adding column '${columnName}' to table '${tableName}'...`);
+        await db.run(`ALTER TABLE ${tableName} ADD COLUMN ${columnName} ${columnDef}`);
+        columns.add(columnName);
+    }
+};
+
+// Runs chunked steps one after another as a single background step.
+const inSequence = (...steps: (() => Promise<boolean>)[]) => {
+    let current = 0;
+    return async () => {
+        while (current < steps.length) {
+            if (!(await steps[current]())) return false;
+            current++;
+        }
+        return true;
+    };
+};
+
+// Fills `ts` for rows written before the column existed. Walks id ranges from the newest row
+// down, so recent data becomes visible to ts-range queries first and no batch rescans rows.
+const backfillEpochTs = (tableName: 'readings' | 'raw_readings') => {
+    let upperId: number | null = null;
+    let total = 0;
+    return async () => {
+        if (upperId === null) {
+            const maxRow = await db.get(`SELECT MAX(id) as maxId FROM ${tableName}`);
+            upperId = (maxRow?.maxId ?? 0) + 1;
+        }
+        const lowerId = Math.max(upperId - BACKFILL_BATCH_SIZE, 0);
+        const result = await withTransaction(() => db.run(
+            `UPDATE ${tableName} SET ts = ${epochMsSql()} WHERE id >= ? AND id < ? AND ts IS NULL`,
+            lowerId, upperId
+        ));
+        upperId = lowerId;
+        total += result.changes || 0;
+        if (upperId > 0) return false;
+        console.log(`[Migration] ${tableName}.ts dolduruldu (${total} satır).`);
+        return true;
+    };
+};
+
+const createIndex = (sql: string) => async () => {
+    await withTransaction(() => db.exec(sql));
+    return true;
+};
+
+const MIGRATIONS: Migration[] = [
+    {
+        version: 1,
+        name: 'baseline schema',
+        up: async () => {
+            await db.exec(`
+                CREATE TABLE IF NOT EXISTS stations (
+                    id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    location TEXT,
+                    lat REAL,
+                    lng REAL,
+                    status TEXT,
+                    sensor_count INTEGER DEFAULT 0,
+                    camera_count INTEGER DEFAULT 0,
+                    active_alerts INTEGER DEFAULT 0,
+                    last_update TEXT,
+                    system_health INTEGER DEFAULT 100,
+                    avg_battery INTEGER DEFAULT 100,
+                    data_flow INTEGER DEFAULT 100,
+                    active_sensor_count INTEGER DEFAULT 0,
+                    online_camera_count INTEGER DEFAULT 0
+                );
+
+                CREATE TABLE IF NOT EXISTS sensors (
+                    id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    type TEXT,
+                    station_id TEXT,
+                    status TEXT,
+                    value TEXT, -- Storing as JSON string
+                    unit TEXT,
+                    battery INTEGER,
+                    last_update TEXT,
+                    is_active BOOLEAN DEFAULT 1,
+                    interface TEXT,
+                    parser_config TEXT,
+                    config TEXT,
+                    read_frequency INTEGER DEFAULT 600,
+                    reference_value REAL,
+                    reference_operation TEXT,
+                    read_order INTEGER DEFAULT 0,
+                    health_status TEXT DEFAULT 'Bilinmiyor',
+                    FOREIGN KEY(station_id) REFERENCES stations(id) ON DELETE SET NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS cameras (
+                    id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    station_id TEXT,
+                    status TEXT,
+                    stream_url TEXT,
+                    rtsp_url TEXT,
+                    camera_type TEXT,
+                    view_direction TEXT,
+                    fps INTEGER,
+                    photos TEXT, -- Storing as JSON string array
+                    FOREIGN KEY(station_id) REFERENCES stations(id) ON DELETE SET NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS readings (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sensor_id TEXT NOT NULL,
+                    value TEXT NOT NULL, -- JSON string for processed value
+                    timestamp TEXT NOT NULL,
+                    is_anomaly BOOLEAN DEFAULT 0,
+                    anomaly_reason TEXT,
+                    FOREIGN KEY(sensor_id) REFERENCES sensors(id) ON DELETE CASCADE
+                );
+
+                CREATE TABLE IF NOT EXISTS raw_readings (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sensor_id TEXT NOT NULL,
+                    raw_value TEXT NOT NULL, -- JSON string for raw value from agent
+                    timestamp TEXT NOT NULL,
+                    FOREIGN KEY(sensor_id) REFERENCES sensors(id) ON DELETE CASCADE
+                );
+
+                CREATE TABLE IF NOT EXISTS alert_rules (
+                    id TEXT PRIMARY KEY,
+                    name TEXT,
+                    sensor_type TEXT,
+                    station_ids TEXT, -- JSON array
+                    condition TEXT,
+                    threshold REAL,
+                    severity TEXT,
+                    is_enabled BOOLEAN
+                );
+
+                CREATE TABLE IF NOT EXISTS notifications (
+                    id TEXT PRIMARY KEY,
+                    rule_id TEXT,
+                    message TEXT,
+                    station_name TEXT,
+                    sensor_name TEXT,
+                    triggered_value TEXT,
+                    timestamp TEXT,
+                    severity TEXT,
+                    is_read BOOLEAN
+                );
+
+                CREATE TABLE IF NOT EXISTS commands (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    device_id TEXT NOT NULL,
+                    command_type TEXT NOT NULL,
+                    payload TEXT, -- JSON payload
+                    status TEXT DEFAULT 'pending', -- pending, processing, completed, failed
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+                );
+
+                CREATE TABLE IF NOT EXISTS station_types ( id INTEGER PRIMARY KEY, name TEXT UNIQUE );
+                CREATE TABLE IF NOT EXISTS sensor_types ( id INTEGER PRIMARY KEY, name TEXT UNIQUE );
+                CREATE TABLE IF NOT EXISTS camera_types ( id INTEGER PRIMARY KEY, name TEXT UNIQUE );
+                CREATE TABLE IF NOT EXISTS reports ( id TEXT PRIMARY KEY, title TEXT, created_at TEXT, type TEXT, config TEXT );
+                CREATE TABLE IF NOT EXISTS report_schedules ( id TEXT PRIMARY KEY, name TEXT, frequency TEXT, time TEXT, recipient TEXT, report_config TEXT, is_enabled BOOLEAN, last_run TEXT );
+
+                CREATE TABLE IF NOT EXISTS global_settings (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            `);
+
+            // Columns that databases created by earlier releases may be missing.
+            await addColumn('sensors', 'value', 'TEXT');
+            await addColumn('sensors', 'last_update', 'TEXT');
+            await addColumn('readings', 'value', 'TEXT NOT NULL DEFAULT \'{}\'');
+            await addColumn('sensors', 'reference_value', 'REAL');
+            await addColumn('sensors', 'reference_operation', 'TEXT');
+            await addColumn('sensors', 'read_order', 'INTEGER DEFAULT 0');
+            await addColumn('raw_readings', 'raw_value', 'TEXT NOT NULL DEFAULT \'{}\'');
+            await addColumn('raw_readings', 'timestamp', 'TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP');
+            await addColumn('sensors', 'health_status', "TEXT DEFAULT 'Bilinmiyor'");
+            await addColumn('readings', 'is_anomaly', 'BOOLEAN DEFAULT 0');
+            await addColumn('readings', 'anomaly_reason', 'TEXT');
+
+            // Seed global settings
+            await db.run("INSERT OR IGNORE INTO global_settings (key, value) VALUES (?, ?)", 'global_read_frequency_minutes', '0');
+
+            // Seed default sensor types if the table is empty.
+            const countResult = await db.get("SELECT COUNT(*) as count FROM sensor_types");
+            if (countResult.count === 0) {
+                console.log('Seeding default sensor types...');
+                const defaultSensorTypes = ['Sıcaklık', 'Nem', 'Rüzgar Hızı', 'Basınç', 'Yağış', 'UV İndeksi', 'Rüzgar Yönü', 'Mesafe', 'Ağırlık', 'Kar Yüksekliği'];
+                const stmt = await db.prepare("INSERT OR IGNORE INTO sensor_types (name) VALUES (?)");
+                for (const type of defaultSensorTypes) {
+                    await stmt.run(type);
+                }
+                await stmt.finalize();
+            }
+        },
+    },
+    {
+        // Integer epoch-millisecond time column. Range predicates on `ts` can use the
+        // composite (sensor_id, ts) indexes; `datetime(timestamp)` comparisons cannot.
+        version: 2,
+        name: 'epoch ts columns and time indexes',
+        up: async () => {
+            await addColumn('readings', 'ts', 'INTEGER');
+            await addColumn('raw_readings', 'ts', 'INTEGER');
+        },
+        backgroundStep: inSequence(
+            backfillEpochTs('readings'),
+            backfillEpochTs('raw_readings'),
+            createIndex('CREATE INDEX IF NOT EXISTS idx_readings_sensor_ts ON readings(sensor_id, ts)'),
+            createIndex('CREATE INDEX IF NOT EXISTS idx_readings_ts ON readings(ts)'),
+            createIndex('CREATE INDEX IF NOT EXISTS idx_raw_readings_sensor_ts ON raw_readings(sensor_id, ts)'),
+        ),
+    },
+    {
+        // Minute/hour/day rollups. Existing history is rolled up by the resumable rebuild
+        // job in rollups.ts, which the server runs once it is listening.
+        version: 3,
+        name: 'reading rollup tables',
+        up: async () => {
+            await db.exec(createRollupTablesSql);
+            await beginRollupRebuild();
+        },
+    },
+    {
+        // One row per scheduled report run (reportScheduler.ts).
+        version: 4,
+        name: 'scheduled report runs',
+        up: async () => {
+            await db.exec(`
+                CREATE TABLE IF NOT EXISTS report_runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    schedule_id TEXT NOT NULL,
+                    started_at TEXT NOT NULL,
+                    finished_at TEXT,
+                    window_start INTEGER NOT NULL,
+                    window_end INTEGER NOT NULL,
+                    status TEXT NOT NULL, -- running, queued, failed
+                    row_count INTEGER,
+                    bytes INTEGER,
+                    duration_ms INTEGER,
+                    error TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_report_runs_schedule ON report_runs(schedule_id, id);
+            `);
+        },
+    },
+    {
+        // Outgoing e-mail queue (email.ts).
+        version: 5,
+        name: 'email outbox',
+        up: async () => {
+            await db.exec(`
+                CREATE TABLE IF NOT EXISTS email_outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    recipient TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    html TEXT NOT NULL,
+                    attachment_name TEXT,
+                    attachment_path TEXT,
+                    attachment_type TEXT,
+                    report_run_id INTEGER,
+                    status TEXT NOT NULL, -- pending, sending, sent, failed
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at INTEGER NOT NULL,
+                    created_at INTEGER NOT NULL, -- epoch ms
+                    sent_at INTEGER,
+                    latency_ms INTEGER,
+                    last_error TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox(status, next_attempt_at);
+                CREATE INDEX IF NOT EXISTS idx_email_outbox_report_run ON email_outbox(report_run_id);
+            `);
+        },
+    },
+    {
+        // Last fire time of jobs that catch up missed runs (jobScheduler.ts).
+        version: 6,
+        name: 'scheduled jobs',
+        up: async () => {
+            await db.exec(`
+                CREATE TABLE IF NOT EXISTS scheduled_jobs (
+                    id TEXT PRIMARY KEY,
+                    last_fire_at INTEGER NOT NULL -- epoch ms of the occurrence, not of the actual start
+                );
+            `);
+        },
+    },
+    {
+        version: 7,
+        name: 'alert rule hysteresis and cooldown',
+        up: async () => {
+            await addColumn('alert_rules', 'hysteresis', 'REAL NOT NULL DEFAULT 0');
+            await addColumn('alert_rules', 'cooldown_minutes', 'INTEGER'); // NULL: ALERT_COOLDOWN_MINUTES
+        },
+    },
+    {
+        version: 8,
+        name: 'anomaly detector state',
+        up: async () => {
+            await db.exec(`
+                CREATE TABLE IF NOT EXISTS anomaly_state (
+                    sensor_id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL, -- JSON, see anomaly.ts
+                    updated_at INTEGER NOT NULL
+                );
+            `);
+        },
+    },
+    {
+        version: 9,
+        name: 'change tracking',
+        up: async () => {
+            await db.exec(`
+                CREATE TABLE IF NOT EXISTS entity_versions (
+                    entity TEXT NOT NULL, -- table name
+                    entity_id TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    deleted INTEGER NOT NULL DEFAULT 0,
+                    changed_at INTEGER NOT NULL, -- epoch ms
+                    PRIMARY KEY (entity, entity_id)
+                ) WITHOUT ROWID;
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_entity_versions_version ON entity_versions (version);
+            `);
+            await db.exec(changeTrackingSql());
+        },
+    },
+    {
+        version: 10,
+        name: 'resource versions for conditional requests',
+        up: async () => {
+            await db.exec(`
+                CREATE TABLE IF NOT EXISTS table_versions (
+                    name TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                ) WITHOUT ROWID;
+            `);
+            for (const name of VERSIONED_RESOURCES) await db.exec(bumpResource(name));
+            await db.exec(resourceTriggerSql());
+        },
+    },
+    {
+        version: 11,
+        name: 'ingest dead letters',
+        up: async () => {
+            await db.exec(`
+                CREATE TABLE IF NOT EXISTS ingest_dead_letters (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    seq INTEGER, -- journal sequence, if the reading came through the queue
+                    reading TEXT NOT NULL, -- the validated reading as JSON
+                    error TEXT,
+                    failed_at INTEGER NOT NULL -- epoch ms
+                );
+            `);
+        },
+    },
+    {
+        // Numbers sent as strings are now rolled up too (values.ts); recompute the existing rollups.
+        version: 12,
+        name: 'roll up numeric strings',
+        up: async () => {
+            await beginRollupRebuild();
+        },
+    },
+];
+
+export const LATEST_SCHEMA_VERSION = MIGRATIONS[MIGRATIONS.length - 1].version;
+
+const status = {
+    schemaVersion: 0,
+    backgroundRunning: false,
+    backgroundCurrent: null as string | null,
+    backgroundError: null as string | null,
+};
+
+const getUserVersion = async (): Promise<number> => {
+    const row = await db.get('PRAGMA user_version');
+    return row?.user_version ?? 0;
+};
+
+// PRAGMA arguments cannot be bound; the version is always an integer from MIGRATIONS.
+const setUserVersion = async (version: number) => {
+    await db.exec(`PRAGMA user_version = ${Math.trunc(version)}`);
+    status.schemaVersion = version;
+};
+
+// Applies the fast part of every pending migration. Call before the server starts listening.
+export async function migrate() {
+    status.schemaVersion = await getUserVersion();
+    const pending = MIGRATIONS.filter(m => m.version > status.schemaVersion);
+    if (pending.length === 0) {
+        console.log(`Database schema is current (v${status.schemaVersion}).`);
+        return;
+    }
+
+    await db.exec(`
+        CREATE TABLE IF NOT EXISTS migrations_applied (
+            version INTEGER PRIMARY KEY,
+            applied_at INTEGER NOT NULL -- epoch ms
+        );
+    `);
+    const applied = new Set((await db.all<{ version: number }[]>('SELECT version FROM migrations_applied')).map(r => r.version));
+
+    console.log(`Running database migrations (v${status.schemaVersion} -> v${LATEST_SCHEMA_VERSION})...`);
+    let blocked = false; // A pending background step keeps later versions from being recorded.
+    for (const migration of pending) {
+        await withTransaction(async () => {
+            if (migration.up && !applied.has(migration.version)) {
+                console.log(`  -> v${migration.version}: ${migration.name}`);
+                await migration.up();
+                await db.run('INSERT OR IGNORE INTO migrations_applied (version, applied_at) VALUES (?, ?)', migration.version, Date.now());
+            }
+            if (!blocked && !migration.backgroundStep) await setUserVersion(migration.version);
+        });
+        if (migration.backgroundStep) blocked = true;
+    }
+    console.log(blocked
+        ? 'Schema migrations complete; data migrations will continue in the background.'
+        : 'Migrations complete. Database is ready.');
+}
+
+// Runs the background part of pending migrations in order. Call once the server is listening.
+export function startBackgroundMigrations() {
+    const pending = MIGRATIONS.filter(m => m.version > status.schemaVersion);
+    if (pending.length === 0 || status.backgroundRunning) return;
+
+    status.backgroundRunning = true;
+    (async () => {
+        for (const migration of pending) {
+            if (migration.backgroundStep) {
+                status.backgroundCurrent = `v${migration.version}: ${migration.name}`;
+                console.log(`[Migration] Arka plan adımı başladı: ${status.backgroundCurrent}`);
+                while (!(await migration.backgroundStep())) {
+                    await new Promise(r => setTimeout(r, BACKGROUND_PAUSE_MS));
+                }
+            }
+            await setUserVersion(migration.version);
+        }
+        console.log(`[Migration] Tüm veri geçişleri tamamlandı (v${status.schemaVersion}).`);
+    })().catch(error => {
+        status.backgroundError = String(error);
+        console.error('[Migration] Arka plan geçişi başarısız oldu, bir sonraki başlangıçta devam edilecek:', error);
+    }).finally(() => {
+        status.backgroundRunning = false;
+        status.backgroundCurrent = null;
+    });
+}
+
+// The `ts` of a readings or raw_readings row in SQL; `prefix` is the table alias, e.g. 'r.'.
+// Until the v2 backfill is done older rows may still lack it, so it is derived from
+// `timestamp` for them. That form cannot use the ts indexes, so it is only used until then.
+export function epochTsSql(prefix = '') {
+    return status.schemaVersion >= 2 ? `${prefix}ts` : `COALESCE(${prefix}ts, ${epochMsSql(`${prefix}timestamp`)})`;
+}
+
+export function getMigrationStatus() {
+    return { ...status, latestVersion: LATEST_SCHEMA_VERSION };
+}
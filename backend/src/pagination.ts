@@ -0,0 +1,91 @@
+// Keyset pagination for the history endpoints.
+// Pages are ordered newest first by (ts, id); `id` is the rowid, so it breaks ties between
+// readings with the same timestamp and keeps the order stable while new rows are inserted.
+// Cursors are opaque to clients: base64url-encoded JSON of the boundary row and direction.
+
+export type CursorDirection = 'next' | 'prev';
+
+export interface Cursor {
+    ts: number;
+    id: number;
+    d: CursorDirection;
+}
+
+export interface CursorPage<T> {
+    items: T[];
+    next: string | null;
+    prev: string | null;
+}
+
+export class InvalidCursorError extends Error {
+    constructor() {
+        super('Invalid cursor.');
+        this.name = 'InvalidCursorError';
+    }
+}
+
+export function encodeCursor(cursor: Cursor): string {
+    return Buffer.from(JSON.stringify(cursor)).toString('base64url');
+}
+
+export function decodeCursor(value: string): Cursor {
+    try {
+        const cursor = JSON.parse(Buffer.from(value, 'base64url').toString('utf8'));
+        if (Number.isFinite(cursor?.ts) && Number.isInteger(cursor?.id) && (cursor.d === 'next' || cursor.d === 'prev')) {
+            return { ts: cursor.ts, id: cursor.id, d: cursor.d };
+        }
+    } catch {
+        // fall through
+    }
+    throw new InvalidCursorError();
+}
+
+// Parses the `limit` query parameter; returns null when it is not a valid page size.
+export function parsePageLimit(value: unknown, defaultLimit: number, maxLimit: number): number | null {
+    if (value === undefined) return defaultLimit;
+    const limit = typeof value === 'string' ? parseInt(value, 10) : NaN;
+    return Number.isInteger(limit) && limit >= 1 && limit <= maxLimit ? limit : null;
+}
+
+// WHERE fragment and ORDER BY for one page. `prefix` is the table alias, e.g. 'r.'; `ts` is
+// the time expression, when it is not the plain column.
+// A 'prev' page is read in ascending order from the cursor and reversed afterwards.
+export function keysetQuery(cursor: Cursor | null, prefix = '', ts = `${prefix}ts`) {
+    const id = `${prefix}id`;
+    if (!cursor) {
+        return { clause: '', params: [] as number[], orderBy: `${ts} DESC, ${id} DESC` };
+    }
+    const op = cursor.d === 'next' ? '<' : '>';
+    const dir = cursor.d === 'next' ? 'DESC' : 'ASC';
+    // Same as (ts op ? OR (ts = ? AND id op ?)), but the leading ts bound lets SQLite seek the index.
+    return {
+        clause: ` AND ${ts} ${op}= ? AND (${ts} ${op} ? OR ${id} ${op} ?)`,
+        params: [cursor.ts, cursor.ts, cursor.id],
+        orderBy: `${ts} ${dir}, ${id} ${dir}`,
+    };
+}
+
+// Builds the page from rows fetched with LIMIT limit + 1: the extra row only tells whether
+// there is another page in the direction of travel.
+export function buildPage<R extends { ts: number; id: number }, T>(
+    rows: R[],
+    limit: number,
+    cursor: Cursor | null,
+    map: (row: R) => T,
+): CursorPage<T> {
+    const hasMore = rows.length > limit;
+    const pageRows = rows.slice(0, limit);
+    if (cursor?.d === 'prev') pageRows.reverse();
+
+    const first = pageRows[0];
+    const last = pageRows[pageRows.length - 1];
+    // Moving forward always leaves newer rows behind us, and moving back leaves older ones.
+    const hasNewer = cursor?.d === 'prev' ? hasMore : cursor !== null;
+    const hasOlder = cursor?.d === 'prev' ? true : hasMore;
+
+    return {
+        items: pageRows.map(map),
+        next: last && hasOlder ? encodeCursor({ ts: last.ts, id: last.id, d: 'next' }) : null,
+        prev: first && hasNewer ? encodeCursor({ ts: first.ts, id: first.id, d: 'prev' }) : null,
+    };
+}
@@ -0,0 +1,242 @@
+import { Worker } from 'worker_threads';
+import { Response as ExpressResponse } from 'express';
+import path from 'path';
+import process from 'process';
+import { fileURLToPath } from 'url';
+import { DB_FILE } from './database.js';
+import { DownsampleOptions } from './downsample.js';
+
+// Pool of read-only SQLite connections, each in its own worker thread.
+//
+// Heavy reads (history, reports, maintenance scans) go through the pool so they neither
+// queue behind agent writes on the shared connection nor tie up the main event loop.
+// Ingestion keeps the single writer connection in database.ts. The pool queue is bounded:
+// when it is full, new queries fail immediately with ReadPoolBusyError instead of piling
+// up. Every query has a timeout after which it is interrupted and fails with
+// ReadPoolTimeoutError.
+
+const POOL_SIZE = Math.max(parseInt(process.env.READ_POOL_SIZE || '2', 10), 1);
+const MAX_QUEUE_DEPTH = parseInt(process.env.READ_POOL_MAX_QUEUE || '100', 10);
+const QUERY_TIMEOUT_MS = parseInt(process.env.READ_POOL_QUERY_TIMEOUT_MS || '15000', 10);
+
+// Same file extension as this module, so the pool works from both src (ts-node) and dist.
+const WORKER_FILE = new URL(`./readWorker${path.extname(fileURLToPath(import.meta.url))}`, import.meta.url);
+
+export class ReadPoolBusyError extends Error {
+    constructor() {
+        super('Read pool queue is full.');
+        this.name = 'ReadPoolBusyError';
+    }
+}
+
+export class ReadPoolTimeoutError extends Error {
+    constructor(timeoutMs: number) {
+        super(`Query exceeded ${timeoutMs} ms.`);
+        this.name = 'ReadPoolTimeoutError';
+    }
+}
+
+interface QueryOptions {
+    timeoutMs?: number;
+    // Reduce reading rows per sensor in the worker before returning them (see downsample.ts).
+    downsample?: DownsampleOptions;
+}
+
+interface PendingQuery {
+    id: number;
+    method: 'all' | 'get';
+    sql: string;
+    params: unknown[];
+    downsample?: DownsampleOptions;
+    timeoutMs: number;
+    enqueuedAt: number;
+    timer?: NodeJS.Timeout;
+    timedOut?: boolean;
+    resolve: (rows: any) => void;
+    reject: (error: Error) => void;
+}
+
+interface PoolWorker {
+    worker: Worker;
+    current: PendingQuery | null;
+}
+
+class ReadPool {
+    private workers: PoolWorker[] = [];
+    private queue: PendingQuery[] = [];
+    private nextId = 1;
+    private stopped = false;
+
+    private stats = {
+        completed: 0,
+        failed: 0,
+        timeouts: 0,
+        rejectedBusy: 0,
+        restarts: 0,
+        maxQueueDepth: 0,
+        totalMs: 0,
+        maxMs: 0,
+    };
+
+    start() {
+        this.stopped = false;
+        for (let i = 0; i < POOL_SIZE; i++) {
+            this.workers.push(this.spawn());
+        }
+        console.log(`[ReadPool] ${POOL_SIZE} okuma işçisi başlatıldı.`);
+    }
+
+    async stop() {
+        this.stopped = true;
+        const error = new Error('Read pool is shutting down.');
+        this.queue.splice(0).forEach(q => this.fail(q, error));
+        await Promise.all(this.workers.map(w => w.worker.terminate()));
+        this.workers = [];
+    }
+
+    all<T = any[]>(sql: string, params: unknown[] = [], options: QueryOptions = {}): Promise<T> {
+        return this.enqueue('all', sql, params, options);
+    }
+
+    get<T = any>(sql: string, params: unknown[] = [], options: QueryOptions = {}): Promise<T | undefined> {
+        return this.enqueue('get', sql, params, options);
+    }
+
+    getStats() {
+        const finished = this.stats.completed + this.stats.failed;
+        return {
+            size: this.workers.length,
+            busy: this.workers.filter(w => w.current).length,
+            queueDepth: this.queue.length,
+            maxQueueDepthLimit: MAX_QUEUE_DEPTH,
+            queryTimeoutMs: QUERY_TIMEOUT_MS,
+            ...this.stats,
+            avgMs: finished > 0 ? Math.round(this.stats.totalMs / finished) : 0,
+        };
+    }
+
+    private enqueue(method: 'all' | 'get', sql: string, params: unknown[], options: QueryOptions): Promise<any> {
+        if (this.stopped || this.workers.length === 0) {
+            return Promise.reject(new Error('Read pool is not running.'));
+        }
+        if (this.queue.length >= MAX_QUEUE_DEPTH) {
+            this.stats.rejectedBusy++;
+            return Promise.reject(new ReadPoolBusyError());
+        }
+        return new Promise((resolve, reject) => {
+            const query: PendingQuery = {
+                id: this.nextId++,
+                method, sql, params,
+                downsample: options.downsample,
+                timeoutMs: options.timeoutMs ?? QUERY_TIMEOUT_MS,
+                enqueuedAt: Date.now(),
+                resolve, reject,
+            };
+            // The timeout covers time spent waiting in the queue as well as running.
+            query.timer = setTimeout(() => this.timeout(query), query.timeoutMs);
+            this.queue.push(query);
+            this.stats.maxQueueDepth = Math.max(this.stats.maxQueueDepth, this.queue.length);
+            this.dispatch();
+        });
+    }
+
+    private dispatch() {
+        for (const w of this.workers) {
+            if (this.queue.length === 0) return;
+            if (w.current) continue;
+            const query = this.queue.shift()!;
+            w.current = query;
+            w.worker.postMessage({ type: 'query', id: query.id, method: query.method, sql: query.sql, params: query.params, downsample: query.downsample });
+        }
+    }
+
+    private timeout(query: PendingQuery) {
+        query.timedOut = true;
+        this.stats.timeouts++;
+        const queued = this.queue.indexOf(query);
+        if (queued !== -1) {
+            this.queue.splice(queued, 1);
+        } else {
+            const owner = this.workers.find(w => w.current === query);
+            owner?.worker.postMessage({ type: 'cancel', id: query.id });
+        }
+        this.fail(query, new ReadPoolTimeoutError(query.timeoutMs));
+    }
+
+    private finish(query: PendingQuery) {
+        clearTimeout(query.timer);
+        const elapsed = Date.now() - query.enqueuedAt;
+        this.stats.totalMs += elapsed;
+        this.stats.maxMs = Math.max(this.stats.maxMs, elapsed);
+    }
+
+    private fail(query: PendingQuery, error: Error) {
+        this.finish(query);
+        this.stats.failed++;
+        query.reject(error);
+    }
+
+    private spawn(): PoolWorker {
+        const poolWorker: PoolWorker = {
+            worker: new Worker(WORKER_FILE, {
+                workerData: {
+                    dbFile: DB_FILE,
+                    busyTimeoutMs: parseInt(process.env.SQLITE_BUSY_TIMEOUT_MS || '5000', 10),
+                    cacheSizeKb: parseInt(process.env.READ_POOL_CACHE_SIZE_KB || '16384', 10),
+                    mmapSizeBytes: parseInt(process.env.SQLITE_MMAP_SIZE_MB || '256', 10) * 1024 * 1024,
+                },
+            }),
+            current: null,
+        };
+
+        poolWorker.worker.on('message', (message: { id: number; rows?: any; error?: string }) => {
+            const query = poolWorker.current;
+            if (!query || query.id !== message.id) return;
+            poolWorker.current = null;
+            // A timed-out query has already been rejected; only the worker is released.
+            if (!query.timedOut) {
+                if (message.error !== undefined) {
+                    this.fail(query, new Error(message.error));
+                } else {
+                    this.finish(query);
+                    this.stats.completed++;
+                    query.resolve(message.rows);
+                }
+            }
+            this.dispatch();
+        });
+
+        poolWorker.worker.on('error', (error) => {
+            console.error('[ReadPool] Okuma işçisi hata verdi:', error);
+        });
+
+        // Replace a worker that died so the pool keeps its size.
+        poolWorker.worker.on('exit', (code) => {
+            const index = this.workers.indexOf(poolWorker);
+            if (index === -1) return;
+            const query = poolWorker.current;
+            if (query && !query.timedOut) this.fail(query, new Error(`Read worker exited with code ${code}.`));
+            if (this.stopped) return;
+            this.stats.restarts++;
+            this.workers[index] = this.spawn();
+            this.dispatch();
+        });
+
+        return poolWorker;
+    }
+}
+
+export const readPool = new ReadPool();
+
+// Maps pool errors to HTTP responses; returns false for errors the caller should handle.
+export function sendReadPoolError(res: ExpressResponse, error: unknown): boolean {
+    if (error instanceof ReadPoolBusyError) {
+        res.status(503).json({ error: 'Server is busy, please retry shortly.' });
+        return true;
+    }
+    if (error instanceof ReadPoolTimeoutError) {
+        res.status(504).json({ error: 'Query took too long. Narrow the date range and try again.' });
+        return true;
+    }
+    return false;
+}
@@ -0,0 +1,67 @@
+import { parentPort, workerData } from 'worker_threads';
+import sqlite3 from 'sqlite3';
+import { open, Database } from 'sqlite';
+import { downsampleReadings, DownsampleOptions } from './downsample.js';
+
+// Worker side of the read pool (see readPool.ts). Each worker owns one read-only
+// connection and runs a single query at a time; in WAL mode it never blocks the writer.
+
+interface QueryMessage {
+    type: 'query';
+    id: number;
+    method: 'all' | 'get';
+    sql: string;
+    params: unknown[];
+    downsample?: DownsampleOptions;
+}
+
+interface CancelMessage {
+    type: 'cancel';
+    id: number;
+}
+
+const { dbFile, busyTimeoutMs, cacheSizeKb, mmapSizeBytes } = workerData as {
+    dbFile: string;
+    busyTimeoutMs: number;
+    cacheSizeKb: number;
+    mmapSizeBytes: number;
+};
+
+let db: Database;
+let currentId: number | null = null;
+
+const ready = (async () => {
+    db = await open({ filename: dbFile, driver: sqlite3.Database, mode: sqlite3.OPEN_READONLY });
+    await db.exec(`
+        PRAGMA busy_timeout = ${busyTimeoutMs};
+        PRAGMA cache_size = -${cacheSizeKb};
+        PRAGMA mmap_size = ${mmapSizeBytes};
+        PRAGMA temp_store = MEMORY;
+        PRAGMA query_only = ON;
+    `);
+})();
+
+parentPort!.on('message', async (message: QueryMessage | CancelMessage) => {
+    if (message.type === 'cancel') {
+        // Aborts the running statement; it then fails with SQLITE_INTERRUPT.
+        if (currentId === message.id) db.getDatabaseInstance().interrupt();
+        return;
+    }
+
+    currentId = message.id;
+    try {
+        await ready;
+        let rows = message.method === 'get'
+            ? await db.get(message.sql, message.params)
+            : await db.all(message.sql, message.params);
+        // Downsampling here means only the reduced rows are copied back to the main thread.
+        if (message.downsample && Array.isArray(rows)) {
+            rows = downsampleReadings(rows, message.downsample);
+        }
+        parentPort!.postMessage({ id: message.id, rows });
+    } catch (error: any) {
+        parentPort!.postMessage({ id: message.id, error: error?.message ?? String(error), code: error?.code });
+    } finally {
+        currentId = null;
+    }
+});
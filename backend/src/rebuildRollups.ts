@@ -0,0 +1,30 @@
+import 'dotenv/config';
+import { openDb, db, withTransaction } from './database.js';
+import { configureStorage } from './storage.js';
+import { migrate } from './migrations.js';
+import { beginRollupRebuild, runRollupRebuild, getRollupStatus } from './rollups.js';
+
+// Recomputes all rollup tables from the stored readings:
+//   npm run rebuild-rollups
+// Can run while the server is up: readings written meanwhile are counted once, and the server
+// sees the persisted rebuild state and answers aggregate queries from the raw readings until
+// the rebuild is done. POST /system/rollups/rebuild does the same inside the server.
+
+async function main() {
+    await openDb();
+    await configureStorage();
+    await migrate();
+    await withTransaction(beginRollupRebuild);
+    await runRollupRebuild();
+    await db.close();
+    const status = getRollupStatus();
+    if (status.lastError) {
+        console.error(`❌ Özet tabloları oluşturulamadı: ${status.lastError}`);
+        process.exit(1);
+    }
+}
+
+main().catch(error => {
+    console.error('❌ Özet tabloları oluşturulamadı:', error);
+    process.exit(1);
+});
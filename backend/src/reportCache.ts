@@ -0,0 +1,125 @@
+import fs from 'fs/promises';
+import path from 'path';
+import process from 'process';
+import { DATA_DIR } from './database.js';
+
+// Disk cache of rendered report files.
+//
+// Artifacts are content-addressed: the key (see reports.ts) hashes everything that goes into
+// the file, so an entry never needs invalidating and simply ages out. Entries are evicted
+// least recently used first once the cache holds more than MAX_BYTES. An entry that is still
+// being downloaded or mailed is pinned and is not evicted until it has been released.
+// The cache survives restarts; the rows count is kept in the file name for that reason.
+
+export const CACHE_DIR = path.join(DATA_DIR, 'report-cache');
+const MAX_BYTES = parseInt(process.env.REPORT_CACHE_MAX_MB || '512', 10) * 1024 * 1024;
+
+export interface CachedArtifact {
+    key: string;
+    filePath: string;
+    rows: number;
+    bytes: number;
+    pins: number;
+}
+
+// Least recently used first: a hit moves its entry to the end.
+const entries = new Map<string, CachedArtifact>();
+let totalBytes = 0;
+const stats = { hits: 0, misses: 0, stores: 0, evictions: 0 };
+
+const FILE_NAME = /^([0-9a-f]{64})_(\d+)\.(xlsx|csv)$/;
+
+// Indexes the files left by a previous process, oldest first by modification time.
+export async function loadReportCache() {
+    await fs.mkdir(CACHE_DIR, { recursive: true });
+    const found: (CachedArtifact & { mtimeMs: number })[] = [];
+    for (const name of await fs.readdir(CACHE_DIR)) {
+        const filePath = path.join(CACHE_DIR, name);
+        const match = FILE_NAME.exec(name);
+        if (!match) {
+            await fs.rm(filePath, { force: true, recursive: true });
+            continue;
+        }
+        const stat = await fs.stat(filePath);
+        found.push({ key: match[1], filePath, rows: Number(match[2]), bytes: stat.size, pins: 0, mtimeMs: stat.mtimeMs });
+    }
+    found.sort((a, b) => a.mtimeMs - b.mtimeMs);
+    entries.clear();
+    totalBytes = 0;
+    for (const { mtimeMs, ...entry } of found) {
+        entries.set(entry.key, entry);
+        totalBytes += entry.bytes;
+    }
+    await evict();
+    console.log(`[Rapor Önbelleği] ${entries.size} dosya (${Math.round(totalBytes / 1024 / 1024)} MB) yüklendi.`);
+}
+
+// Returns the entry pinned, or undefined on a miss. Release it with releaseArtifact.
+export function lookupArtifact(key: string): CachedArtifact | undefined {
+    const entry = entries.get(key);
+    if (!entry) {
+        stats.misses++;
+        return undefined;
+    }
+    stats.hits++;
+    entries.delete(key);
+    entries.set(key, entry);
+    entry.pins++;
+    // Keeps the LRU order across restarts.
+    const now = new Date();
+    fs.utimes(entry.filePath, now, now).catch(() => undefined);
+    return entry;
+}
+
+// Moves a finished render into the cache. The entry starts unpinned and nothing is evicted
+// until trimReportCache(), which gives the caller a chance to pin it first.
+export async function storeArtifact(key: string, renderedPath: string, extension: string, rows: number): Promise<CachedArtifact> {
+    const filePath = path.join(CACHE_DIR, `${key}_${rows}.${extension}`);
+    await fs.mkdir(CACHE_DIR, { recursive: true });
+    await fs.rename(renderedPath, filePath);
+    const { size } = await fs.stat(filePath);
+    const previous = entries.get(key);
+    if (previous) {
+        entries.delete(key);
+        totalBytes -= previous.bytes;
+    }
+    const entry: CachedArtifact = { key, filePath, rows, bytes: size, pins: 0 };
+    entries.set(key, entry);
+    totalBytes += size;
+    stats.stores++;
+    return entry;
+}
+
+export function releaseArtifact(entry: CachedArtifact) {
+    entry.pins = Math.max(0, entry.pins - 1);
+    if (entry.pins === 0) trimReportCache();
+}
+
+export function trimReportCache() {
+    if (totalBytes > MAX_BYTES) evict();
+}
+
+async function evict() {
+    const removed: string[] = [];
+    for (const entry of entries.values()) {
+        if (totalBytes <= MAX_BYTES) break;
+        if (entry.pins > 0) continue;
+        entries.delete(entry.key);
+        totalBytes -= entry.bytes;
+        stats.evictions++;
+        removed.push(entry.filePath);
+    }
+    await Promise.all(removed.map(file => fs.rm(file, { force: true }).catch(() => undefined)));
+}
+
+export function getReportCacheStats() {
+    const lookups = stats.hits + stats.misses;
+    return {
+        entries: entries.size,
+        bytes: totalBytes,
+        maxBytes: MAX_BYTES,
+        pinned: [...entries.values()].filter(e => e.pins > 0).length,
+        ...stats,
+        hitRate: lookups > 0 ? Math.round((stats.hits / lookups) * 1000) / 1000 : null,
+    };
+}
@@ -0,0 +1,196 @@
+import process from 'process';
+import { db } from './database.js';
+import { ReportWindow, RenderedReport, renderReport } from './reports.js';
+import { enqueueEmail } from './email.js';
+import { jobScheduler, CalendarSchedule, SYSTEM_TIME_ZONE, zonedParts, zonedTimeToUtc } from './jobScheduler.js';
+import { ReportConfig } from './types.js';
+
+// Scheduled report e-mails.
+//
+// Each enabled schedule is a calendar job in jobScheduler: daily at its time, weekly on
+// Mondays, monthly on the 1st, in SCHEDULE_TIME_ZONE. A run renders the report for the
+// period that just ended through renderReport, which does the work in a worker thread,
+// bounds how many renders run at once and shares one cached file between schedules with the
+// same configuration and fire time, then queues the e-mail in the outbox (email.ts) and
+// records the outcome in report_runs; delivery is tracked there. Runs missed while the
+// server was down are caught up on startup. The schedule routes call syncReportSchedule()
+// after every change.
+
+const TIME_ZONE = process.env.SCHEDULE_TIME_ZONE || SYSTEM_TIME_ZONE;
+const RUN_HISTORY_LIMIT = parseInt(process.env.REPORT_RUN_HISTORY_LIMIT || '50', 10);
+
+export type ScheduleFrequency = 'daily' | 'weekly' | 'monthly';
+
+interface ScheduleRow {
+    id: string;
+    name: string;
+    frequency: string;
+    recipient: string;
+    report_config: string | null;
+}
+
+const toFrequency = (value: string): ScheduleFrequency =>
+    value === 'weekly' || value === 'monthly' ? value : 'daily';
+
+const jobId = (scheduleId: string) => `report:${scheduleId}`;
+
+function calendarFor(frequency: ScheduleFrequency, time: string): CalendarSchedule {
+    return {
+        kind: 'calendar',
+        time,
+        weekday: frequency === 'weekly' ? 1 : undefined,
+        monthDay: frequency === 'monthly' ? 1 : undefined,
+        timeZone: TIME_ZONE,
+    };
+}
+
+// The data window a run covers: the full period ending at its fire time.
+export function scheduleWindow(frequency: ScheduleFrequency, fireAt: number): ReportWindow {
+    const p = zonedParts(fireAt, TIME_ZONE);
+    const start = frequency === 'monthly'
+        ? zonedTimeToUtc(p.year, p.month - 1, p.day, p.hour, p.minute, TIME_ZONE)
+        : zonedTimeToUtc(p.year, p.month, p.day - (frequency === 'weekly' ? 7 : 1), p.hour, p.minute, TIME_ZONE);
+    return { start, end: fireAt };
+}
+
+// YYYY-MM-DD of an instant in the schedule time zone, shown as the schedule's last run.
+const zonedDate = (ts: number) => {
+    const p = zonedParts(ts, TIME_ZONE);
+    return `${p.year}-${String(p.month).padStart(2, '0')}-${String(p.day).padStart(2, '0')}`;
+};
+
+let running = 0;
+const stats = { started: 0, queued: 0, failed: 0, totalMs: 0, maxMs: 0, rows: 0 };
+
+// Registers, reschedules or removes the job of one schedule to match the database.
+export async function syncReportSchedule(scheduleId: string) {
+    const row = await db.get("SELECT frequency, time, is_enabled FROM report_schedules WHERE id = ?", scheduleId);
+    if (!row || !row.is_enabled) {
+        await jobScheduler.cancel(jobId(scheduleId));
+        return;
+    }
+    const frequency = toFrequency(row.frequency);
+    try {
+        await jobScheduler.schedule(jobId(scheduleId), calendarFor(frequency, row.time), fireAt => runSchedule(scheduleId, fireAt), { catchUp: true });
+    } catch (error: any) {
+        console.error(`[Zamanlayıcı Hatası] Rapor planı (${scheduleId}) zamanlanamadı: ${error.message}`);
+        await jobScheduler.cancel(jobId(scheduleId));
+    }
+}
+
+async function runSchedule(scheduleId: string, fireAt: number) {
+    const schedule = await db.get<ScheduleRow>(
+        "SELECT id, name, frequency, recipient, report_config FROM report_schedules WHERE id = ?", scheduleId
+    );
+    if (!schedule) return;
+    const window = scheduleWindow(toFrequency(schedule.frequency), fireAt);
+    const startedAt = Date.now();
+    stats.started++;
+    running++;
+
+    let runId: number | undefined;
+    let file: RenderedReport | undefined;
+    try {
+        const { lastID } = await db.run(
+            "INSERT INTO report_runs (schedule_id, started_at, window_start, window_end, status) VALUES (?, ?, ?, ?, 'running')",
+            schedule.id, new Date(startedAt).toISOString(), window.start, window.end
+        );
+        runId = lastID;
+
+        let config: ReportConfig | null = null;
+        try {
+            config = schedule.report_config ? JSON.parse(schedule.report_config) : null;
+        } catch {
+            // handled below
+        }
+        if (!config?.selectedStations || !config.selectedSensorTypes) {
+            throw new Error('Rapor yapılandırması eksik veya bozuk.');
+        }
+
+        file = await renderReport(schedule.name, config, window);
+        const emailBody = `Merhaba,<br><br><b>${schedule.name}</b> adlı otomatik raporunuz oluşturulmuş ve eke eklenmiştir.<br><br>Saygılarımızla,<br>ORION Gözlem Platformu`;
+        await enqueueEmail(schedule.recipient, `Otomatik Rapor: ${schedule.name}`, emailBody, {
+            filename: file.fileName,
+            path: file.filePath,
+            contentType: file.contentType,
+        }, runId);
+
+        const durationMs = Date.now() - startedAt;
+        await db.run(
+            "UPDATE report_runs SET status = 'queued', finished_at = ?, row_count = ?, bytes = ?, duration_ms = ? WHERE id = ?",
+            new Date().toISOString(), file.rows, file.bytes, durationMs, runId
+        );
+        stats.queued++;
+        stats.totalMs += durationMs;
+        stats.maxMs = Math.max(stats.maxMs, durationMs);
+        stats.rows += file.rows;
+        console.log(`[Zamanlayıcı] "${schedule.name}" e-posta kuyruğuna alındı: ${file.rows} satır, ${durationMs} ms${file.cached ? ' (önbellekten)' : ''}.`);
+    } catch (error: any) {
+        stats.failed++;
+        console.error(`[Zamanlayıcı Hatası] Rapor planı (${schedule.id} - ${schedule.name}) çalıştırılamadı:`, error);
+        if (runId !== undefined) {
+            await db.run(
+                "UPDATE report_runs SET status = 'failed', finished_at = ?, duration_ms = ?, error = ? WHERE id = ?",
+                new Date().toISOString(), Date.now() - startedAt, error?.message ?? String(error), runId
+            ).catch(e => console.error("[Zamanlayıcı Hatası] Çalışma kaydı güncellenemedi:", e));
+        }
+    } finally {
+        file?.release();
+        running--;
+    }
+
+    // A failed run is not retried; the failure is in report_runs.
+    await db.run("UPDATE report_schedules SET last_run = ? WHERE id = ?", zonedDate(fireAt), schedule.id)
+        .catch(e => console.error("[Zamanlayıcı Hatası] Son çalışma tarihi kaydedilemedi:", e));
+    if (runId !== undefined) {
+        await db.run(
+            "DELETE FROM report_runs WHERE schedule_id = ? AND id <= (SELECT id FROM report_runs WHERE schedule_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+            schedule.id, schedule.id, RUN_HISTORY_LIMIT
+        ).catch(() => undefined);
+    }
+}
+
+export async function startReportScheduler() {
+    // Runs still marked running were interrupted by a previous shutdown or crash.
+    await db.run(
+        "UPDATE report_runs SET status = 'failed', error = 'Sunucu yeniden başlatıldı.' WHERE status = 'running'"
+    );
+    const schedules = await db.all<{ id: string }[]>("SELECT id FROM report_schedules WHERE is_enabled = 1");
+    for (const { id } of schedules) await syncReportSchedule(id);
+    console.log(`✅ Rapor zamanlayıcısı aktif: ${schedules.length} plan (${TIME_ZONE}).`);
+}
+
+export async function getScheduleRuns(scheduleId: string, limit = 20) {
+    const rows = await db.all(`
+        SELECT rr.*, eo.status AS email_status, eo.attempts AS email_attempts, eo.latency_ms AS email_latency_ms, eo.last_error AS email_error
+        FROM report_runs rr LEFT JOIN email_outbox eo ON eo.report_run_id = rr.id
+        WHERE rr.schedule_id = ? ORDER BY rr.id DESC LIMIT ?
+    `, scheduleId, limit);
+    return rows.map(r => ({
+        id: r.id,
+        scheduleId: r.schedule_id,
+        startedAt: r.started_at,
+        finishedAt: r.finished_at,
+        windowStart: new Date(r.window_start).toISOString(),
+        windowEnd: new Date(r.window_end).toISOString(),
+        status: r.status,
+        rows: r.row_count,
+        bytes: r.bytes,
+        durationMs: r.duration_ms,
+        error: r.error,
+        email: r.email_status ? {
+            status: r.email_status,
+            attempts: r.email_attempts,
+            latencyMs: r.email_latency_ms,
+            error: r.email_error,
+        } : null,
+    }));
+}
+
+export function getReportSchedulerStats() {
+    return {
+        running,
+        ...stats,
+        avgMs: stats.queued > 0 ? Math.round(stats.totalMs / stats.queued) : 0,
+    };
+}
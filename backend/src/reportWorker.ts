@@ -0,0 +1,126 @@
+import { parentPort, workerData } from 'worker_threads';
+import fs from 'fs';
+import { once } from 'events';
+import sqlite3 from 'sqlite3';
+import { open } from 'sqlite';
+import { ReportConfig, ReportJob, ReportJobResult } from './types.js';
+import { keysetQuery } from './pagination.js';
+import { numericValue } from './values.js';
+import { createCsvWriter, createXlsxWriter, RowWriter } from './reportWriter.js';
+
+// Renders one report to a file (see reports.ts). Runs in its own thread with its own
+// read-only connection: rows are read in keyset chunks, formatted and handed to the
+// streaming writer, so neither the main thread nor memory grows with the report size.
+
+const { dbFile, busyTimeoutMs, job } = workerData as { dbFile: string; busyTimeoutMs: number; job: ReportJob };
+
+const CHUNK_ROWS = 5000;
+const HEADER = ['Tarih', 'Saat', 'İstasyon', 'Sensör', 'Sensör Tipi', 'Değer', 'Birim'];
+
+const dateFormat = new Intl.DateTimeFormat('tr-TR', { day: '2-digit', month: '2-digit', year: 'numeric' });
+const timeFormat = new Intl.DateTimeFormat('tr-TR', { hour: '2-digit', minute: '2-digit', second: '2-digit', hour12: false });
+
+interface ReportSensor {
+    id: string;
+    name: string;
+    type: string;
+    unit: string | null;
+    stationName: string;
+}
+
+// Sensors are split into groups that are written one after another, each newest first.
+// This gives the group-by-station / group-by-type ordering without sorting the rows.
+function groupSensors(sensors: ReportSensor[], config: ReportConfig): ReportSensor[][] {
+    const { groupByStation, groupBySensorType } = config.dataRules ?? {};
+    if (!groupByStation && !groupBySensorType) return sensors.length ? [sensors] : [];
+    const groupKey = (s: ReportSensor) => [groupByStation ? s.stationName : '', groupBySensorType ? s.type : ''];
+    const groups = new Map<string, { key: string[]; sensors: ReportSensor[] }>();
+    for (const s of sensors) {
+        const key = groupKey(s);
+        const id = JSON.stringify(key);
+        if (!groups.has(id)) groups.set(id, { key, sensors: [] });
+        groups.get(id)!.sensors.push(s);
+    }
+    return [...groups.values()]
+        .sort((a, b) => a.key[0].localeCompare(b.key[0], 'tr') || a.key[1].localeCompare(b.key[1], 'tr'))
+        .map(g => g.sensors);
+}
+
+async function render(): Promise<ReportJobResult> {
+    const db = await open({ filename: dbFile, driver: sqlite3.Database, mode: sqlite3.OPEN_READONLY });
+    await db.exec(`PRAGMA busy_timeout = ${busyTimeoutMs}; PRAGMA query_only = ON;`);
+
+    const out = fs.createWriteStream(job.outputPath);
+    try {
+        const stationIds = job.config.selectedStations ?? [];
+        const sensorTypes = job.config.selectedSensorTypes ?? [];
+        const sensors = stationIds.length && sensorTypes.length ? await db.all<ReportSensor[]>(`
+            SELECT s.id, s.name, s.type, s.unit, st.name AS stationName
+            FROM sensors s JOIN stations st ON s.station_id = st.id
+            WHERE s.station_id IN (${stationIds.map(() => '?').join(',')})
+            AND s.type IN (${sensorTypes.map(() => '?').join(',')})
+        `, [...stationIds, ...sensorTypes]) : [];
+        const sensorMap = new Map(sensors.map(s => [s.id, s]));
+
+        const writer: RowWriter = job.format === 'CSV'
+            ? createCsvWriter(out, HEADER)
+            : createXlsxWriter(out, 'Rapor', HEADER);
+
+        let rows = 0;
+        for (const group of groupSensors(sensors, job.config)) {
+            const ids = group.map(s => s.id);
+            // Several sensors: walk the ts index in order instead of sorting the whole window.
+            const sensorColumn = ids.length > 1 ? '+sensor_id' : 'sensor_id';
+            const ts = job.tsSql;
+            let after: { ts: number; id: number } | null = null;
+            while (true) {
+                const keyset = keysetQuery(after ? { ...after, d: 'next' as const } : null, '', ts);
+                const chunk = await db.all<{ id: number; ts: number; sensor_id: string; value: string | null }[]>(`
+                    SELECT id, ${ts} AS ts, sensor_id, value FROM readings
+                    WHERE ${sensorColumn} IN (${ids.map(() => '?').join(',')}) AND ${ts} >= ? AND ${ts} <= ?${keyset.clause}
+                    ORDER BY ${keyset.orderBy}
+                    LIMIT ?
+                `, [...ids, job.start, job.end, ...keyset.params, CHUNK_ROWS]);
+
+                for (const r of chunk) {
+                    const sensor = sensorMap.get(r.sensor_id)!;
+                    let value: number | null = null;
+                    try {
+                        value = r.value === null ? null : numericValue(JSON.parse(r.value), sensor.type);
+                    } catch {
+                        // Unparseable values are reported as N/A.
+                    }
+                    const date = new Date(r.ts);
+                    await writer.writeRow([
+                        dateFormat.format(date),
+                        timeFormat.format(date),
+                        sensor.stationName,
+                        sensor.name,
+                        sensor.type,
+                        value === null ? 'N/A' : Math.round(value * 100) / 100,
+                        sensor.unit,
+                    ]);
+                }
+                rows += chunk.length;
+                if (chunk.length < CHUNK_ROWS) break;
+                const last = chunk[chunk.length - 1];
+                after = { ts: last.ts, id: last.id };
+            }
+        }
+
+        const bytes = await writer.finish();
+        out.end();
+        await once(out, 'finish');
+        return { rows, bytes };
+    } catch (error) {
+        out.destroy();
+        throw error;
+    } finally {
+        await db.close();
+    }
+}
+
+render().then(
+    result => parentPort!.postMessage({ result }),
+    (error: any) => parentPort!.postMessage({ error: error?.message ?? String(error) }),
+);
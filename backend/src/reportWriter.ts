@@ -0,0 +1,311 @@
+import { Writable } from 'stream';
+import { once } from 'events';
+import zlib from 'zlib';
+
+// Incremental CSV and XLSX writers for generated reports.
+//
+// Rows are encoded and written as they arrive, waiting for the output to drain, so memory
+// stays flat regardless of report size. The XLSX writer produces a minimal workbook
+// (inline strings, no styles) inside a zip that is itself streamed: the worksheet entry
+// is deflated on the fly and its CRC and sizes follow in a data descriptor.
+
+export type Cell = string | number | null;
+
+export interface RowWriter {
+    writeRow(cells: Cell[]): Promise<void>;
+    // Completes the file and returns the number of bytes written.
+    finish(): Promise<number>;
+}
+
+const write = async (out: Writable, chunk: string | Buffer) => {
+    if (!out.write(chunk)) await once(out, 'drain');
+};
+
+// --- CSV ---
+
+// Semicolon-separated with a BOM, which is what Excel expects with Turkish locale settings.
+const csvField = (value: Cell): string => {
+    const text = value === null ? '' : String(value);
+    return /[;"\r\n]/.test(text) ? `"${text.replace(/"/g, '""')}"` : text;
+};
+
+export function createCsvWriter(out: Writable, header: string[]): RowWriter {
+    let bytes = 0;
+    let pending = '';
+    const flush = async () => {
+        if (!pending) return;
+        const buf = Buffer.from(pending, 'utf8');
+        pending = '';
+        bytes += buf.length;
+        await write(out, buf);
+    };
+    pending = `\uFEFF${header.map(csvField).join(';')}\n`;
+    return {
+        async writeRow(cells) {
+            pending += cells.map(csvField).join(';') + '\n';
+            if (pending.length >= 64 * 1024) await flush();
+        },
+        async finish() {
+            await flush();
+            return bytes;
+        },
+    };
+}
+
+// --- ZIP ---
+
+const CRC_TABLE = (() => {
+    const table = new Int32Array(256);
+    for (let n = 0; n < 256; n++) {
+        let c = n;
+        for (let k = 0; k < 8; k++) c = c & 1 ? 0xEDB88320 ^ (c >>> 1) : c >>> 1;
+        table[n] = c;
+    }
+    return table;
+})();
+
+const crc32 = (buf: Buffer, crc = 0): number => {
+    crc = ~crc;
+    for (let i = 0; i < buf.length; i++) crc = CRC_TABLE[(crc ^ buf[i]) & 0xFF] ^ (crc >>> 8);
+    return ~crc >>> 0;
+};
+
+interface ZipEntry {
+    name: Buffer;
+    flags: number;
+    crc: number;
+    compressedSize: number;
+    size: number;
+    offset: number;
+}
+
+const FLAG_DATA_DESCRIPTOR = 0x0008;
+const FLAG_UTF8 = 0x0800;
+const METHOD_DEFLATE = 8;
+const ZIP32_LIMIT = 0xFFFFFFFF;
+
+class ZipStream {
+    private offset = 0;
+    private entries: ZipEntry[] = [];
+    private readonly time: number;
+    private readonly date: number;
+
+    constructor(private readonly out: Writable) {
+        const now = new Date();
+        this.time = (now.getHours() << 11) | (now.getMinutes() << 5) | Math.floor(now.getSeconds() / 2);
+        this.date = ((now.getFullYear() - 1980) << 9) | ((now.getMonth() + 1) << 5) | now.getDate();
+    }
+
+    get bytesWritten() {
+        return this.offset;
+    }
+
+    private async raw(buf: Buffer) {
+        this.offset += buf.length;
+        if (this.offset > ZIP32_LIMIT) throw new Error('Report exceeds the 4 GB zip limit.');
+        await write(this.out, buf);
+    }
+
+    private localHeader(name: Buffer, flags: number, crc: number, compressedSize: number, size: number) {
+        const header = Buffer.alloc(30);
+        header.writeUInt32LE(0x04034B50, 0);
+        header.writeUInt16LE(20, 4);
+        header.writeUInt16LE(flags, 6);
+        header.writeUInt16LE(METHOD_DEFLATE, 8);
+        header.writeUInt16LE(this.time, 10);
+        header.writeUInt16LE(this.date, 12);
+        header.writeUInt32LE(crc, 14);
+        header.writeUInt32LE(compressedSize, 18);
+        header.writeUInt32LE(size, 22);
+        header.writeUInt16LE(name.length, 26);
+        header.writeUInt16LE(0, 28);
+        return Buffer.concat([header, name]);
+    }
+
+    // Small entries whose content is known up front.
+    async addFile(fileName: string, content: string) {
+        const name = Buffer.from(fileName, 'utf8');
+        const data = Buffer.from(content, 'utf8');
+        const compressed = zlib.deflateRawSync(data);
+        const entry: ZipEntry = { name, flags: FLAG_UTF8, crc: crc32(data), compressedSize: compressed.length, size: data.length, offset: this.offset };
+        await this.raw(this.localHeader(name, entry.flags, entry.crc, entry.compressedSize, entry.size));
+        await this.raw(compressed);
+        this.entries.push(entry);
+    }
+
+    // Streamed entry: content is deflated as it is written, sizes go into a data descriptor.
+    async beginFile(fileName: string) {
+        const name = Buffer.from(fileName, 'utf8');
+        const entry: ZipEntry = { name, flags: FLAG_UTF8 | FLAG_DATA_DESCRIPTOR, crc: 0, compressedSize: 0, size: 0, offset: this.offset };
+        await this.raw(this.localHeader(name, entry.flags, 0, 0, 0));
+
+        const deflate = zlib.createDeflateRaw();
+        // Output is copied in order; a full destination pauses the deflater, which in turn
+        // makes deflate.write() report backpressure to the caller.
+        let copying: Promise<void> = Promise.resolve();
+        deflate.on('data', (chunk: Buffer) => {
+            entry.compressedSize += chunk.length;
+            deflate.pause();
+            copying = copying.then(() => this.raw(chunk)).finally(() => deflate.resume());
+            // A write failure is reported by end(); don't let it surface as an unhandled rejection first.
+            copying.catch(() => undefined);
+        });
+        const ended = once(deflate, 'end');
+
+        return {
+            write: async (text: string) => {
+                const buf = Buffer.from(text, 'utf8');
+                entry.crc = crc32(buf, entry.crc);
+                entry.size += buf.length;
+                if (entry.size > ZIP32_LIMIT) throw new Error('Report exceeds the 4 GB zip limit.');
+                if (!deflate.write(buf)) await once(deflate, 'drain');
+            },
+            end: async () => {
+                deflate.end();
+                await ended;
+                await copying;
+                const descriptor = Buffer.alloc(16);
+                descriptor.writeUInt32LE(0x08074B50, 0);
+                descriptor.writeUInt32LE(entry.crc, 4);
+                descriptor.writeUInt32LE(entry.compressedSize, 8);
+                descriptor.writeUInt32LE(entry.size, 12);
+                await this.raw(descriptor);
+                this.entries.push(entry);
+            },
+        };
+    }
+
+    async finish() {
+        const centralOffset = this.offset;
+        for (const e of this.entries) {
+            const header = Buffer.alloc(46);
+            header.writeUInt32LE(0x02014B50, 0);
+            header.writeUInt16LE(20, 4);
+            header.writeUInt16LE(20, 6);
+            header.writeUInt16LE(e.flags, 8);
+            header.writeUInt16LE(METHOD_DEFLATE, 10);
+            header.writeUInt16LE(this.time, 12);
+            header.writeUInt16LE(this.date, 14);
+            header.writeUInt32LE(e.crc, 16);
+            header.writeUInt32LE(e.compressedSize, 20);
+            header.writeUInt32LE(e.size, 24);
+            header.writeUInt16LE(e.name.length, 28);
+            header.writeUInt32LE(e.offset, 42);
+            await this.raw(Buffer.concat([header, e.name]));
+        }
+        const end = Buffer.alloc(22);
+        end.writeUInt32LE(0x06054B50, 0);
+        end.writeUInt16LE(this.entries.length, 8);
+        end.writeUInt16LE(this.entries.length, 10);
+        end.writeUInt32LE(this.offset - centralOffset, 12);
+        end.writeUInt32LE(centralOffset, 16);
+        await this.raw(end);
+    }
+}
+
+// --- XLSX ---
+
+// Excel's per-sheet row limit; longer reports continue on further sheets.
+const MAX_SHEET_ROWS = 1048576;
+
+const xmlEscape = (text: string) => text
+    // Control characters other than tab/newline are not allowed in XML.
+    .replace(/[\u0000-\u0008\u000B\u000C\u000E-\u001F]/g, '')
+    .replace(/&/g, '&amp;')
+    .replace(/</g, '&lt;')
+    .replace(/>/g, '&gt;');
+
+const columnName = (index: number) => {
+    let name = '';
+    for (let n = index + 1; n > 0; n = Math.floor((n - 1) / 26)) {
+        name = String.fromCharCode(65 + ((n - 1) % 26)) + name;
+    }
+    return name;
+};
+
+const XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n';
+const SHEET_START = `${XML_HEADER}<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>`;
+const SHEET_END = '</sheetData></worksheet>';
+
+export function createXlsxWriter(out: Writable, sheetName: string, header: string[]): RowWriter {
+    const zip = new ZipStream(out);
+    const columns = header.map((_, i) => columnName(i));
+    // Sheet names are limited to 31 characters and may not contain []:*?/\
+    const baseName = sheetName.replace(/[\[\]:*?/\\]/g, ' ').slice(0, 25) || 'Rapor';
+
+    let sheetCount = 0;
+    let sheet: Awaited<ReturnType<ZipStream['beginFile']>> | null = null;
+    let rowNumber = 0;
+    let pending = '';
+
+    const rowXml = (cells: Cell[], r: number) => {
+        let xml = `<row r="${r}">`;
+        cells.forEach((cell, i) => {
+            if (cell === null || cell === '') return;
+            const ref = `${columns[i]}${r}`;
+            xml += typeof cell === 'number' && Number.isFinite(cell)
+                ? `<c r="${ref}"><v>${cell}</v></c>`
+                : `<c r="${ref}" t="inlineStr"><is><t xml:space="preserve">${xmlEscape(String(cell))}</t></is></c>`;
+        });
+        return xml + '</row>';
+    };
+
+    const flush = async () => {
+        if (!pending || !sheet) return;
+        const text = pending;
+        pending = '';
+        await sheet.write(text);
+    };
+
+    const openSheet = async () => {
+        sheetCount++;
+        sheet = await zip.beginFile(`xl/worksheets/sheet${sheetCount}.xml`);
+        rowNumber = 1;
+        pending = SHEET_START + rowXml(header, rowNumber);
+    };
+
+    const closeSheet = async () => {
+        pending += SHEET_END;
+        await flush();
+        await sheet!.end();
+        sheet = null;
+    };
+
+    const sheetNames = () => Array.from({ length: sheetCount }, (_, i) => xmlEscape(sheetCount === 1 ? baseName : `${baseName} ${i + 1}`));
+
+    return {
+        async writeRow(cells) {
+            if (!sheet) await openSheet();
+            if (rowNumber >= MAX_SHEET_ROWS) {
+                await closeSheet();
+                await openSheet();
+            }
+            rowNumber++;
+            pending += rowXml(cells, rowNumber);
+            if (pending.length >= 64 * 1024) await flush();
+        },
+        async finish() {
+            if (!sheet) await openSheet();
+            await closeSheet();
+
+            const names = sheetNames();
+            await zip.addFile('[Content_Types].xml', `${XML_HEADER}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">`
+                + '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                + '<Default Extension="xml" ContentType="application/xml"/>'
+                + '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+                + names.map((_, i) => `<Override PartName="/xl/worksheets/sheet${i + 1}.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>`).join('')
+                + '</Types>');
+            await zip.addFile('_rels/.rels', `${XML_HEADER}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">`
+                + '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+                + '</Relationships>');
+            await zip.addFile('xl/workbook.xml', `${XML_HEADER}<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>`
+                + names.map((name, i) => `<sheet name="${name.replace(/"/g, '&quot;')}" sheetId="${i + 1}" r:id="rId${i + 1}"/>`).join('')
+                + '</sheets></workbook>');
+            await zip.addFile('xl/_rels/workbook.xml.rels', `${XML_HEADER}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">`
+                + names.map((_, i) => `<Relationship Id="rId${i + 1}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet${i + 1}.xml"/>`).join('')
+                + '</Relationships>');
+            await zip.finish();
+            return zip.bytesWritten;
+        },
+    };
+}
@@ -0,0 +1,299 @@
+import { Worker } from 'worker_threads';
+import crypto from 'crypto';
+import path from 'path';
+import fs from 'fs/promises';
+import process from 'process';
+import { fileURLToPath } from 'url';
+import { v4 as uuidv4 } from 'uuid';
+import { DATA_DIR, DB_FILE } from './database.js';
+import { readPool } from './readPool.js';
+import { CachedArtifact, lookupArtifact, storeArtifact, releaseArtifact, trimReportCache } from './reportCache.js';
+import { ReportConfig, ReportJob, ReportJobResult } from './types.js';
+import { epochTsSql } from './migrations.js';
+
+// Server-side report generation.
+//
+// Each render runs in its own worker thread (reportWorker.ts), which streams the rows into
+// a file under ARTIFACTS_DIR. Finished files go to the artifact cache (reportCache.ts) under
+// a key derived from what the file contains, so schedules that share a configuration, and
+// repeated downloads of the same report, reuse one file; identical renders that overlap are
+// run once. Interactive renders are tracked by a handle: the client gets the handle back
+// immediately, polls its status and downloads the file once it is done. Handles are kept
+// for RENDER_TTL_MS.
+//
+// At most MAX_CONCURRENT_RENDERS workers run at a time, interactive and scheduled renders
+// alike; further renders wait in FIFO order for a free slot.
+
+export const ARTIFACTS_DIR = path.join(DATA_DIR, 'report-artifacts');
+const RENDER_TTL_MS = parseInt(process.env.REPORT_RENDER_TTL_MS || '3600000', 10);
+const MAX_CONCURRENT_RENDERS = Math.max(1, parseInt(process.env.REPORT_MAX_CONCURRENT_RENDERS || '2', 10));
+
+// Same file extension as this module, so rendering works from both src (ts-node) and dist.
+const WORKER_FILE = new URL(`./reportWorker${path.extname(fileURLToPath(import.meta.url))}`, import.meta.url);
+
+const PRESET_DAYS: Record<string, number> = { last24h: 1, last7d: 7, last30d: 30 };
+
+export interface ReportWindow {
+    start: number;
+    end: number;
+}
+
+// The file stays valid until release() is called.
+export interface RenderedReport extends ReportJobResult {
+    filePath: string;
+    fileName: string;
+    contentType: string;
+    durationMs: number;
+    cached: boolean;
+    release: () => void;
+}
+
+// The date range a report covers: its custom range, or the preset ending at the current
+// minute. Whole minutes let repeated downloads within a minute share a cached file.
+export function reportWindow(config: ReportConfig, now = Date.now()): ReportWindow | null {
+    if (config.dateRangePreset === 'custom') {
+        const start = Date.parse(config.customDateRange?.start);
+        const end = Date.parse(config.customDateRange?.end);
+        return isNaN(start) || isNaN(end) || start > end ? null : { start, end };
+    }
+    const days = PRESET_DAYS[config.dateRangePreset] ?? 1;
+    const end = now - (now % 60000);
+    return { start: end - days * 24 * 60 * 60 * 1000, end };
+}
+
+export function reportFileName(title: string, format: 'XLSX' | 'CSV', window: ReportWindow) {
+    const safeTitle = title.replace(/[^a-z0-9ğüşıöç_-]+/gi, '_').replace(/^_+|_+$/g, '') || 'rapor';
+    return `${safeTitle}_${new Date(window.end).toISOString().split('T')[0]}.${format === 'CSV' ? 'csv' : 'xlsx'}`;
+}
+
+const runningWorkers = new Set<Worker>();
+
+let activeRenders = 0;
+const waitingRenders: (() => void)[] = [];
+let stopped = false;
+
+async function acquireRenderSlot() {
+    if (activeRenders < MAX_CONCURRENT_RENDERS) {
+        activeRenders++;
+        return;
+    }
+    // The slot is handed over directly by releaseRenderSlot, so activeRenders stays as is.
+    await new Promise<void>(resolve => waitingRenders.push(resolve));
+}
+
+function releaseRenderSlot() {
+    const next = waitingRenders.shift();
+    if (next) next();
+    else activeRenders--;
+}
+
+// Cache key of a report: the normalized selection, the window, the sensor metadata printed
+// in the rows and a watermark of the readings in the window. Readings only ever get new,
+// higher ids, so any reading added to (or removed from) the window changes the watermark.
+// Names such as the report title are not part of the file and are left out.
+async function artifactKey(config: ReportConfig, window: ReportWindow, format: 'XLSX' | 'CSV'): Promise<string> {
+    const stationIds = [...new Set<string>(config.selectedStations ?? [])].sort();
+    const sensorTypes = [...new Set<string>(config.selectedSensorTypes ?? [])].sort();
+    const sensors = stationIds.length && sensorTypes.length ? await readPool.all<{ id: string }[]>(`
+        SELECT s.id, s.name, s.type, s.unit, st.name AS stationName
+        FROM sensors s JOIN stations st ON s.station_id = st.id
+        WHERE s.station_id IN (${stationIds.map(() => '?').join(',')})
+        AND s.type IN (${sensorTypes.map(() => '?').join(',')})
+        ORDER BY s.id
+    `, [...stationIds, ...sensorTypes]) : [];
+    // Index-only once the ts backfill is done: counted on the (sensor_id, ts) index, which
+    // carries the rowid.
+    const ts = epochTsSql();
+    const watermark = sensors.length ? await readPool.get(`
+        SELECT COUNT(*) AS count, MAX(id) AS maxId FROM readings
+        WHERE sensor_id IN (${sensors.map(() => '?').join(',')}) AND ${ts} >= ? AND ${ts} <= ?
+    `, [...sensors.map(s => s.id), window.start, window.end]) : null;
+
+    return crypto.createHash('sha256').update(JSON.stringify({
+        format,
+        stationIds,
+        sensorTypes,
+        groupByStation: !!config.dataRules?.groupByStation,
+        groupBySensorType: !!config.dataRules?.groupBySensorType,
+        start: window.start,
+        end: window.end,
+        sensors,
+        watermark,
+    })).digest('hex');
+}
+
+// Renders in progress by cache key, with the number of callers waiting for each.
+const pendingRenders = new Map<string, { promise: Promise<CachedArtifact>; waiters: number }>();
+
+// Returns the report as a file, from the cache or rendered on a miss. A render that is
+// already running for the same key is joined; a new one waits for a free render slot.
+// `durationMs` covers this call, so a cache hit reports only the time to look it up.
+export async function renderReport(title: string, config: ReportConfig, window: ReportWindow): Promise<RenderedReport> {
+    const format = config.fileFormat === 'CSV' ? 'CSV' : 'XLSX';
+    const startedAt = Date.now();
+    const key = await artifactKey(config, window, format);
+
+    let artifact = lookupArtifact(key);
+    const cached = artifact !== undefined;
+    if (!artifact) {
+        let pending = pendingRenders.get(key);
+        if (!pending) {
+            pending = { promise: renderArtifact(key, config, window, format), waiters: 0 };
+            pendingRenders.set(key, pending);
+        }
+        pending.waiters++;
+        artifact = await pending.promise;
+    }
+
+    const entry = artifact;
+    let released = false;
+    return {
+        rows: entry.rows,
+        bytes: entry.bytes,
+        filePath: entry.filePath,
+        fileName: reportFileName(title, format, window),
+        contentType: format === 'CSV' ? 'text/csv; charset=utf-8' : 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        durationMs: Date.now() - startedAt,
+        cached,
+        release: () => {
+            if (released) return;
+            released = true;
+            releaseArtifact(entry);
+        },
+    };
+}
+
+async function renderArtifact(key: string, config: ReportConfig, window: ReportWindow, format: 'XLSX' | 'CSV'): Promise<CachedArtifact> {
+    try {
+        await acquireRenderSlot();
+        let result: { filePath: string; rows: number };
+        try {
+            if (stopped) throw new Error('Report rendering is shut down.');
+            result = await runReportWorker(config, window, format);
+        } finally {
+            releaseRenderSlot();
+        }
+        const entry = await storeArtifact(key, result.filePath, format.toLowerCase(), result.rows);
+        // Every caller that joined this render gets a pin; from here on callers find it in the cache.
+        entry.pins += pendingRenders.get(key)!.waiters;
+        pendingRenders.delete(key);
+        trimReportCache();
+        return entry;
+    } finally {
+        pendingRenders.delete(key);
+    }
+}
+
+async function runReportWorker(config: ReportConfig, window: ReportWindow, format: 'XLSX' | 'CSV') {
+    await fs.mkdir(ARTIFACTS_DIR, { recursive: true });
+    const filePath = path.join(ARTIFACTS_DIR, `${uuidv4()}.${format.toLowerCase()}`);
+    // The worker's copy of the migrations module does not know whether the ts backfill is done.
+    const job: ReportJob = { config, start: window.start, end: window.end, format, outputPath: filePath, tsSql: epochTsSql() };
+
+    const result = await new Promise<ReportJobResult>((resolve, reject) => {
+        const worker = new Worker(WORKER_FILE, {
+            workerData: {
+                dbFile: DB_FILE,
+                busyTimeoutMs: parseInt(process.env.SQLITE_BUSY_TIMEOUT_MS || '5000', 10),
+                job,
+            },
+        });
+        runningWorkers.add(worker);
+        let settled = false;
+        worker.on('message', (message: { result?: ReportJobResult; error?: string }) => {
+            settled = true;
+            if (message.error !== undefined) reject(new Error(message.error));
+            else resolve(message.result!);
+        });
+        worker.on('error', (error) => {
+            settled = true;
+            reject(error);
+        });
+        worker.on('exit', (code) => {
+            runningWorkers.delete(worker);
+            if (!settled) reject(new Error(`Report worker exited with code ${code}.`));
+        });
+    }).catch(async (error) => {
+        await fs.rm(filePath, { force: true });
+        throw error;
+    });
+
+    return { filePath, rows: result.rows };
+}
+
+// --- Download handles ---
+
+export interface ReportRender {
+    id: string;
+    reportId: string;
+    status: 'running' | 'done' | 'failed';
+    createdAt: string;
+    rows?: number;
+    bytes?: number;
+    durationMs?: number;
+    error?: string;
+    file?: RenderedReport;
+}
+
+const renders = new Map<string, ReportRender>();
+const stats = { completed: 0, cached: 0, failed: 0, totalMs: 0, maxMs: 0, rows: 0, bytes: 0 };
+
+export function startReportRender(reportId: string, title: string, config: ReportConfig, window: ReportWindow): ReportRender {
+    const render: ReportRender = { id: uuidv4(), reportId, status: 'running', createdAt: new Date().toISOString() };
+    renders.set(render.id, render);
+
+    renderReport(title, config, window).then(file => {
+        Object.assign(render, { status: 'done', rows: file.rows, bytes: file.bytes, durationMs: file.durationMs, file });
+        stats.completed++;
+        if (file.cached) stats.cached++;
+        stats.totalMs += file.durationMs;
+        stats.maxMs = Math.max(stats.maxMs, file.durationMs);
+        stats.rows += file.rows;
+        stats.bytes += file.bytes;
+        console.log(`[Rapor] "${title}" ${file.cached ? 'önbellekten alındı' : 'oluşturuldu'}: ${file.rows} satır, ${file.bytes} bayt, ${file.durationMs} ms.`);
+    }, (error) => {
+        Object.assign(render, { status: 'failed', error: error.message });
+        stats.failed++;
+        console.error(`[Rapor] "${title}" oluşturulamadı:`, error);
+    }).finally(() => {
+        setTimeout(() => discardRender(render.id), RENDER_TTL_MS).unref();
+    });
+
+    return render;
+}
+
+export function getReportRender(id: string): ReportRender | undefined {
+    return renders.get(id);
+}
+
+function discardRender(id: string) {
+    const render = renders.get(id);
+    renders.delete(id);
+    render?.file?.release();
+}
+
+// Removes partial renders left over from a previous process.
+export async function clearReportArtifacts() {
+    await fs.rm(ARTIFACTS_DIR, { recursive: true, force: true });
+    await fs.mkdir(ARTIFACTS_DIR, { recursive: true });
+}
+
+// Fails queued renders and terminates running ones.
+export async function stopReportWorkers() {
+    stopped = true;
+    waitingRenders.splice(0).forEach(resume => resume());
+    await Promise.all([...runningWorkers].map(w => w.terminate()));
+}
+
+export function getReportStats() {
+    const finished = stats.completed + stats.failed;
+    return {
+        running: runningWorkers.size,
+        queued: waitingRenders.length,
+        maxConcurrent: MAX_CONCURRENT_RENDERS,
+        handles: renders.size,
+        ...stats,
+        avgMs: stats.completed > 0 ? Math.round(stats.totalMs / stats.completed) : 0,
+        failureRate: finished > 0 ? Math.round((stats.failed / finished) * 1000) / 1000 : null,
+    };
+}
@@ -0,0 +1,258 @@
+import process from 'process';
+import { db, withTransaction } from './database.js';
+import { numericFields } from './values.js';
+
+// Continuous rollups of numeric reading values at minute, hour and day granularity.
+//
+// Each rollup row holds count/min/max/sum/last for one (sensor, numeric key, bucket).
+// A reading value that is a plain number rolls up under the key 'value'; an object value
+// rolls up each of its numeric top-level fields under the field name.
+//
+// Rows are maintained incrementally inside the ingest transaction. A rebuild recomputes
+// them from `readings`; it is resumable and its progress lives in global_settings. The
+// rebuild captures a watermark (MAX(readings.id)) in the same transaction that clears the
+// tables, scans only ids up to the watermark, and leaves newer rows to the incremental path,
+// so every reading is counted exactly once even while agents keep writing.
+
+export type Granularity = '1m' | '1h' | '1d';
+
+export const ROLLUP_TABLES: Record<Granularity, string> = {
+    '1m': 'rollups_1m',
+    '1h': 'rollups_1h',
+    '1d': 'rollups_1d',
+};
+
+const MINUTE_MS = 60 * 1000;
+const HOUR_MS = 60 * MINUTE_MS;
+const DAY_MS = 24 * HOUR_MS;
+
+// Day buckets start at local midnight. Europe/Istanbul has been UTC+3 all year since 2016.
+export const DAY_OFFSET_MS = parseInt(process.env.ROLLUP_TZ_OFFSET_MINUTES || '180', 10) * MINUTE_MS;
+
+const REBUILD_BATCH_SIZE = parseInt(process.env.ROLLUP_REBUILD_BATCH_SIZE || '5000', 10);
+const REBUILD_PAUSE_MS = 50;
+const REBUILD_STATE_KEY = 'rollup_rebuild';
+
+export function bucketStart(granularity: Granularity, ts: number): number {
+    switch (granularity) {
+        case '1m': return ts - (((ts % MINUTE_MS) + MINUTE_MS) % MINUTE_MS);
+        case '1h': return ts - (((ts % HOUR_MS) + HOUR_MS) % HOUR_MS);
+        case '1d': {
+            const local = ts + DAY_OFFSET_MS;
+            return local - (((local % DAY_MS) + DAY_MS) % DAY_MS) - DAY_OFFSET_MS;
+        }
+    }
+}
+
+export const createRollupTablesSql = Object.values(ROLLUP_TABLES).map(table => `
+    CREATE TABLE IF NOT EXISTS ${table} (
+        sensor_id TEXT NOT NULL,
+        key TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        min REAL NOT NULL,
+        max REAL NOT NULL,
+        sum REAL NOT NULL,
+        last REAL NOT NULL,
+        last_ts INTEGER NOT NULL,
+        PRIMARY KEY (sensor_id, key, bucket),
+        FOREIGN KEY(sensor_id) REFERENCES sensors(id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+`).join('');
+
+interface Aggregate {
+    sensorId: string;
+    key: string;
+    bucket: number;
+    count: number;
+    min: number;
+    max: number;
+    sum: number;
+    last: number;
+    lastTs: number;
+}
+
+// Pre-aggregates a batch of readings in memory so each touched bucket costs one upsert.
+export class RollupBatch {
+    private aggregates: Record<Granularity, Map<string, Aggregate>> = { '1m': new Map(), '1h': new Map(), '1d': new Map() };
+
+    add(sensorId: string, ts: number, value: any) {
+        if (!Number.isFinite(ts) || ts <= 0) return;
+        const fields = numericFields(value);
+        if (fields.length === 0) return;
+        for (const granularity of Object.keys(this.aggregates) as Granularity[]) {
+            const bucket = bucketStart(granularity, ts);
+            const map = this.aggregates[granularity];
+            for (const [key, num] of fields) {
+                const id = `${sensorId}\u0000${key}\u0000${bucket}`;
+                const agg = map.get(id);
+                if (!agg) {
+                    map.set(id, { sensorId, key, bucket, count: 1, min: num, max: num, sum: num, last: num, lastTs: ts });
+                    continue;
+                }
+                agg.count++;
+                agg.min = Math.min(agg.min, num);
+                agg.max = Math.max(agg.max, num);
+                agg.sum += num;
+                if (ts >= agg.lastTs) {
+                    agg.last = num;
+                    agg.lastTs = ts;
+                }
+            }
+        }
+    }
+
+    get size() {
+        return this.aggregates['1m'].size;
+    }
+
+    // Merges the batch into the rollup tables. Call inside a transaction.
+    async apply() {
+        for (const granularity of Object.keys(this.aggregates) as Granularity[]) {
+            const map = this.aggregates[granularity];
+            if (map.size === 0) continue;
+            const table = ROLLUP_TABLES[granularity];
+            const upsert = await db.prepare(`
+                INSERT INTO ${table} (sensor_id, key, bucket, count, min, max, sum, last, last_ts)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(sensor_id, key, bucket) DO UPDATE SET
+                    count = count + excluded.count,
+                    min = MIN(min, excluded.min),
+                    max = MAX(max, excluded.max),
+                    sum = sum + excluded.sum,
+                    last = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last ELSE last END,
+                    last_ts = MAX(last_ts, excluded.last_ts)
+            `);
+            try {
+                for (const a of map.values()) {
+                    await upsert.run(a.sensorId, a.key, a.bucket, a.count, a.min, a.max, a.sum, a.last, a.lastTs);
+                }
+            } finally {
+                await upsert.finalize();
+            }
+            map.clear();
+        }
+    }
+}
+
+// --- REBUILD ---
+interface RebuildState {
+    watermark: number;
+    cursor: number;
+}
+
+const rebuildStatus = {
+    pending: false,
+    running: false,
+    startedAt: null as string | null,
+    lastCompletedAt: null as string | null,
+    scannedRows: 0,
+    lastError: null as string | null,
+};
+
+const readRebuildState = async (): Promise<RebuildState | null> => {
+    const row = await db.get("SELECT value FROM global_settings WHERE key = ?", REBUILD_STATE_KEY);
+    if (!row) return null;
+    try {
+        return JSON.parse(row.value);
+    } catch {
+        return null;
+    }
+};
+
+const writeRebuildState = (state: RebuildState) =>
+    db.run("INSERT OR REPLACE INTO global_settings (key, value) VALUES (?, ?)", REBUILD_STATE_KEY, JSON.stringify(state));
+
+// Clears the rollups and records a new rebuild job. Call inside a transaction.
+export async function beginRollupRebuild() {
+    for (const table of Object.values(ROLLUP_TABLES)) {
+        await db.run(`DELETE FROM ${table}`);
+    }
+    const maxRow = await db.get("SELECT MAX(id) as maxId FROM readings");
+    await writeRebuildState({ watermark: maxRow?.maxId ?? 0, cursor: 0 });
+    rebuildStatus.pending = true;
+}
+
+// Rolls up the next chunk of readings at or below the watermark. Returns true when done.
+async function rebuildStep(): Promise<boolean> {
+    return withTransaction(async () => {
+        const state = await readRebuildState();
+        if (!state) {
+            rebuildStatus.pending = false;
+            return true;
+        }
+
+        const rows = await db.all(
+            "SELECT id, sensor_id, value, ts, timestamp FROM readings WHERE id > ? AND id <= ? ORDER BY id LIMIT ?",
+            state.cursor, state.watermark, REBUILD_BATCH_SIZE
+        );
+        const batch = new RollupBatch();
+        for (const r of rows) {
+            let value: any;
+            try {
+                value = JSON.parse(r.value);
+            } catch {
+                continue;
+            }
+            batch.add(r.sensor_id, r.ts ?? Date.parse(r.timestamp), value);
+        }
+        await batch.apply();
+        rebuildStatus.scannedRows += rows.length;
+
+        if (rows.length < REBUILD_BATCH_SIZE) {
+            await db.run("DELETE FROM global_settings WHERE key = ?", REBUILD_STATE_KEY);
+            rebuildStatus.pending = false;
+            return true;
+        }
+        await writeRebuildState({ ...state, cursor: rows[rows.length - 1].id });
+        return false;
+    });
+}
+
+// Runs a pending rebuild to completion, one chunk per transaction.
+export async function runRollupRebuild() {
+    if (rebuildStatus.running) return;
+    rebuildStatus.running = true;
+    try {
+        rebuildStatus.pending = (await readRebuildState()) !== null;
+        if (!rebuildStatus.pending) return;
+        rebuildStatus.startedAt = new Date().toISOString();
+        rebuildStatus.scannedRows = 0;
+        rebuildStatus.lastError = null;
+        console.log('[Rollup] Özet tabloları yeniden oluşturuluyor...');
+        while (!(await rebuildStep())) {
+            await new Promise(r => setTimeout(r, REBUILD_PAUSE_MS));
+        }
+        rebuildStatus.lastCompletedAt = new Date().toISOString();
+        console.log(`[Rollup] Özet tabloları hazır (${rebuildStatus.scannedRows} okuma işlendi).`);
+    } catch (error) {
+        rebuildStatus.lastError = String(error);
+        console.error('[Rollup] Yeniden oluşturma başarısız, bir sonraki başlangıçta devam edilecek:', error);
+    } finally {
+        rebuildStatus.running = false;
+    }
+}
+
+// Starts a full rebuild in the background, e.g. after readings were deleted.
+export async function requestRollupRebuild() {
+    await withTransaction(beginRollupRebuild);
+    runRollupRebuild();
+}
+
+// While a rebuild is pending the rollups only cover part of the history. The persisted state
+// is checked too (cached for PENDING_CHECK_TTL_MS), since the rebuild-rollups CLI clears and
+// refills the tables from another process without touching this one's status.
+const PENDING_CHECK_TTL_MS = 2000;
+let persistedPending = { value: false, checkedAt: 0 };
+
+export async function isRollupRebuildPending(): Promise<boolean> {
+    if (rebuildStatus.pending) return true;
+    if (Date.now() - persistedPending.checkedAt > PENDING_CHECK_TTL_MS) {
+        persistedPending = { value: (await readRebuildState()) !== null, checkedAt: Date.now() };
+    }
+    return persistedPending.value;
+}
+
+export function getRollupStatus() {
+    return { ...rebuildStatus };
+}
@@ -1,45 +1,46 @@
+// Load .env before any other module: ES imports are evaluated first, and several modules
+// read their settings from process.env at load time.
+import 'dotenv/config';
 // FIX: Resolve Node.js type errors by importing 'Buffer' and 'process' and use aliased Express types for ES modules.
 import { Buffer } from 'buffer';
 import process from 'process';
 // Use aliased imports for Express types to avoid conflicts with global DOM types.
 import express, { Request as ExpressRequest, Response as ExpressResponse, NextFunction as ExpressNextFunction } from 'express';
 import cors from 'cors';
-import { openDb, db, migrate } from './database.js';
+import { openDb, db, withTransaction } from './database.js';
+import { migrate, startBackgroundMigrations, getMigrationStatus, epochTsSql } from './migrations.js';
+import { configureStorage, startCheckpointScheduler, stopCheckpointScheduler, getStorageStats } from './storage.js';
+import { warmLastValueCache, getLastValue, recordLastValue, invalidateLastValue } from './lastValueCache.js';
+import { ingestQueue, validateReadings, MAX_READINGS_PER_BATCH } from './ingest.js';
+import { readPool, sendReadPoolError } from './readPool.js';
+import { RollupBatch, runRollupRebuild, requestRollupRebuild, getRollupStatus } from './rollups.js';
+import { aggregateReadings, BUCKET_SIZES, AGGREGATE_FUNCTIONS, AggregateFn, MAX_BUCKETS_PER_SERIES } from './aggregate.js';
+import { decodeCursor, keysetQuery, buildPage, parsePageLimit, Cursor } from './pagination.js';
+import { streamReadingsExport, EXPORT_FORMATS, ExportFormat } from './export.js';
+import { reportWindow, startReportRender, getReportRender, ReportRender, clearReportArtifacts, stopReportWorkers, getReportStats } from './reports.js';
+import { loadReportCache, getReportCacheStats } from './reportCache.js';
+import { startEmailOutbox, stopEmailOutbox, getEmailOutboxStats } from './email.js';
+import { jobScheduler } from './jobScheduler.js';
+import { startReportScheduler, syncReportSchedule, getScheduleRuns, getReportSchedulerStats } from './reportScheduler.js';
+import { startAnomalyDetector, stopAnomalyDetector, forgetAnomalyState, getAnomalyStats } from './anomaly.js';
+import { queueCommand, takeCommands, waitForCommands, grantedWaitSeconds, releaseCommandWaiters, getCommandStats } from './commands.js';
+import { conditionalGet, fingerprint, getConditionalStats } from './conditional.js';
+import { getChangesSince, startChangeLog, getChangeLogStats, SyncedEntity } from './changeLog.js';
+import { publish, handleEventStream, closeEventStreams, getEventStats } from './events.js';
+import { loadAlertRules, syncAlertRule, evaluateAlerts, flushNotifications, getAlertStats } from './alertRules.js';
+import {
+    warmMetadataCache, getMetadataCacheStats, getSensorMeta, getStationMeta, getSensorsForStation, getCamerasForStation,
+    findSensors, getGlobalReadFrequencyMinutes, setGlobalReadFrequencyMinutes,
+    refreshSensor, refreshStation, refreshCamera, removeSensor, removeStation, removeCamera, SensorMeta,
+} from './metadataCache.js';
 import { v4 as uuidv4 } from 'uuid';
-import { DeviceConfig, SensorConfig, ReportSchedule } from './types.js';
+import { DeviceConfig, SensorConfig } from './types.js';
 import path from 'path';
 import { fileURLToPath } from 'url';
 import fs from 'fs/promises';
-import XLSX from 'xlsx';
-import nodemailer from 'nodemailer';
-import dotenv from 'dotenv';
 // Import Type for responseSchema
 import { GoogleGenAI, Type } from "@google/genai";
 
-dotenv.config();
-
-// FIX: Define types for DB query results to avoid 'unknown' type errors.
-interface ReadingForReport {
-    timestamp: string;
-    stationName: string;
-    sensorName: string;
-    sensorType: string;
-    value: string; // JSON string from DB
-    unit: string | null;
-    interface: string;
-}
-
-interface SensorForProcessing {
-    id: string;
-    type: string;
-    name: string;
-    station_id: string;
-    interface: string;
-    unit: string | null;
-    reference_value: number | null;
-    reference_operation: string | null;
-}
-
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
 
@@ -51,6 +52,21 @@ console.log(`[Server] Uploads dizini olarak kullanılıyor: ${UPLOADS_ROOT}`);
 const app = express();
 const port = process.env.PORT || 8000;
 
+// Parses optional start/end query parameters into epoch milliseconds.
+// Returns null if either one is present but not a valid date.
+const parseTimeRange = (start: unknown, end: unknown): { start: number | null; end: number | null } | null => {
+    const parse = (v: unknown): number | null | undefined => {
+        if (v === undefined || v === '') return null;
+        if (typeof v !== 'string') return undefined;
+        const ms = Date.parse(v);
+        return isNaN(ms) ? undefined : ms;
+    };
+    const startMs = parse(start);
+    const endMs = parse(end);
+    if (startMs === undefined || endMs === undefined) return null;
+    return { start: startMs, end: endMs };
+};
+
 // Helper to safely parse JSON that might be invalid or empty
 const safeJSONParse = (str: string | null | undefined, fallback: any) => {
     if (str === null || str === undefined || str === '') {
@@ -77,15 +93,7 @@ let agentStatus = {
     status: 'offline',
     lastUpdate: null as string | null,
 };
-let commandQueue: { [deviceId: string]: any[] } = {};
-
-// Helper to queue a command for a device
-const queueCommand = (deviceId: string, command_type: string, payload: any = {}) => {
-    const command = { id: Date.now(), command_type, payload, status: 'pending' };
-    if (!commandQueue[deviceId]) commandQueue[deviceId] = [];
-    commandQueue[deviceId].push(command);
-    console.log(`[COMMAND QUEUED] ${command_type} for device ${deviceId}`);
-};
+// Commands for the agents are queued in commands.ts.
 
 
 // --- AUTH MIDDLEWARE (simple token check) ---
@@ -94,70 +102,19 @@ const agentAuth = (req: ExpressRequest, res: ExpressResponse, next: ExpressNextF
     const token = req.headers.authorization?.split(' ')[1];
     // This token MUST match the one in the agent's config.json
     if (token && token === (process.env.DEVICE_AUTH_TOKEN || "EjderMeteo_Rpi_SecretKey_2025!")) { 
+        const wasOnline = agentStatus.status === 'online';
         agentStatus.status = 'online';
         agentStatus.lastUpdate = new Date().toISOString();
+        if (!wasOnline) publish('agent-status', agentStatus);
         next();
     } else {
         res.status(401).send('Unauthorized');
     }
 };
 
-// --- ANOMALY DETECTION HELPER ---
-const detectAnomaly = (currentValue: any, previousValue: any, sensorType: string): { isAnomaly: boolean; reason: string | null } => {
-    if (typeof currentValue !== 'number') {
-        // Extract number from object if possible (e.g. {temperature: 25})
-        if (currentValue && typeof currentValue === 'object') {
-             const val = Object.values(currentValue).find(v => typeof v === 'number');
-             if (typeof val === 'number') currentValue = val;
-             else return { isAnomaly: false, reason: null };
-        } else {
-            return { isAnomaly: false, reason: null };
-        }
-    }
-
-    // 1. Range Check
-    const ranges: Record<string, [number, number]> = {
-        'Sıcaklık': [-50, 80],
-        'Nem': [0, 100],
-        'Rüzgar Hızı': [0, 250], // km/h?
-        'Mesafe': [0, 1000], // cm
-    };
-
-    if (ranges[sensorType]) {
-        const [min, max] = ranges[sensorType];
-        if (currentValue < min || currentValue > max) {
-            return { isAnomaly: true, reason: `Değer Aralığı Dışı (${currentValue} < ${min} veya > ${max})` };
-        }
-    }
-
-    // 2. Spike Check (Requires previous value)
-    if (previousValue !== null && previousValue !== undefined) {
-        let prevVal = previousValue;
-         if (typeof prevVal !== 'number') {
-             if (prevVal && typeof prevVal === 'object') {
-                 const val = Object.values(prevVal).find(v => typeof v === 'number');
-                 if (typeof val === 'number') prevVal = val;
-             }
-        }
-
-        if (typeof prevVal === 'number') {
-             const diff = Math.abs(currentValue - prevVal);
-             // Simple thresholds for sudden change
-             const spikeThresholds: Record<string, number> = {
-                 'Sıcaklık': 15, // 15 degrees change in one reading is weird
-                 'Nem': 40, // 40% jump
-                 'Mesafe': 200, // 2 meters jump without context might be weird, but snow can fall? Keep high.
-             };
-             
-             if (spikeThresholds[sensorType] && diff > spikeThresholds[sensorType]) {
-                  return { isAnomaly: true, reason: `Ani Sıçrama (${prevVal} -> ${currentValue})` };
-             }
-        }
-    }
-
-    return { isAnomaly: false, reason: null };
-};
-
+// The device config also carries API keys from the environment; a change there after a
+// restart must change its ETag too.
+const configEnvFingerprint = fingerprint(process.env.API_KEY, process.env.OPENWEATHER_API_KEY);
 
 // --- API ROUTER SETUP ---
 const apiRouter = express.Router();
@@ -166,20 +123,21 @@ const apiRouter = express.Router();
 // --- AGENT-FACING ENDPOINTS ---
 
 // FIX: Add explicit types for req and res parameters.
-apiRouter.get('/config/:deviceId', agentAuth, async (req: ExpressRequest, res: ExpressResponse) => {
+apiRouter.get('/config/:deviceId', agentAuth, conditionalGet(['device_config'], { extra: configEnvFingerprint }), async (req: ExpressRequest, res: ExpressResponse) => {
     try {
         const { deviceId } = req.params;
 
-        const station = await db.get("SELECT lat, lng FROM stations WHERE id = ?", deviceId);
+        // Served from the metadata cache; agents poll this every minute.
+        const station = await getStationMeta(deviceId);
         if (!station) {
             return res.status(404).json({ error: "Station with this device ID not found." });
         }
 
-        const sensorsFromDb = await db.all("SELECT id, name, type, is_active, read_frequency, interface, parser_config, config, reference_value, reference_operation, read_order FROM sensors WHERE station_id = ?", deviceId);
-        const cameras = await db.all("SELECT id, name, rtsp_url FROM cameras WHERE station_id = ?", deviceId);
-        const globalFreq = await db.get("SELECT value FROM global_settings WHERE key = 'global_read_frequency_minutes'");
+        const stationSensors = getSensorsForStation(deviceId);
+        const cameras = getCamerasForStation(deviceId).map(({ id, name, rtsp_url }) => ({ id, name, rtsp_url }));
+        const globalFreq = await getGlobalReadFrequencyMinutes();
         
-        const processedSensors = sensorsFromDb.map(s => {
+        const processedSensors = stationSensors.map(({ station_id, unit, ...s }) => {
             const sensorConfig = {
                 ...s,
                 is_active: !!s.is_active,
@@ -202,7 +160,7 @@ apiRouter.get('/config/:deviceId', agentAuth, async (req: ExpressRequest, res: E
         const config: DeviceConfig = {
             sensors: processedSensors,
             cameras: cameras,
-            global_read_frequency_seconds: (parseInt(globalFreq?.value, 10) || 0) * 60,
+            global_read_frequency_seconds: (parseInt(globalFreq, 10) || 0) * 60,
             // FIX: Use process.env.API_KEY as per the coding guidelines.
             gemini_api_key: process.env.API_KEY,
         };
@@ -217,66 +175,85 @@ apiRouter.get('/config/:deviceId', agentAuth, async (req: ExpressRequest, res: E
 apiRouter.post('/submit-reading', agentAuth, async (req: ExpressRequest, res: ExpressResponse) => {
     try {
         const { sensor: sensor_id, value, rawValue } = req.body;
-        const timestamp = new Date().toISOString();
 
         if (sensor_id === undefined || value === undefined) {
             console.warn(`Bad request for /submit-reading: 'sensor' or 'value' field is missing.`, req.body);
             return res.status(400).json({ error: 'Bad Request: sensor and value fields are required.' });
         }
-        
-        const sensor = await db.get("SELECT id, type FROM sensors WHERE id = ?", sensor_id);
-        if (!sensor) {
-            console.warn(`Reading submitted for unknown sensor ID: ${sensor_id}`);
-            return res.status(404).json({ error: 'Sensor not found.' });
-        }
-        
-        // Anomaly Detection Logic
-        let isAnomaly = false;
-        let anomalyReason = null;
 
-        // Get the last reading to compare
-        const lastReading = await db.get("SELECT value FROM readings WHERE sensor_id = ? ORDER BY timestamp DESC LIMIT 1", sensor_id);
-        const prevValue = lastReading ? safeJSONParse(lastReading.value, null) : null;
-
-        const anomalyCheck = detectAnomaly(value, prevValue, sensor.type);
-        isAnomaly = anomalyCheck.isAnomaly;
-        anomalyReason = anomalyCheck.reason;
-
-        if (isAnomaly) {
-            console.log(`[ANOMALY DETECTED] Sensor: ${sensor_id} (${sensor.type}), Reason: ${anomalyReason}, Value:`, value);
+        const { results, valid } = await validateReadings([{ sensor: sensor_id, value, rawValue }]);
+        if (results[0].status === 'rejected') {
+            return res.status(404).json({ error: 'Sensor not found.' });
         }
 
-        // Store the processed value
-        const valueStr = JSON.stringify(value);
-        await db.run(
-            "INSERT INTO readings (sensor_id, value, timestamp, is_anomaly, anomaly_reason) VALUES (?, ?, ?, ?, ?)",
-            sensor_id, valueStr, timestamp, isAnomaly ? 1 : 0, anomalyReason
-        );
-        await db.run("UPDATE sensors SET value = ?, last_update = ?, health_status = ? WHERE id = ?", valueStr, timestamp, 'Sağlıklı', sensor_id);
-
-        // Store the raw value if it was provided by the agent
-        if (rawValue !== undefined) {
-            const rawValueStr = JSON.stringify(rawValue);
-            await db.run("INSERT INTO raw_readings (sensor_id, raw_value, timestamp) VALUES (?, ?, ?)", sensor_id, rawValueStr, timestamp);
+        // Acknowledged as soon as the reading is durable in the ingest journal.
+        const { queued, statuses } = await ingestQueue.submit(valid);
+        if (statuses[0] === 'failed') {
+            return res.status(500).json({ error: 'Failed to submit reading.' });
         }
-        
-        res.status(201).send('OK');
+        res.status(queued ? 202 : 201).send('OK');
     } catch (error) {
         console.error("Error submitting reading:", error);
         res.status(500).json({ error: 'Failed to submit reading.' });
     }
 });
 
+// Batch variant of /submit-reading. Accepts `{ readings: [...] }` (or a bare array) and
+// reports the outcome of every item so the agent can mark exactly the accepted rows as sent.
+apiRouter.post('/submit-readings', agentAuth, async (req: ExpressRequest, res: ExpressResponse) => {
+    const items = Array.isArray(req.body) ? req.body : req.body?.readings;
+
+    if (!Array.isArray(items) || items.length === 0) {
+        return res.status(400).json({ error: 'Bad Request: a non-empty readings array is required.' });
+    }
+    if (items.length > MAX_READINGS_PER_BATCH) {
+        return res.status(413).json({ error: `Too many readings in one batch (max ${MAX_READINGS_PER_BATCH}).` });
+    }
+
+    try {
+        const { results, valid } = await validateReadings(items);
+        const { statuses } = await ingestQueue.submit(valid);
+        valid.forEach((reading, i) => {
+            if (statuses[i] === 'failed') {
+                results[reading.index] = { ...results[reading.index], status: 'failed', error: 'Failed to write reading.' };
+            }
+        });
+        const accepted = results.filter(r => r.status === 'accepted').length;
+        res.status(200).json({ accepted, rejected: results.length - accepted, results });
+    } catch (error) {
+        console.error("Error submitting reading batch:", error);
+        res.status(500).json({ error: 'Failed to submit readings.' });
+    }
+});
+
 
 // FIX: Add explicit types for req and res parameters.
-apiRouter.get('/commands/:deviceId', agentAuth, (req: ExpressRequest, res: ExpressResponse) => {
+// With ?wait=<seconds> the request is held until a command is queued or the wait runs out
+// (long polling, see commands.ts). X-Command-Wait tells the agent the wait was granted.
+apiRouter.get('/commands/:deviceId', agentAuth, async (req: ExpressRequest, res: ExpressResponse) => {
     const { deviceId } = req.params;
-    const pendingCommands = commandQueue[deviceId]?.filter(cmd => cmd.status === 'pending') || [];
-    
+    const waitSeconds = grantedWaitSeconds(req.query.wait);
+    if (waitSeconds > 0) res.set('X-Command-Wait', String(waitSeconds));
+
+    let pendingCommands = takeCommands(deviceId);
+    if (pendingCommands.length === 0 && waitSeconds > 0) {
+        let clientGone = false;
+        const { done, cancel } = waitForCommands(deviceId, waitSeconds);
+        const onClose = () => {
+            clientGone = true;
+            cancel();
+        };
+        req.on('close', onClose);
+        await done;
+        req.off('close', onClose);
+        // Commands queued for a client that went away are kept for its next poll.
+        if (clientGone) return;
+        pendingCommands = takeCommands(deviceId);
+    }
+
     // Dequeue commands after sending them
     if (pendingCommands.length > 0) {
         res.json(pendingCommands);
-        commandQueue[deviceId] = commandQueue[deviceId].filter(cmd => cmd.status !== 'pending');
     } else {
         res.status(204).send(); // Use 204 No Content for empty queue
     }
@@ -312,6 +289,7 @@ apiRouter.post('/cameras/:cameraId/upload-photo', agentAuth, async (req: Express
         photos.unshift(photoUrl); // Add to beginning of array
 
         await db.run("UPDATE cameras SET photos = ? WHERE id = ?", JSON.stringify(photos.slice(0, 20)), cameraId); // Limit to last 20 photos
+        publish('photo', { cameraId, url: photoUrl });
 
         res.status(200).send('OK');
     } catch (error) {
@@ -341,21 +319,29 @@ apiRouter.post('/analysis/upload-photo', agentAuth, async (req: ExpressRequest,
 
 // --- FRONTEND-FACING ENDPOINTS ---
 // FIX: Add explicit types for req and res parameters.
-apiRouter.get('/agent-status', (req: ExpressRequest, res: ExpressResponse) => {
-    // Check if lastUpdate is recent (e.g., within 90 seconds, allowing for polling intervals)
-    if (agentStatus.lastUpdate && (new Date().getTime() - new Date(agentStatus.lastUpdate).getTime()) > 90000) {
+// Marks the agent offline once it has not been heard from for 90 seconds (allowing for polling intervals).
+const checkAgentStatus = () => {
+    if (agentStatus.status === 'online' && agentStatus.lastUpdate && (new Date().getTime() - new Date(agentStatus.lastUpdate).getTime()) > 90000) {
         agentStatus.status = 'offline';
+        publish('agent-status', agentStatus);
     }
+};
+
+apiRouter.get('/agent-status', (req: ExpressRequest, res: ExpressResponse) => {
+    checkAgentStatus();
     res.json(agentStatus);
 });
 
+// Live event stream for the dashboard (see events.ts).
+apiRouter.get('/events', handleEventStream);
+
 // NETWORK STATS ENDPOINT
 apiRouter.get('/network-stats', async (req: ExpressRequest, res: ExpressResponse) => {
     try {
-        const oneHourAgo = new Date(Date.now() - 60 * 60 * 1000).toISOString();
+        const oneHourAgo = Date.now() - 60 * 60 * 1000;
         
         // 1. Total readings in last hour
-        const readingsCountResult = await db.get(`SELECT COUNT(*) as count FROM readings WHERE timestamp > ?`, oneHourAgo);
+        const readingsCountResult = await readPool.get(`SELECT COUNT(*) as count FROM readings WHERE ts > ?`, [oneHourAgo]);
         const readingsLastHour = readingsCountResult?.count || 0;
         const rpm = Math.round(readingsLastHour / 60); // Readings per minute
 
@@ -369,7 +355,7 @@ apiRouter.get('/network-stats', async (req: ExpressRequest, res: ExpressResponse
         const activePercentage = totalStations > 0 ? Math.round((activeStations / totalStations) * 100) : 0;
 
         // 3. Last Data Packet Time
-        const lastReading = await db.get(`SELECT timestamp FROM readings ORDER BY timestamp DESC LIMIT 1`);
+        const lastReading = await readPool.get(`SELECT timestamp FROM readings ORDER BY ts DESC LIMIT 1`);
         const lastPacketTime = lastReading?.timestamp || null;
 
         // 4. System Load (Mocked slightly based on RPM)
@@ -387,33 +373,199 @@ apiRouter.get('/network-stats', async (req: ExpressRequest, res: ExpressResponse
             systemLoad
         });
     } catch (error) {
+        if (sendReadPoolError(res, error)) return;
         console.error("Error fetching network stats:", error);
         res.status(500).json({ error: "Failed to fetch network stats." });
     }
 });
 
 
+// SYSTEM METRICS
+apiRouter.get('/system/metrics', (req: ExpressRequest, res: ExpressResponse) => {
+    res.json({
+        ingest: ingestQueue.getStats(),
+        metadataCache: getMetadataCacheStats(),
+        migrations: getMigrationStatus(),
+        storage: getStorageStats(),
+        readPool: readPool.getStats(),
+        rollups: getRollupStatus(),
+        reports: getReportStats(),
+        reportCache: getReportCacheStats(),
+        jobs: jobScheduler.getStats(),
+        reportScheduler: getReportSchedulerStats(),
+        emailOutbox: getEmailOutboxStats(),
+        alerts: getAlertStats(),
+        events: getEventStats(),
+        sync: getChangeLogStats(),
+        conditional: getConditionalStats(),
+        commands: getCommandStats(),
+        anomaly: getAnomalyStats(),
+    });
+});
+
+
+// Recomputes the rollup tables from the raw readings in the background.
+apiRouter.post('/system/rollups/rebuild', async (req: ExpressRequest, res: ExpressResponse) => {
+    try {
+        await requestRollupRebuild();
+        res.status(202).json({ message: 'Rollup rebuild started.' });
+    } catch (error) {
+        console.error("Error starting rollup rebuild:", error);
+        res.status(500).json({ error: "Failed to start rollup rebuild." });
+    }
+});
+
+
+// Writes readings that failed after they were acknowledged again (see ingest.ts).
+apiRouter.post('/system/ingest/dead-letters/replay', async (req: ExpressRequest, res: ExpressResponse) => {
+    try {
+        res.json(await ingestQueue.replayDeadLetters());
+    } catch (error) {
+        console.error("Error replaying dead-lettered readings:", error);
+        res.status(500).json({ error: "Failed to replay dead-lettered readings." });
+    }
+});
+
+
+// --- ROW MAPPERS ---
+// Shared by the list endpoints and /sync, so both return entities in the same shape.
+
+// Stations with their sensor and camera counts, optionally limited to some ids.
+const queryStations = async (ids?: string[]) => {
+    const stationsFromDb = await db.all(`
+        SELECT 
+            st.*,
+            COUNT(DISTINCT s.id) as sensor_count,
+            COUNT(DISTINCT c.id) as camera_count
+        FROM stations st
+        LEFT JOIN sensors s ON s.station_id = st.id
+        LEFT JOIN cameras c ON c.station_id = st.id
+        ${ids ? `WHERE st.id IN (${ids.map(() => '?').join(',')})` : ''}
+        GROUP BY st.id
+    `, ...(ids ?? []));
+    return stationsFromDb.map(s => ({
+        ...s,
+        sensorCount: s.sensor_count,
+        cameraCount: s.camera_count,
+        locationCoords: { lat: s.lat, lng: s.lng },
+    }));
+};
+
+const toSensor = (s: any) => ({
+    id: s.id,
+    name: s.name,
+    type: s.type,
+    stationId: s.station_id,
+    status: s.status,
+    value: safeJSONParse(s.value, null),
+    unit: s.unit,
+    battery: s.battery,
+    lastUpdate: s.last_update,
+    interface: s.interface,
+    config: safeJSONParse(s.config, {}),
+    parser_config: safeJSONParse(s.parser_config, {}),
+    read_frequency: s.read_frequency,
+    referenceValue: s.reference_value,
+    referenceOperation: s.reference_operation,
+    readOrder: s.read_order,
+    healthStatus: s.health_status,
+});
+
+// Map snake_case from DB to camelCase for frontend
+const toCamera = (c: any) => ({
+    id: c.id,
+    name: c.name,
+    stationId: c.station_id,
+    status: c.status,
+    streamUrl: c.stream_url,
+    rtspUrl: c.rtsp_url,
+    cameraType: c.camera_type,
+    viewDirection: c.view_direction,
+    fps: c.fps,
+    photos: safeJSONParse(c.photos, [])
+});
+
+const toNotification = (n: any) => ({
+    id: n.id,
+    ruleId: n.rule_id,
+    message: n.message,
+    stationName: n.station_name,
+    sensorName: n.sensor_name,
+    triggeredValue: n.triggered_value,
+    timestamp: n.timestamp,
+    severity: n.severity,
+    isRead: !!n.is_read,
+});
+
+
+// DELTA SYNC
+// Returns the stations, sensors, cameras, notifications and definitions changed or deleted
+// after version `since`, and the version to pass next time. Without `since` (or when it is
+// too old, see changeLog.ts) the response is a full snapshot with `reset: true`.
+apiRouter.get('/sync', async (req: ExpressRequest, res: ExpressResponse) => {
+    const since = req.query.since === undefined ? 0 : Number(req.query.since);
+    if (!Number.isInteger(since) || since < 0) {
+        return res.status(400).json({ error: 'since must be a non-negative integer version.' });
+    }
+    try {
+        const { version, reset, changed, deleted } = await getChangesSince(since);
+        // Rows of one table: all of them on a reset, otherwise only the changed ones.
+        const load = async (table: SyncedEntity): Promise<any[] | null> => {
+            if (reset) return db.all(`SELECT * FROM ${table}`);
+            const ids = changed.get(table);
+            if (!ids) return null;
+            const rows: any[] = [];
+            // Stay below SQLite's bound parameter limit.
+            for (let i = 0; i < ids.length; i += 500) {
+                const chunk = ids.slice(i, i + 500);
+                rows.push(...await db.all(`SELECT * FROM ${table} WHERE id IN (${chunk.map(() => '?').join(',')})`, ...chunk));
+            }
+            return rows;
+        };
+        const stationIds = changed.get('stations');
+        const [stations, sensors, cameras, notifications, stationTypes, sensorTypes, cameraTypes] = await Promise.all([
+            reset ? queryStations() : stationIds ? queryStations(stationIds) : null,
+            load('sensors'),
+            load('cameras'),
+            load('notifications'),
+            load('station_types'),
+            load('sensor_types'),
+            load('camera_types'),
+        ]);
+        res.json({
+            version,
+            reset,
+            changed: {
+                stations: stations ?? [],
+                sensors: (sensors ?? []).map(toSensor),
+                cameras: (cameras ?? []).map(toCamera),
+                notifications: (notifications ?? []).map(toNotification),
+                stationTypes: stationTypes ?? [],
+                sensorTypes: sensorTypes ?? [],
+                cameraTypes: cameraTypes ?? [],
+            },
+            deleted: {
+                stations: deleted.get('stations') ?? [],
+                sensors: deleted.get('sensors') ?? [],
+                cameras: deleted.get('cameras') ?? [],
+                notifications: deleted.get('notifications') ?? [],
+                stationTypes: (deleted.get('station_types') ?? []).map(Number),
+                sensorTypes: (deleted.get('sensor_types') ?? []).map(Number),
+                cameraTypes: (deleted.get('camera_types') ?? []).map(Number),
+            },
+        });
+    } catch (error) {
+        console.error("Error syncing changes:", error);
+        res.status(500).json({ error: "Failed to sync changes." });
+    }
+});
+
+
 // STATIONS
 // FIX: Add explicit types for req and res parameters.
-apiRouter.get('/stations', async (req: ExpressRequest, res: ExpressResponse) => {
+apiRouter.get('/stations', conditionalGet(['stations']), async (req: ExpressRequest, res: ExpressResponse) => {
     try {
-        const stationsFromDb = await db.all(`
-            SELECT 
-                st.*,
-                COUNT(DISTINCT s.id) as sensor_count,
-                COUNT(DISTINCT c.id) as camera_count
-            FROM stations st
-            LEFT JOIN sensors s ON s.station_id = st.id
-            LEFT JOIN cameras c ON c.station_id = st.id
-            GROUP BY st.id
-        `);
-        const stations = stationsFromDb.map(s => ({
-            ...s,
-            sensorCount: s.sensor_count,
-            cameraCount: s.camera_count,
-            locationCoords: { lat: s.lat, lng: s.lng },
-        }));
-        res.json(stations);
+        res.json(await queryStations());
     } catch (error) {
         console.error("Error fetching stations:", error);
         res.status(500).json({ error: "Failed to fetch stations." });
@@ -433,6 +585,10 @@ apiRouter.post('/stations', async (req: ExpressRequest, res: ExpressResponse) =>
         for (const cameraId of selectedCameraIds) {
             await db.run("UPDATE cameras SET station_id = ? WHERE id = ?", id, cameraId);
         }
+        await refreshStation(id);
+        for (const sensorId of selectedSensorIds) await refreshSensor(sensorId);
+        for (const cameraId of selectedCameraIds) await refreshCamera(cameraId);
+        publish('config-changed', { entities: ['stations', 'sensors', 'cameras'], id });
         queueCommand(id, 'REFRESH_CONFIG');
         res.status(201).json({ id });
     } catch (error) {
@@ -464,6 +620,8 @@ apiRouter.put('/stations/:id', async (req: ExpressRequest, res: ExpressResponse)
         params.push(id);
 
         await db.run(sql, ...params);
+        await refreshStation(id);
+        publish('config-changed', { entities: ['stations'], id });
         queueCommand(id, 'REFRESH_CONFIG');
         res.status(200).json({ id });
     } catch (error) {
@@ -475,6 +633,8 @@ apiRouter.put('/stations/:id', async (req: ExpressRequest, res: ExpressResponse)
 apiRouter.delete('/stations/:id', async (req: ExpressRequest, res: ExpressResponse) => {
     try {
         await db.run("DELETE FROM stations WHERE id = ?", req.params.id);
+        removeStation(req.params.id);
+        publish('config-changed', { entities: ['stations', 'sensors', 'cameras'], id: req.params.id });
         res.status(204).send();
     } catch (error) {
         console.error(`Error deleting station ${req.params.id}:`, error);
@@ -517,32 +677,14 @@ apiRouter.post('/stations/:id/stop-agent', async (req: ExpressRequest, res: Expr
 
 // SENSORS
 // FIX: Add explicit types for req and res parameters.
-apiRouter.get('/sensors', async (req: ExpressRequest, res: ExpressResponse) => {
+apiRouter.get('/sensors', conditionalGet(['sensors']), async (req: ExpressRequest, res: ExpressResponse) => {
     try {
         const unassigned = req.query.unassigned === 'true';
         const query = unassigned
             ? "SELECT * FROM sensors WHERE station_id IS NULL OR station_id = ''"
             : "SELECT * FROM sensors";
         const sensors = await db.all(query);
-        res.json(sensors.map(s => ({
-            id: s.id,
-            name: s.name,
-            type: s.type,
-            stationId: s.station_id,
-            status: s.status,
-            value: safeJSONParse(s.value, null),
-            unit: s.unit,
-            battery: s.battery,
-            lastUpdate: s.last_update,
-            interface: s.interface,
-            config: safeJSONParse(s.config, {}),
-            parser_config: safeJSONParse(s.parser_config, {}),
-            read_frequency: s.read_frequency,
-            referenceValue: s.reference_value,
-            referenceOperation: s.reference_operation,
-            readOrder: s.read_order,
-            healthStatus: s.health_status,
-        })));
+        res.json(sensors.map(toSensor));
     } catch (error) {
         console.error("Error fetching sensors:", error);
         res.status(500).json({ error: "Failed to fetch sensors." });
@@ -564,6 +706,8 @@ apiRouter.post('/sensors', async (req: ExpressRequest, res: ExpressResponse) =>
              VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)`,
             id, name, stationId, type, unit, isActive ? 'Aktif' : 'Pasif', interfaceType, parserConfigStr, interfaceConfigStr, readFrequency, isActive, new Date().toISOString(), referenceValue, referenceOperation, nextReadOrder
         );
+        await refreshSensor(id);
+        publish('config-changed', { entities: ['sensors', 'stations'], id });
         if (stationId) queueCommand(stationId, 'REFRESH_CONFIG');
         res.status(201).json({ id });
     } catch (error) {
@@ -575,7 +719,7 @@ apiRouter.post('/sensors', async (req: ExpressRequest, res: ExpressResponse) =>
 apiRouter.put('/sensors/:id', async (req: ExpressRequest, res: ExpressResponse) => {
     const { id } = req.params;
     try {
-        const oldSensor = await db.get("SELECT station_id FROM sensors WHERE id = ?", id);
+        const oldSensor = await getSensorMeta(id);
         const fields = req.body;
         const updates: string[] = [];
         const params: any[] = [];
@@ -615,6 +759,8 @@ apiRouter.put('/sensors/:id', async (req: ExpressRequest, res: ExpressResponse)
         params.push(id);
         
         await db.run(sql, ...params);
+        await refreshSensor(id);
+        publish('config-changed', { entities: ['sensors', 'stations'], id });
 
         // Tell old and new stations to refresh their config
         if (oldSensor?.station_id) queueCommand(oldSensor.station_id, 'REFRESH_CONFIG');
@@ -632,8 +778,12 @@ apiRouter.put('/sensors/:id', async (req: ExpressRequest, res: ExpressResponse)
 // FIX: Add explicit types for req and res parameters.
 apiRouter.delete('/sensors/:id', async (req: ExpressRequest, res: ExpressResponse) => {
     try {
-        const sensor = await db.get("SELECT station_id FROM sensors WHERE id = ?", req.params.id);
+        const sensor = await getSensorMeta(req.params.id);
         await db.run("DELETE FROM sensors WHERE id = ?", req.params.id);
+        removeSensor(req.params.id);
+        invalidateLastValue(req.params.id);
+        forgetAnomalyState(req.params.id);
+        publish('config-changed', { entities: ['sensors', 'stations'], id: req.params.id });
         if (sensor?.station_id) queueCommand(sensor.station_id, 'REFRESH_CONFIG');
         res.status(204).send();
     } catch (error) {
@@ -661,6 +811,7 @@ apiRouter.post('/sensors/:id/read-failure', agentAuth, async (req: ExpressReques
     const { id } = req.params;
     try {
         await db.run("UPDATE sensors SET health_status = ? WHERE id = ?", 'Okuma Hatası', id);
+        publish('sensor-status', { sensorId: id, healthStatus: 'Okuma Hatası' });
         res.status(200).send('OK');
     } catch (error) {
         console.error(`Error reporting read failure for sensor ${id}:`, error);
@@ -678,7 +829,7 @@ apiRouter.post('/sensors/:id/manual-reading', async (req: ExpressRequest, res: E
             return res.status(400).json({ error: 'Bad Request: A numeric value is required.' });
         }
 
-        const sensor = await db.get("SELECT type FROM sensors WHERE id = ?", sensor_id);
+        const sensor = await getSensorMeta(sensor_id);
         if (!sensor) {
             return res.status(404).json({ error: 'Sensor not found.' });
         }
@@ -689,9 +840,8 @@ apiRouter.post('/sensors/:id/manual-reading', async (req: ExpressRequest, res: E
         } else if (sensor.type === 'Mesafe') {
             valueObject = { distance_cm: value };
         } else {
-             const lastReading = await db.get("SELECT value FROM sensors WHERE id = ?", sensor_id);
-             if (lastReading && lastReading.value) {
-                const lastValue = safeJSONParse(lastReading.value, {});
+             const lastValue = getLastValue(sensor_id);
+             if (lastValue && typeof lastValue === 'object') {
                 const key = Object.keys(lastValue)[0] || 'value';
                 valueObject = { [key]: value };
              } else {
@@ -705,8 +855,16 @@ apiRouter.post('/sensors/:id/manual-reading', async (req: ExpressRequest, res: E
         const timestamp = new Date().toISOString();
         const valueStr = JSON.stringify(finalValue);
 
-        await db.run("INSERT INTO readings (sensor_id, value, timestamp) VALUES (?, ?, ?)", sensor_id, valueStr, timestamp);
-        await db.run("UPDATE sensors SET value = ?, last_update = ? WHERE id = ?", valueStr, timestamp, sensor_id);
+        await withTransaction(async () => {
+            await db.run("INSERT INTO readings (sensor_id, value, timestamp, ts) VALUES (?, ?, ?, ?)", sensor_id, valueStr, timestamp, Date.parse(timestamp));
+            await db.run("UPDATE sensors SET value = ?, last_update = ? WHERE id = ?", valueStr, timestamp, sensor_id);
+            const rollups = new RollupBatch();
+            rollups.add(sensor_id, Date.parse(timestamp), finalValue);
+            await rollups.apply();
+        });
+        recordLastValue(sensor_id, finalValue, timestamp);
+        publish('reading', { sensorId: sensor_id, value: finalValue, timestamp, isAnomaly: false });
+        await evaluateAlerts([{ sensor: sensor_id, sensorType: sensor.type, value: finalValue, timestamp }]);
         
         console.log(`[MANUAL READING] Sensor ${sensor_id} updated to ${valueStr}`);
         res.status(201).json({ message: 'OK', value: finalValue });
@@ -718,26 +876,14 @@ apiRouter.post('/sensors/:id/manual-reading', async (req: ExpressRequest, res: E
 
 // CAMERAS
 // FIX: Add explicit types for req and res parameters.
-apiRouter.get('/cameras', async (req: ExpressRequest, res: ExpressResponse) => {
+apiRouter.get('/cameras', conditionalGet(['cameras']), async (req: ExpressRequest, res: ExpressResponse) => {
     try {
         const unassigned = req.query.unassigned === 'true';
         const query = unassigned
             ? "SELECT * FROM cameras WHERE station_id IS NULL OR station_id = ''"
             : "SELECT * FROM cameras";
         const cameras = await db.all(query);
-         // Map snake_case from DB to camelCase for frontend
-        res.json(cameras.map(c => ({
-            id: c.id,
-            name: c.name,
-            stationId: c.station_id,
-            status: c.status,
-            streamUrl: c.stream_url,
-            rtspUrl: c.rtsp_url,
-            cameraType: c.camera_type,
-            viewDirection: c.view_direction,
-            fps: c.fps,
-            photos: safeJSONParse(c.photos, [])
-        })));
+        res.json(cameras.map(toCamera));
     } catch (error) {
         console.error("Error fetching cameras:", error);
         res.status(500).json({ error: "Failed to fetch cameras." });
@@ -752,6 +898,8 @@ apiRouter.post('/cameras', async (req: ExpressRequest, res: ExpressResponse) =>
             "INSERT INTO cameras (id, name, station_id, status, view_direction, rtsp_url, camera_type, photos) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
             id, name, stationId, status, viewDirection, rtspUrl, cameraType, '[]'
         );
+        await refreshCamera(id);
+        publish('config-changed', { entities: ['cameras', 'stations'], id });
         if (stationId) queueCommand(stationId, 'REFRESH_CONFIG');
         res.status(201).json({ id });
     } catch (error) {
@@ -783,6 +931,8 @@ apiRouter.put('/cameras/:id', async (req: ExpressRequest, res: ExpressResponse)
         params.push(id);
         
         await db.run(sql, ...params);
+        await refreshCamera(id);
+        publish('config-changed', { entities: ['cameras', 'stations'], id });
         // Tell old and new stations to refresh their config
         if (oldCamera?.station_id) queueCommand(oldCamera.station_id, 'REFRESH_CONFIG');
         if (fields.stationId && fields.stationId !== oldCamera?.station_id) {
@@ -799,6 +949,8 @@ apiRouter.delete('/cameras/:id', async (req: ExpressRequest, res: ExpressRespons
     try {
         const camera = await db.get("SELECT station_id FROM cameras WHERE id = ?", req.params.id);
         await db.run("DELETE FROM cameras WHERE id = ?", req.params.id);
+        removeCamera(req.params.id);
+        publish('config-changed', { entities: ['cameras', 'stations'], id: req.params.id });
         if (camera?.station_id) queueCommand(camera.station_id, 'REFRESH_CONFIG');
         res.status(204).send();
     } catch (error) {
@@ -831,7 +983,7 @@ apiRouter.get('/readings', async (req: ExpressRequest, res: ExpressResponse) =>
             FROM readings r
             JOIN sensors s ON r.sensor_id = s.id
             JOIN stations st ON s.station_id = st.id
-            ORDER BY r.timestamp DESC
+            ORDER BY r.ts DESC
             LIMIT 100
         `);
         res.json(readings.map(r => ({ ...r, value: safeJSONParse(r.value, null), isAnomaly: !!r.isAnomaly })));
@@ -841,12 +993,45 @@ apiRouter.get('/readings', async (req: ExpressRequest, res: ExpressResponse) =>
     }
 });
 
+const MAX_HISTORY_POINTS = 5000;
+const DEFAULT_HISTORY_PAGE_SIZE = 100;
+const MAX_HISTORY_PAGE_SIZE = 1000;
+const MAX_RAW_HISTORY_PAGE_SIZE = 500;
+
 // FIX: Add explicit types for req and res parameters.
 apiRouter.get('/readings/history', async (req: ExpressRequest, res: ExpressResponse) => {
-    const { stationIds: stationIdsQuery, sensorTypes: sensorTypesQuery, start: startDate, end: endDate } = req.query;
+    const { stationIds: stationIdsQuery, sensorTypes: sensorTypesQuery, sensorIds: sensorIdsQuery, start: startDate, end: endDate, maxPoints: maxPointsQuery, limit: limitQuery, cursor: cursorQuery } = req.query;
+
+    // `limit` or `cursor` switches the response to a keyset page: { items, next, prev }.
+    const paged = limitQuery !== undefined || cursorQuery !== undefined;
 
     if (typeof stationIdsQuery !== 'string' || typeof sensorTypesQuery !== 'string' || !stationIdsQuery || !sensorTypesQuery) {
-        return res.json([]);
+        return res.json(paged ? { items: [], next: null, prev: null } : []);
+    }
+
+    // maxPoints switches from "latest 1000 rows" to the whole range, downsampled per sensor.
+    let maxPoints: number | null = null;
+    if (maxPointsQuery !== undefined) {
+        maxPoints = typeof maxPointsQuery === 'string' ? parseInt(maxPointsQuery, 10) : NaN;
+        if (!Number.isInteger(maxPoints) || maxPoints < 3 || maxPoints > MAX_HISTORY_POINTS) {
+            return res.status(400).json({ error: `maxPoints must be an integer between 3 and ${MAX_HISTORY_POINTS}.` });
+        }
+        if (paged) {
+            return res.status(400).json({ error: 'maxPoints cannot be combined with limit or cursor.' });
+        }
+    }
+
+    const limit = parsePageLimit(limitQuery, DEFAULT_HISTORY_PAGE_SIZE, MAX_HISTORY_PAGE_SIZE);
+    if (limit === null) {
+        return res.status(400).json({ error: `limit must be an integer between 1 and ${MAX_HISTORY_PAGE_SIZE}.` });
+    }
+    let cursor: Cursor | null = null;
+    if (cursorQuery !== undefined) {
+        try {
+            cursor = decodeCursor(String(cursorQuery));
+        } catch {
+            return res.status(400).json({ error: 'Invalid cursor.' });
+        }
     }
 
     try {
@@ -854,42 +1039,36 @@ apiRouter.get('/readings/history', async (req: ExpressRequest, res: ExpressRespo
         const sensorTypeList = sensorTypesQuery.split(',');
         const placeholders = (arr: string[]) => arr.map(() => '?').join(',');
 
-        // 1. Get all relevant sensors
-        const sensors = await db.all<SensorForProcessing[]>(`
-            SELECT id, type, name, station_id, interface, unit
-            FROM sensors 
-            WHERE station_id IN (${placeholders(stationIdList)}) AND type IN (${placeholders(sensorTypeList)})
-        `, [...stationIdList, ...sensorTypeList]);
+        // 1. Get all relevant sensors from the metadata cache, optionally narrowed to sensorIds
+        let sensors = findSensors(stationIdList, sensorTypeList);
+        if (typeof sensorIdsQuery === 'string') {
+            const sensorIdSet = new Set(sensorIdsQuery.split(','));
+            sensors = sensors.filter(s => sensorIdSet.has(s.id));
+        }
         
-        if (sensors.length === 0) return res.json([]);
+        if (sensors.length === 0) return res.json(paged ? { items: [], next: null, prev: null } : []);
 
-        const sensorMap = new Map<string, SensorForProcessing>(sensors.map(s => [s.id, s]));
+        const sensorMap = new Map<string, SensorMeta>(sensors.map(s => [s.id, s]));
         const sensorIdList = sensors.map(s => s.id);
 
-        // 2. Build date filter
+        // 2. Build date filter on the indexed epoch column
+        const range = parseTimeRange(startDate, endDate);
+        if (!range) {
+            return res.status(400).json({ error: 'Invalid start or end date.' });
+        }
+        const ts = epochTsSql();
         let dateFilterClause = '';
-        const dateParams: string[] = [];
-        if (startDate && typeof startDate === 'string') {
-            dateFilterClause += ' AND datetime(timestamp) >= datetime(?)';
-            dateParams.push(startDate);
+        const dateParams: number[] = [];
+        if (range.start !== null) {
+            dateFilterClause += ` AND ${ts} >= ?`;
+            dateParams.push(range.start);
         }
-        if (endDate && typeof endDate === 'string') {
-            dateFilterClause += ' AND datetime(timestamp) <= datetime(?)';
-            dateParams.push(endDate);
+        if (range.end !== null) {
+            dateFilterClause += ` AND ${ts} <= ?`;
+            dateParams.push(range.end);
         }
 
-        // 3. Fetch processed readings
-        const queryParams = [...sensorIdList, ...dateParams];
-        const processedReadings = await db.all(`
-            SELECT id, timestamp, sensor_id, value, is_anomaly, anomaly_reason
-            FROM readings
-            WHERE sensor_id IN (${placeholders(sensorIdList)}) ${dateFilterClause}
-            ORDER BY timestamp DESC
-            LIMIT 1000
-        `, queryParams);
-
-
-        const response = processedReadings.map(r => {
+        const toResponse = (r: any) => {
             const sensor = sensorMap.get(r.sensor_id);
             if (!sensor) return null;
             return {
@@ -905,39 +1084,190 @@ apiRouter.get('/readings/history', async (req: ExpressRequest, res: ExpressRespo
                 isAnomaly: !!r.is_anomaly,
                 anomalyReason: r.anomaly_reason
             }
-        }).filter(Boolean);
+        };
+
+        // 3. Fetch processed readings
+        const queryParams = [...sensorIdList, ...dateParams];
+        if (paged) {
+            const keyset = keysetQuery(cursor, '', ts);
+            // Several sensors: walk the ts index in page order instead of sorting the whole range.
+            const sensorColumn = sensorIdList.length > 1 ? '+sensor_id' : 'sensor_id';
+            const rows = await readPool.all(`
+                SELECT id, timestamp, ${ts} AS ts, sensor_id, value, is_anomaly, anomaly_reason
+                FROM readings
+                WHERE ${sensorColumn} IN (${placeholders(sensorIdList)}) ${dateFilterClause}${keyset.clause}
+                ORDER BY ${keyset.orderBy}
+                LIMIT ?
+            `, [...queryParams, ...keyset.params, limit + 1]);
+            return res.json(buildPage(rows, limit, cursor, toResponse));
+        }
+
+        const processedReadings = maxPoints === null
+            ? await readPool.all(`
+                SELECT id, timestamp, sensor_id, value, is_anomaly, anomaly_reason
+                FROM readings
+                WHERE sensor_id IN (${placeholders(sensorIdList)}) ${dateFilterClause}
+                ORDER BY ${ts} DESC
+                LIMIT 1000
+            `, queryParams)
+            : (await readPool.all(`
+                SELECT id, timestamp, ${ts} AS ts, sensor_id, value, is_anomaly, anomaly_reason
+                FROM readings
+                WHERE sensor_id IN (${placeholders(sensorIdList)}) ${dateFilterClause}
+                ORDER BY sensor_id, ${ts}
+            `, queryParams, {
+                downsample: { maxPoints, sensorTypes: Object.fromEntries(sensors.map(s => [s.id, s.type])) },
+            })).sort((a: any, b: any) => b.ts - a.ts);
 
-        res.json(response);
+
+        res.json(processedReadings.map(toResponse).filter(Boolean));
 
     } catch (error) {
+        if (sendReadPoolError(res, error)) return;
         console.error("Error fetching and processing reading history:", error);
         res.status(500).json({ error: 'Failed to fetch reading history.' });
     }
 });
 
 
+// Bucketed aggregates (avg/min/max/sum/count/last) per sensor, served from the rollup tables.
+apiRouter.get('/readings/aggregate', async (req: ExpressRequest, res: ExpressResponse) => {
+    const { sensorIds: sensorIdsQuery, bucket = '1h', fn: fnQuery = 'avg', start: startDate, end: endDate } = req.query;
+
+    if (typeof sensorIdsQuery !== 'string' || !sensorIdsQuery) {
+        return res.status(400).json({ error: 'sensorIds query parameter is required.' });
+    }
+    if (typeof bucket !== 'string' || !BUCKET_SIZES[bucket]) {
+        return res.status(400).json({ error: `Invalid bucket. Use one of: ${Object.keys(BUCKET_SIZES).join(', ')}.` });
+    }
+    const fns = typeof fnQuery === 'string' ? [...new Set(fnQuery.split(','))] : [];
+    if (fns.length === 0 || !fns.every(f => (AGGREGATE_FUNCTIONS as readonly string[]).includes(f))) {
+        return res.status(400).json({ error: `Invalid fn. Use a comma-separated list of: ${AGGREGATE_FUNCTIONS.join(', ')}.` });
+    }
+    const range = parseTimeRange(startDate, endDate);
+    if (!range) {
+        return res.status(400).json({ error: 'Invalid start or end date.' });
+    }
+    // Defaults to the last 24 hours.
+    const end = range.end ?? Date.now();
+    const start = range.start ?? end - 24 * 60 * 60 * 1000;
+    if (start > end) {
+        return res.status(400).json({ error: 'start must be before end.' });
+    }
+    if ((end - start) / BUCKET_SIZES[bucket] > MAX_BUCKETS_PER_SERIES) {
+        return res.status(400).json({ error: `Range too long for bucket ${bucket}; use a larger bucket.` });
+    }
+
+    try {
+        const sensors: SensorMeta[] = [];
+        for (const id of new Set(sensorIdsQuery.split(','))) {
+            const sensor = await getSensorMeta(id);
+            if (sensor) sensors.push(sensor);
+        }
+        const { source, series } = await aggregateReadings(sensors, bucket, fns as AggregateFn[], start, end);
+        res.json({
+            bucket,
+            fn: fns,
+            start: new Date(start).toISOString(),
+            end: new Date(end).toISOString(),
+            source,
+            series,
+        });
+    } catch (error) {
+        if (sendReadPoolError(res, error)) return;
+        console.error("Error aggregating readings:", error);
+        res.status(500).json({ error: 'Failed to aggregate readings.' });
+    }
+});
+
+
+// Streams every reading in the range as NDJSON or CSV, gzip-compressed when the client accepts it.
+apiRouter.get('/readings/export', async (req: ExpressRequest, res: ExpressResponse) => {
+    const { format = 'csv', stationIds: stationIdsQuery, sensorTypes: sensorTypesQuery, sensorIds: sensorIdsQuery, start: startDate, end: endDate } = req.query;
+
+    if (typeof format !== 'string' || !(EXPORT_FORMATS as readonly string[]).includes(format)) {
+        return res.status(400).json({ error: `Invalid format. Use one of: ${EXPORT_FORMATS.join(', ')}.` });
+    }
+    if (typeof stationIdsQuery !== 'string' || typeof sensorTypesQuery !== 'string' || !stationIdsQuery || !sensorTypesQuery) {
+        return res.status(400).json({ error: 'stationIds and sensorTypes query parameters are required.' });
+    }
+    const range = parseTimeRange(startDate, endDate);
+    if (!range) {
+        return res.status(400).json({ error: 'Invalid start or end date.' });
+    }
+
+    try {
+        let sensors = findSensors(stationIdsQuery.split(','), sensorTypesQuery.split(','));
+        if (typeof sensorIdsQuery === 'string') {
+            const sensorIdSet = new Set(sensorIdsQuery.split(','));
+            sensors = sensors.filter(s => sensorIdSet.has(s.id));
+        }
+        await streamReadingsExport(req, res, sensors, range.start, range.end, format as ExportFormat);
+    } catch (error) {
+        if (res.headersSent) return;
+        if (sendReadPoolError(res, error)) return;
+        console.error("Error exporting readings:", error);
+        res.status(500).json({ error: 'Failed to export readings.' });
+    }
+});
+
+
 // FIX: Add explicit types for req and res parameters.
 apiRouter.get('/raw-readings/history', async (req: ExpressRequest, res: ExpressResponse) => {
-    const { sensorId, start: startDate, end: endDate } = req.query;
+    const { sensorId, start: startDate, end: endDate, limit: limitQuery, cursor: cursorQuery } = req.query;
+    const paged = limitQuery !== undefined || cursorQuery !== undefined;
 
     if (!sensorId || typeof sensorId !== 'string') {
         return res.status(400).json({ error: 'sensorId query parameter is required.' });
     }
 
+    const range = parseTimeRange(startDate, endDate);
+    if (!range) {
+        return res.status(400).json({ error: 'Invalid start or end date.' });
+    }
+    const limit = parsePageLimit(limitQuery, DEFAULT_HISTORY_PAGE_SIZE, MAX_RAW_HISTORY_PAGE_SIZE);
+    if (limit === null) {
+        return res.status(400).json({ error: `limit must be an integer between 1 and ${MAX_RAW_HISTORY_PAGE_SIZE}.` });
+    }
+    let cursor: Cursor | null = null;
+    if (cursorQuery !== undefined) {
+        try {
+            cursor = decodeCursor(String(cursorQuery));
+        } catch {
+            return res.status(400).json({ error: 'Invalid cursor.' });
+        }
+    }
+
     try {
+        const ts = epochTsSql('r.');
         let dateFilterClause = '';
-        const params: (string | undefined)[] = [sensorId];
+        const params: (string | number)[] = [sensorId];
 
-        if (startDate && typeof startDate === 'string') {
-            dateFilterClause += ' AND datetime(r.timestamp) >= datetime(?)';
-            params.push(startDate);
+        if (range.start !== null) {
+            dateFilterClause += ` AND ${ts} >= ?`;
+            params.push(range.start);
         }
-        if (endDate && typeof endDate === 'string') {
-            dateFilterClause += ' AND datetime(r.timestamp) <= datetime(?)';
-            params.push(endDate);
+        if (range.end !== null) {
+            dateFilterClause += ` AND ${ts} <= ?`;
+            params.push(range.end);
         }
 
-        const readings = await db.all(`
+        const toResponse = ({ ts, ...r }: any) => ({ ...r, raw_value: safeJSONParse(r.raw_value, null) });
+
+        if (paged) {
+            const keyset = keysetQuery(cursor, 'r.', ts);
+            const rows = await readPool.all(`
+                SELECT r.id, r.raw_value, r.timestamp, ${ts} AS ts, s.id as sensorId
+                FROM raw_readings r
+                JOIN sensors s ON r.sensor_id = s.id
+                WHERE r.sensor_id = ? ${dateFilterClause}${keyset.clause}
+                ORDER BY ${keyset.orderBy}
+                LIMIT ?
+            `, [...params, ...keyset.params, limit + 1]);
+            return res.json(buildPage(rows, limit, cursor, toResponse));
+        }
+
+        const readings = await readPool.all(`
             SELECT 
                 r.id, 
                 r.raw_value,
@@ -945,12 +1275,13 @@ apiRouter.get('/raw-readings/history', async (req: ExpressRequest, res: ExpressR
                 s.id as sensorId
             FROM raw_readings r
             JOIN sensors s ON r.sensor_id = s.id
-            WHERE s.id = ? ${dateFilterClause}
-            ORDER BY r.timestamp DESC
+            WHERE r.sensor_id = ? ${dateFilterClause}
+            ORDER BY ${ts} DESC
             LIMIT 500
         `, params);
-        res.json(readings.map(r => ({ ...r, raw_value: safeJSONParse(r.raw_value, null) })));
+        res.json(readings.map(toResponse));
     } catch (error) {
+        if (sendReadPoolError(res, error)) return;
         console.error("Error fetching raw reading history:", error);
         res.status(500).json({ error: 'Failed to fetch raw reading history.' });
     }
@@ -963,7 +1294,7 @@ const isValidDefinitionType = (type: string): boolean => {
 };
 
 // FIX: Add explicit types for req and res parameters.
-apiRouter.get('/definitions', async (req: ExpressRequest, res: ExpressResponse) => {
+apiRouter.get('/definitions', conditionalGet(['definitions']), async (req: ExpressRequest, res: ExpressResponse) => {
     try {
         const [stationTypes, sensorTypes, cameraTypes] = await Promise.all([
             db.all("SELECT * FROM station_types"),
@@ -988,6 +1319,7 @@ apiRouter.post('/definitions/:type', async (req: ExpressRequest, res: ExpressRes
             return res.status(400).json({ error: 'Invalid name provided.' });
         }
         const result = await db.run(`INSERT INTO ${type} (name) VALUES (?)`, name);
+        publish('config-changed', { entities: ['definitions'], id: result.lastID });
         res.status(201).json({ id: result.lastID, name });
     } catch (error) {
         console.error(`Error creating definition for ${type}:`, error);
@@ -1006,6 +1338,7 @@ apiRouter.put('/definitions/:type/:id', async (req: ExpressRequest, res: Express
             return res.status(400).json({ error: 'Invalid name provided.' });
         }
         await db.run(`UPDATE ${type} SET name = ? WHERE id = ?`, name, id);
+        publish('config-changed', { entities: ['definitions'], id });
         res.status(200).json({ id, name });
     } catch (error) {
         console.error(`Error updating definition for ${type} with id ${id}:`, error);
@@ -1020,6 +1353,7 @@ apiRouter.delete('/definitions/:type/:id', async (req: ExpressRequest, res: Expr
     }
     try {
         await db.run(`DELETE FROM ${type} WHERE id = ?`, id);
+        publish('config-changed', { entities: ['definitions'], id });
         res.status(204).send();
     } catch (error) {
         console.error(`Error deleting definition for ${type} with id ${id}:`, error);
@@ -1028,14 +1362,88 @@ apiRouter.delete('/definitions/:type/:id', async (req: ExpressRequest, res: Expr
 });
 
 // FIX: Add explicit types for req and res parameters.
-apiRouter.get('/alert-rules', async (req: ExpressRequest, res: ExpressResponse) => {
+apiRouter.get('/alert-rules', conditionalGet(['alert_rules']), async (req: ExpressRequest, res: ExpressResponse) => {
     try {
-        res.json(await db.all("SELECT * FROM alert_rules"));
+        const rules = await db.all("SELECT * FROM alert_rules");
+        res.json(rules.map(r => ({
+            id: r.id,
+            name: r.name,
+            sensorType: r.sensor_type,
+            stationIds: safeJSONParse(r.station_ids, []),
+            condition: r.condition,
+            threshold: r.threshold,
+            severity: r.severity,
+            isEnabled: !!r.is_enabled,
+            hysteresis: r.hysteresis ?? 0,
+            cooldownMinutes: r.cooldown_minutes ?? undefined,
+        })));
     } catch (error) {
         console.error("Error fetching alert rules:", error);
         res.status(500).json({ error: "Failed to fetch alert rules." });
     }
 });
+// FIX: Add explicit types for req and res parameters.
+apiRouter.post('/alert-rules', async (req: ExpressRequest, res: ExpressResponse) => {
+    try {
+        const { name, sensorType, stationIds, condition, threshold, severity, isEnabled, hysteresis, cooldownMinutes } = req.body;
+        if (!name || !sensorType || !['Büyüktür', 'Küçüktür'].includes(condition) || typeof threshold !== 'number') {
+            return res.status(400).json({ error: 'name, sensorType, condition and a numeric threshold are required.' });
+        }
+        const id = `RULE_${uuidv4()}`;
+        await db.run(
+            `INSERT INTO alert_rules (id, name, sensor_type, station_ids, condition, threshold, severity, is_enabled, hysteresis, cooldown_minutes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)`,
+            id, name, sensorType, JSON.stringify(Array.isArray(stationIds) ? stationIds : []), condition, threshold, severity, isEnabled ?? true,
+            hysteresis ?? 0, cooldownMinutes ?? null
+        );
+        await syncAlertRule(id);
+        res.status(201).json({ id });
+    } catch (error) {
+        console.error("Error creating alert rule:", error);
+        res.status(500).json({ error: "Failed to create alert rule." });
+    }
+});
+// FIX: Add explicit types for req and res parameters.
+apiRouter.put('/alert-rules/:id', async (req: ExpressRequest, res: ExpressResponse) => {
+    const { id } = req.params;
+    try {
+        const fields = req.body;
+        const updates: string[] = [];
+        const params: any[] = [];
+
+        if (fields.name !== undefined) { updates.push('name = ?'); params.push(fields.name); }
+        if (fields.sensorType !== undefined) { updates.push('sensor_type = ?'); params.push(fields.sensorType); }
+        if (fields.stationIds !== undefined) { updates.push('station_ids = ?'); params.push(JSON.stringify(fields.stationIds || [])); }
+        if (fields.condition !== undefined) { updates.push('condition = ?'); params.push(fields.condition); }
+        if (fields.threshold !== undefined) { updates.push('threshold = ?'); params.push(fields.threshold); }
+        if (fields.severity !== undefined) { updates.push('severity = ?'); params.push(fields.severity); }
+        if (fields.isEnabled !== undefined) { updates.push('is_enabled = ?'); params.push(fields.isEnabled); }
+        if (fields.hysteresis !== undefined) { updates.push('hysteresis = ?'); params.push(fields.hysteresis ?? 0); }
+        if (fields.cooldownMinutes !== undefined) { updates.push('cooldown_minutes = ?'); params.push(fields.cooldownMinutes); }
+
+        if (updates.length === 0) {
+            return res.status(200).json({ id, message: 'No fields to update.' });
+        }
+
+        params.push(id);
+        await db.run(`UPDATE alert_rules SET ${updates.join(', ')} WHERE id = ?`, ...params);
+        await syncAlertRule(id);
+        res.status(200).send('OK');
+    } catch (error) {
+        console.error(`Error updating alert rule ${id}:`, error);
+        res.status(500).json({ error: "Failed to update alert rule." });
+    }
+});
+// FIX: Add explicit types for req and res parameters.
+apiRouter.delete('/alert-rules/:id', async (req: ExpressRequest, res: ExpressResponse) => {
+    try {
+        await db.run("DELETE FROM alert_rules WHERE id = ?", req.params.id);
+        await syncAlertRule(req.params.id);
+        res.status(204).send();
+    } catch (error) {
+        console.error(`Error deleting alert rule ${req.params.id}:`, error);
+        res.status(500).json({ error: "Failed to delete alert rule." });
+    }
+});
 
 // FIX: Add explicit types for req and res parameters.
 apiRouter.get('/settings/global_read_frequency', async (req: ExpressRequest, res: ExpressResponse) => {
@@ -1052,6 +1460,7 @@ apiRouter.put('/settings/global_read_frequency', async (req: ExpressRequest, res
     try {
         const { value } = req.body;
         await db.run("UPDATE global_settings SET value = ? WHERE key = 'global_read_frequency_minutes'", value);
+        setGlobalReadFrequencyMinutes(String(value));
         // Notify all stations about the change
         const stations = await db.all("SELECT id FROM stations");
         for (const station of stations) {
@@ -1065,15 +1474,96 @@ apiRouter.put('/settings/global_read_frequency', async (req: ExpressRequest, res
 });
 
 // REPORTS
+const toRenderResponse = (render: ReportRender) => ({
+    id: render.id,
+    reportId: render.reportId,
+    status: render.status,
+    createdAt: render.createdAt,
+    rows: render.rows,
+    bytes: render.bytes,
+    durationMs: render.durationMs,
+    cached: render.file?.cached,
+    error: render.error,
+    fileName: render.file?.fileName,
+    downloadUrl: render.status === 'done' ? `/api/reports/renders/${render.id}/download` : undefined,
+});
+
 // FIX: Add explicit types for req and res parameters.
 apiRouter.get('/reports', async (req: ExpressRequest, res: ExpressResponse) => {
     try {
-        res.json(await db.all("SELECT * FROM reports"));
+        const reports = await db.all("SELECT * FROM reports ORDER BY created_at DESC");
+        res.json(reports.map(r => ({
+            id: r.id,
+            title: r.title,
+            type: r.type,
+            createdAt: r.created_at,
+            config: safeJSONParse(r.config, undefined),
+        })));
     } catch (error) {
         console.error("Error fetching reports:", error);
         res.status(500).json({ error: "Failed to fetch reports." });
     }
 });
+apiRouter.post('/reports', async (req: ExpressRequest, res: ExpressResponse) => {
+    const { title, type, config } = req.body;
+    if (!title || !config || typeof config !== 'object') {
+        return res.status(400).json({ error: 'title and config are required.' });
+    }
+    try {
+        const id = `RPT_${uuidv4()}`;
+        const createdAt = new Date().toISOString();
+        await db.run(
+            "INSERT INTO reports (id, title, created_at, type, config) VALUES (?, ?, ?, ?, ?)",
+            id, title, createdAt, type, JSON.stringify(config)
+        );
+        res.status(201).json({ id, title, type, createdAt, config });
+    } catch (error) {
+        console.error("Error creating report:", error);
+        res.status(500).json({ error: "Failed to create report." });
+    }
+});
+// Starts rendering a saved report in a worker and returns a handle to poll and download.
+apiRouter.post('/reports/:id/render', async (req: ExpressRequest, res: ExpressResponse) => {
+    try {
+        const report = await db.get("SELECT * FROM reports WHERE id = ?", req.params.id);
+        if (!report) {
+            return res.status(404).json({ error: 'Report not found.' });
+        }
+        const config = safeJSONParse(report.config, null);
+        const window = config ? reportWindow(config) : null;
+        if (!config || !window) {
+            return res.status(400).json({ error: 'Report configuration is missing or invalid.' });
+        }
+        const render = startReportRender(report.id, report.title, config, window);
+        res.status(202).json(toRenderResponse(render));
+    } catch (error) {
+        console.error(`Error rendering report ${req.params.id}:`, error);
+        res.status(500).json({ error: "Failed to render report." });
+    }
+});
+apiRouter.get('/reports/renders/:renderId', (req: ExpressRequest, res: ExpressResponse) => {
+    const render = getReportRender(req.params.renderId);
+    if (!render) {
+        return res.status(404).json({ error: 'Render not found or expired.' });
+    }
+    res.json(toRenderResponse(render));
+});
+apiRouter.get('/reports/renders/:renderId/download', (req: ExpressRequest, res: ExpressResponse) => {
+    const render = getReportRender(req.params.renderId);
+    if (!render) {
+        return res.status(404).json({ error: 'Render not found or expired.' });
+    }
+    if (render.status !== 'done' || !render.file) {
+        return res.status(409).json({ error: `Render is ${render.status}.` });
+    }
+    res.type(render.file.contentType);
+    res.download(render.file.filePath, render.file.fileName, (err) => {
+        if (err && !res.headersSent) {
+            console.error(`Error sending report render ${render.id}:`, err);
+            res.status(500).json({ error: "Failed to download report." });
+        }
+    });
+});
 // FIX: Add explicit types for req and res parameters.
 apiRouter.delete('/reports/:id', async (req: ExpressRequest, res: ExpressResponse) => {
     try {
@@ -1085,12 +1575,28 @@ apiRouter.delete('/reports/:id', async (req: ExpressRequest, res: ExpressRespons
     }
 });
 // FIX: Add explicit types for req and res parameters.
-apiRouter.get('/report-schedules', async (req: ExpressRequest, res: ExpressResponse) => {
+apiRouter.get('/report-schedules', conditionalGet(['report_schedules']), async (req: ExpressRequest, res: ExpressResponse) => {
     try {
-        const schedules = await db.all("SELECT * FROM report_schedules");
+        // Each schedule comes with a summary of its latest run.
+        const schedules = await db.all(`
+            SELECT rs.*, rr.row_count AS last_run_rows, rr.duration_ms AS last_run_duration_ms,
+                CASE WHEN rr.status = 'queued' AND eo.status IN ('sent', 'failed') THEN eo.status ELSE rr.status END AS last_run_status
+            FROM report_schedules rs
+            LEFT JOIN report_runs rr ON rr.id = (SELECT MAX(id) FROM report_runs WHERE schedule_id = rs.id)
+            LEFT JOIN email_outbox eo ON eo.report_run_id = rr.id
+        `);
         res.json(schedules.map(s => ({
-            ...s, 
-            reportConfig: safeJSONParse(s.report_config, {})
+            id: s.id,
+            name: s.name,
+            frequency: s.frequency,
+            time: s.time,
+            recipient: s.recipient,
+            reportConfig: safeJSONParse(s.report_config, {}),
+            isEnabled: !!s.is_enabled,
+            lastRun: s.last_run ?? undefined,
+            lastRunStatus: s.last_run_status ?? undefined,
+            lastRunRows: s.last_run_rows ?? undefined,
+            lastRunDurationMs: s.last_run_duration_ms ?? undefined,
         })));
     } catch (error) {
         console.error("Error fetching report schedules:", error);
@@ -1106,6 +1612,7 @@ apiRouter.post('/report-schedules', async (req: ExpressRequest, res: ExpressResp
             `INSERT INTO report_schedules (id, name, frequency, time, recipient, report_config, is_enabled) VALUES (?, ?, ?, ?, ?, ?, ?)`,
             id, name, frequency, time, recipient, JSON.stringify(reportConfig), isEnabled
         );
+        await syncReportSchedule(id);
         res.status(201).json({ id });
     } catch (error) {
         console.error("Error creating report schedule:", error);
@@ -1138,16 +1645,27 @@ apiRouter.put('/report-schedules/:id', async (req: ExpressRequest, res: ExpressR
         params.push(id);
 
         await db.run(sql, ...params);
+        await syncReportSchedule(id);
         res.status(200).send('OK');
     } catch (error) {
         console.error(`Error updating report schedule ${id}:`, error);
         res.status(500).json({ error: "Failed to update report schedule." });
     }
 });
+apiRouter.get('/report-schedules/:id/runs', async (req: ExpressRequest, res: ExpressResponse) => {
+    try {
+        res.json(await getScheduleRuns(req.params.id));
+    } catch (error) {
+        console.error(`Error fetching runs of report schedule ${req.params.id}:`, error);
+        res.status(500).json({ error: "Failed to fetch report schedule runs." });
+    }
+});
 // FIX: Add explicit types for req and res parameters.
 apiRouter.delete('/report-schedules/:id', async (req: ExpressRequest, res: ExpressResponse) => {
     try {
         await db.run("DELETE FROM report_schedules WHERE id = ?", req.params.id);
+        await db.run("DELETE FROM report_runs WHERE schedule_id = ?", req.params.id);
+        await syncReportSchedule(req.params.id);
         res.status(204).send();
     } catch (error) {
         console.error(`Error deleting report schedule ${req.params.id}:`, error);
@@ -1159,7 +1677,8 @@ apiRouter.delete('/report-schedules/:id', async (req: ExpressRequest, res: Expre
 // FIX: Add explicit types for req and res parameters.
 apiRouter.get('/notifications', async (req: ExpressRequest, res: ExpressResponse) => {
     try {
-        res.json(await db.all("SELECT * FROM notifications ORDER BY timestamp DESC"));
+        const notifications = await db.all("SELECT * FROM notifications ORDER BY timestamp DESC");
+        res.json(notifications.map(toNotification));
     } catch (error) {
         console.error("Error fetching notifications:", error);
         res.status(500).json({ error: "Failed to fetch notifications." });
@@ -1207,6 +1726,8 @@ apiRouter.post('/maintenance/clean-duplicates', async (req, res) => {
         `);
         const deletedCount = (readingsResult.changes || 0) + (rawReadingsResult.changes || 0);
         console.log(`[MAINTENANCE] Deleted ${deletedCount} duplicate readings.`);
+        // Rollups still count the deleted rows; recompute them in the background.
+        if ((readingsResult.changes || 0) > 0) await requestRollupRebuild();
         res.status(200).json({ message: `${deletedCount} adet tekrar eden kayıt silindi.`, deletedCount });
     } catch (error) {
         console.error("Error cleaning duplicate readings:", error);
@@ -1226,6 +1747,8 @@ apiRouter.post('/maintenance/clean-invalid', async (req, res) => {
         `);
         const deletedCount = (readingsResult.changes || 0) + (rawReadingsResult.changes || 0);
         console.log(`[MAINTENANCE] Deleted ${deletedCount} invalid readings.`);
+        // Rollups still count the deleted rows; recompute them in the background.
+        if ((readingsResult.changes || 0) > 0) await requestRollupRebuild();
         res.status(200).json({ message: `${deletedCount} adet geçersiz kayıt silindi.`, deletedCount });
     } catch (error) {
         console.error("Error cleaning invalid readings:", error);
@@ -1366,8 +1889,17 @@ apiRouter.post('/analysis/snow-depth-from-image', async (req: ExpressRequest, re
         const value = { snow_depth_cm: snowDepth };
         const valueStr = JSON.stringify(value);
 
-        await db.run("INSERT INTO readings (sensor_id, value, timestamp) VALUES (?, ?, ?)", virtualSensorId, valueStr, timestamp);
-        await db.run("UPDATE sensors SET value = ?, last_update = ? WHERE id = ?", valueStr, timestamp, virtualSensorId);
+        await withTransaction(async () => {
+            await db.run("INSERT INTO readings (sensor_id, value, timestamp, ts) VALUES (?, ?, ?, ?)", virtualSensorId, valueStr, timestamp, Date.parse(timestamp));
+            await db.run("UPDATE sensors SET value = ?, last_update = ? WHERE id = ?", valueStr, timestamp, virtualSensorId);
+            const rollups = new RollupBatch();
+            rollups.add(virtualSensorId, Date.parse(timestamp), value);
+            await rollups.apply();
+        });
+        recordLastValue(virtualSensorId, value, timestamp);
+        publish('reading', { sensorId: virtualSensorId, value, timestamp, isAnomaly: false });
+        const virtualSensor = await getSensorMeta(virtualSensorId);
+        if (virtualSensor) await evaluateAlerts([{ sensor: virtualSensorId, sensorType: virtualSensor.type, value, timestamp }]);
 
         res.status(200).json({ message: 'Analysis successful and reading updated.', value });
 
@@ -1378,165 +1910,6 @@ apiRouter.post('/analysis/snow-depth-from-image', async (req: ExpressRequest, re
 });
 
 
-// --- NODEMAILER TRANSPORTER & SCHEDULED REPORTS ---
-
-const transporter = nodemailer.createTransport({
-    host: process.env.EMAIL_HOST,
-    port: parseInt(process.env.EMAIL_PORT || '587', 10),
-    secure: (process.env.EMAIL_PORT === '465'), // true for 465, false for other ports
-    auth: {
-        user: process.env.EMAIL_USER,
-        pass: process.env.EMAIL_PASS,
-    },
-});
-
-transporter.verify(function(error, success) {
-    if (error) {
-        console.error("❌ E-posta gönderici yapılandırma hatası:", error.message);
-        console.warn("   -> .env dosyanızda EMAIL_HOST, EMAIL_PORT, EMAIL_USER, ve EMAIL_PASS değişkenlerini kontrol edin.");
-    } else {
-        console.log("✅ E-posta gönderici (Nodemailer) başarıyla yapılandırıldı ve hazır.");
-    }
-});
-
-
-async function sendEmail(recipient: string, subject: string, body: string, attachment?: { filename: string, content: Buffer, contentType: string }) {
-    console.log(`[E-POSTA GÖNDERİLİYOR] -> Alıcı: ${recipient}, Konu: ${subject}`);
-    
-    const mailOptions: nodemailer.SendMailOptions = {
-        from: `"ORION Gözlem Platformu" <${process.env.EMAIL_USER}>`,
-        to: recipient,
-        subject: subject,
-        html: `<p>${body}</p>`,
-    };
-
-    if (attachment) {
-        mailOptions.attachments = [
-            {
-                filename: attachment.filename,
-                content: attachment.content,
-                contentType: attachment.contentType,
-            },
-        ];
-    }
-
-    try {
-        await transporter.sendMail(mailOptions);
-        console.log(`✅ [E-POSTA BAŞARILI] -> Alıcı: ${recipient}`);
-    } catch (error) {
-        console.error(`❌ [E-POSTA HATASI] -> Alıcı: ${recipient}, Hata:`, error);
-    }
-}
-
-// FIX: Add explicit type for reading parameter and fix property access.
-const formatReadingValueForReport = (reading: ReadingForReport): string => {
-    const value = safeJSONParse(reading.value, null);
-    // FIX: Use `sensorType` and `interface` from the `reading` object directly.
-    const { sensorType, interface: sensorInterface } = reading;
-
-    if (value === null || value === undefined) return 'N/A';
-    if (typeof value !== 'object') return String(value);
-
-    if (sensorInterface === 'openweather') {
-        if (sensorType === 'Sıcaklık' && typeof (value as any).temperature === 'number') {
-            return String((value as any).temperature.toFixed(2));
-        }
-        if (sensorType === 'Nem' && typeof (value as any).humidity === 'number') {
-            return String((value as any).humidity.toFixed(2));
-        }
-        // Fallback for other openweather types
-        return 'N/A';
-    }
-    
-    // Fallback for other object types
-    const numericValue = Object.values(value).find(v => typeof v === 'number');
-    if (typeof numericValue === 'number') {
-        return String(numericValue.toFixed(2));
-    }
-
-    return JSON.stringify(value); // Last resort
-};
-
-async function checkAndSendScheduledReports() {
-    try {
-        const now = new Date();
-        const today = now.toISOString().split('T')[0]; // YYYY-MM-DD
-        const currentTime = now.toTimeString().substring(0, 5); // HH:MM
-
-        const dueSchedules = await db.all<ReportSchedule[]>(
-            "SELECT * FROM report_schedules WHERE is_enabled = 1 AND time = ? AND (last_run IS NULL OR last_run < ?)",
-            currentTime,
-            today
-        );
-        
-        for (const schedule of dueSchedules) {
-            const scheduleFromDb = schedule as any;
-            const scheduleConfig = safeJSONParse(scheduleFromDb.report_config, null);
-
-            if (!scheduleConfig || !scheduleConfig.selectedStations || !scheduleConfig.selectedSensorTypes) {
-                console.error(`[Zamanlayıcı Hatası] Rapor planı (${schedule.id} - ${schedule.name}) için yapılandırma eksik veya bozuk, atlanıyor.`);
-                continue; 
-            }
-
-            // FIX: Add explicit type for db.all result
-            let readings = await db.all<ReadingForReport[]>(`
-                SELECT r.timestamp, st.name as stationName, s.name as sensorName, s.type as sensorType, r.value, s.unit, s.interface FROM readings r
-                JOIN sensors s ON r.sensor_id = s.id
-                JOIN stations st ON s.station_id = st.id
-                WHERE s.station_id IN (${scheduleConfig.selectedStations.map((s:string) => `'${s}'`).join(',')})
-                AND s.type IN (${scheduleConfig.selectedSensorTypes.map((t:string) => `'${t}'`).join(',')})
-                ORDER BY r.timestamp DESC
-            `);
-            
-            if (scheduleConfig.dataRules.groupByStation || scheduleConfig.dataRules.groupBySensorType) {
-                // FIX: Type a and b as ReadingForReport
-                readings.sort((a: ReadingForReport, b: ReadingForReport) => {
-                    if (scheduleConfig.dataRules.groupByStation) {
-                        const stationCompare = a.stationName.localeCompare(b.stationName, 'tr');
-                        if (stationCompare !== 0) return stationCompare;
-                    }
-                    if (scheduleConfig.dataRules.groupBySensorType) {
-                        const typeCompare = a.sensorType.localeCompare(b.sensorType, 'tr');
-                        if (typeCompare !== 0) return typeCompare;
-                    }
-                    return new Date(b.timestamp).getTime() - new Date(a.timestamp).getTime();
-                });
-            }
-
-            // FIX: Type d as ReadingForReport
-            const formattedData = readings.map((d: ReadingForReport) => {
-                const date = new Date(d.timestamp);
-                return {
-                    'Tarih': date.toLocaleDateString('tr-TR'),
-                    'Saat': date.toLocaleTimeString('tr-TR'),
-                    'İstasyon': d.stationName,
-                    'Sensör': d.sensorName,
-                    'Sensör Tipi': d.sensorType,
-                    'Değer': `${formatReadingValueForReport(d)} ${d.unit || ''}`
-                }
-            });
-
-            const ws = XLSX.utils.json_to_sheet(formattedData);
-            const wb = XLSX.utils.book_new();
-            XLSX.utils.book_append_sheet(wb, ws, "Rapor");
-            const buffer = XLSX.write(wb, { bookType: 'xlsx', type: 'buffer' });
-            
-            const filename = `${schedule.name.replace(/ /g, '_')}_${today}.xlsx`;
-            const emailBody = `Merhaba,<br><br><b>${schedule.name}</b> adlı otomatik raporunuz oluşturulmuş ve eke eklenmiştir.<br><br>Saygılarımızla,<br>ORION Gözlem Platformu`;
-
-            await sendEmail(schedule.recipient, `Otomatik Rapor: ${schedule.name}`, emailBody, {
-                filename,
-                content: buffer,
-                contentType: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            });
-
-            await db.run("UPDATE report_schedules SET last_run = ? WHERE id = ?", today, schedule.id);
-        }
-    } catch (error) {
-        console.error("[Zamanlayıcı Hatası] Raporlar gönderilemedi:", error);
-    }
-}
-
 // --- Mount API Router ---
 app.use('/api', apiRouter);
 
@@ -1573,15 +1946,57 @@ app.get('*', (req: ExpressRequest, res: ExpressResponse) => {
 // --- SERVER START ---
 async function startServer() {
     await openDb();
+    await configureStorage();
     await migrate();
-
-    // Start the scheduled report checker (runs every minute)
-    setInterval(checkAndSendScheduledReports, 60000);
-    console.log('✅ Rapor zamanlayıcısı aktif, her dakika kontrol edilecek.');
-
-    app.listen(port, () => {
+    await warmLastValueCache();
+    await warmMetadataCache();
+    await loadAlertRules();
+    await startAnomalyDetector();
+    await ingestQueue.start();
+    await startCheckpointScheduler();
+    readPool.start();
+    await clearReportArtifacts();
+    await loadReportCache();
+
+    await startEmailOutbox();
+    await startReportScheduler();
+    await startChangeLog();
+    await jobScheduler.schedule('agent:status', { kind: 'interval', everyMs: 30000 }, checkAgentStatus);
+
+    const server = app.listen(port, () => {
         console.log(`✅ Backend server listening on http://localhost:${port}`);
+        startBackgroundMigrations();
+        runRollupRebuild();
     });
+
+    // Graceful shutdown: stop taking requests, flush queued readings, then close the database.
+    let shuttingDown = false;
+    const shutdown = async (signal: string) => {
+        if (shuttingDown) return;
+        shuttingDown = true;
+        console.log(`${signal} sinyali alındı. Sunucu kapatılıyor...`);
+        server.close();
+        closeEventStreams();
+        releaseCommandWaiters();
+        try {
+            const scheduledJobs = jobScheduler.stop();
+            await stopReportWorkers();
+            await scheduledJobs;
+            await stopEmailOutbox();
+            await readPool.stop();
+            await ingestQueue.stop();
+            await flushNotifications();
+            await stopAnomalyDetector();
+            await stopCheckpointScheduler();
+            await db.close();
+        } catch (error) {
+            console.error('Kapatma sırasında hata:', error);
+        }
+        process.exit(0);
+    };
+
+    process.on('SIGINT', () => shutdown('SIGINT'));
+    process.on('SIGTERM', () => shutdown('SIGTERM'));
 }
 
 startServer();
\ No newline at end of file
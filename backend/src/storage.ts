@@ -0,0 +1,131 @@
+import fs from 'fs/promises';
+import process from 'process';
+import { db, DB_FILE } from './database.js';
+import { jobScheduler } from './jobScheduler.js';
+
+// SQLite storage settings for the backend database.
+//
+// WAL lets dashboard reads proceed while agent readings are being written; in the default
+// rollback-journal mode every write blocks every read. With WAL, `synchronous = NORMAL`
+// is still crash-safe (only the last commits before a power loss can be lost, never
+// corrupted). Checkpoints are driven by a timer: a PASSIVE checkpoint never waits for
+// readers or writers, and once the WAL grows past WAL_SIZE_LIMIT_MB a TRUNCATE checkpoint
+// resets the file so it cannot grow without bound behind a long-running reader.
+
+const SYNCHRONOUS = (process.env.SQLITE_SYNCHRONOUS || 'NORMAL').toUpperCase();
+const CACHE_SIZE_KB = parseInt(process.env.SQLITE_CACHE_SIZE_KB || '65536', 10);
+const MMAP_SIZE_MB = parseInt(process.env.SQLITE_MMAP_SIZE_MB || '256', 10);
+const BUSY_TIMEOUT_MS = parseInt(process.env.SQLITE_BUSY_TIMEOUT_MS || '5000', 10);
+const CHECKPOINT_INTERVAL_MS = parseInt(process.env.SQLITE_CHECKPOINT_INTERVAL_MS || '30000', 10);
+const WAL_SIZE_LIMIT_MB = parseInt(process.env.SQLITE_WAL_SIZE_LIMIT_MB || '64', 10);
+
+export const WAL_FILE = `${DB_FILE}-wal`;
+
+const SYNCHRONOUS_MODES = ['OFF', 'NORMAL', 'FULL', 'EXTRA'];
+
+type CheckpointMode = 'PASSIVE' | 'TRUNCATE';
+
+const stats = {
+    journalMode: null as string | null,
+    checkpoints: 0,
+    truncations: 0,
+    busyCheckpoints: 0,
+    lastCheckpointAt: null as string | null,
+    lastCheckpointMs: 0,
+    maxCheckpointMs: 0,
+    lastCheckpointPages: 0,
+    walSizeBytes: 0,
+    maxWalSizeBytes: 0,
+    lastError: null as string | null,
+};
+
+let checkpointRunning = false;
+
+// Applies the connection pragmas. Must run right after openDb(), before any other query.
+export async function configureStorage() {
+    const synchronous = SYNCHRONOUS_MODES.includes(SYNCHRONOUS) ? SYNCHRONOUS : 'NORMAL';
+    const journal = await db.get('PRAGMA journal_mode = WAL');
+    stats.journalMode = journal?.journal_mode ?? null;
+    if (stats.journalMode !== 'wal') {
+        console.warn(`⚠️ WAL modu etkinleştirilemedi, journal_mode = ${stats.journalMode}`);
+    }
+    // PRAGMA arguments cannot be bound; every value below is validated or an integer.
+    await db.exec(`
+        PRAGMA synchronous = ${synchronous};
+        PRAGMA cache_size = -${Math.max(CACHE_SIZE_KB, 0)};
+        PRAGMA mmap_size = ${Math.max(MMAP_SIZE_MB, 0) * 1024 * 1024};
+        PRAGMA temp_store = MEMORY;
+        PRAGMA busy_timeout = ${Math.max(BUSY_TIMEOUT_MS, 0)};
+        PRAGMA journal_size_limit = ${Math.max(WAL_SIZE_LIMIT_MB, 0) * 1024 * 1024};
+    `);
+    console.log(`Database storage configured (journal_mode=${stats.journalMode}, synchronous=${synchronous}).`);
+}
+
+const readWalSize = async (): Promise<number> => {
+    try {
+        return (await fs.stat(WAL_FILE)).size;
+    } catch {
+        return 0; // No WAL file yet, or it was just removed.
+    }
+};
+
+// Runs one checkpoint and records its duration. Returns false if SQLite reported the
+// checkpoint as busy (readers or a writer kept part of the WAL from being copied back).
+export async function checkpoint(mode: CheckpointMode = 'PASSIVE'): Promise<boolean> {
+    const started = Date.now();
+    const result = await db.get(`PRAGMA wal_checkpoint(${mode})`);
+    const elapsed = Date.now() - started;
+
+    stats.checkpoints++;
+    if (mode === 'TRUNCATE') stats.truncations++;
+    stats.lastCheckpointAt = new Date().toISOString();
+    stats.lastCheckpointMs = elapsed;
+    stats.maxCheckpointMs = Math.max(stats.maxCheckpointMs, elapsed);
+    stats.lastCheckpointPages = result?.checkpointed ?? 0;
+    const busy = (result?.busy ?? 0) !== 0;
+    if (busy) stats.busyCheckpoints++;
+    return !busy;
+}
+
+const runScheduledCheckpoint = async () => {
+    if (checkpointRunning || stats.journalMode !== 'wal') return;
+    checkpointRunning = true;
+    try {
+        await checkpoint('PASSIVE');
+        let walSize = await readWalSize();
+        if (walSize > WAL_SIZE_LIMIT_MB * 1024 * 1024) {
+            console.log(`[Storage] WAL boyutu ${(walSize / 1024 / 1024).toFixed(1)} MB, sınır aşıldı. WAL sıfırlanıyor...`);
+            await checkpoint('TRUNCATE');
+            walSize = await readWalSize();
+        }
+        stats.walSizeBytes = walSize;
+        stats.maxWalSizeBytes = Math.max(stats.maxWalSizeBytes, walSize);
+        stats.lastError = null;
+    } catch (error) {
+        stats.lastError = String(error);
+        console.error('[Storage] Checkpoint başarısız:', error);
+    } finally {
+        checkpointRunning = false;
+    }
+};
+
+export async function startCheckpointScheduler() {
+    if (stats.journalMode !== 'wal') return;
+    await jobScheduler.schedule('storage:checkpoint', { kind: 'interval', everyMs: CHECKPOINT_INTERVAL_MS }, runScheduledCheckpoint);
+}
+
+// Stops the periodic checkpoints and folds the WAL back into the main database file before shutdown.
+export async function stopCheckpointScheduler() {
+    await jobScheduler.cancel('storage:checkpoint');
+    if (stats.journalMode === 'wal') {
+        await checkpoint('TRUNCATE');
+    }
+}
+
+export function getStorageStats() {
+    return {
+        ...stats,
+        checkpointIntervalMs: CHECKPOINT_INTERVAL_MS,
+        walSizeLimitBytes: WAL_SIZE_LIMIT_MB * 1024 * 1024,
+    };
+}
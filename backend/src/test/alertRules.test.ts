@@ -0,0 +1,87 @@
+import { test } from 'node:test';
+import assert from 'node:assert/strict';
+import { compileAlertRule, newRuleState, stepRuleState, CompiledRule } from '../alertRules.js';
+
+const MINUTE = 60 * 1000;
+
+const rule = (overrides: Record<string, unknown> = {}): CompiledRule => compileAlertRule({
+    id: 'r1',
+    name: 'Sıcaklık yüksek',
+    sensor_type: 'Sıcaklık',
+    station_ids: null,
+    condition: 'Büyüktür',
+    threshold: 30,
+    hysteresis: 2,
+    cooldown_minutes: 10,
+    severity: 'Kritik',
+    is_enabled: 1,
+    ...overrides,
+})!;
+
+// Feeds [minute, value] readings through one rule state and returns the outcomes.
+function run(compiled: CompiledRule, readings: [number, number][]) {
+    const state = newRuleState();
+    return readings.map(([minute, value]) => stepRuleState(compiled, state, value, minute * MINUTE));
+}
+
+test('compileAlertRule derives the clear level and cooldown', () => {
+    const above = rule();
+    assert.equal(above.above, true);
+    assert.equal(above.clearAt, 28);
+    assert.equal(above.cooldownMs, 10 * MINUTE);
+    assert.deepEqual(above.stationIds, []);
+
+    const below = rule({ condition: 'Küçüktür', threshold: '-5', hysteresis: 1.5, station_ids: '["S1","S2"]' });
+    assert.equal(below.above, false);
+    assert.equal(below.threshold, -5);
+    assert.equal(below.clearAt, -3.5);
+    assert.deepEqual(below.stationIds, ['S1', 'S2']);
+
+    // A negative hysteresis is treated as none.
+    assert.equal(rule({ hysteresis: -3 }).clearAt, 30);
+});
+
+test('compileAlertRule skips rules that cannot fire', () => {
+    const row = { id: 'r1', sensor_type: 'Sıcaklık', condition: 'Büyüktür', threshold: 30, is_enabled: 1 };
+    assert.ok(compileAlertRule(row));
+    assert.equal(compileAlertRule({ ...row, is_enabled: 0 }), null);
+    assert.equal(compileAlertRule({ ...row, threshold: 'yüksek' }), null);
+    assert.equal(compileAlertRule({ ...row, condition: 'Eşittir' }), null);
+    assert.equal(compileAlertRule({ ...row, sensor_type: null }), null);
+});
+
+test('an alarm only clears once the value is back past the hysteresis band', () => {
+    assert.deepEqual(run(rule({ cooldown_minutes: 0 }), [
+        [0, 29],    // below the threshold
+        [1, 31],    // crosses it
+        [2, 29],    // inside the band: still active
+        [3, 31],    // so no second notification
+        [4, 27.9],  // clears
+        [5, 30.5],  // crosses again
+    ]), [null, 'trigger', null, null, null, 'trigger']);
+});
+
+test('a value exactly at the threshold does not trigger', () => {
+    assert.deepEqual(run(rule(), [[0, 30]]), [null]);
+    assert.deepEqual(run(rule({ condition: 'Küçüktür', threshold: 0 }), [[0, 0], [1, -0.1]]), [null, 'trigger']);
+});
+
+test('an alarm that starts again within the cooldown is not notified', () => {
+    assert.deepEqual(run(rule(), [
+        [0, 31],   // notified
+        [1, 20],   // clears
+        [5, 31],   // starts again 5 minutes later: suppressed, but active
+        [6, 31],
+        [7, 20],
+        [10, 31],  // exactly one cooldown after the notification
+    ]), ['trigger', null, 'suppressed', null, null, 'trigger']);
+});
+
+test('readings older than the last one evaluated are ignored', () => {
+    const compiled = rule();
+    const state = newRuleState();
+    assert.equal(stepRuleState(compiled, state, 20, 10 * MINUTE), null);
+    assert.equal(stepRuleState(compiled, state, 35, 5 * MINUTE), null);
+    assert.equal(state.active, false);
+    assert.equal(stepRuleState(compiled, state, 35, 10 * MINUTE), 'trigger');
+});
@@ -0,0 +1,76 @@
+import { test, after } from 'node:test';
+import assert from 'node:assert/strict';
+import fs from 'fs';
+import os from 'os';
+import path from 'path';
+import process from 'process';
+
+// The database path is fixed when database.js is first imported, so point it at a temp dir first.
+const dataDir = fs.mkdtempSync(path.join(os.tmpdir(), 'orion-anomaly-'));
+process.env.DATA_DIR = dataDir;
+const { openDb } = await import('../database.js');
+const { migrate } = await import('../migrations.js');
+const { AnomalyBatch, checkpointAnomalyState, startAnomalyDetector, stopAnomalyDetector } = await import('../anomaly.js');
+
+const db = await openDb();
+await migrate();
+
+after(async () => {
+    await stopAnomalyDetector();
+    await db.close();
+    fs.rmSync(dataDir, { recursive: true, force: true });
+});
+
+const MINUTE = 60 * 1000;
+const START = Date.UTC(2024, 0, 1);
+
+// Small deterministic noise in [-0.2, 0.2].
+const noise = (i: number) => ((i * 7) % 5 - 2) / 10;
+
+// Checks one reading per minute, starting at `fromMinute`, and commits them as ingest does.
+function feed(sensorId: string, values: number[], fromMinute = 0) {
+    const batch = new AnomalyBatch();
+    const results = values.map((value, i) => {
+        const { accept, ...result } = batch.check(sensorId, 'Sıcaklık', value, new Date(START + (fromMinute + i) * MINUTE).toISOString());
+        accept();
+        return result;
+    });
+    batch.apply();
+    return results;
+}
+
+const flagged = (results: { isAnomaly: boolean }[]) => results.flatMap((r, i) => r.isAnomaly ? [i] : []);
+
+const baseline = (count: number, level = 20) => Array.from({ length: count }, (_, i) => level + noise(i));
+
+test('readings during the warm-up are not flagged', () => {
+    // Erratic but physically plausible values: there is no learned scale to judge them by yet.
+    const values = Array.from({ length: 20 }, (_, i) => (i % 2 ? 40 : -10) + i);
+    assert.deepEqual(flagged(feed('warmup', values)), []);
+});
+
+test('a single spike is flagged while a step change stops being flagged', () => {
+    assert.deepEqual(flagged(feed('spike', baseline(60))), []);
+    const spike = feed('spike', [35, ...baseline(30)], 60);
+    assert.deepEqual(flagged(spike), [0]);
+    assert.match(spike[0].reason!, /Ortalamadan Sapma/);
+
+    feed('step', baseline(60));
+    const step = feed('step', baseline(120, 30), 60);
+    assert.ok(step[0].isAnomaly);
+    // The new level becomes the normal one.
+    assert.deepEqual(flagged(step.slice(60)), []);
+});
+
+test('a checkpointed state restores to identical results', async () => {
+    const history = baseline(40);
+    const next = [...baseline(10), 35, ...baseline(10, 25)];
+    feed('restore', history);
+    await checkpointAnomalyState();
+    const before = feed('restore', next, history.length);
+    assert.ok(flagged(before).length > 0);
+
+    // Reloading drops everything learned since the checkpoint.
+    await startAnomalyDetector();
+    assert.deepEqual(feed('restore', next, history.length), before);
+});
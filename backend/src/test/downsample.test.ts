@@ -0,0 +1,57 @@
+import { test } from 'node:test';
+import assert from 'node:assert/strict';
+import { lttb, downsampleReadings } from '../downsample.js';
+
+const series = (ys: number[]) => ys.map((y, x) => ({ x, y }));
+const x = (p: { x: number }) => p.x;
+const y = (p: { y: number }) => p.y;
+
+test('lttb leaves a series that already fits alone', () => {
+    const points = series([1, 2, 3, 4]);
+    assert.equal(lttb(points, 4, x, y), points);
+    assert.equal(lttb(points, 2, x, y), points);
+});
+
+test('lttb keeps the end points and returns `threshold` points in order', () => {
+    const points = series(Array.from({ length: 100 }, (_, i) => Math.sin(i / 5)));
+    const sampled = lttb(points, 10, x, y);
+    assert.equal(sampled.length, 10);
+    assert.equal(sampled[0], points[0]);
+    assert.equal(sampled[9], points[99]);
+    for (let i = 1; i < sampled.length; i++) assert.ok(sampled[i].x > sampled[i - 1].x);
+});
+
+test('lttb keeps a single spike in a flat series', () => {
+    const ys = new Array(100).fill(0);
+    ys[50] = 100;
+    const sampled = lttb(series(ys), 10, x, y);
+    assert.ok(sampled.some(p => p.y === 100));
+});
+
+test('downsampleReadings limits every sensor separately', () => {
+    const rows = [
+        ...Array.from({ length: 50 }, (_, i) => ({ sensor_id: 'a', ts: i * 1000, value: String(i % 7) })),
+        { sensor_id: 'b', ts: 0, value: '1' },
+        { sensor_id: 'b', ts: 1000, value: '2' },
+    ];
+    const result = downsampleReadings(rows, { maxPoints: 5, sensorTypes: { a: 'Sıcaklık', b: 'Nem' } });
+    assert.equal(result.filter(r => r.sensor_id === 'a').length, 5);
+    assert.equal(result.filter(r => r.sensor_id === 'b').length, 2);
+});
+
+test('downsampleReadings picks the measurement field by sensor type', () => {
+    // The humidity field is flat, so a spike can only survive if temperature is used.
+    const rows = Array.from({ length: 50 }, (_, i) => ({
+        sensor_id: 'a',
+        ts: i * 1000,
+        value: JSON.stringify({ humidity: 40, temperature: i === 25 ? 90 : 20 }),
+    }));
+    const result = downsampleReadings(rows, { maxPoints: 5, sensorTypes: { a: 'Sıcaklık' } });
+    assert.ok(result.some(r => r.ts === 25000));
+});
+
+test('downsampleReadings thins a series without numeric values evenly', () => {
+    const rows = Array.from({ length: 20 }, (_, i) => ({ sensor_id: 'a', ts: i * 1000, value: '"kapalı"' }));
+    const result = downsampleReadings(rows, { maxPoints: 4, sensorTypes: { a: 'Mesafe' } });
+    assert.deepEqual(result.map(r => r.ts), [0, 5000, 10000, 15000]);
+});
@@ -0,0 +1,131 @@
+import { test, after } from 'node:test';
+import assert from 'node:assert/strict';
+import fs from 'fs';
+import os from 'os';
+import path from 'path';
+import process from 'process';
+import type { FileHandle } from 'fs/promises';
+import type { IngestQueue as Queue, ValidReading } from '../ingest.js';
+
+// The database path is fixed when database.js is first imported, so point it at a temp dir first.
+// Flushes only happen when a test drains the queue.
+const dataDir = fs.mkdtempSync(path.join(os.tmpdir(), 'orion-ingest-'));
+process.env.DATA_DIR = dataDir;
+process.env.INGEST_FLUSH_INTERVAL_MS = '3600000';
+const { openDb } = await import('../database.js');
+const { migrate } = await import('../migrations.js');
+const { IngestQueue } = await import('../ingest.js');
+
+const JOURNAL = path.join(dataDir, 'ingest-journal.ndjson');
+
+const db = await openDb();
+await migrate();
+await db.run("INSERT INTO stations (id, name) VALUES ('ST1', 'İstasyon')");
+await db.run("INSERT INTO sensors (id, name, type, station_id) VALUES ('S1', 'Sıcaklık', 'Sıcaklık', 'ST1')");
+
+// Queues that are still running; a failed assertion must not leave their flush timers behind.
+const running = new Set<Queue>();
+
+after(async () => {
+    for (const queue of running) await crash(queue);
+    await db.close();
+    fs.rmSync(dataDir, { recursive: true, force: true });
+});
+
+const reading = (value: number, sensor = 'S1'): ValidReading => ({
+    index: 0,
+    sensor,
+    sensorType: 'Sıcaklık',
+    value,
+    timestamp: new Date(Date.UTC(2024, 0, 1) + value * 1000).toISOString(),
+});
+
+const startQueue = async () => {
+    const queue = new IngestQueue();
+    await queue.start();
+    running.add(queue);
+    return queue;
+};
+
+// Simulates a crash: the queue goes away without draining or truncating its journal.
+async function crash(queue: Queue) {
+    const internals = queue as unknown as { flushTimer: ReturnType<typeof setInterval>; journal: FileHandle };
+    clearInterval(internals.flushTimer);
+    await internals.journal.close();
+    running.delete(queue);
+}
+
+async function stop(queue: Queue) {
+    await queue.stop();
+    running.delete(queue);
+}
+
+const countReadings = async (value: number) =>
+    (await db.get("SELECT COUNT(*) AS count FROM readings WHERE sensor_id = 'S1' AND value = ?", JSON.stringify(value)))!.count;
+
+const committedSeq = async () =>
+    Number((await db.get("SELECT value FROM global_settings WHERE key = 'ingest_journal_committed_seq'"))!.value);
+
+test('an acknowledged batch survives a restart before it is committed', async () => {
+    const first = await startQueue();
+    const result = await first.submit([reading(1), reading(2)]);
+    assert.deepEqual(result, { queued: true, statuses: ['accepted', 'accepted'] });
+    assert.equal(await countReadings(1), 0);
+    await crash(first);
+
+    const second = await startQueue();
+    assert.equal(second.getStats().depth, 2);
+    await second.drain();
+    assert.equal(await countReadings(1), 1);
+    assert.equal(await countReadings(2), 1);
+    assert.equal(fs.readFileSync(JOURNAL, 'utf-8'), '');
+    await stop(second);
+});
+
+test('a reading that fails to insert is dead-lettered, not left in the journal', async () => {
+    const queue = await startQueue();
+    await queue.submit([reading(3), reading(4, 'missing-sensor')]);
+    const lastSeq = JSON.parse(fs.readFileSync(JOURNAL, 'utf-8').trim().split('\n').pop()!).seq;
+    await queue.drain();
+
+    assert.equal(await countReadings(3), 1);
+    const deadLetters = await db.all("SELECT seq, reading, error FROM ingest_dead_letters");
+    assert.equal(deadLetters.length, 1);
+    assert.equal(deadLetters[0].seq, lastSeq);
+    assert.equal(JSON.parse(deadLetters[0].reading).sensor, 'missing-sensor');
+    assert.match(deadLetters[0].error, /FOREIGN KEY/);
+    assert.equal(queue.getStats().deadLetters, 1);
+    assert.equal(await committedSeq(), lastSeq);
+    assert.equal(fs.readFileSync(JOURNAL, 'utf-8'), '');
+    await stop(queue);
+
+    const restarted = await startQueue();
+    assert.equal(restarted.getStats().depth, 0);
+    assert.equal(restarted.getStats().deadLetters, 1);
+    await stop(restarted);
+});
+
+test('replay skips sequences that were already committed', async () => {
+    const first = await startQueue();
+    await first.submit([reading(5), reading(6)]);
+    const committedLines = fs.readFileSync(JOURNAL, 'utf-8');
+    await first.drain();
+    await first.submit([reading(7)]);
+    await crash(first);
+    // As if the process died after the commit but before the journal was truncated.
+    fs.writeFileSync(JOURNAL, committedLines + fs.readFileSync(JOURNAL, 'utf-8'));
+
+    const second = await startQueue();
+    assert.equal(second.getStats().depth, 1);
+    await second.drain();
+    // A restart right after the drain finds nothing left to replay either.
+    await crash(second);
+    const third = await startQueue();
+    assert.equal(third.getStats().depth, 0);
+    await third.submit([reading(8)]);
+    await stop(third);
+
+    for (const value of [5, 6, 7, 8]) assert.equal(await countReadings(value), 1);
+    assert.equal(fs.readFileSync(JOURNAL, 'utf-8'), '');
+    assert.equal(await committedSeq(), JSON.parse(committedLines.trim().split('\n').pop()!).seq + 2);
+});
@@ -0,0 +1,76 @@
+import { test } from 'node:test';
+import assert from 'node:assert/strict';
+import { zonedTimeToUtc, zonedParts, nextOccurrence, CalendarSchedule } from '../jobScheduler.js';
+
+const utc = (year: number, month: number, day: number, hour = 0, minute = 0) => Date.UTC(year, month - 1, day, hour, minute);
+
+// Successive fire times, starting after `after`.
+function occurrences(schedule: CalendarSchedule, after: number, count: number): number[] {
+    const times: number[] = [];
+    for (let t = after; times.length < count; ) times.push(t = nextOccurrence(schedule, t));
+    return times;
+}
+
+test('zonedTimeToUtc applies the offset in effect on that date', () => {
+    assert.equal(zonedTimeToUtc(2024, 1, 15, 12, 0, 'Europe/Berlin'), utc(2024, 1, 15, 11));
+    assert.equal(zonedTimeToUtc(2024, 7, 1, 12, 0, 'Europe/Berlin'), utc(2024, 7, 1, 10));
+    assert.equal(zonedTimeToUtc(2024, 7, 1, 12, 0, 'Europe/Istanbul'), utc(2024, 7, 1, 9));
+    assert.equal(zonedTimeToUtc(2024, 7, 1, 12, 0, 'UTC'), utc(2024, 7, 1, 12));
+});
+
+test('zonedTimeToUtc rolls out-of-range fields over', () => {
+    assert.equal(zonedTimeToUtc(2024, 3, 0, 12, 0, 'Europe/Istanbul'), utc(2024, 2, 29, 9));
+    assert.equal(zonedTimeToUtc(2023, 13, 1, 0, 0, 'UTC'), utc(2024, 1, 1));
+});
+
+test('zonedTimeToUtc maps a time skipped by DST to a valid instant', () => {
+    // Europe/Berlin skips 02:00-03:00 on 2024-03-31.
+    const ts = zonedTimeToUtc(2024, 3, 31, 2, 30, 'Europe/Berlin');
+    assert.equal(ts, utc(2024, 3, 31, 1, 30));
+    assert.deepEqual(zonedParts(ts, 'Europe/Berlin'), { year: 2024, month: 3, day: 31, hour: 3, minute: 30, second: 0 });
+});
+
+test('a daily job keeps its wall-clock time across DST changes', () => {
+    const daily: CalendarSchedule = { kind: 'calendar', time: '09:00', timeZone: 'Europe/Berlin' };
+    assert.deepEqual(occurrences(daily, utc(2024, 3, 30, 12), 2), [utc(2024, 3, 31, 7), utc(2024, 4, 1, 7)]);
+    assert.deepEqual(occurrences(daily, utc(2024, 10, 26, 12), 2), [utc(2024, 10, 27, 8), utc(2024, 10, 28, 8)]);
+});
+
+test('a daily job at a time skipped or repeated by DST fires once that day', () => {
+    const daily: CalendarSchedule = { kind: 'calendar', time: '02:30', timeZone: 'Europe/Berlin' };
+    assert.deepEqual(occurrences(daily, utc(2024, 3, 29, 12), 3), [utc(2024, 3, 30, 1, 30), utc(2024, 3, 31, 1, 30), utc(2024, 4, 1, 0, 30)]);
+    assert.deepEqual(occurrences(daily, utc(2024, 10, 25, 12), 3), [utc(2024, 10, 26, 0, 30), utc(2024, 10, 27, 1, 30), utc(2024, 10, 28, 1, 30)]);
+});
+
+test('a monthly job on a day some months lack fires on their last day', () => {
+    const monthly: CalendarSchedule = { kind: 'calendar', time: '09:00', monthDay: 31, timeZone: 'Europe/Istanbul' };
+    assert.deepEqual(occurrences(monthly, utc(2023, 12, 31, 12), 4), [
+        utc(2024, 1, 31, 6),
+        utc(2024, 2, 29, 6),
+        utc(2024, 3, 31, 6),
+        utc(2024, 4, 30, 6),
+    ]);
+    assert.equal(nextOccurrence(monthly, utc(2023, 1, 31, 12)), utc(2023, 2, 28, 6));
+});
+
+test('a weekly job fires on its weekday only', () => {
+    // 2024-01-01 was a Monday.
+    const weekly: CalendarSchedule = { kind: 'calendar', time: '08:00', weekday: 0, timeZone: 'Europe/Istanbul' };
+    assert.deepEqual(occurrences(weekly, utc(2024, 1, 1), 2), [utc(2024, 1, 7, 5), utc(2024, 1, 14, 5)]);
+});
+
+test('nextOccurrence is strictly after the given time', () => {
+    const daily: CalendarSchedule = { kind: 'calendar', time: '00:00', timeZone: 'UTC' };
+    assert.equal(nextOccurrence(daily, utc(2024, 5, 1)), utc(2024, 5, 2));
+    assert.equal(nextOccurrence(daily, utc(2024, 5, 1) - 1), utc(2024, 5, 1));
+});
+
+test('interval jobs fire every `everyMs`', () => {
+    assert.equal(nextOccurrence({ kind: 'interval', everyMs: 60000 }, utc(2024, 5, 1)), utc(2024, 5, 1, 0, 1));
+});
+
+test('an invalid time is rejected', () => {
+    for (const time of ['24:00', '9', '12:60', '']) {
+        assert.throws(() => nextOccurrence({ kind: 'calendar', time, timeZone: 'UTC' }, 0), /Invalid schedule time/);
+    }
+});
@@ -0,0 +1,67 @@
+import { test } from 'node:test';
+import assert from 'node:assert/strict';
+import { encodeCursor, decodeCursor, keysetQuery, buildPage, parsePageLimit, InvalidCursorError } from '../pagination.js';
+
+test('cursors survive encoding', () => {
+    const cursor = { ts: 1717171717123, id: 42, d: 'prev' as const };
+    const encoded = encodeCursor(cursor);
+    assert.match(encoded, /^[A-Za-z0-9_-]+$/);
+    assert.deepEqual(decodeCursor(encoded), cursor);
+});
+
+test('malformed cursors are rejected', () => {
+    const encode = (value: unknown) => Buffer.from(JSON.stringify(value)).toString('base64url');
+    for (const value of ['', 'not a cursor', encode({ ts: 1, id: 2 }), encode({ ts: 1, id: 2.5, d: 'next' }), encode({ ts: 'x', id: 2, d: 'next' })]) {
+        assert.throws(() => decodeCursor(value), InvalidCursorError);
+    }
+});
+
+test('parsePageLimit accepts sizes within the bounds only', () => {
+    assert.equal(parsePageLimit(undefined, 100, 1000), 100);
+    assert.equal(parsePageLimit('250', 100, 1000), 250);
+    assert.equal(parsePageLimit('0', 100, 1000), null);
+    assert.equal(parsePageLimit('1001', 100, 1000), null);
+    assert.equal(parsePageLimit(['5'], 100, 1000), null);
+});
+
+test('keysetQuery seeks from the cursor in the direction of travel', () => {
+    assert.deepEqual(keysetQuery(null), { clause: '', params: [], orderBy: 'ts DESC, id DESC' });
+    assert.deepEqual(keysetQuery({ ts: 10, id: 3, d: 'next' }, 'r.'), {
+        clause: ' AND r.ts <= ? AND (r.ts < ? OR r.id < ?)',
+        params: [10, 10, 3],
+        orderBy: 'r.ts DESC, r.id DESC',
+    });
+    assert.deepEqual(keysetQuery({ ts: 10, id: 3, d: 'prev' }, '', 'COALESCE(ts, 0)'), {
+        clause: ' AND COALESCE(ts, 0) >= ? AND (COALESCE(ts, 0) > ? OR id > ?)',
+        params: [10, 10, 3],
+        orderBy: 'COALESCE(ts, 0) ASC, id ASC',
+    });
+});
+
+const rows = (...ids: number[]) => ids.map(id => ({ id, ts: id * 1000 }));
+
+test('the first page links only to older rows', () => {
+    const page = buildPage(rows(5, 4, 3), 2, null, r => r.id);
+    assert.deepEqual(page.items, [5, 4]);
+    assert.deepEqual(decodeCursor(page.next!), { ts: 4000, id: 4, d: 'next' });
+    assert.equal(page.prev, null);
+});
+
+test('the last page going forward has no next link', () => {
+    const page = buildPage(rows(2, 1), 2, { ts: 3000, id: 3, d: 'next' }, r => r.id);
+    assert.deepEqual(page.items, [2, 1]);
+    assert.equal(page.next, null);
+    assert.deepEqual(decodeCursor(page.prev!), { ts: 2000, id: 2, d: 'prev' });
+});
+
+test('a page read backwards is returned newest first', () => {
+    // Rows arrive in ascending order; the extra row means there are newer ones still.
+    const page = buildPage(rows(3, 4, 5), 2, { ts: 2000, id: 2, d: 'prev' }, r => r.id);
+    assert.deepEqual(page.items, [4, 3]);
+    assert.deepEqual(decodeCursor(page.next!), { ts: 3000, id: 3, d: 'next' });
+    assert.deepEqual(decodeCursor(page.prev!), { ts: 4000, id: 4, d: 'prev' });
+});
+
+test('an empty page has no links', () => {
+    assert.deepEqual(buildPage([], 2, { ts: 1000, id: 1, d: 'next' }, r => r), { items: [], next: null, prev: null });
+});
@@ -0,0 +1,129 @@
+import { test } from 'node:test';
+import assert from 'node:assert/strict';
+import { Writable } from 'stream';
+import { once } from 'events';
+import zlib from 'zlib';
+import { createCsvWriter, createXlsxWriter, Cell, RowWriter } from '../reportWriter.js';
+
+// Collects everything written; `delayMs` makes the sink slow so the writers hit backpressure.
+function sink(delayMs = 0) {
+    const chunks: Buffer[] = [];
+    const out = new Writable({
+        highWaterMark: 1024,
+        write(chunk: Buffer, _encoding, callback) {
+            chunks.push(chunk);
+            if (delayMs > 0) setTimeout(callback, delayMs);
+            else callback();
+        },
+    });
+    return { out, data: () => Buffer.concat(chunks) };
+}
+
+// Writes the rows and ends the output the way reportWorker.ts does.
+async function writeAll(out: Writable, writer: RowWriter, rows: Cell[][]) {
+    for (const row of rows) await writer.writeRow(row);
+    const bytes = await writer.finish();
+    out.end();
+    await once(out, 'finish');
+    return bytes;
+}
+
+interface ZipFile {
+    name: string;
+    flags: number;
+    data: Buffer;
+}
+
+// Reads a zip through its central directory and checks every entry's CRC and sizes.
+function readZip(zip: Buffer): ZipFile[] {
+    const end = zip.length - 22;
+    assert.equal(zip.readUInt32LE(end), 0x06054B50);
+    const count = zip.readUInt16LE(end + 10);
+    let p = zip.readUInt32LE(end + 16);
+    const files: ZipFile[] = [];
+    for (let i = 0; i < count; i++) {
+        assert.equal(zip.readUInt32LE(p), 0x02014B50);
+        const flags = zip.readUInt16LE(p + 8);
+        const crc = zip.readUInt32LE(p + 16);
+        const compressedSize = zip.readUInt32LE(p + 20);
+        const size = zip.readUInt32LE(p + 24);
+        const nameLength = zip.readUInt16LE(p + 28);
+        const offset = zip.readUInt32LE(p + 42);
+        const name = zip.toString('utf8', p + 46, p + 46 + nameLength);
+        p += 46 + nameLength;
+
+        assert.equal(zip.readUInt32LE(offset), 0x04034B50);
+        const dataStart = offset + 30 + zip.readUInt16LE(offset + 26) + zip.readUInt16LE(offset + 28);
+        const data = zlib.inflateRawSync(zip.subarray(dataStart, dataStart + compressedSize));
+        assert.equal(data.length, size, name);
+        assert.equal(zlib.crc32(data), crc, name);
+        if (flags & 0x0008) {
+            const descriptor = dataStart + compressedSize;
+            assert.equal(zip.readUInt32LE(descriptor), 0x08074B50);
+            assert.deepEqual([zip.readUInt32LE(descriptor + 4), zip.readUInt32LE(descriptor + 8), zip.readUInt32LE(descriptor + 12)], [crc, compressedSize, size]);
+        }
+        files.push({ name, flags, data });
+    }
+    return files;
+}
+
+test('CSV output is semicolon-separated with a BOM and quotes where needed', async () => {
+    const { out, data } = sink();
+    const bytes = await writeAll(out, createCsvWriter(out, ['Zaman', 'Değer']), [
+        ['2024-01-01 00:00', 1.5],
+        ['a;b', 'say "hi"'],
+        ['line\nbreak', null],
+    ]);
+    const text = data().toString('utf8');
+    assert.equal(text, '﻿Zaman;Değer\n2024-01-01 00:00;1.5\n"a;b";"say ""hi"""\n"line\nbreak";\n');
+    assert.equal(bytes, data().length);
+});
+
+test('XLSX output is a valid workbook with typed cells', async () => {
+    const { out, data } = sink();
+    const bytes = await writeAll(out, createXlsxWriter(out, 'Rapor: İstasyon/1', ['Zaman', 'Değer', 'Not']), [
+        ['2024-01-01 00:00', 21.5, '<5 & >2'],
+        ['2024-01-01 01:00', null, ''],
+    ]);
+    const zip = data();
+    assert.equal(bytes, zip.length);
+
+    const files = readZip(zip);
+    assert.deepEqual(files.map(f => f.name), [
+        'xl/worksheets/sheet1.xml',
+        '[Content_Types].xml',
+        '_rels/.rels',
+        'xl/workbook.xml',
+        'xl/_rels/workbook.xml.rels',
+    ]);
+    assert.ok(files.every(f => f.flags & 0x0800));
+
+    const sheet = files[0].data.toString('utf8');
+    assert.match(sheet, /<row r="1"><c r="A1" t="inlineStr"><is><t xml:space="preserve">Zaman<\/t><\/is><\/c>/);
+    assert.match(sheet, /<c r="B2"><v>21.5<\/v><\/c>/);
+    assert.match(sheet, /<c r="C2" t="inlineStr"><is><t xml:space="preserve">&lt;5 &amp; &gt;2<\/t><\/is><\/c>/);
+    // Empty cells are left out.
+    assert.match(sheet, /<row r="3"><c r="A3" t="inlineStr"><is><t xml:space="preserve">2024-01-01 01:00<\/t><\/is><\/c><\/row>/);
+    assert.ok(sheet.endsWith('</sheetData></worksheet>'));
+
+    // Characters Excel does not allow in sheet names are replaced.
+    assert.match(files[3].data.toString('utf8'), /<sheet name="Rapor  İstasyon 1" sheetId="1" r:id="rId1"\/>/);
+});
+
+test('XLSX output stays intact when the destination is slow', async () => {
+    const { out, data } = sink(1);
+    const rows: Cell[][] = Array.from({ length: 5000 }, (_, i) => [`satır ${i}`, i, Math.sin(i)]);
+    await writeAll(out, createXlsxWriter(out, 'Rapor', ['Ad', 'No', 'Değer']), rows);
+
+    const sheet = readZip(data())[0].data.toString('utf8');
+    assert.equal(sheet.match(/<row /g)?.length, 5001);
+    assert.match(sheet, /<row r="5001"><c r="A5001" t="inlineStr"><is><t xml:space="preserve">satır 4999<\/t><\/is><\/c><c r="B5001"><v>4999<\/v><\/c>/);
+});
+
+test('an XLSX report without rows still has its header sheet', async () => {
+    const { out, data } = sink();
+    await writeAll(out, createXlsxWriter(out, '', ['Zaman']), []);
+    const files = readZip(data());
+    assert.match(files[0].data.toString('utf8'), /<sheetData><row r="1">.*<\/row><\/sheetData>/);
+    assert.match(files[3].data.toString('utf8'), /<sheet name="Rapor"/);
+});
@@ -0,0 +1,94 @@
+import { test, after } from 'node:test';
+import assert from 'node:assert/strict';
+import fs from 'fs';
+import os from 'os';
+import path from 'path';
+import process from 'process';
+import type { Granularity } from '../rollups.js';
+
+// The database path is fixed when database.js is first imported, so point it at a temp dir first.
+const dataDir = fs.mkdtempSync(path.join(os.tmpdir(), 'orion-rollups-'));
+process.env.DATA_DIR = dataDir;
+const { openDb, withTransaction } = await import('../database.js');
+const { migrate } = await import('../migrations.js');
+const { bucketStart, DAY_OFFSET_MS, RollupBatch, ROLLUP_TABLES } = await import('../rollups.js');
+const { alignBucket } = await import('../aggregate.js');
+
+const db = await openDb();
+await migrate();
+await db.run("INSERT INTO stations (id, name) VALUES ('ST1', 'İstasyon')");
+await db.run("INSERT INTO sensors (id, name, station_id) VALUES ('S1', 'Sıcaklık', 'ST1')");
+
+after(async () => {
+    await db.close();
+    fs.rmSync(dataDir, { recursive: true, force: true });
+});
+
+const HOUR = 60 * 60 * 1000;
+const DAY = 24 * HOUR;
+
+// The S1 rollup row of the given granularity whose bucket holds `ts`.
+const rollupRow = (granularity: Granularity, ts: number, key = 'value') => db.get(
+    `SELECT count, min, max, sum, last, last_ts FROM ${ROLLUP_TABLES[granularity]} WHERE sensor_id = 'S1' AND key = ? AND bucket = ?`,
+    key, bucketStart(granularity, ts)
+);
+
+// Adds [ts, value] readings for S1 to a batch and applies it in its own transaction.
+const applyBatch = (readings: [number, unknown][]) => withTransaction(async () => {
+    const batch = new RollupBatch();
+    for (const [ts, value] of readings) batch.add('S1', ts, value);
+    await batch.apply();
+});
+
+test('day buckets start at Istanbul midnight', () => {
+    assert.equal(DAY_OFFSET_MS, 3 * HOUR);
+    // 23:59 local on 10 March is still 10 March, which started at 21:00 UTC on the 9th.
+    assert.equal(bucketStart('1d', Date.UTC(2024, 2, 10, 20, 59, 59, 999)), Date.UTC(2024, 2, 9, 21));
+    assert.equal(bucketStart('1d', Date.UTC(2024, 2, 10, 21)), Date.UTC(2024, 2, 10, 21));
+    assert.equal(bucketStart('1d', Date.UTC(2024, 2, 10, 0)), Date.UTC(2024, 2, 9, 21));
+    assert.equal(bucketStart('1h', Date.UTC(2024, 2, 10, 20, 59, 59)), Date.UTC(2024, 2, 10, 20));
+    assert.equal(bucketStart('1m', Date.UTC(2024, 2, 10, 20, 59, 59)), Date.UTC(2024, 2, 10, 20, 59));
+});
+
+test('alignBucket uses the same local-midnight grid', () => {
+    assert.equal(alignBucket(Date.UTC(2024, 2, 10, 20, 59), DAY), Date.UTC(2024, 2, 9, 21));
+    assert.equal(alignBucket(Date.UTC(2024, 2, 10, 21), DAY), Date.UTC(2024, 2, 10, 21));
+    // Six-hour buckets start at 00, 06, 12 and 18 local time.
+    assert.equal(alignBucket(Date.UTC(2024, 2, 10, 2, 59), 6 * HOUR), Date.UTC(2024, 2, 9, 21));
+    assert.equal(alignBucket(Date.UTC(2024, 2, 10, 3), 6 * HOUR), Date.UTC(2024, 2, 10, 3));
+    for (const granularity of ['1m', '1h', '1d'] as const) {
+        const size = { '1m': 60 * 1000, '1h': HOUR, '1d': DAY }[granularity];
+        const ts = Date.UTC(2024, 5, 1, 13, 37, 12, 345);
+        assert.equal(alignBucket(ts, size), bucketStart(granularity, ts));
+    }
+});
+
+test('a batch keeps the latest reading as last even when it arrives first', async () => {
+    const t = Date.UTC(2024, 2, 11, 10, 0, 30);
+    await applyBatch([[t + 20_000, 7], [t, 3], [t + 10_000, { value: 'x' }], [t + 10_000, 5]]);
+
+    assert.deepEqual({ ...await rollupRow('1m', t) }, { count: 3, min: 3, max: 7, sum: 15, last: 7, last_ts: t + 20_000 });
+});
+
+test('batches merge into existing rows and an older last does not win', async () => {
+    const t = Date.UTC(2024, 2, 12, 10, 0, 30);
+    await applyBatch([[t, 10], [t + 5_000, 20]]);
+    // Arrives later but was measured earlier than the stored last.
+    await applyBatch([[t - 10_000, 1], [t + 1_000, 30]]);
+
+    assert.deepEqual({ ...await rollupRow('1h', t) }, { count: 4, min: 1, max: 30, sum: 61, last: 20, last_ts: t + 5_000 });
+    assert.equal((await rollupRow('1d', t))!.count, 4);
+
+    // A reading with the same timestamp as the stored last replaces it.
+    await applyBatch([[t + 5_000, 25]]);
+    assert.deepEqual({ ...await rollupRow('1h', t) }, { count: 5, min: 1, max: 30, sum: 86, last: 25, last_ts: t + 5_000 });
+});
+
+test('object values roll up per numeric field and readings without a time are skipped', async () => {
+    const t = Date.UTC(2024, 2, 13, 10);
+    await applyBatch([[t, { temperature: 21.5, humidity: '40', label: 'ok' }], [0, { temperature: 99 }], [NaN, { temperature: 99 }]]);
+
+    assert.deepEqual({ ...await rollupRow('1m', t, 'temperature') }, { count: 1, min: 21.5, max: 21.5, sum: 21.5, last: 21.5, last_ts: t });
+    assert.equal((await rollupRow('1m', t, 'humidity'))!.sum, 40);
+    assert.equal(await rollupRow('1m', t, 'label'), undefined);
+});
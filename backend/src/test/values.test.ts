@@ -0,0 +1,32 @@
+import { test } from 'node:test';
+import assert from 'node:assert/strict';
+import { numericFields, numericValue } from '../values.js';
+
+test('numericFields reads plain numbers and numeric object fields', () => {
+    assert.deepEqual(numericFields(21.5), [['value', 21.5]]);
+    assert.deepEqual(numericFields({ temperature: 21.5, humidity: 40, status: 'ok' }), [['temperature', 21.5], ['humidity', 40]]);
+    assert.deepEqual(numericFields(NaN), []);
+    assert.deepEqual(numericFields(null), []);
+    assert.deepEqual(numericFields([1, 2]), []);
+    assert.deepEqual(numericFields({ ok: true }), []);
+});
+
+test('numericFields accepts numbers sent as strings', () => {
+    assert.deepEqual(numericFields('23.4'), [['value', 23.4]]);
+    assert.deepEqual(numericFields(' -1e3 '), [['value', -1000]]);
+    assert.deepEqual(numericFields({ temperature: '23.4', humidity: 40 }), [['temperature', 23.4], ['humidity', 40]]);
+});
+
+test('numericFields ignores strings that are not plain numbers', () => {
+    for (const text of ['', 'abc', '23.4 °C', '0x10', 'Infinity', '1,5', '+5', '.5']) {
+        assert.deepEqual(numericFields(text), [], text);
+        assert.deepEqual(numericFields({ value: text }), [], text);
+    }
+});
+
+test('numericValue picks the field for the sensor type', () => {
+    assert.equal(numericValue({ humidity: '55', temperature: '21' }, 'Sıcaklık'), 21);
+    assert.equal(numericValue({ humidity: 55, temperature: 21 }, 'Nem'), 55);
+    assert.equal(numericValue({ reading: 3 }, 'Bilinmeyen'), 3);
+    assert.equal(numericValue('kapalı', 'Mesafe'), null);
+});
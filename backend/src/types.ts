@@ -119,4 +119,19 @@ export interface ReportSchedule {
     reportConfig: ReportConfig;
     isEnabled: boolean;
     lastRun?: string;
-}
\ No newline at end of file
+}
+
+// A report render handed to the report worker (reportWorker.ts).
+export interface ReportJob {
+    config: ReportConfig;
+    start: number; // epoch ms, inclusive
+    end: number;   // epoch ms, inclusive
+    format: 'XLSX' | 'CSV';
+    outputPath: string;
+    tsSql: string; // SQL for a reading's epoch-ms time, from epochTsSql() in migrations.ts
+}
+
+export interface ReportJobResult {
+    rows: number;
+    bytes: number;
+}
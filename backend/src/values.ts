@@ -0,0 +1,53 @@
+// Helpers for pulling numbers out of stored reading values. A value is either a plain
+// number or an object with one or more numeric fields (e.g. { temperature, humidity }).
+
+// Which field of an object value holds the measurement, by sensor type. Mirrors
+// getNumericValue in the frontend (utils/helpers.ts).
+const VALUE_KEY_PRIORITY: Record<string, string[]> = {
+    'Sıcaklık': ['temperature', 'temp', 'sicaklik_c'],
+    'Nem': ['humidity', 'hum', 'nem_yuzde'],
+    'Mesafe': ['distance_cm', 'dist'],
+    'Kar Yüksekliği': ['snow_depth_cm', 'depth'],
+    'Ağırlık': ['weight_kg', 'weight'],
+    'Rüzgar Hızı': ['speed', 'wind_speed'],
+    'Rüzgar Yönü': ['direction', 'deg'],
+    'Basınç': ['pressure', 'pres'],
+};
+
+// Some agents send numbers as strings ("23.4"). Only plain decimal numbers are accepted, the
+// same strings SQLite's JSON functions read as numbers (see fromReadings in aggregate.ts).
+const NUMERIC_STRING = /^\s*-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?\s*$/;
+
+function toNumber(value: unknown): number | null {
+    const n = typeof value === 'number' ? value : typeof value === 'string' && NUMERIC_STRING.test(value) ? Number(value) : NaN;
+    return Number.isFinite(n) ? n : null;
+}
+
+// Returns the numeric fields of a reading value as [key, number] pairs. A plain number
+// is reported under the key 'value'.
+export function numericFields(value: any): [string, number][] {
+    const plain = toNumber(value);
+    if (plain !== null) return [['value', plain]];
+    if (!value || typeof value !== 'object' || Array.isArray(value)) return [];
+    const fields: [string, number][] = [];
+    for (const [key, field] of Object.entries(value)) {
+        const n = toNumber(field);
+        if (n !== null) fields.push([key, n]);
+    }
+    return fields;
+}
+
+export function pickValueKey(sensorType: string, keys: string[]): string | null {
+    for (const key of VALUE_KEY_PRIORITY[sensorType] || []) {
+        if (keys.includes(key)) return key;
+    }
+    if (keys.includes('value')) return 'value';
+    return keys[0] ?? null;
+}
+
+// The measurement of a reading value as a number, or null if it has none.
+export function numericValue(value: any, sensorType: string): number | null {
+    const fields = numericFields(value);
+    const key = pickValueKey(sensorType, fields.map(([k]) => k));
+    return key === null ? null : fields.find(([k]) => k === key)![1];
+}
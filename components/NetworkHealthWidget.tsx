@@ -1,10 +1,15 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import Card from './common/Card.tsx';
 import { getNetworkStats } from '../services/apiService.ts';
 import { NetworkStats } from '../types.ts';
 import { CheckCircleIcon, ExclamationCircleIcon, RefreshIcon } from './icons/Icons.tsx';
 import Skeleton from './common/Skeleton.tsx';
 import { formatTimeAgo } from '../utils/helpers.ts';
+import { useLiveEvents } from '../services/liveEvents.ts';
+
+// The counters are recomputed by the server; while readings stream in they are refetched at
+// most this often, and not at all while nothing happens.
+const STATS_REFRESH_MS = 30000;
 
 // Fallback Server Icon since it might be missing in Icons.tsx
 const ServerIconFallback = (props: any) => (
@@ -31,12 +36,37 @@ const NetworkHealthWidget: React.FC = () => {
         }
     };
 
+    const lastFetchRef = useRef(0);
+    const refreshTimerRef = useRef<number | null>(null);
+
+    const scheduleRefresh = () => {
+        if (refreshTimerRef.current !== null) return;
+        const delay = Math.max(0, lastFetchRef.current + STATS_REFRESH_MS - Date.now());
+        refreshTimerRef.current = window.setTimeout(() => {
+            refreshTimerRef.current = null;
+            lastFetchRef.current = Date.now();
+            fetchStats();
+        }, delay);
+    };
+
     useEffect(() => {
+        lastFetchRef.current = Date.now();
         fetchStats();
-        const interval = setInterval(fetchStats, 30000); // Refresh every 30s
-        return () => clearInterval(interval);
+        return () => {
+            if (refreshTimerRef.current !== null) window.clearTimeout(refreshTimerRef.current);
+        };
     }, []);
 
+    useLiveEvents({
+        'reading': ({ timestamp }) => {
+            setStats(prev => prev && (!prev.lastPacketTime || prev.lastPacketTime < timestamp) ? { ...prev, lastPacketTime: timestamp } : prev);
+            scheduleRefresh();
+        },
+        'agent-status': scheduleRefresh,
+        'config-changed': scheduleRefresh,
+        'resync': scheduleRefresh,
+    });
+
     if (loading && !stats) return <Card><Skeleton className="h-32 w-full" /></Card>;
     if (error) return <Card><div className="text-danger text-center p-4">{error}</div></Card>;
     if (!stats) return null;
@@ -1,10 +1,11 @@
 
 import React, { useMemo, useState, useEffect } from 'react';
-import { Sensor } from '../types.ts';
+import { Sensor, CursorPage } from '../types.ts';
 import { ThermometerIcon, DropletIcon, WindSockIcon, GaugeIcon, SensorIcon as GenericSensorIcon, XIcon, ExclamationCircleIcon } from './icons/Icons.tsx';
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer, Scatter } from 'recharts';
 import { useTheme } from './ThemeContext.tsx';
-import { getRawReadingsHistory, getReadingsHistory } from '../services/apiService.ts';
+import { getRawReadingsHistory, getReadingsHistory, getReadingsHistoryPage, getRawReadingsHistoryPage } from '../services/apiService.ts';
+import CursorPagination from './common/CursorPagination.tsx';
 import { getNumericValue, toDateTimeLocal } from '../utils/helpers.ts';
 
 
@@ -50,12 +51,19 @@ const formatDisplayValue = (reading: SensorReading): string => {
     return 'N/A';
 };
 
+const CHART_MAX_POINTS = 500;
+const TABLE_PAGE_SIZE = 50;
+
 
 const SensorDetailModal: React.FC<SensorDetailModalProps> = ({ isOpen, onClose, sensor }) => {
     const { theme } = useTheme();
     const tickColor = theme === 'dark' ? '#9CA3AF' : '#6B7281';
     const [rawReadings, setRawReadings] = useState<RawSensorReading[]>([]);
-    const [processedReadings, setProcessedReadings] = useState<SensorReading[]>([]);
+    const [chartReadings, setChartReadings] = useState<SensorReading[]>([]);
+    const [processedPage, setProcessedPage] = useState<CursorPage<SensorReading>>({ items: [], next: null, prev: null });
+    const [rawPage, setRawPage] = useState<CursorPage<RawSensorReading>>({ items: [], next: null, prev: null });
+    const [processedCursor, setProcessedCursor] = useState<string | null>(null);
+    const [rawCursor, setRawCursor] = useState<string | null>(null);
     const [activeTab, setActiveTab] = useState<'processed' | 'raw'>('processed');
     const [dateFilter, setDateFilter] = useState<{ start: string, end: string }>({ start: '', end: '' });
     
@@ -63,7 +71,9 @@ const SensorDetailModal: React.FC<SensorDetailModalProps> = ({ isOpen, onClose,
         let isMounted = true;
         if (isOpen && sensor) {
             setRawReadings([]);
-            setProcessedReadings([]);
+            setChartReadings([]);
+            setProcessedPage({ items: [], next: null, prev: null });
+            setRawPage({ items: [], next: null, prev: null });
             setActiveTab('processed');
             
             const now = new Date();
@@ -81,25 +91,29 @@ const SensorDetailModal: React.FC<SensorDetailModalProps> = ({ isOpen, onClose,
         };
     }, [isOpen, sensor]);
     
-    // Refetch both processed and raw data when date filter changes
+    // Refetch chart data when date filter changes; the tables start again from the newest page
     useEffect(() => {
         let isMounted = true;
+        setProcessedCursor(null);
+        setRawCursor(null);
         if (isOpen && sensor && dateFilter.start && dateFilter.end) {
              const fetchAllData = async () => {
                  try {
-                     const [rawHistory, processedHistory] = await Promise.all([
+                     const [rawHistory, chartHistory] = await Promise.all([
                         getRawReadingsHistory(sensor.id, dateFilter.start, dateFilter.end),
+                        // The chart covers the whole range, downsampled on the server.
                         getReadingsHistory({
-                             stationIds: [sensor.stationId],
-                             sensorTypes: [sensor.type],
-                             start: dateFilter.start,
-                             end: dateFilter.end
-                        })
+                            stationIds: [sensor.stationId],
+                            sensorTypes: [sensor.type],
+                            start: dateFilter.start,
+                            end: dateFilter.end,
+                            maxPoints: CHART_MAX_POINTS,
+                        }),
                      ]);
 
                      if (isMounted) {
                          setRawReadings(rawHistory);
-                         setProcessedReadings(processedHistory.filter(r => r.sensorId === sensor.id));
+                         setChartReadings(chartHistory.filter(r => r.sensorId === sensor.id));
                      }
                  } catch (err) {
                       if (isMounted) {
@@ -112,20 +126,51 @@ const SensorDetailModal: React.FC<SensorDetailModalProps> = ({ isOpen, onClose,
          return () => { isMounted = false; };
     }, [dateFilter, isOpen, sensor]);
 
+    // Processed readings table, one keyset page at a time
+    useEffect(() => {
+        let isMounted = true;
+        if (isOpen && sensor && dateFilter.start && dateFilter.end) {
+            getReadingsHistoryPage({
+                stationIds: [sensor.stationId],
+                sensorTypes: [sensor.type],
+                sensorIds: [sensor.id],
+                start: dateFilter.start,
+                end: dateFilter.end,
+                limit: TABLE_PAGE_SIZE,
+                cursor: processedCursor,
+            })
+                .then(page => { if (isMounted) setProcessedPage(page); })
+                .catch(err => console.error("Could not fetch processed readings page:", err));
+        }
+        return () => { isMounted = false; };
+    }, [dateFilter, isOpen, sensor, processedCursor]);
+
+    // Raw readings table, one keyset page at a time
+    useEffect(() => {
+        let isMounted = true;
+        if (isOpen && sensor && dateFilter.start && dateFilter.end) {
+            getRawReadingsHistoryPage({
+                sensorId: sensor.id,
+                start: dateFilter.start,
+                end: dateFilter.end,
+                limit: TABLE_PAGE_SIZE,
+                cursor: rawCursor,
+            })
+                .then(page => { if (isMounted) setRawPage(page); })
+                .catch(err => console.error("Could not fetch raw readings page:", err));
+        }
+        return () => { isMounted = false; };
+    }, [dateFilter, isOpen, sensor, rawCursor]);
+
 
     if (!isOpen || !sensor) return null;
 
-    const latestReadings = useMemo(() => {
-        return [...processedReadings]
-            .sort((a, b) => new Date(b.timestamp).getTime() - new Date(a.timestamp).getTime());
-    }, [processedReadings]);
-    
     const chartData = useMemo(() => {
         const dataMap = new Map<number, any>();
         // Saniye hassasiyetinde yuvarlama
         const roundToNearestSecond = (iso: string) => Math.round(new Date(iso).getTime() / 1000);
     
-        processedReadings.forEach(r => {
+        chartReadings.forEach(r => {
             const key = roundToNearestSecond(r.timestamp);
             const entry = dataMap.get(key) || { timestamp: r.timestamp };
             entry['İşlenmiş Değer'] = getNumericValue(r.value, r.sensorType, r.interface);
@@ -144,14 +189,14 @@ const SensorDetailModal: React.FC<SensorDetailModalProps> = ({ isOpen, onClose,
         return Array.from(dataMap.values())
             .filter(item => item['İşlenmiş Değer'] !== undefined || item['Ham Değer'] !== undefined)
             .sort((a, b) => new Date(a.timestamp).getTime() - new Date(b.timestamp).getTime())
-            .slice(-500) // Increase data points for better graph detail
             .map(item => ({
                 ...item,
                 name: new Date(item.timestamp).toLocaleString('tr-TR', { day: 'numeric', month: 'short', hour: '2-digit', minute: '2-digit' })
             }));
-    }, [processedReadings, rawReadings, sensor.type, sensor.interface]);
+    }, [chartReadings, rawReadings, sensor.type, sensor.interface]);
 
-    const latestValue = latestReadings.length > 0 ? formatDisplayValue(latestReadings[0]) : 'N/A';
+    // Chart readings come newest first, and downsampling always keeps the newest point.
+    const latestValue = chartReadings.length > 0 ? formatDisplayValue(chartReadings[0]) : 'N/A';
     
     // Custom dot for line chart to show anomalies
     const CustomDot = (props: any) => {
@@ -284,7 +329,7 @@ const SensorDetailModal: React.FC<SensorDetailModalProps> = ({ isOpen, onClose,
                         <div className="border border-gray-200 dark:border-gray-700 rounded-lg overflow-y-auto bg-primary dark:bg-dark-primary flex-1">
                             {activeTab === 'processed' && (
                                 <>
-                                    {latestReadings.length > 0 ? (
+                                    {processedPage.items.length > 0 ? (
                                         <table className="w-full text-sm text-left text-gray-600 dark:text-gray-300">
                                             <thead className="text-xs text-gray-700 dark:text-gray-400 uppercase bg-gray-100 dark:bg-gray-700 sticky top-0">
                                                 <tr>
@@ -293,7 +338,7 @@ const SensorDetailModal: React.FC<SensorDetailModalProps> = ({ isOpen, onClose,
                                                 </tr>
                                             </thead>
                                             <tbody>
-                                                {latestReadings.map(reading => (
+                                                {processedPage.items.map(reading => (
                                                     <tr key={reading.id} className={`border-b border-gray-200 dark:border-gray-700 last:border-b-0 hover:bg-gray-50 dark:hover:bg-gray-900/50 ${reading.isAnomaly ? 'bg-red-50 dark:bg-red-900/20' : ''}`}>
                                                         <td className="px-6 py-3 font-mono text-gray-800 dark:text-gray-200 flex items-center gap-2">
                                                             {reading.isAnomaly && (
@@ -320,7 +365,7 @@ const SensorDetailModal: React.FC<SensorDetailModalProps> = ({ isOpen, onClose,
                             )}
                             {activeTab === 'raw' && (
                                  <>
-                                    {rawReadings.length > 0 ? (
+                                    {rawPage.items.length > 0 ? (
                                         <table className="w-full text-sm text-left text-gray-600 dark:text-gray-300">
                                             <thead className="text-xs text-gray-700 dark:text-gray-400 uppercase bg-gray-100 dark:bg-gray-700 sticky top-0">
                                                 <tr>
@@ -329,7 +374,7 @@ const SensorDetailModal: React.FC<SensorDetailModalProps> = ({ isOpen, onClose,
                                                 </tr>
                                             </thead>
                                             <tbody>
-                                                {rawReadings.map(reading => (
+                                                {rawPage.items.map(reading => (
                                                     <tr key={reading.id} className="border-b border-gray-200 dark:border-gray-700 last:border-b-0 hover:bg-gray-50 dark:hover:bg-gray-900/50">
                                                         <td className="px-6 py-3 font-mono text-gray-800 dark:text-gray-200">{new Date(reading.timestamp).toLocaleString('tr-TR')}</td>
                                                         <td className="px-6 py-3 text-right font-semibold text-gray-900 dark:text-gray-100">{`${getNumericValue(reading.raw_value, sensor.type, sensor.interface)?.toFixed(2) ?? 'N/A'} ${sensor.unit || ''}`}</td>
@@ -345,6 +390,21 @@ const SensorDetailModal: React.FC<SensorDetailModalProps> = ({ isOpen, onClose,
                                 </>
                             )}
                         </div>
+                        {activeTab === 'processed' ? (
+                            <CursorPagination
+                                hasPrevious={processedPage.prev !== null}
+                                hasNext={processedPage.next !== null}
+                                onPrevious={() => setProcessedCursor(processedPage.prev)}
+                                onNext={() => setProcessedCursor(processedPage.next)}
+                            />
+                        ) : (
+                            <CursorPagination
+                                hasPrevious={rawPage.prev !== null}
+                                hasNext={rawPage.next !== null}
+                                onPrevious={() => setRawCursor(rawPage.prev)}
+                                onNext={() => setRawCursor(rawPage.next)}
+                            />
+                        )}
                     </div>
                 </main>
             </div>
@@ -4,7 +4,7 @@
 import React, { useMemo } from 'react';
 import { ResponsiveContainer, RadarChart, PolarGrid, PolarAngleAxis, PolarRadiusAxis, Radar, Legend, Tooltip } from 'recharts';
 import { useTheme } from './ThemeContext.tsx';
-import { getNumericValue } from '../utils/helpers.ts';
+import { AggregateSeries } from '../types.ts';
 
 const DIRECTIONS = ['N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE', 'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW'];
 const SPEED_BINS = [
@@ -14,45 +14,37 @@ const SPEED_BINS = [
   { range: [30, Infinity], label: '>30 km/h', color: '#059669' },
 ];
 
-const processWindData = (historyData: any[]) => {
-    const speedData = historyData.filter(d => d.sensorType === 'Rüzgar Hızı');
-    const directionData = historyData.filter(d => d.sensorType === 'Rüzgar Yönü');
+// Pairs wind speed and direction buckets of the same station. Speed uses the bucket
+// average; direction uses the last reading, because averaging angles is meaningless
+// (350° and 10° would average to 180°).
+const processWindData = (series: AggregateSeries[]) => {
+    const speedSeries = series.filter(s => s.sensorType === 'Rüzgar Hızı');
+    const directionSeries = series.filter(s => s.sensorType === 'Rüzgar Yönü');
     
-    if (speedData.length === 0 || directionData.length === 0) return [];
+    if (speedSeries.length === 0 || directionSeries.length === 0) return [];
 
-    const speedMap = new Map(speedData.map(d => [new Date(d.timestamp).getTime(), getNumericValue(d.value, d.sensorType, d.interface)]));
+    const speedMap = new Map<string, number>();
+    speedSeries.forEach(s => s.points.forEach(p => {
+        if (p.avg !== undefined) speedMap.set(`${s.stationId}|${p.timestamp}`, p.avg);
+    }));
 
     const directionBins = Array.from({ length: 16 }, () => 
         Array.from({ length: SPEED_BINS.length }, () => 0)
     );
     let totalReadings = 0;
 
-    directionData.forEach(dirReading => {
-        const timestamp = new Date(dirReading.timestamp).getTime();
-        
-        // Find closest speed reading in time
-        let closestSpeed: number | null = null;
-        let minTimeDiff = Infinity;
-
-        speedMap.forEach((speed, speedTs) => {
-            const timeDiff = Math.abs(timestamp - speedTs);
-            if (timeDiff < minTimeDiff && timeDiff < 60000 * 5) { // 5 minute tolerance
-                minTimeDiff = timeDiff;
-                closestSpeed = speed;
-            }
-        });
-        
-        const direction = getNumericValue(dirReading.value, dirReading.sensorType, dirReading.interface);
+    directionSeries.forEach(s => s.points.forEach(p => {
+        const speed = speedMap.get(`${s.stationId}|${p.timestamp}`);
+        const direction = p.last;
+        if (speed === undefined || direction === undefined) return;
 
-        if (closestSpeed === null || direction === null) return;
-        
         totalReadings++;
         const dirIndex = Math.floor(((direction + 11.25) % 360) / 22.5);
-        const speedIndex = SPEED_BINS.findIndex(bin => closestSpeed! >= bin.range[0] && closestSpeed! < bin.range[1]);
+        const speedIndex = SPEED_BINS.findIndex(bin => speed >= bin.range[0] && speed < bin.range[1]);
         if (dirIndex >= 0 && dirIndex < 16 && speedIndex !== -1) {
             directionBins[dirIndex][speedIndex]++;
         }
-    });
+    }));
     
     if(totalReadings === 0) return [];
 
@@ -72,14 +64,14 @@ const processWindData = (historyData: any[]) => {
 };
 
 interface WindRoseChartProps {
-    historyData: any[];
+    series: AggregateSeries[];
 }
 
-const WindRoseChart: React.FC<WindRoseChartProps> = ({ historyData }) => {
+const WindRoseChart: React.FC<WindRoseChartProps> = ({ series }) => {
   const { theme } = useTheme();
   const tickColor = theme === 'dark' ? '#9CA3AF' : '#6B7281';
   
-  const chartData = useMemo(() => processWindData(historyData), [historyData]);
+  const chartData = useMemo(() => processWindData(series), [series]);
 
   if (chartData.length === 0) {
       return (
@@ -0,0 +1,39 @@
+import React from 'react';
+
+interface CursorPaginationProps {
+  hasPrevious: boolean;
+  hasNext: boolean;
+  onPrevious: () => void;
+  onNext: () => void;
+  isLoading?: boolean;
+}
+
+// Previous/next navigation for cursor-paginated lists, where the total page count is unknown.
+const CursorPagination: React.FC<CursorPaginationProps> = ({ hasPrevious, hasNext, onPrevious, onNext, isLoading = false }) => {
+  if (!hasPrevious && !hasNext) {
+    return null;
+  }
+
+  return (
+    <nav className="flex items-center justify-between border-t border-gray-200 px-4 py-3 sm:px-6 mt-4" aria-label="Pagination">
+      <div className="flex-1 flex justify-between sm:justify-end">
+        <button
+          onClick={onPrevious}
+          disabled={!hasPrevious || isLoading}
+          className="relative inline-flex items-center rounded-md border border-gray-300 bg-primary px-4 py-2 text-sm font-medium text-gray-700 hover:bg-gray-50 disabled:opacity-50 disabled:cursor-not-allowed"
+        >
+          Önceki
+        </button>
+        <button
+          onClick={onNext}
+          disabled={!hasNext || isLoading}
+          className="relative ml-3 inline-flex items-center rounded-md border border-gray-300 bg-primary px-4 py-2 text-sm font-medium text-gray-700 hover:bg-gray-50 disabled:opacity-50 disabled:cursor-not-allowed"
+        >
+          Sonraki
+        </button>
+      </div>
+    </nav>
+  );
+};
+
+export default CursorPagination;
@@ -1,7 +1,7 @@
 
 import React, { useState, useMemo, useEffect, useCallback } from 'react';
-import { Station, Sensor, Camera } from '../types.ts';
-import { getReadingsHistory, analyzeSnowDepth, analyzeSnowDepthFromImage, submitManualReading } from '../services/apiService.ts';
+import { Station, Sensor, Camera, AggregateSeries } from '../types.ts';
+import { getReadingsHistory, getReadingsExportUrl, getAggregatedReadings, analyzeSnowDepth, analyzeSnowDepthFromImage, submitManualReading } from '../services/apiService.ts';
 import { sendMessageToGemini } from '../services/geminiService.ts';
 import Card from '../components/common/Card.tsx';
 import Skeleton from '../components/common/Skeleton.tsx';
@@ -10,7 +10,6 @@ import { SnowRulerDayIcon, SnowRulerNightIcon } from '../components/icons/RulerI
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer } from 'recharts';
 import { useTheme } from '../components/ThemeContext.tsx';
 import MultiSelectDropdown from '../components/common/MultiSelectDropdown.tsx';
-import * as XLSX from 'xlsx';
 import { getNumericValue, formatTimeAgo } from '../utils/helpers.ts';
 
 const blobToBase64 = (blob: Blob): Promise<string> => {
@@ -424,7 +423,7 @@ const CorrelationGraph: React.FC<{ stations: Station[], sensors: Sensor[] }> = (
     
     const [selectedStations, setSelectedStations] = useState<string[]>([]);
     const [selectedSensorTypes, setSelectedSensorTypes] = useState<string[]>([]);
-    const [history, setHistory] = useState<any[]>([]);
+    const [series, setSeries] = useState<AggregateSeries[]>([]);
     const [isLoading, setIsLoading] = useState(false);
     
     useEffect(() => {
@@ -437,42 +436,51 @@ const CorrelationGraph: React.FC<{ stations: Station[], sensors: Sensor[] }> = (
     }, [stations, allSensorTypes, selectedStations, selectedSensorTypes]);
 
     const handleFetchHistory = useCallback(async () => {
-        if (selectedStations.length === 0 || selectedSensorTypes.length === 0) {
-            setHistory([]);
+        const sensorIds = sensors
+            .filter(s => selectedStations.includes(s.stationId) && selectedSensorTypes.includes(s.type))
+            .map(s => s.id);
+        if (sensorIds.length === 0) {
+            setSeries([]);
             return;
         }
         setIsLoading(true);
         try {
-            const data = await getReadingsHistory({ stationIds: selectedStations, sensorTypes: selectedSensorTypes });
-            setHistory(data);
+            // Hourly averages over the last 7 days.
+            const end = new Date();
+            const start = new Date(end.getTime() - 7 * 24 * 60 * 60 * 1000);
+            const data = await getAggregatedReadings({ sensorIds, bucket: '1h', fn: ['avg'], start: start.toISOString(), end: end.toISOString() });
+            setSeries(data.series);
         } catch (error) {
             console.error(error);
         } finally {
             setIsLoading(false);
         }
-    }, [selectedStations, selectedSensorTypes]);
+    }, [sensors, selectedStations, selectedSensorTypes]);
     
     const stationOptions = useMemo(() => stations.map(s => ({ value: s.id, label: s.name })), [stations]);
     const sensorTypeOptions = useMemo(() => allSensorTypes.map(t => ({ value: t, label: t })), [allSensorTypes]);
 
+    // One line per sensor type; several stations of the same type are averaged per hour.
     const chartData = useMemo(() => {
-        const timeMap = new Map<string, any>();
-        history.forEach(reading => {
-            const timestamp = new Date(reading.timestamp).toLocaleString('tr-TR', { day: 'numeric', month: 'short', hour: '2-digit', minute: '2-digit' });
-            if (!timeMap.has(timestamp)) {
-                timeMap.set(timestamp, { name: timestamp });
-            }
-            const entry = timeMap.get(timestamp);
-            
-            const numericValue = getNumericValue(reading.value, reading.sensorType, reading.interface);
-            if (numericValue !== null) {
-                entry[reading.sensorType] = Number(numericValue.toFixed(2));
-            } else {
-                entry[reading.sensorType] = null;
+        const timeMap = new Map<number, { time: number, name: string, sums: Record<string, [number, number]> }>();
+        series.forEach(s => s.points.forEach(p => {
+            if (p.avg === undefined) return;
+            const time = new Date(p.timestamp).getTime();
+            if (!timeMap.has(time)) {
+                timeMap.set(time, { time, name: new Date(time).toLocaleString('tr-TR', { day: 'numeric', month: 'short', hour: '2-digit', minute: '2-digit' }), sums: {} });
             }
-        });
-        return Array.from(timeMap.values()).reverse();
-    }, [history]);
+            const sums = timeMap.get(time)!.sums;
+            const [sum, count] = sums[s.sensorType] || [0, 0];
+            sums[s.sensorType] = [sum + p.avg, count + 1];
+        }));
+        return [...timeMap.values()]
+            .sort((a, b) => a.time - b.time)
+            .map(({ name, sums }) => {
+                const entry: Record<string, any> = { name };
+                Object.entries(sums).forEach(([type, [sum, count]]) => { entry[type] = Number((sum / count).toFixed(2)); });
+                return entry;
+            });
+    }, [series]);
 
     const chartColors = ['#F97316', '#22C55E', '#3B82F6', '#8B5CF6', '#EC4899'];
     
@@ -504,6 +512,8 @@ const CorrelationGraph: React.FC<{ stations: Station[], sensors: Sensor[] }> = (
     );
 };
 
+const TIME_RANGE_DAYS: Record<string, number> = { last24h: 1, last7d: 7, last30d: 30, last90d: 90, last365d: 365 };
+
 const DataExplorer: React.FC<{ stations: Station[], sensors: Sensor[] }> = ({ stations, sensors }) => {
     const [selectedStations, setSelectedStations] = useState<string[]>([]);
     const [selectedSensorTypes, setSelectedSensorTypes] = useState<string[]>([]);
@@ -520,6 +530,8 @@ const DataExplorer: React.FC<{ stations: Station[], sensors: Sensor[] }> = ({ st
         if(allSensorTypes.length > 0 && selectedSensorTypes.length === 0) setSelectedSensorTypes(allSensorTypes);
     }, [stations, allSensorTypes, selectedStations, selectedSensorTypes]);
     
+    const rangeStart = () => new Date(Date.now() - TIME_RANGE_DAYS[timeRange] * 24 * 60 * 60 * 1000).toISOString();
+
     const handleFetchData = useCallback(async () => {
         if (selectedStations.length === 0 || selectedSensorTypes.length === 0) {
             setReadings([]);
@@ -527,14 +539,14 @@ const DataExplorer: React.FC<{ stations: Station[], sensors: Sensor[] }> = ({ st
         }
         setIsLoading(true);
         try {
-            const data = await getReadingsHistory({ stationIds: selectedStations, sensorTypes: selectedSensorTypes });
+            const data = await getReadingsHistory({ stationIds: selectedStations, sensorTypes: selectedSensorTypes, start: rangeStart() });
             setReadings(data);
         } catch (error) {
             console.error(error);
         } finally {
             setIsLoading(false);
         }
-    }, [selectedStations, selectedSensorTypes]);
+    }, [selectedStations, selectedSensorTypes, timeRange]);
 
     const formatReadingValue = (reading: any): string => {
         const numValue = getNumericValue(reading.value, reading.sensorType, reading.interface);
@@ -544,27 +556,23 @@ const DataExplorer: React.FC<{ stations: Station[], sensors: Sensor[] }> = ({ st
         return 'N/A';
     };
 
+    // The table shows the latest rows only; the export streams the whole range from the server.
     const handleExport = () => {
-        if (readings.length === 0) {
+        if (selectedStations.length === 0 || selectedSensorTypes.length === 0) {
             alert("Dışa aktarılacak veri bulunmuyor.");
             return;
         }
-        const dataToExport = readings.map(reading => {
-            const station = stations.find(s => s.id === reading.stationId);
-            return {
-                'Zaman Damgası': new Date(reading.timestamp).toLocaleString('tr-TR'),
-                'İstasyon': station?.name || 'Bilinmiyor',
-                'Sensör Adı': reading.sensorName,
-                'Sensör Tipi': reading.sensorType,
-                'Değer': formatReadingValue(reading),
-                'Birim': reading.unit || ''
-            };
+        const link = document.createElement('a');
+        link.href = getReadingsExportUrl({
+            stationIds: selectedStations,
+            sensorTypes: selectedSensorTypes,
+            start: rangeStart(),
+            format: 'csv',
         });
-
-        const ws = XLSX.utils.json_to_sheet(dataToExport);
-        const wb = XLSX.utils.book_new();
-        XLSX.utils.book_append_sheet(wb, ws, "Veri Geçmişi");
-        XLSX.writeFile(wb, `orion_veri_gezgini_${new Date().toISOString().split('T')[0]}.xlsx`);
+        link.style.visibility = 'hidden';
+        document.body.appendChild(link);
+        link.click();
+        document.body.removeChild(link);
     };
 
 
@@ -578,15 +586,17 @@ const DataExplorer: React.FC<{ stations: Station[], sensors: Sensor[] }> = ({ st
                     <option value="last24h">Son 24 Saat</option>
                     <option value="last7d">Son 7 Gün</option>
                     <option value="last30d">Son 30 Gün</option>
+                    <option value="last90d">Son 90 Gün</option>
+                    <option value="last365d">Son 1 Yıl</option>
                 </select>
             </div>
              <div className="flex flex-col sm:flex-row justify-end gap-2 mb-4">
                 <button onClick={handleFetchData} disabled={isLoading} className="btn-primary w-full sm:w-auto">
                     {isLoading ? 'Veriler Getiriliyor...' : 'Verileri Getir'}
                 </button>
-                 <button onClick={handleExport} title="Verileri Excel olarak indir" className="p-2.5 bg-green-600 text-white rounded-md hover:bg-green-700 disabled:bg-gray-400 w-full sm:w-auto flex items-center justify-center gap-2">
+                 <button onClick={handleExport} title="Verileri CSV olarak indir" className="p-2.5 bg-green-600 text-white rounded-md hover:bg-green-700 disabled:bg-gray-400 w-full sm:w-auto flex items-center justify-center gap-2">
                     <DownloadIcon className="w-5 h-5"/>
-                    <span className="sm:hidden">Excel'e Aktar</span>
+                    <span className="sm:hidden">CSV Olarak İndir</span>
                 </button>
             </div>
              <div className="overflow-x-auto border border-gray-200 dark:border-gray-700 rounded-lg max-h-96">
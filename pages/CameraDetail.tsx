@@ -2,6 +2,7 @@
 import React, { useMemo, useState, useEffect, useRef } from 'react';
 import { Camera, CameraStatus, Station } from '../types.ts';
 import { getCameras, getStations, captureCameraImage } from '../services/apiService.ts';
+import { useLiveEvents } from '../services/liveEvents.ts';
 import Card from '../components/common/Card.tsx';
 import Skeleton from '../components/common/Skeleton.tsx';
 import { ArrowLeftIcon, CameraIcon as VideoIcon, PlayIcon, FullscreenIcon, PhotographIcon, ExclamationIcon, DownloadIcon, CalendarIcon } from '../components/icons/Icons.tsx';
@@ -19,16 +20,14 @@ const CameraDetail: React.FC<CameraDetailProps> = ({ cameraId, onBack }) => {
   const [isCapturing, setIsCapturing] = useState(false);
   const [photoDateFilter, setPhotoDateFilter] = useState(new Date().toISOString().split('T')[0]);
   
-  const pollingIntervalRef = useRef<number | null>(null);
+  // Çekim sırasında yeni fotoğraf gelmezse uyarı vermek için zaman aşımı
+  const captureTimeoutRef = useRef<number | null>(null);
   const videoContainerRef = useRef<HTMLDivElement>(null);
-  
-  // En son fotoğrafın URL'ini tutmak için ref (Sayısından daha güvenilir)
-  const lastKnownPhotoRef = useRef<string | null>(null);
 
-  const fetchData = async (isPolling = false) => {
-    if (!isPolling) setIsLoading(true);
+  const fetchData = async () => {
+    setIsLoading(true);
     try {
-        if (!isPolling) setError(null);
+        setError(null);
         const [camerasData, stationsData] = await Promise.all([getCameras(), getStations()]);
         const currentCamera = camerasData.find(c => c.id === cameraId);
         
@@ -36,47 +35,39 @@ const CameraDetail: React.FC<CameraDetailProps> = ({ cameraId, onBack }) => {
             const currentStation = stationsData.find(s => s.id === currentCamera.stationId);
             setCamera(currentCamera);
             setStation(currentStation || null);
-
-            // Polling yapılıyorsa ve en son fotoğraf değiştiyse işlemi bitir
-            if (isPolling) {
-                const newestPhoto = currentCamera.photos.length > 0 ? currentCamera.photos[0] : null;
-                
-                // Eğer yeni gelen fotoğraf, işlem başındaki fotoğraftan farklıysa işlem tamamdır
-                if (newestPhoto !== lastKnownPhotoRef.current) {
-                    console.log("Yeni fotoğraf algılandı, polling durduruluyor.");
-                    if (pollingIntervalRef.current) {
-                        window.clearInterval(pollingIntervalRef.current);
-                        pollingIntervalRef.current = null;
-                    }
-                    setIsCapturing(false);
-                }
-            }
-
         } else {
              throw new Error("Kamera bulunamadı");
         }
     } catch (err) {
         setError('Kamera detayları yüklenirken bir hata oluştu.');
         console.error(err);
-        // Hata durumunda polling'i durdur
-        if (pollingIntervalRef.current) {
-            window.clearInterval(pollingIntervalRef.current);
-            pollingIntervalRef.current = null;
-        }
-        setIsCapturing(false);
     } finally {
-        if (!isPolling) setIsLoading(false);
+        setIsLoading(false);
+    }
+  };
+
+  const stopCaptureTimeout = () => {
+    if (captureTimeoutRef.current) {
+        window.clearTimeout(captureTimeoutRef.current);
+        captureTimeoutRef.current = null;
     }
   };
   
   useEffect(() => {
     fetchData();
-    return () => { // Cleanup on unmount
-        if (pollingIntervalRef.current) {
-            window.clearInterval(pollingIntervalRef.current);
-        }
-    };
+    return stopCaptureTimeout; // Cleanup on unmount
   }, [cameraId]);
+
+  // Agent fotoğrafı yüklediğinde sunucu 'photo' olayı yayınlar; yoklama gerekmez.
+  useLiveEvents({
+    'photo': ({ cameraId: photoCameraId, url }) => {
+        if (photoCameraId !== cameraId) return;
+        setCamera(prev => prev ? { ...prev, photos: [url, ...prev.photos].slice(0, 20) } : prev);
+        stopCaptureTimeout();
+        setIsCapturing(false);
+    },
+    'resync': () => fetchData(),
+  });
   
   const filteredPhotos = useMemo(() => {
     if (!camera?.photos) return [];
@@ -91,35 +82,22 @@ const CameraDetail: React.FC<CameraDetailProps> = ({ cameraId, onBack }) => {
   const handleCapture = async () => {
     if (!camera) return;
     
-    // Mevcut en son fotoğrafı kaydet (Yoksa null)
-    lastKnownPhotoRef.current = camera.photos.length > 0 ? camera.photos[0] : null;
-    
     setIsCapturing(true);
     try {
         await captureCameraImage(camera.id);
         
-        // Yeni görüntüyü kontrol etmek için polling başlat
-        // Önceki interval varsa temizle
-        if (pollingIntervalRef.current) window.clearInterval(pollingIntervalRef.current);
-        
-        pollingIntervalRef.current = window.setInterval(() => {
-            fetchData(true);
-        }, 3000); // 3 saniyede bir kontrol et
-
-        // Zaman aşımı (60 saniye)
-        setTimeout(() => {
-            if (pollingIntervalRef.current) {
-                window.clearInterval(pollingIntervalRef.current);
-                pollingIntervalRef.current = null;
-                // Eğer hala capturing durumundaysa (yani fotoğraf gelmediyse) durdur ve uyar
-                setIsCapturing(prev => {
-                    if (prev) {
-                        alert("Fotoğraf yakalama zaman aşımı. Agent yanıt vermedi veya işlem çok uzun sürdü.");
-                        return false;
-                    }
-                    return prev;
-                });
-            }
+        // Yeni fotoğraf 'photo' olayıyla gelir. Zaman aşımı (60 saniye)
+        stopCaptureTimeout();
+        captureTimeoutRef.current = window.setTimeout(() => {
+            captureTimeoutRef.current = null;
+            // Eğer hala capturing durumundaysa (yani fotoğraf gelmediyse) durdur ve uyar
+            setIsCapturing(prev => {
+                if (prev) {
+                    alert("Fotoğraf yakalama zaman aşımı. Agent yanıt vermedi veya işlem çok uzun sürdü.");
+                    return false;
+                }
+                return prev;
+            });
         }, 60000); 
 
     } catch (error) {
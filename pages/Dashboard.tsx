@@ -3,8 +3,8 @@
 
 import React, { useState, useEffect, useMemo, useCallback, HTMLAttributes } from 'react';
 import { ResponsiveContainer, LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, Legend, AreaChart, Area } from 'recharts';
-import { Station, Sensor, WidgetConfig, WidgetType } from '../types.ts';
-import { getReadingsHistory } from '../services/apiService.ts';
+import { Station, Sensor, WidgetConfig, WidgetType, AggregateSeries } from '../types.ts';
+import { getAggregatedReadings } from '../services/apiService.ts';
 import { useTheme } from '../components/ThemeContext.tsx';
 import FullMap from '../components/common/FullMap.tsx';
 import MultiSelectDropdown from '../components/common/MultiSelectDropdown.tsx';
@@ -13,7 +13,7 @@ import ChartSettingsModal, { ChartStyle } from '../components/ChartSettingsModal
 import WindRoseChart from '../components/WindRoseChart.tsx';
 import NetworkHealthWidget from '../components/NetworkHealthWidget.tsx';
 import { ChartBarIcon, MapIcon, AddIcon, PaletteIcon, XIcon, ThermometerIcon, DropletIcon, WindIcon, PressureIcon, CalendarIcon, SensorIcon as GenericSensorIcon, GaugeIcon } from '../components/icons/Icons.tsx';
-import { getNumericValue } from '../utils/helpers.ts';
+import { pickAggregateBucket } from '../utils/helpers.ts';
 import Skeleton from '../components/common/Skeleton.tsx';
 
 const SENSOR_STYLES: { [key: string]: { icon: React.ReactElement<HTMLAttributes<SVGElement>>, bg: string, text: string } } = {
@@ -29,14 +29,18 @@ const SENSOR_STYLES: { [key: string]: { icon: React.ReactElement<HTMLAttributes<
 
 // --- WIDGET COMPONENTS ---
 
-const DataCard: React.FC<{ title: string, data: any[], unit: string }> = ({ title, data, unit }) => {
+const DataCard: React.FC<{ title: string, series: AggregateSeries[], unit: string }> = ({ title, series, unit }) => {
+    // Average over all readings: bucket averages weighted by their reading counts.
     const avg = useMemo(() => {
-        if (!data || data.length === 0) return null;
-        const validReadings = data.map(curr => getNumericValue(curr.value, curr.sensorType, curr.interface)).filter(v => v !== null) as number[];
-        if (validReadings.length === 0) return null;
-        const sum = validReadings.reduce((acc, curr) => acc + curr, 0);
-        return sum / validReadings.length;
-    }, [data]);
+        let sum = 0;
+        let count = 0;
+        series.forEach(s => s.points.forEach(p => {
+            if (p.avg === undefined || !p.count) return;
+            sum += p.avg * p.count;
+            count += p.count;
+        }));
+        return count > 0 ? sum / count : null;
+    }, [series]);
 
     const sensorType = title.replace('Ortalama ', '');
     const styleInfo = SENSOR_STYLES[sensorType] || { icon: <GenericSensorIcon />, bg: 'bg-gray-100 dark:bg-gray-700/50', text: 'text-gray-600 dark:text-gray-400' };
@@ -57,28 +61,29 @@ const DataCard: React.FC<{ title: string, data: any[], unit: string }> = ({ titl
     );
 };
 
-const SensorChart: React.FC<{ sensorType: string, data: any[], stations: Station[], styles: Record<string, ChartStyle> }> = ({ sensorType, data, stations, styles }) => {
+const SensorChart: React.FC<{ sensorType: string, series: AggregateSeries[], stations: Station[], styles: Record<string, ChartStyle> }> = ({ sensorType, series, stations, styles }) => {
     const { theme } = useTheme();
     const tickColor = theme === 'dark' ? '#9CA3AF' : '#6B7281';
 
+    const stationNameOf = useCallback((s: AggregateSeries) => stations.find(st => st.id === s.stationId)?.name || s.stationId || s.sensorName, [stations]);
+
     const chartData = useMemo(() => {
-        const stationData: { [key: string]: any } = {};
-        data.forEach(d => {
-            const time = new Date(d.timestamp).toLocaleString('tr-TR', { hour: '2-digit', minute: '2-digit', day: '2-digit', month: 'short' });
-            if (!stationData[time]) {
-                stationData[time] = { name: time };
-            }
-            const stationName = stations.find(s => s.id === d.stationId)?.name || d.stationId;
-            const numericValue = getNumericValue(d.value, d.sensorType, d.interface);
-            // Only add valid numeric values
-            if (numericValue !== null) {
-                stationData[time][stationName] = numericValue;
-            }
+        const rows = new Map<number, any>();
+        series.forEach(s => {
+            const stationName = stationNameOf(s);
+            s.points.forEach(p => {
+                if (p.avg === undefined) return;
+                const time = new Date(p.timestamp).getTime();
+                if (!rows.has(time)) {
+                    rows.set(time, { time, name: new Date(time).toLocaleString('tr-TR', { hour: '2-digit', minute: '2-digit', day: '2-digit', month: 'short' }) });
+                }
+                rows.get(time)[stationName] = Number(p.avg.toFixed(2));
+            });
         });
-        return Object.values(stationData).sort((a,b) => new Date(a.timestamp).getTime() - new Date(b.timestamp).getTime());
-    }, [data, stations]);
+        return [...rows.values()].sort((a, b) => a.time - b.time);
+    }, [series, stationNameOf]);
     
-    const stationNames = useMemo(() => [...new Set(data.map(d => stations.find(s => s.id === d.stationId)?.name || d.stationId))], [data, stations]);
+    const stationNames = useMemo(() => [...new Set(series.map(stationNameOf))], [series, stationNameOf]);
 
     return (
         <div className="h-full w-full p-4 flex flex-col">
@@ -88,7 +93,7 @@ const SensorChart: React.FC<{ sensorType: string, data: any[], stations: Station
                     <AreaChart data={chartData} margin={{ top: 5, right: 20, left: -10, bottom: 20 }}>
                         <CartesianGrid strokeDasharray="3 3" stroke={theme === 'dark' ? '#374151' : '#E5E7EB'} />
                         <XAxis dataKey="name" tick={{ fontSize: 9, fill: tickColor }} angle={-25} textAnchor="end" />
-                        <YAxis tick={{ fontSize: 10, fill: tickColor }} unit={data?.[0]?.unit || ''} domain={['auto', 'auto']}/>
+                        <YAxis tick={{ fontSize: 10, fill: tickColor }} unit={series[0]?.unit || ''} domain={['auto', 'auto']}/>
                         <Tooltip contentStyle={{ backgroundColor: theme === 'dark' ? '#1F2937' : '#FFFFFF', border: `1px solid ${theme === 'dark' ? '#374151' : '#E5E7EB'}` }}/>
                         <Legend wrapperStyle={{ fontSize: '11px', paddingTop: '20px' }}/>
                         {stationNames.map((name) => (
@@ -141,7 +146,7 @@ const Dashboard: React.FC<{
     const [selectedStationIds, setSelectedStationIds] = useState<string[]>([]);
     const [selectedSensorTypes, setSelectedSensorTypes] = useState<string[]>([]);
     const [dateRange, setDateRange] = useState({ start: '', end: '' });
-    const [historyData, setHistoryData] = useState<any[]>([]);
+    const [historySeries, setHistorySeries] = useState<AggregateSeries[]>([]);
     const [isLoadingHistory, setIsLoadingHistory] = useState(false);
     
     const [widgets, setWidgets] = useState<WidgetConfig[]>(() => {
@@ -205,8 +210,11 @@ const Dashboard: React.FC<{
     const sensorTypeOptions = useMemo(() => allSensorTypes.map(t => ({ value: t, label: t })), [allSensorTypes]);
     
     const fetchHistory = useCallback(async () => {
-        if (selectedStationIds.length === 0 || selectedSensorTypes.length === 0) {
-            setHistoryData([]);
+        const sensorIds = sensors
+            .filter(s => selectedStationIds.includes(s.stationId) && selectedSensorTypes.includes(s.type))
+            .map(s => s.id);
+        if (sensorIds.length === 0) {
+            setHistorySeries([]);
             return;
         }
         setIsLoadingHistory(true);
@@ -216,21 +224,24 @@ const Dashboard: React.FC<{
             if (endDateTime && endDateTime.length === 10) {
                 endDateTime += 'T23:59:59';
             }
-
-            const data = await getReadingsHistory({ 
-                stationIds: selectedStationIds, 
-                sensorTypes: selectedSensorTypes,
-                start: dateRange.start ? new Date(dateRange.start).toISOString() : undefined,
-                end: endDateTime ? new Date(endDateTime).toISOString() : undefined,
+            const end = endDateTime ? new Date(endDateTime) : new Date();
+            const start = dateRange.start ? new Date(dateRange.start) : new Date(end.getTime() - 24 * 60 * 60 * 1000);
+
+            const data = await getAggregatedReadings({
+                sensorIds,
+                bucket: pickAggregateBucket(start.getTime(), end.getTime()),
+                fn: ['avg', 'count', 'last'],
+                start: start.toISOString(),
+                end: end.toISOString(),
             });
-            setHistoryData(data);
+            setHistorySeries(data.series);
         } catch (error) {
             console.error("Error fetching history data:", error);
-            setHistoryData([]);
+            setHistorySeries([]);
         } finally {
             setIsLoadingHistory(false);
         }
-    }, [selectedStationIds, selectedSensorTypes, dateRange]);
+    }, [sensors, selectedStationIds, selectedSensorTypes, dateRange]);
     
     useEffect(() => {
         fetchHistory();
@@ -276,16 +287,15 @@ const Dashboard: React.FC<{
     const chartWidgets = renderableWidgets.filter(w => w.type !== 'dataCard');
 
     const renderWidget = (widget: WidgetConfig) => {
-        const dataForWidget = historyData.filter(d => d.sensorType === widget.config.sensorType);
-        if (!dataForWidget) return null;
+        const seriesForWidget = historySeries.filter(s => s.sensorType === widget.config.sensorType);
 
         switch (widget.type) {
             case 'dataCard':
-                return <DataCard title={`Ortalama ${widget.config.sensorType}`} data={dataForWidget} unit={widget.config.unit || ''} />;
+                return <DataCard title={`Ortalama ${widget.config.sensorType}`} series={seriesForWidget} unit={widget.config.unit || ''} />;
             case 'sensorChart':
-                return <SensorChart sensorType={widget.config.sensorType} data={dataForWidget} stations={stations} styles={chartStyles} />;
+                return <SensorChart sensorType={widget.config.sensorType} series={seriesForWidget} stations={stations} styles={chartStyles} />;
             case 'windRose':
-                return <WindRoseChart historyData={historyData.filter(d => d.sensorType === 'Rüzgar Hızı' || d.sensorType === 'Rüzgar Yönü')} />;
+                return <WindRoseChart series={historySeries.filter(s => s.sensorType === 'Rüzgar Hızı' || s.sensorType === 'Rüzgar Yönü')} />;
             default:
                 return null;
         }
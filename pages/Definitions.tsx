@@ -2,7 +2,7 @@ import React, { useState, useMemo, useEffect, useCallback } from 'react';
 import Card from '../components/common/Card.tsx';
 import { AddIcon, EditIcon, DeleteIcon, StationIcon, BrainIcon } from '../components/icons/Icons.tsx';
 import { AlertRule, Severity, AlertCondition, Station, Sensor } from '../types.ts';
-import { getStations, getSensors, getDefinitions, getAlertRules, addDefinition, updateDefinition, deleteDefinition, getGlobalReadFrequency, setGlobalReadFrequency, cleanDuplicateReadings, cleanInvalidReadings } from '../services/apiService.ts';
+import { getStations, getSensors, getDefinitions, getAlertRules, addAlertRule, updateAlertRule, deleteAlertRule, addDefinition, updateDefinition, deleteDefinition, getGlobalReadFrequency, setGlobalReadFrequency, cleanDuplicateReadings, cleanInvalidReadings } from '../services/apiService.ts';
 import DefinitionModal from '../components/DefinitionModal.tsx';
 import Skeleton from '../components/common/Skeleton.tsx';
 
@@ -66,6 +66,8 @@ const AddAlertRuleDrawer: React.FC<AddAlertRuleDrawerProps> = ({ isOpen, onClose
     const [sensorType, setSensorType] = useState(sensorTypes[0] || '');
     const [condition, setCondition] = useState<AlertCondition>('Büyüktür');
     const [threshold, setThreshold] = useState(0);
+    const [hysteresis, setHysteresis] = useState(0);
+    const [cooldownMinutes, setCooldownMinutes] = useState(15);
     const [severity, setSeverity] = useState<Severity>('Uyarı');
     const [selectedStations, setSelectedStations] = useState<string[]>([]);
     const [isEnabled, setIsEnabled] = useState(true);
@@ -84,6 +86,8 @@ const AddAlertRuleDrawer: React.FC<AddAlertRuleDrawerProps> = ({ isOpen, onClose
             severity,
             stationIds: selectedStations,
             isEnabled,
+            hysteresis,
+            cooldownMinutes,
         });
         onClose();
     };
@@ -102,6 +106,10 @@ const AddAlertRuleDrawer: React.FC<AddAlertRuleDrawerProps> = ({ isOpen, onClose
                             <select value={condition} onChange={e => setCondition(e.target.value as AlertCondition)} className="w-full input"><option>Büyüktür</option><option>Küçüktür</option></select>
                             <input type="number" value={threshold} onChange={e => setThreshold(parseFloat(e.target.value))} placeholder="Eşik Değer" className="w-full input"/>
                         </div>
+                        <div className="grid grid-cols-2 gap-4">
+                            <label className="text-sm text-muted">Histerezis<input type="number" min={0} value={hysteresis} onChange={e => setHysteresis(parseFloat(e.target.value) || 0)} className="w-full input mt-1"/></label>
+                            <label className="text-sm text-muted">Tekrar Bildirim Aralığı (dk)<input type="number" min={0} value={cooldownMinutes} onChange={e => setCooldownMinutes(parseInt(e.target.value, 10) || 0)} className="w-full input mt-1"/></label>
+                        </div>
                         <select value={severity} onChange={e => setSeverity(e.target.value as Severity)} className="w-full input"><option>Kritik</option><option>Uyarı</option><option>Bilgi</option></select>
                         <div>
                             <h4>İstasyonlar (Boş bırakılırsa tümü için geçerli)</h4>
@@ -176,10 +184,36 @@ const Definitions: React.FC = () => {
 
     const sensorTypes = useMemo(() => definitions.sensorTypes.map(s => s.name), [definitions.sensorTypes]);
 
-    const handleSaveRule = (newRule: Omit<AlertRule, 'id'>) => {
-        // Mocked until backend endpoint is available
-        const ruleToAdd: AlertRule = { id: `RULE${Date.now()}`, ...newRule };
-        setAlertRules(prev => [ruleToAdd, ...prev]);
+    const handleSaveRule = async (newRule: Omit<AlertRule, 'id'>) => {
+        try {
+            const { id } = await addAlertRule(newRule);
+            setAlertRules(prev => [{ id, ...newRule }, ...prev]);
+        } catch (error) {
+            console.error("Failed to save alert rule:", error);
+            alert("Alarm kuralı kaydedilemedi.");
+        }
+    };
+
+    const handleToggleRule = async (rule: AlertRule) => {
+        try {
+            await updateAlertRule(rule.id, { isEnabled: !rule.isEnabled });
+            setAlertRules(prev => prev.map(r => r.id === rule.id ? { ...r, isEnabled: !r.isEnabled } : r));
+        } catch (error) {
+            console.error("Failed to update alert rule:", error);
+            alert("Alarm kuralı güncellenemedi.");
+        }
+    };
+
+    const handleDeleteRule = async (id: string) => {
+        if (window.confirm('Bu alarm kuralını silmek istediğinizden emin misiniz?')) {
+            try {
+                await deleteAlertRule(id);
+                setAlertRules(prev => prev.filter(r => r.id !== id));
+            } catch (error) {
+                console.error("Failed to delete alert rule:", error);
+                alert("Alarm kuralı silinemedi.");
+            }
+        }
     };
 
     const handleOpenModal = (type: DefinitionType, title: string, item?: DefinitionItem) => {
@@ -384,12 +418,12 @@ const Definitions: React.FC = () => {
                                         <p className="text-sm text-muted mt-1">Eğer <span className="font-semibold">{rule.sensorType}</span> değeri <span className="font-semibold">{rule.threshold}</span> değerinden <span className="font-semibold">{rule.condition}</span> ise alarm tetiklenir.</p>
                                     </div>
                                     <div className="flex items-center gap-4">
-                                        <div className="relative">
-                                            <input type="checkbox" className="sr-only peer" checked={rule.isEnabled} readOnly/>
+                                        <label className="relative cursor-pointer">
+                                            <input type="checkbox" className="sr-only peer" checked={rule.isEnabled} onChange={() => handleToggleRule(rule)}/>
                                             <div className="w-11 h-6 bg-gray-200 rounded-full peer peer-checked:after:translate-x-full after:absolute after:top-0.5 after:left-[2px] after:bg-white after:border after:rounded-full after:h-5 after:w-5 after:transition-all peer-checked:bg-accent"></div>
-                                        </div>
+                                        </label>
                                         <button className="text-muted hover:text-accent"><EditIcon /></button>
-                                        <button className="text-muted hover:text-danger"><DeleteIcon /></button>
+                                        <button onClick={() => handleDeleteRule(rule.id)} className="text-muted hover:text-danger"><DeleteIcon /></button>
                                     </div>
                                 </div>
                                 {rule.stationIds.length > 0 && (
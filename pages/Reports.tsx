@@ -4,40 +4,12 @@ import Card from '../components/common/Card.tsx';
 import AddReportDrawer from '../components/AddReportDrawer.tsx';
 import ScheduleReportDrawer from '../components/ScheduleReportDrawer.tsx';
 import { AddIcon, SearchIcon, DownloadIcon, EditIcon, DeleteIcon, CalendarIcon } from '../components/icons/Icons.tsx';
-import { getStations, getSensors, getReports, getReportSchedules, getReadings, deleteReport, deleteReportSchedule, addReportSchedule, updateReportSchedule } from '../services/apiService.ts';
+import { getStations, getSensors, getReports, getReportSchedules, addReport, renderReport, getReportRender, deleteReport, deleteReportSchedule, addReportSchedule, updateReportSchedule } from '../services/apiService.ts';
 import DeleteConfirmationModal from '../components/DeleteConfirmationModal.tsx';
-import * as XLSX from 'xlsx';
 
-interface SensorReading {
-    id: string;
-    sensorId: string;
-    stationId: string;
-    sensorName: string;
-    stationName: string;
-    sensorType: string;
-    value: any;
-    unit: string;
-    timestamp: string;
-    interface: string;
-}
-
-const formatReadingValue = (reading: SensorReading): string => {
-    const { value, sensorType, interface: sensorInterface } = reading;
-    if (value === null || value === undefined) return 'N/A';
-    if (typeof value !== 'object') return String(value);
-
-    if (sensorInterface === 'openweather') {
-        if (sensorType === 'Sıcaklık' && value.temperature !== undefined) {
-            return String(value.temperature);
-        }
-        if (sensorType === 'Nem' && value.humidity !== undefined) {
-            return String(value.humidity);
-        }
-    }
-    
-    const numericValue = Object.values(value).find(v => typeof v === 'number');
-    return numericValue !== undefined ? String(numericValue) : JSON.stringify(value);
-};
+// Cached reports are usually ready on the first poll; renders back off to the full interval.
+const RENDER_FIRST_POLL_MS = 250;
+const RENDER_POLL_INTERVAL_MS = 1000;
 
 
 const Reports: React.FC = () => {
@@ -45,7 +17,7 @@ const Reports: React.FC = () => {
     const [schedules, setSchedules] = useState<ReportSchedule[]>([]);
     const [stations, setStations] = useState<Station[]>([]);
     const [sensors, setSensors] = useState<Sensor[]>([]);
-    const [readings, setReadings] = useState<SensorReading[]>([]);
+    const [renderingReportIds, setRenderingReportIds] = useState<string[]>([]);
     const [isLoading, setIsLoading] = useState(true);
     const [activeTab, setActiveTab] = useState('generated');
     const [isDrawerOpen, setIsDrawerOpen] = useState(false);
@@ -61,18 +33,16 @@ const Reports: React.FC = () => {
         // Don't show loader on subsequent refetches
         if (reports.length === 0 && schedules.length === 0) setIsLoading(true);
         try {
-            const [stationsData, sensorsData, reportsData, schedulesData, readingsData] = await Promise.all([
+            const [stationsData, sensorsData, reportsData, schedulesData] = await Promise.all([
                 getStations(), 
                 getSensors(),
                 getReports(),
                 getReportSchedules(),
-                getReadings()
             ]);
             setStations(stationsData);
             setSensors(sensorsData);
             setReports(reportsData);
             setSchedules(schedulesData);
-            setReadings(readingsData);
         } catch (error) {
             console.error("Failed to fetch data for reports:", error);
         } finally {
@@ -89,11 +59,15 @@ const Reports: React.FC = () => {
     const filteredReports = reports.filter(report => report.title.toLowerCase().includes(searchTerm.toLowerCase()));
     const filteredSchedules = schedules.filter(schedule => schedule.name.toLowerCase().includes(searchTerm.toLowerCase()));
 
-    const handleSaveReport = (reportConfig: ReportConfig) => {
-        // Mocked until backend endpoint is implemented
+    const handleSaveReport = async (reportConfig: ReportConfig) => {
         const typeMapping = { 'Günlük': 'daily', 'Haftalık': 'weekly', 'Aylık': 'monthly'} as const;
-        const newReport: Report = { id: `RPT${Date.now()}`, title: reportConfig.reportName, type: typeMapping[reportConfig.reportType as keyof typeof typeMapping] || 'daily', createdAt: new Date().toISOString(), config: reportConfig };
-        setReports(prev => [newReport, ...prev]);
+        try {
+            const newReport = await addReport({ title: reportConfig.reportName, type: typeMapping[reportConfig.reportType as keyof typeof typeMapping] || 'daily', config: reportConfig });
+            setReports(prev => [newReport, ...prev]);
+        } catch (e) {
+            console.error(e);
+            alert("Rapor kaydedilemedi.");
+        }
     };
 
     const handleSaveSchedule = async (scheduleData: Omit<ReportSchedule, 'id' | 'lastRun'>) => {
@@ -116,97 +90,40 @@ const Reports: React.FC = () => {
         }
     };
 
-    const generateCsv = (data: any[], fileName: string) => {
-        if (!data || data.length === 0) {
-            alert('Rapor için veri bulunamadı.');
-            return;
-        }
-        const headers = Object.keys(data[0]);
-        const csvContent = [
-            headers.join(';'),
-            ...data.map(row => headers.map(header => `"${String(row[header]).replace(/"/g, '""')}"`).join(';'))
-        ].join('\n');
-
-        const blob = new Blob([`\uFEFF${csvContent}`], { type: 'text/csv;charset=utf-8;' });
-        const link = document.createElement('a');
-        const url = URL.createObjectURL(blob);
-        link.setAttribute('href', url);
-        link.setAttribute('download', `${fileName}.csv`);
-        link.style.visibility = 'hidden';
-        document.body.appendChild(link);
-        link.click();
-        document.body.removeChild(link);
-    };
-
-    const generateXlsx = (data: any[], fileName: string) => {
-        if (!data || data.length === 0) {
-            alert('Rapor için veri bulunamadı.');
-            return;
-        }
-        if (typeof XLSX === 'undefined') {
-            console.error('XLSX library is not loaded.');
-            alert('Rapor oluşturma kütüphanesi yüklenemedi. Lütfen internet bağlantınızı kontrol edin.');
-            return;
-        }
-        const ws = XLSX.utils.json_to_sheet(data);
-        const wb = XLSX.utils.book_new();
-        XLSX.utils.book_append_sheet(wb, ws, "Rapor Verileri");
-        XLSX.writeFile(wb, `${fileName}.xlsx`);
-    };
-
-    const handleDownloadReport = (report: Report) => {
-        const { config } = report;
-        if (!config) {
+    // The report is generated on the server; poll the render until the file is ready, then download it.
+    const handleDownloadReport = async (report: Report) => {
+        if (!report.config) {
             alert('Bu rapor için yapılandırma bulunamadı, indirilemiyor.');
             return;
         }
-    
-        let reportData = readings.filter(reading => {
-            const stationMatch = !config.selectedStations || config.selectedStations.length === 0 || config.selectedStations.includes(reading.stationId);
-            const sensorTypeMatch = !config.selectedSensorTypes || config.selectedSensorTypes.length === 0 || config.selectedSensorTypes.includes(reading.sensorType);
-            // Date filtering would be added here in a real scenario
-            return stationMatch && sensorTypeMatch;
-        });
-    
-        // Apply grouping/sorting
-        if (config.dataRules.groupByStation || config.dataRules.groupBySensorType) {
-            reportData.sort((a, b) => {
-                if (config.dataRules.groupByStation) {
-                    const stationCompare = a.stationName.localeCompare(b.stationName, 'tr');
-                    if (stationCompare !== 0) return stationCompare;
-                }
-                if (config.dataRules.groupBySensorType) {
-                    const typeCompare = a.sensorType.localeCompare(b.sensorType, 'tr');
-                    if (typeCompare !== 0) return typeCompare;
-                }
-                // Finally sort by date descending
-                return new Date(b.timestamp).getTime() - new Date(a.timestamp).getTime();
-            });
-        }
-    
-        const formattedData = reportData.map(d => {
-            const date = new Date(d.timestamp);
-            return {
-                'Tarih': date.toLocaleDateString('tr-TR'),
-                'Saat': date.toLocaleTimeString('tr-TR'),
-                'İstasyon': d.stationName,
-                'Sensör': d.sensorName,
-                'Sensör Tipi': d.sensorType,
-                'Değer': `${formatReadingValue(d)} ${d.unit || ''}`
-            };
-        });
-    
-        if (formattedData.length === 0) {
-            alert('Rapor için filtrelenen kriterlerde veri bulunamadı.');
-            return;
-        }
-    
-        const safeFileName = report.title.replace(/[^a-z0-9]/gi, '_').toLowerCase();
-        
-        if (config.fileFormat === 'CSV') {
-            generateCsv(formattedData, safeFileName);
-        } else { // Default to XLSX
-            generateXlsx(formattedData, safeFileName);
+        setRenderingReportIds(prev => [...prev, report.id]);
+        try {
+            let render = await renderReport(report.id);
+            let pollDelay = RENDER_FIRST_POLL_MS;
+            while (render.status === 'running') {
+                await new Promise(resolve => setTimeout(resolve, pollDelay));
+                pollDelay = Math.min(pollDelay * 2, RENDER_POLL_INTERVAL_MS);
+                render = await getReportRender(render.id);
+            }
+            if (render.status === 'failed' || !render.downloadUrl) {
+                throw new Error(render.error || 'Rapor oluşturulamadı.');
+            }
+            if (render.rows === 0) {
+                alert('Rapor için filtrelenen kriterlerde veri bulunamadı.');
+                return;
+            }
+            const link = document.createElement('a');
+            link.setAttribute('href', render.downloadUrl);
+            link.setAttribute('download', render.fileName || '');
+            link.style.visibility = 'hidden';
+            document.body.appendChild(link);
+            link.click();
+            document.body.removeChild(link);
+        } catch (error) {
+            console.error("Failed to render report:", error);
+            alert("Rapor oluşturulurken bir hata oluştu.");
+        } finally {
+            setRenderingReportIds(prev => prev.filter(id => id !== report.id));
         }
     };
 
@@ -270,7 +187,7 @@ const Reports: React.FC = () => {
                 <Card className="p-0"><div className="overflow-x-auto"><table className="w-full text-sm text-left text-gray-600 min-w-[640px]"><thead className="text-xs text-gray-700 uppercase bg-gray-100 dark:bg-gray-800"><tr><th scope="col" className="px-6 py-3">Rapor Başlığı</th><th scope="col" className="px-6 py-3">Rapor Tipi</th><th scope="col" className="px-6 py-3">Oluşturulma Tarihi</th><th scope="col" className="px-6 py-3 text-right">İşlemler</th></tr></thead><tbody>
                 {filteredReports.map(report => (<tr key={report.id} className="border-b border-gray-200 dark:border-gray-700 hover:bg-gray-50 dark:hover:bg-gray-700/50"><td className="px-6 py-4 font-medium text-gray-900 dark:text-gray-100">{report.title}</td><td className="px-6 py-4"><span className={`px-2 py-1 text-xs font-semibold rounded-full ${report.type === 'daily' ? 'bg-blue-100 text-blue-800' : report.type === 'weekly' ? 'bg-purple-100 text-purple-800' : 'bg-green-100 text-green-800'}`}>{report.type}</span></td><td className="px-6 py-4 font-mono text-gray-800 dark:text-gray-200">{new Date(report.createdAt).toLocaleString('tr-TR')}</td>
                 <td className="px-6 py-4 text-right flex justify-end items-center gap-2">
-                    <button onClick={() => handleDownloadReport(report)} className="flex items-center gap-2 text-accent font-semibold py-1 px-3 rounded-lg hover:bg-accent/10 transition-colors text-sm"><DownloadIcon className="w-4 h-4" /><span>İndir</span></button>
+                    <button onClick={() => handleDownloadReport(report)} disabled={renderingReportIds.includes(report.id)} className="flex items-center gap-2 text-accent font-semibold py-1 px-3 rounded-lg hover:bg-accent/10 transition-colors text-sm disabled:opacity-50 disabled:cursor-wait"><DownloadIcon className="w-4 h-4" /><span>{renderingReportIds.includes(report.id) ? 'Hazırlanıyor...' : 'İndir'}</span></button>
                     <button onClick={() => handleOpenDeleteReportModal(report)} className="text-muted hover:text-danger p-2 rounded-lg hover:bg-danger/10 transition-colors"><DeleteIcon className="w-4 h-4"/></button>
                 </td>
                 </tr>))}
@@ -288,7 +205,11 @@ const Reports: React.FC = () => {
                         </div>
                     </label>
                 </td>
-                <td className="px-6 py-4 font-mono text-gray-800 dark:text-gray-200 text-xs">{schedule.lastRun || "Henüz çalışmadı"}</td>
+                <td className="px-6 py-4 font-mono text-gray-800 dark:text-gray-200 text-xs">
+                    {schedule.lastRun || "Henüz çalışmadı"}
+                    {schedule.lastRunStatus === 'failed' && <span className="block text-danger">Başarısız</span>}
+                    {(schedule.lastRunStatus === 'queued' || schedule.lastRunStatus === 'sent') && <span className="block text-muted">{schedule.lastRunRows} satır · {((schedule.lastRunDurationMs ?? 0) / 1000).toFixed(1)} sn{schedule.lastRunStatus === 'queued' ? ' · gönderim bekliyor' : ''}</span>}
+                </td>
                 <td className="px-6 py-4 text-right flex justify-end gap-2">
                     <button className="text-muted hover:text-accent p-2 rounded-lg hover:bg-accent/10 transition-colors"><EditIcon className="w-4 h-4"/></button>
                     <button onClick={() => handleOpenDeleteScheduleModal(schedule)} className="text-muted hover:text-danger p-2 rounded-lg hover:bg-danger/10 transition-colors"><DeleteIcon className="w-4 h-4"/></button>
@@ -1,10 +1,11 @@
 
 import React, { useMemo, useState, useEffect } from 'react';
-import { Station, Sensor, Camera, SensorStatus, CameraStatus } from '../types.ts';
-import { getStations, getSensors, getCameras, getReadingsHistory, restartAgent, stopAgent } from '../services/apiService.ts';
+import { Station, Sensor, Camera, SensorStatus, CameraStatus, CursorPage } from '../types.ts';
+import { getStations, getSensors, getCameras, getReadingsHistory, getReadingsHistoryPage, restartAgent, stopAgent } from '../services/apiService.ts';
 import Card from '../components/common/Card.tsx';
 import InteractiveMap from '../components/common/InteractiveMap.tsx';
 import Pagination from '../components/common/Pagination.tsx';
+import CursorPagination from '../components/common/CursorPagination.tsx';
 import Skeleton from '../components/common/Skeleton.tsx';
 import { ArrowLeftIcon, SensorIcon, CameraIcon, SettingsIcon, ThermometerIcon, DropletIcon, WindSockIcon, GaugeIcon, OnlineIcon, OfflineIcon, PlayIcon, PhotographIcon, SearchIcon, ExclamationIcon, DownloadIcon, CalendarIcon, AgentIcon } from '../components/icons/Icons.tsx';
 import SensorDetailModal from '../components/SensorDetailModal.tsx'; // Import the new modal
@@ -32,6 +33,7 @@ interface SensorReading {
 }
 
 const ITEMS_PER_PAGE_DATA = 10;
+const SPARKLINE_POINTS = 15;
 const ITEMS_PER_PAGE_SENSORS = 6;
 
 const statusInfo: Record<string, { text: string, className: string }> = {
@@ -149,7 +151,9 @@ const StationDetail: React.FC<StationDetailProps> = ({ stationId, onBack, onView
 
   const [activeTab, setActiveTab] = useState('Veriler');
   const [dataSearchTerm, setDataSearchTerm] = useState('');
-  const [dataPage, setDataPage] = useState(1);
+  const [dataCursor, setDataCursor] = useState<string | null>(null);
+  const [dataPage, setDataPage] = useState<CursorPage<SensorReading>>({ items: [], next: null, prev: null });
+  const [isDataPageLoading, setIsDataPageLoading] = useState(false);
   const [sensorPage, setSensorPage] = useState(1);
   
   const [selectedCameraId, setSelectedCameraId] = useState<string | null>(null);
@@ -199,7 +203,55 @@ const StationDetail: React.FC<StationDetailProps> = ({ stationId, onBack, onView
     });
   }, [stationId]);
 
-  // Effect to fetch readings when station, sensors, or date filter changes
+  // Sensors whose name or type matches the search term; the data table is filtered server-side.
+  const matchingSensorIds = useMemo(() => {
+    const term = dataSearchTerm.toLowerCase();
+    return sensors
+        .filter(s => !term || s.name.toLowerCase().includes(term) || s.type.toLowerCase().includes(term))
+        .map(s => s.id);
+  }, [sensors, dataSearchTerm]);
+
+  // A new filter starts again from the newest page.
+  useEffect(() => {
+      setDataCursor(null);
+  }, [stationId, matchingSensorIds, dateFilter]);
+
+  // Effect to fetch one page of the data table
+  useEffect(() => {
+      if (activeTab !== 'Veriler') return;
+      const emptyPage = { items: [], next: null, prev: null };
+      if (!stationId || matchingSensorIds.length === 0 || !dateFilter.start || !dateFilter.end) {
+          setDataPage(emptyPage);
+          return;
+      }
+
+      let cancelled = false;
+      const fetchDataPage = async () => {
+          setIsDataPageLoading(true);
+          try {
+              const page = await getReadingsHistoryPage({
+                  stationIds: [stationId],
+                  sensorTypes: Array.from(new Set(sensors.map(s => s.type))),
+                  sensorIds: matchingSensorIds,
+                  start: dateFilter.start,
+                  end: dateFilter.end,
+                  limit: ITEMS_PER_PAGE_DATA,
+                  cursor: dataCursor,
+              });
+              if (!cancelled) setDataPage(page);
+          } catch (err) {
+              // Don't set a global error for this, just show empty table. Log it.
+              console.error('İstasyon verileri yüklenirken bir hata oluştu:', err);
+              if (!cancelled) setDataPage(emptyPage);
+          } finally {
+              if (!cancelled) setIsDataPageLoading(false);
+          }
+      };
+      fetchDataPage();
+      return () => { cancelled = true; };
+  }, [stationId, sensors, matchingSensorIds, dateFilter, dataCursor, activeTab]);
+
+  // Effect to fetch sparkline history for the sensor cards
   useEffect(() => {
       const fetchReadings = async () => {
           if (!stationId || sensors.length === 0 || !dateFilter.start || !dateFilter.end) {
@@ -220,17 +272,17 @@ const StationDetail: React.FC<StationDetailProps> = ({ stationId, onBack, onView
                   sensorTypes: sensorTypesForStation,
                   start: dateFilter.start,
                   end: dateFilter.end,
+                  maxPoints: SPARKLINE_POINTS,
               });
               setReadings(readingsData);
           } catch (err) {
-              // Don't set a global error for this, just show empty table. Log it.
               console.error('İstasyon verileri yüklenirken bir hata oluştu:', err);
               setReadings([]); // Clear readings on error
           }
       };
 
       // Only fetch if the tab is active to avoid unnecessary calls
-      if (activeTab === 'Veriler' || activeTab === 'Sensörler') {
+      if (activeTab === 'Sensörler') {
         fetchReadings();
       }
   }, [stationId, sensors, dateFilter, activeTab]);
@@ -272,22 +324,6 @@ const StationDetail: React.FC<StationDetailProps> = ({ stationId, onBack, onView
       }
   };
 
-  const filteredSensorReadings = useMemo(() => {
-    if (!dataSearchTerm) {
-        return readings;
-    }
-    return readings.filter(reading =>
-        reading.sensorName.toLowerCase().includes(dataSearchTerm.toLowerCase()) ||
-        reading.sensorType.toLowerCase().includes(dataSearchTerm.toLowerCase())
-    );
-  }, [readings, dataSearchTerm]);
-
-
-  const paginatedSensorReadings = useMemo(() => {
-    const startIndex = (dataPage - 1) * ITEMS_PER_PAGE_DATA;
-    return filteredSensorReadings.slice(startIndex, startIndex + ITEMS_PER_PAGE_DATA);
-  }, [filteredSensorReadings, dataPage]);
-
   const paginatedSensors = useMemo(() => {
     const startIndex = (sensorPage - 1) * ITEMS_PER_PAGE_SENSORS;
     return sensors.slice(startIndex, startIndex + ITEMS_PER_PAGE_SENSORS);
@@ -398,10 +434,7 @@ const StationDetail: React.FC<StationDetailProps> = ({ stationId, onBack, onView
                                 placeholder="Sensör adı veya tipine göre filtrele..." 
                                 className="w-full bg-secondary border border-gray-300 rounded-lg pl-11 pr-4 py-2.5 focus:outline-none focus:ring-2 focus:ring-accent"
                                 value={dataSearchTerm}
-                                onChange={e => {
-                                    setDataSearchTerm(e.target.value);
-                                    setDataPage(1); // Reset page on search
-                                }}
+                                onChange={e => setDataSearchTerm(e.target.value)}
                             />
                         </div>
                          <div className="flex flex-col sm:flex-row items-center gap-2 w-full md:w-auto">
@@ -432,7 +465,7 @@ const StationDetail: React.FC<StationDetailProps> = ({ stationId, onBack, onView
                           </tr>
                         </thead>
                         <tbody>
-                          {paginatedSensorReadings.map(reading => {
+                          {dataPage.items.map(reading => {
                             const date = new Date(reading.timestamp);
                             const displayTimestamp = !isNaN(date.getTime())
                                 ? date.toLocaleString('tr-TR', { day: '2-digit', month: '2-digit', year: 'numeric', hour: '2-digit', minute: '2-digit', second: '2-digit' })
@@ -450,11 +483,13 @@ const StationDetail: React.FC<StationDetailProps> = ({ stationId, onBack, onView
                         </tbody>
                       </table>
                     </div>
-                    {filteredSensorReadings.length > 0 ? (
-                        <Pagination 
-                            currentPage={dataPage}
-                            totalPages={Math.ceil(filteredSensorReadings.length / ITEMS_PER_PAGE_DATA)}
-                            onPageChange={setDataPage}
+                    {dataPage.items.length > 0 ? (
+                        <CursorPagination
+                            hasPrevious={dataPage.prev !== null}
+                            hasNext={dataPage.next !== null}
+                            onPrevious={() => setDataCursor(dataPage.prev)}
+                            onNext={() => setDataCursor(dataPage.next)}
+                            isLoading={isDataPageLoading}
                         />
                     ) : (
                         <div className="text-center py-8 text-muted border border-t-0 rounded-b-lg border-gray-200">
@@ -469,9 +504,7 @@ const StationDetail: React.FC<StationDetailProps> = ({ stationId, onBack, onView
                         <>
                             <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-4">
                                 {paginatedSensors.map(sensor => {
-                                     const sensorHistory = readings
-                                        .filter(r => r.sensorId === sensor.id)
-                                        .slice(-15);
+                                     const sensorHistory = readings.filter(r => r.sensorId === sensor.id);
                                     return (
                                         <SensorCard 
                                             key={sensor.id} 
@@ -14,8 +14,9 @@ import {
     AgentCommand,
     AgentState,
 } from './types.js';
+import { diffConfigs, driverKey } from './configDiff.js';
 import dotenv from 'dotenv';
-import { openDb, addReading, getUnsentReadings, markReadingsAsSent, ReadingFromDb, closeDb } from './database.js';
+import { openDb, addReading, getUnsentReadings, markReadingsAsSent, markReadingsAsRejected, ReadingFromDb, closeDb } from './database.js';
 // FIX: Import process to resolve type errors for process.on and process.exit
 import process from 'process';
 
@@ -32,7 +33,8 @@ const CONFIG_CACHE_PATH = path.join(__dirname, '..', 'config.cache.json'); // Ca
 // --- Timers ---
 const CONFIG_FETCH_INTERVAL = 60000; // 1 minute (for checking config updates)
 const MAIN_LOOP_DEFAULT_INTERVAL = 600000; // 10 minutes (default sensor read cycle)
-const COMMAND_POLL_INTERVAL = 5000; // 5 seconds
+const COMMAND_POLL_INTERVAL = 5000; // 5 seconds, when the server answers polls at once
+const COMMAND_LONG_POLL_SECONDS = 30; // how long the server may hold a command poll
 const SYNC_INTERVAL = 30000; // 30 seconds for syncing offline data
 const AVERAGING_DURATION_MS = 60000; // 1 minute for averaging
 const AVERAGING_READ_INTERVAL_MS = 4000; // Increased to 4 seconds to prevent serial port busy errors
@@ -89,6 +91,8 @@ Nihai cevabını SADECE aşağıdaki JSON formatında ver, başka hiçbir metin
 class Agent {
     private state: AgentState = AgentState.INITIALIZING;
     private config: DeviceConfig | null = null;
+    // ETag of the config above; sent back so an unchanged config comes back as an empty 304.
+    private configEtag: string | null = null;
     private driverInstances: Map<string, ISensorDriver> = new Map();
     private globalReadFrequencySeconds: number = 0;
 
@@ -102,6 +106,9 @@ class Agent {
     private timers: (ReturnType<typeof setTimeout> | ReturnType<typeof setInterval>)[] = [];
     private mainLoopTimeout: ReturnType<typeof setTimeout> | null = null;
     private sensorLoopTimers: Map<string, ReturnType<typeof setInterval>> = new Map();
+    private sequentialCycleRunning: boolean = false;
+    // Cancels the command poll in flight when the agent stops.
+    private commandPollAbort: AbortController | null = null;
 
 
     constructor(localConfig: LocalConfig) {
@@ -160,7 +167,7 @@ class Agent {
 
         // Start other periodic tasks
         this.timers.push(setInterval(() => this.fetchConfig(), CONFIG_FETCH_INTERVAL));
-        this.timers.push(setInterval(() => this.pollForCommands(), COMMAND_POLL_INTERVAL));
+        this.commandLoop();
         this.timers.push(setInterval(() => this.syncOfflineData(), SYNC_INTERVAL));
     }
 
@@ -175,16 +182,10 @@ class Agent {
 
         this.timers.forEach(timer => clearInterval(timer));
         this.timers = [];
+        this.commandPollAbort?.abort();
         
-        for (const [sensorId, driver] of this.driverInstances.entries()) {
-            if (typeof (driver as any).close === 'function') {
-                try {
-                    await (driver as any).close();
-                    console.log(`   -> Sürücü kapatıldı: ${sensorId}`);
-                } catch (e) {
-                    console.error(`   -> Sürücü kapatılırken hata: ${sensorId}`, e);
-                }
-            }
+        for (const sensorId of [...this.driverInstances.keys()]) {
+            await this.closeDriver(sensorId);
         }
         await closeDb();
         console.log("👋 Agent başarıyla durduruldu.");
@@ -221,14 +222,19 @@ class Agent {
         }
 
         try {
+            const headers: Record<string, string> = { 'Authorization': `Bearer ${this.authToken}` };
+            if (this.configEtag && this.config && !isInitial) headers['If-None-Match'] = this.configEtag;
             const response = await axios.get(`${this.apiBaseUrl}/config/${this.deviceId}`, {
-                headers: { 'Authorization': `Bearer ${this.authToken}` }
+                headers,
+                validateStatus: status => (status >= 200 && status < 300) || status === 304,
             });
+            const etag = response.headers['etag'];
 
-            const newConfigString = JSON.stringify(response.data);
-            const oldConfigString = JSON.stringify(this.config);
+            const unchanged = response.status === 304
+                || JSON.stringify(response.data) === JSON.stringify(this.config);
+            if (response.status !== 304) this.configEtag = typeof etag === 'string' ? etag : null;
 
-            if (newConfigString === oldConfigString && !isInitial) {
+            if (unchanged && !isInitial) {
                  if (this.state !== AgentState.ONLINE) {
                     this.setState(AgentState.ONLINE);
                     console.log('✅ Sunucu ile bağlantı kuruldu, yapılandırma değişmedi.');
@@ -236,25 +242,17 @@ class Agent {
                 return;
             }
 
-            this.config = response.data;
-            this.geminiApiKey = this.config?.gemini_api_key;
-            
-            this.globalReadFrequencySeconds = this.config?.global_read_frequency_seconds ?? 0;
-
             if (isInitial) {
                  console.log('✅ Sunucudan yapılandırma başarıyla alındı.');
-            } else {
-                 console.log('✨ Yapılandırma güncellendi, sürücüler ve döngü yeniden başlatılıyor.');
             }
             
-            await this.saveConfigToFile(this.config!);
+            await this.saveConfigToFile(response.data);
             
             if (this.state !== AgentState.ONLINE) {
                 this.setState(AgentState.ONLINE);
             }
             
-            await this.initializeDrivers();
-            this.restartMainLoop();
+            await this.applyConfig(response.data);
 
         } catch (error) {
             this.handleApiError(error, isInitial ? 'yapılandırma alınırken' : 'yapılandırma güncellenirken');
@@ -263,14 +261,8 @@ class Agent {
                 console.log('... Sunucuya ulaşılamadı, yerel önbellek deneniyor.');
                 const cachedConfig = await this.loadConfigFromFile();
                 if (cachedConfig) {
-                    this.config = cachedConfig;
-                    this.geminiApiKey = this.config?.gemini_api_key;
-                    
-                    this.globalReadFrequencySeconds = this.config?.global_read_frequency_seconds ?? 0;
-
                     this.setState(AgentState.OFFLINE);
-                    await this.initializeDrivers();
-                    this.restartMainLoop();
+                    await this.applyConfig(cachedConfig);
                 } else {
                     console.error('❌ KRİTİK HATA: Sunucuya ulaşılamıyor ve yerel yapılandırma önbelleği yok. Agent sensörleri okuyamıyor. Bağlantı kurulduğunda tekrar denenecek.');
                     this.setState(AgentState.ERROR);
@@ -279,15 +271,73 @@ class Agent {
         }
     }
     
-    private async initializeDrivers() {
+    // Switches to a new config. Only the sensors that changed are touched: drivers whose
+    // settings changed are reopened and sensors whose schedule changed are rescheduled. Other
+    // changes (a rename, new calibration) are picked up by the next read, so a running cycle
+    // or averaging window carries on. The whole loop restarts only on the first config or
+    // when the agent switches between global and per-sensor frequency.
+    private async applyConfig(next: DeviceConfig) {
+        const previous = this.config;
+        const diff = diffConfigs(previous, next);
+        const wasGlobal = this.globalReadFrequencySeconds > 0;
+
+        this.config = next;
+        this.geminiApiKey = next.gemini_api_key;
+        this.globalReadFrequencySeconds = next.global_read_frequency_seconds ?? 0;
+        const isGlobal = this.globalReadFrequencySeconds > 0;
+
+        if (previous) {
+            console.log(`✨ Yapılandırma güncellendi: ${diff.added.length} sensör eklendi, ${diff.removed.length} kaldırıldı, ${diff.driverChanged.length} sürücü yenilendi, ${diff.scheduleChanged.length} zamanlama ve ${diff.otherChanged.length} diğer ayar değişti.`);
+        }
+
+        await this.initializeDrivers(diff.driverChanged.map(s => s.id));
+
+        if (!previous || isGlobal !== wasGlobal) {
+            this.restartMainLoop();
+        } else if (isGlobal) {
+            // A cycle in progress schedules the next one with the new frequency when it ends.
+            if (diff.globalFrequencyChanged && !this.sequentialCycleRunning) {
+                if (this.mainLoopTimeout) clearTimeout(this.mainLoopTimeout);
+                this.scheduleNextSequentialLoop();
+            }
+        } else {
+            diff.removed.forEach(sensorId => this.unscheduleSensor(sensorId));
+            [...diff.added, ...diff.scheduleChanged].forEach(sensor => this.scheduleSensor(sensor));
+        }
+    }
+
+    private findSensor(sensorId: string): SensorConfig | undefined {
+        return this.config?.sensors.find(s => s.id === sensorId);
+    }
+
+    private async closeDriver(sensorId: string) {
+        const driver = this.driverInstances.get(sensorId);
+        if (!driver) return;
+        this.driverInstances.delete(sensorId);
+        if (typeof driver.close === 'function') {
+            try {
+                await driver.close();
+                console.log(`   -> Sürücü kapatıldı: ${sensorId}`);
+            } catch (e) {
+                console.error(`   -> Sürücü kapatılırken hata: ${sensorId}`, e);
+            }
+        }
+    }
+
+    // Loads a driver for every sensor that has none. Drivers of sensors that are gone, and
+    // those listed in `reload` (their settings changed), are closed first.
+    private async initializeDrivers(reload: string[] = []) {
         if (!this.config?.sensors) return;
 
-        // Unload drivers for sensors that are no longer in the config
         const newSensorIds = new Set(this.config.sensors.map(s => s.id));
-        for (const sensorId of this.driverInstances.keys()) {
+        const reloadIds = new Set(reload);
+        for (const sensorId of [...this.driverInstances.keys()]) {
             if (!newSensorIds.has(sensorId)) {
-                this.driverInstances.delete(sensorId);
+                await this.closeDriver(sensorId);
                 console.log(`   -> Sürücü kaldırıldı: ${sensorId}`);
+            } else if (reloadIds.has(sensorId)) {
+                await this.closeDriver(sensorId);
+                console.log(`   -> Sürücü ayarları değişti, yeniden yüklenecek: ${sensorId}`);
             }
         }
         
@@ -314,12 +364,14 @@ class Agent {
     private restartMainLoop() {
         // Clear all previous loop timers
         if (this.mainLoopTimeout) clearTimeout(this.mainLoopTimeout);
+        this.mainLoopTimeout = null;
         this.sensorLoopTimers.forEach(timer => clearInterval(timer));
         this.sensorLoopTimers.clear();
         
         if (this.globalReadFrequencySeconds > 0) {
             console.log(`⚙️ Global frekans modu aktif. Döngü ${this.globalReadFrequencySeconds / 60} dakikada bir çalışacak.`);
-            this.sequentialLoopCycle(); // Start the first cycle immediately
+            // Start the first cycle immediately, unless one is still running; it schedules the next.
+            if (!this.sequentialCycleRunning) this.sequentialLoopCycle();
         } else {
             console.log(`⚙️ Bireysel sensör frekans modu aktif.`);
             this.individualSensorLoops();
@@ -329,22 +381,35 @@ class Agent {
     private individualSensorLoops() {
         if (!this.config?.sensors) return;
         
-        this.config.sensors.forEach(sensor => {
-            if (sensor.is_active && sensor.read_frequency > 0) {
-                console.log(`   -> ${sensor.name} için ${sensor.read_frequency} saniyede bir okuma planlandı.`);
-                const timer = setInterval(async () => {
-                    if (!this.running) {
-                        clearInterval(timer);
-                        return;
-                    }
-                    const reading = await this.performSingleReading(sensor);
-                    if (reading) {
-                        await addReading(sensor.id, reading.rawValue, reading.processedValue);
-                    }
-                }, sensor.read_frequency * 1000);
-                this.sensorLoopTimers.set(sensor.id, timer);
+        this.config.sensors.forEach(sensor => this.scheduleSensor(sensor));
+    }
+
+    // (Re)starts the read timer of one sensor in per-sensor frequency mode. The timer looks the
+    // sensor up on every tick, so changes that leave its schedule alone apply without a restart.
+    private scheduleSensor(sensor: SensorConfig) {
+        this.unscheduleSensor(sensor.id);
+        if (!sensor.is_active || sensor.read_frequency <= 0) return;
+
+        console.log(`   -> ${sensor.name} için ${sensor.read_frequency} saniyede bir okuma planlandı.`);
+        const timer = setInterval(async () => {
+            if (!this.running) {
+                clearInterval(timer);
+                return;
             }
-        });
+            const current = this.findSensor(sensor.id);
+            if (!current) return;
+            const reading = await this.performSingleReading(current);
+            if (reading) {
+                await addReading(current.id, reading.rawValue, reading.processedValue);
+            }
+        }, sensor.read_frequency * 1000);
+        this.sensorLoopTimers.set(sensor.id, timer);
+    }
+
+    private unscheduleSensor(sensorId: string) {
+        const timer = this.sensorLoopTimers.get(sensorId);
+        if (timer) clearInterval(timer);
+        this.sensorLoopTimers.delete(sensorId);
     }
     
     private sequentialLoopCycle = async () => {
@@ -357,6 +422,7 @@ class Agent {
     
         console.log('--- Sıralı Okuma Döngüsü Başladı ---');
         this.setState(AgentState.READING);
+        this.sequentialCycleRunning = true;
     
         const sortedSensors = this.config.sensors
             .filter(s => s.is_active && (s.read_order ?? 0) > 0)
@@ -365,8 +431,12 @@ class Agent {
         if (sortedSensors.length === 0) {
             console.log('... Sıralı okuma için yapılandırılmış aktif sensör bulunamadı.');
         } else {
-            for (const sensor of sortedSensors) {
-                if (!this.running) break; // Exit loop if agent is stopping
+            for (const { id } of sortedSensors) {
+                // Exit loop if agent is stopping or switched to per-sensor frequencies
+                if (!this.running || this.globalReadFrequencySeconds <= 0) break;
+                // The config may have changed since the cycle started; use the latest settings.
+                const sensor = this.findSensor(id);
+                if (!sensor?.is_active) continue;
     
                 const physicalInterfaces = ['i2c', 'serial', 'uart'];
     
@@ -389,7 +459,9 @@ class Agent {
     
         console.log('--- Sıralı Okuma Döngüsü Tamamlandı ---');
         this.setState(AgentState.IDLE);
-        this.scheduleNextSequentialLoop();
+        this.sequentialCycleRunning = false;
+        // Per-sensor loops took over if the global frequency was turned off meanwhile.
+        if (this.globalReadFrequencySeconds > 0) this.scheduleNextSequentialLoop();
     }
 
     private scheduleNextSequentialLoop() {
@@ -404,12 +476,29 @@ class Agent {
     private async readAndAverageSensor(sensor: SensorConfig, durationMs: number): Promise<ReadingPayload | null> {
         process.stdout.write(`   Ortalama alınıyor: ${sensor.name} (${durationMs / 1000} saniye) `);
         
-        const collectedRawValues: any[] = [];
-        const collectedProcessedValues: any[] = [];
-        const endTime = Date.now() + durationMs;
+        let collectedRawValues: any[] = [];
+        let collectedProcessedValues: any[] = [];
+        let endTime = Date.now() + durationMs;
+        let currentDriverKey = driverKey(sensor);
 
         while (Date.now() < endTime) {
             if (!this.running) break;
+            // Config updates during the window: a rename or new calibration is used from the next
+            // read on; new driver settings restart the window, as earlier values came from the old ones.
+            const current = this.findSensor(sensor.id);
+            if (!current) {
+                process.stdout.write('\n');
+                console.log(`   -> ${sensor.name} yapılandırmadan kaldırıldı, ortalama iptal edildi.`);
+                return null;
+            }
+            if (driverKey(current) !== currentDriverKey) {
+                currentDriverKey = driverKey(current);
+                collectedRawValues = [];
+                collectedProcessedValues = [];
+                endTime = Date.now() + durationMs;
+                process.stdout.write(' (sürücü ayarları değişti, yeniden başlatıldı) ');
+            }
+            sensor = current;
             // Enable verbose (true) to see errors during averaging if they occur
             const reading = await this.performSingleReading(sensor, true); 
             if (reading && reading.rawValue !== null && reading.processedValue !== null) {
@@ -605,39 +694,63 @@ class Agent {
         }
 
         console.log(`🔄️ ${unsentReadings.length} adet çevrimdışı okuma senkronize ediliyor...`);
-        const sentIds: number[] = [];
-
-        for (const reading of unsentReadings) {
-             try {
-                const payload: ReadingPayload = {
-                    sensor: reading.sensor_id,
-                    rawValue: JSON.parse(reading.raw_value),
-                    value: JSON.parse(reading.processed_value)
-                };
-                 await axios.post(`${this.apiBaseUrl}/submit-reading`, payload, {
-                     headers: { 'Authorization': `Bearer ${this.authToken}` },
-                     timeout: 10000
-                });
-                sentIds.push(reading.id);
-            } catch (error) {
-                this.handleApiError(error, 'çevrimdışı veri senkronize edilirken');
-                // Stop syncing on first error to prevent data loss and wait for next interval
-                break; 
+
+        const batch = unsentReadings.map(reading => ({
+            id: reading.id,
+            sensor: reading.sensor_id,
+            rawValue: JSON.parse(reading.raw_value),
+            value: JSON.parse(reading.processed_value),
+            timestamp: reading.timestamp,
+        }));
+
+        try {
+            const response = await axios.post(`${this.apiBaseUrl}/submit-readings`, { readings: batch }, {
+                headers: { 'Authorization': `Bearer ${this.authToken}` },
+                timeout: 10000
+            });
+
+            const results: { id: number; status: 'accepted' | 'rejected' | 'failed'; error?: string }[] = response.data?.results || [];
+            const sentIds = results.filter(r => r.status === 'accepted').map(r => r.id);
+            const rejected = results.filter(r => r.status === 'rejected');
+
+            if (sentIds.length > 0) {
+                await markReadingsAsSent(sentIds);
+                console.log(`   -> ${sentIds.length} okuma başarıyla senkronize edildi.`);
             }
-        }
-        
-        if (sentIds.length > 0) {
-            await markReadingsAsSent(sentIds);
-            console.log(`   -> ${sentIds.length} okuma başarıyla senkronize edildi.`);
+            if (rejected.length > 0) {
+                await markReadingsAsRejected(rejected.map(r => r.id));
+                rejected.forEach(r => console.warn(`   -> Sunucu okumayı reddetti (#${r.id}): ${r.error}`));
+            }
+        } catch (error) {
+            // Nothing is marked as sent; the whole batch is retried on the next interval.
+            this.handleApiError(error, 'çevrimdışı veri senkronize edilirken');
         }
     }
 
 
-    private async pollForCommands() {
-        if (!this.running || this.state === AgentState.OFFLINE) return;
+    // Polls for commands for as long as the agent runs. A server that supports long polling
+    // holds each request until a command arrives, so the next poll follows right away; with
+    // one that answers at once (or while offline) polls are spaced COMMAND_POLL_INTERVAL apart.
+    private async commandLoop() {
+        while (this.running) {
+            const heldByServer = await this.pollForCommands();
+            if (!heldByServer && this.running) {
+                await new Promise(r => setTimeout(r, COMMAND_POLL_INTERVAL));
+            }
+        }
+    }
+
+    // Returns whether the server held the request (long polling).
+    private async pollForCommands(): Promise<boolean> {
+        if (!this.running || this.state === AgentState.OFFLINE) return false;
+        this.commandPollAbort = new AbortController();
         try {
             const response = await axios.get(`${this.apiBaseUrl}/commands/${this.deviceId}`, {
-                headers: { 'Authorization': `Bearer ${this.authToken}` }
+                headers: { 'Authorization': `Bearer ${this.authToken}` },
+                params: { wait: COMMAND_LONG_POLL_SECONDS },
+                // Leave the server time to answer a held poll before giving up on it.
+                timeout: (COMMAND_LONG_POLL_SECONDS + 15) * 1000,
+                signal: this.commandPollAbort.signal,
             });
             
             if (response.status === 200 && Array.isArray(response.data)) {
@@ -646,8 +759,13 @@ class Agent {
                     await this.executeCommand(command);
                 }
             }
+            return Number(response.headers['x-command-wait']) > 0;
         } catch (error) {
+            if (!this.running && axios.isCancel(error)) return false;
             this.handleApiError(error, 'sunucudan komutları kontrol etme');
+            return false;
+        } finally {
+            this.commandPollAbort = null;
         }
     }
 
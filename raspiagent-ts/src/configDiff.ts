@@ -0,0 +1,51 @@
+import { DeviceConfig, SensorConfig } from './types.js';
+
+// Compares two device configs sensor by sensor, so the agent only touches what changed:
+// a sensor whose driver settings changed gets a new driver, one whose schedule changed is
+// rescheduled, and everything else (names, calibration) is simply used from the next read.
+
+export interface ConfigDiff {
+    added: SensorConfig[];
+    removed: string[];
+    // Driver, interface or port settings changed: the driver has to be reopened.
+    driverChanged: SensorConfig[];
+    // is_active, read_frequency or read_order changed: the sensor has to be rescheduled.
+    scheduleChanged: SensorConfig[];
+    // Anything else about the sensor changed (name, type, calibration).
+    otherChanged: SensorConfig[];
+    globalFrequencyChanged: boolean;
+}
+
+// Everything a driver instance depends on.
+export const driverKey = (sensor: SensorConfig) =>
+    JSON.stringify([sensor.interface, sensor.parser_config ?? null, sensor.config ?? null]);
+
+const scheduleKey = (sensor: SensorConfig) =>
+    JSON.stringify([!!sensor.is_active, sensor.read_frequency, sensor.read_order ?? 0]);
+
+export function diffConfigs(previous: DeviceConfig | null, next: DeviceConfig): ConfigDiff {
+    const diff: ConfigDiff = {
+        added: [],
+        removed: [],
+        driverChanged: [],
+        scheduleChanged: [],
+        otherChanged: [],
+        globalFrequencyChanged: (previous?.global_read_frequency_seconds ?? 0) !== (next.global_read_frequency_seconds ?? 0),
+    };
+    const before = new Map((previous?.sensors ?? []).map(s => [s.id, s]));
+    for (const sensor of next.sensors ?? []) {
+        const old = before.get(sensor.id);
+        before.delete(sensor.id);
+        if (!old) {
+            diff.added.push(sensor);
+            continue;
+        }
+        const driverChanged = driverKey(old) !== driverKey(sensor);
+        const scheduleChanged = scheduleKey(old) !== scheduleKey(sensor);
+        if (driverChanged) diff.driverChanged.push(sensor);
+        if (scheduleChanged) diff.scheduleChanged.push(sensor);
+        if (!driverChanged && !scheduleChanged && JSON.stringify(old) !== JSON.stringify(sensor)) diff.otherChanged.push(sensor);
+    }
+    diff.removed = [...before.keys()];
+    return diff;
+}
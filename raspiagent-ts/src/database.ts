@@ -73,6 +73,14 @@ export async function markReadingsAsSent(ids: number[]): Promise<void> {
     await db.run(`UPDATE readings SET is_sent = 1 WHERE id IN (${placeholders})`, ...ids);
 }
 
+// Readings the server permanently refused (unknown sensor, invalid payload) are parked
+// with is_sent = 2 so they no longer block the sync queue but remain inspectable.
+export async function markReadingsAsRejected(ids: number[]): Promise<void> {
+    if (ids.length === 0) return;
+    const placeholders = ids.map(() => '?').join(',');
+    await db.run(`UPDATE readings SET is_sent = 2 WHERE id IN (${placeholders})`, ...ids);
+}
+
 export async function closeDb() {
     if (db) {
         try {
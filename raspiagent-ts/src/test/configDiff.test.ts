@@ -0,0 +1,82 @@
+import { test } from 'node:test';
+import assert from 'node:assert/strict';
+import { diffConfigs } from '../configDiff.js';
+import { DeviceConfig, SensorConfig } from '../types.js';
+
+const sensor = (id: string, overrides: Partial<SensorConfig> = {}): SensorConfig => ({
+    id,
+    name: `Sensör ${id}`,
+    type: 'Sıcaklık',
+    is_active: true,
+    read_frequency: 600,
+    read_order: 0,
+    interface: 'i2c',
+    parser_config: { driver: 'sht3x' },
+    config: { address: '0x44', bus: 1 },
+    ...overrides,
+});
+
+const device = (sensors: SensorConfig[], global_read_frequency_seconds = 600): DeviceConfig => ({ sensors, cameras: [], global_read_frequency_seconds });
+
+test('the first config adds every sensor', () => {
+    const diff = diffConfigs(null, device([sensor('a'), sensor('b')]));
+    assert.deepEqual(diff.added.map(s => s.id), ['a', 'b']);
+    assert.deepEqual(diff.removed, []);
+    assert.equal(diff.globalFrequencyChanged, true);
+});
+
+test('an identical config has no changes', () => {
+    const diff = diffConfigs(device([sensor('a')]), device([sensor('a')]));
+    assert.deepEqual(diff, { added: [], removed: [], driverChanged: [], scheduleChanged: [], otherChanged: [], globalFrequencyChanged: false });
+});
+
+test('sensors are added and removed by id', () => {
+    const diff = diffConfigs(device([sensor('a'), sensor('b')]), device([sensor('b'), sensor('c')]));
+    assert.deepEqual(diff.added.map(s => s.id), ['c']);
+    assert.deepEqual(diff.removed, ['a']);
+});
+
+test('driver, interface and port settings reopen the driver', () => {
+    const before = device([sensor('a'), sensor('b'), sensor('c')]);
+    const after = device([
+        sensor('a', { parser_config: { driver: 'bme280' } }),
+        sensor('b', { config: { address: '0x45', bus: 1 } }),
+        sensor('c', { interface: 'serial' }),
+    ]);
+    const diff = diffConfigs(before, after);
+    assert.deepEqual(diff.driverChanged.map(s => s.id), ['a', 'b', 'c']);
+    assert.deepEqual(diff.scheduleChanged, []);
+    assert.deepEqual(diff.otherChanged, []);
+});
+
+test('activation, frequency and order changes reschedule the sensor', () => {
+    const before = device([sensor('a'), sensor('b'), sensor('c', { read_order: undefined })]);
+    const after = device([
+        sensor('a', { is_active: false }),
+        sensor('b', { read_frequency: 60 }),
+        // A missing read_order is the same as 0.
+        sensor('c'),
+    ]);
+    const diff = diffConfigs(before, after);
+    assert.deepEqual(diff.scheduleChanged.map(s => s.id), ['a', 'b']);
+    assert.deepEqual(diff.driverChanged, []);
+    assert.deepEqual(diff.otherChanged.map(s => s.id), ['c']);
+});
+
+test('a sensor can need both a new driver and a new schedule', () => {
+    const diff = diffConfigs(device([sensor('a')]), device([sensor('a', { config: { address: '0x45', bus: 1 }, read_frequency: 60 })]));
+    assert.deepEqual(diff.driverChanged.map(s => s.id), ['a']);
+    assert.deepEqual(diff.scheduleChanged.map(s => s.id), ['a']);
+    assert.deepEqual(diff.otherChanged, []);
+});
+
+test('names and calibration changes need neither', () => {
+    const diff = diffConfigs(device([sensor('a')]), device([sensor('a', { name: 'Yeni ad', reference_value: 1.5, reference_operation: 'add' })]));
+    assert.deepEqual(diff.otherChanged.map(s => s.id), ['a']);
+    assert.deepEqual(diff.driverChanged, []);
+    assert.deepEqual(diff.scheduleChanged, []);
+});
+
+test('a changed global read frequency is reported', () => {
+    assert.equal(diffConfigs(device([], 600), device([], 300)).globalFrequencyChanged, true);
+});
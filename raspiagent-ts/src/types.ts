@@ -46,6 +46,8 @@ export interface AgentCommand {
 // Sensör sürücülerinin uygulayacağı arayüz
 export interface ISensorDriver {
     read(config: any, verbose?: boolean): Promise<Record<string, any> | null>;
+    // Releases ports or buses the driver keeps open between reads.
+    close?(): Promise<void>;
 }
 
 // Sunucuya gönderilecek okuma verisi
@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { Station, Sensor, Camera, AlertRule, Report, ReportSchedule, Notification, NetworkStats } from '../types.ts';
+import { Station, Sensor, Camera, AlertRule, Report, ReportRender, ReportSchedule, Notification, NetworkStats, AggregateBucket, AggregateFn, AggregateResponse, CursorPage, SyncResponse } from '../types.ts';
 
 // Use absolute URL for API calls to ensure compatibility with all Axios versions and environments.
 // In development (Vite), window.location.origin is localhost:3000, which gets proxied.
@@ -12,7 +12,39 @@ const apiClient = axios.create({
     baseURL: API_BASE_URL,
     headers: {
         'Content-Type': 'application/json',
+    },
+    // 304 is the answer to a conditional GET, resolved from the cache below.
+    validateStatus: status => (status >= 200 && status < 300) || status === 304,
+});
+
+// Bodies of GET responses that came with a strong ETag, by URL. The ETag is sent back as
+// If-None-Match and a 304 reuses the stored body, so unchanged lists are not downloaded again.
+// Express adds weak ETags to every response; only the versioned endpoints send strong ones.
+const conditionalCache = new Map<string, { etag: string; data: any }>();
+
+apiClient.interceptors.request.use(config => {
+    if ((config.method ?? 'get') === 'get') {
+        const cached = conditionalCache.get(apiClient.getUri(config));
+        if (cached) config.headers['If-None-Match'] = cached.etag;
+    }
+    return config;
+});
+
+apiClient.interceptors.response.use(response => {
+    if ((response.config.method ?? 'get') !== 'get') return response;
+    const key = apiClient.getUri(response.config);
+    if (response.status === 304) {
+        const cached = conditionalCache.get(key);
+        if (cached) response.data = cached.data;
+        return response;
+    }
+    const etag = response.headers['etag'];
+    if (typeof etag === 'string' && !etag.startsWith('W/')) {
+        conditionalCache.set(key, { etag, data: response.data });
+    } else {
+        conditionalCache.delete(key);
     }
+    return response;
 });
 
 // Generic error handler
@@ -25,6 +57,9 @@ const handleError = (error: any, context: string): Promise<never> => {
 // Agent Status
 export const getAgentStatus = (): Promise<{ status: string; lastUpdate: string | null }> => apiClient.get('/agent-status').then(res => res.data).catch(e => handleError(e, 'fetching agent status'));
 
+// Delta sync: what changed after `since` (0 for a full snapshot)
+export const getSync = (since: number): Promise<SyncResponse> => apiClient.get('/sync', { params: { since } }).then(res => res.data).catch(e => handleError(e, 'syncing changes'));
+
 // Network Stats
 export const getNetworkStats = (): Promise<NetworkStats> => apiClient.get('/network-stats').then(res => res.data).catch(e => handleError(e, 'fetching network stats'));
 
@@ -72,21 +107,69 @@ export const analyzeSnowDepthFromImage = (imageBase64: string, virtualSensorId:
 
 // Readings
 export const getReadings = (): Promise<any[]> => apiClient.get('/readings').then(res => res.data).catch(e => handleError(e, 'fetching readings'));
-export const getReadingsHistory = (params: { stationIds: string[], sensorTypes: string[], start?: string, end?: string }): Promise<any[]> => {
+// With maxPoints the whole range is returned, downsampled to at most maxPoints readings per sensor.
+export const getReadingsHistory = (params: { stationIds: string[], sensorTypes: string[], start?: string, end?: string, maxPoints?: number }): Promise<any[]> => {
     return apiClient.get('/readings/history', {
         params: {
             stationIds: params.stationIds.join(','),
             sensorTypes: params.sensorTypes.join(','),
             start: params.start,
             end: params.end,
+            maxPoints: params.maxPoints,
         }
     }).then(res => res.data).catch(e => handleError(e, 'fetching readings history'));
 }
+export const getReadingsHistoryPage = (params: { stationIds: string[], sensorTypes: string[], sensorIds?: string[], start?: string, end?: string, limit?: number, cursor?: string | null }): Promise<CursorPage<any>> => {
+    return apiClient.get('/readings/history', {
+        params: {
+            stationIds: params.stationIds.join(','),
+            sensorTypes: params.sensorTypes.join(','),
+            sensorIds: params.sensorIds?.join(','),
+            start: params.start,
+            end: params.end,
+            limit: params.limit ?? 100,
+            cursor: params.cursor ?? undefined,
+        }
+    }).then(res => res.data).catch(e => handleError(e, 'fetching readings history page'));
+}
+export const getAggregatedReadings = (params: { sensorIds: string[], bucket: AggregateBucket, fn: AggregateFn[], start?: string, end?: string }): Promise<AggregateResponse> => {
+    return apiClient.get('/readings/aggregate', {
+        params: {
+            sensorIds: params.sensorIds.join(','),
+            bucket: params.bucket,
+            fn: params.fn.join(','),
+            start: params.start,
+            end: params.end,
+        }
+    }).then(res => res.data).catch(e => handleError(e, 'fetching aggregated readings'));
+}
+// Export is downloaded by the browser directly (streamed, gzip-compressed), not through axios.
+export const getReadingsExportUrl = (params: { stationIds: string[], sensorTypes: string[], start?: string, end?: string, format: 'csv' | 'ndjson' }): string => {
+    const query = new URLSearchParams({
+        format: params.format,
+        stationIds: params.stationIds.join(','),
+        sensorTypes: params.sensorTypes.join(','),
+    });
+    if (params.start) query.set('start', params.start);
+    if (params.end) query.set('end', params.end);
+    return `${API_BASE_URL}/readings/export?${query.toString()}`;
+}
 export const getRawReadingsHistory = (sensorId: string, start?: string, end?: string): Promise<any[]> => {
     return apiClient.get('/raw-readings/history', {
         params: { sensorId, start, end }
     }).then(res => res.data).catch(e => handleError(e, 'fetching raw readings history'));
 }
+export const getRawReadingsHistoryPage = (params: { sensorId: string, start?: string, end?: string, limit?: number, cursor?: string | null }): Promise<CursorPage<any>> => {
+    return apiClient.get('/raw-readings/history', {
+        params: {
+            sensorId: params.sensorId,
+            start: params.start,
+            end: params.end,
+            limit: params.limit ?? 100,
+            cursor: params.cursor ?? undefined,
+        }
+    }).then(res => res.data).catch(e => handleError(e, 'fetching raw readings history page'));
+}
 
 // Definitions
 export const getDefinitions = (): Promise<{ stationTypes: any[], sensorTypes: any[], cameraTypes: any[] }> => apiClient.get('/definitions').then(res => res.data).catch(e => handleError(e, 'fetching definitions'));
@@ -94,6 +177,9 @@ export const addDefinition = (type: string, data: { name: string }): Promise<any
 export const updateDefinition = (type: string, id: number, data: { name: string }): Promise<any> => apiClient.put(`/definitions/${type}/${id}`, data).then(res => res.data).catch(e => handleError(e, `updating ${type}`));
 export const deleteDefinition = (type: string, id: number): Promise<void> => apiClient.delete(`/definitions/${type}/${id}`).then(res => res.data).catch(e => handleError(e, `deleting ${type}`));
 export const getAlertRules = (): Promise<AlertRule[]> => apiClient.get('/alert-rules').then(res => res.data).catch(e => handleError(e, 'fetching alert rules'));
+export const addAlertRule = (data: Omit<AlertRule, 'id'>): Promise<{ id: string }> => apiClient.post('/alert-rules', data).then(res => res.data).catch(e => handleError(e, 'adding alert rule'));
+export const updateAlertRule = (id: string, data: Partial<AlertRule>): Promise<void> => apiClient.put(`/alert-rules/${id}`, data).then(res => res.data).catch(e => handleError(e, 'updating alert rule'));
+export const deleteAlertRule = (id: string): Promise<void> => apiClient.delete(`/alert-rules/${id}`).then(res => res.data).catch(e => handleError(e, 'deleting alert rule'));
 export const getGlobalReadFrequency = (): Promise<{ value: string }> => apiClient.get('/settings/global_read_frequency').then(res => res.data).catch(e => handleError(e, 'getting global read frequency'));
 export const setGlobalReadFrequency = (value: string): Promise<void> => apiClient.put('/settings/global_read_frequency', { value }).then(res => res.data).catch(e => handleError(e, 'setting global read frequency'));
 
@@ -101,6 +187,9 @@ export const setGlobalReadFrequency = (value: string): Promise<void> => apiClien
 // Reports
 export const getReports = (): Promise<Report[]> => apiClient.get('/reports').then(res => res.data).catch(e => handleError(e, 'fetching reports'));
 export const deleteReport = (id: string): Promise<void> => apiClient.delete(`/reports/${id}`).then(res => res.data).catch(e => handleError(e, 'deleting report'));
+export const addReport = (data: Omit<Report, 'id' | 'createdAt'>): Promise<Report> => apiClient.post('/reports', data).then(res => res.data).catch(e => handleError(e, 'adding report'));
+export const renderReport = (id: string): Promise<ReportRender> => apiClient.post(`/reports/${id}/render`).then(res => res.data).catch(e => handleError(e, 'rendering report'));
+export const getReportRender = (renderId: string): Promise<ReportRender> => apiClient.get(`/reports/renders/${renderId}`).then(res => res.data).catch(e => handleError(e, 'fetching report render status'));
 export const getReportSchedules = (): Promise<ReportSchedule[]> => apiClient.get('/report-schedules').then(res => res.data).catch(e => handleError(e, 'fetching report schedules'));
 export const addReportSchedule = (data: Omit<ReportSchedule, 'id' | 'lastRun'>): Promise<ReportSchedule> => apiClient.post('/report-schedules', data).then(res => res.data).catch(e => handleError(e, 'adding report schedule'));
 export const updateReportSchedule = (id: string, data: Partial<ReportSchedule>): Promise<void> => apiClient.put(`/report-schedules/${id}`, data).then(res => res.data).catch(e => handleError(e, 'updating report schedule'));
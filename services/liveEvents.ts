@@ -0,0 +1,70 @@
+import { useEffect, useRef } from 'react';
+import { Notification } from '../types.ts';
+
+// Live updates from the backend (GET /api/events, Server-Sent Events).
+// One EventSource is shared by every component that subscribes; it is opened with the first
+// subscriber and closed with the last. The browser reconnects on its own and the server
+// replays what was missed; `resync` means it could not, so subscribers should reload.
+
+export interface ReadingEvent {
+    sensorId: string;
+    value: any;
+    timestamp: string;
+    isAnomaly: boolean;
+}
+
+export interface LiveEventMap {
+    'reading': ReadingEvent;
+    'sensor-status': { sensorId: string; healthStatus: string };
+    'agent-status': { status: string; lastUpdate: string | null };
+    'photo': { cameraId: string; url: string };
+    'notification': Notification;
+    'config-changed': { entities: ('stations' | 'sensors' | 'cameras' | 'definitions')[]; id?: string | number };
+    'resync': {};
+}
+
+export type LiveEventHandlers = { [K in keyof LiveEventMap]?: (data: LiveEventMap[K]) => void };
+
+const EVENT_TYPES: (keyof LiveEventMap)[] = ['reading', 'sensor-status', 'agent-status', 'photo', 'notification', 'config-changed', 'resync'];
+
+const EVENTS_URL = typeof window !== 'undefined' ? `${window.location.origin}/api/events` : '/api/events';
+
+const subscribers = new Set<{ current: LiveEventHandlers }>();
+let source: EventSource | null = null;
+
+const dispatch = (type: keyof LiveEventMap) => (event: MessageEvent) => {
+    let data: any;
+    try {
+        data = JSON.parse(event.data);
+    } catch {
+        return;
+    }
+    subscribers.forEach(handlers => (handlers.current[type] as ((d: any) => void) | undefined)?.(data));
+};
+
+const open = () => {
+    if (source || typeof EventSource === 'undefined') return;
+    source = new EventSource(EVENTS_URL);
+    EVENT_TYPES.forEach(type => source!.addEventListener(type, dispatch(type) as EventListener));
+};
+
+const close = () => {
+    source?.close();
+    source = null;
+};
+
+// Subscribes the calling component to live events for as long as it is mounted. The latest
+// handlers are always used, so they do not need to be memoized.
+export const useLiveEvents = (handlers: LiveEventHandlers) => {
+    const handlersRef = useRef(handlers);
+    handlersRef.current = handlers;
+
+    useEffect(() => {
+        subscribers.add(handlersRef);
+        open();
+        return () => {
+            subscribers.delete(handlersRef);
+            if (subscribers.size === 0) close();
+        };
+    }, []);
+};
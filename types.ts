@@ -27,6 +27,8 @@ export interface AlertRule {
   threshold: number;
   severity: Severity;
   isEnabled: boolean;
+  hysteresis?: number; // How far the value must fall back before the alarm can fire again
+  cooldownMinutes?: number; // Minimum time between notifications; server default if omitted
 }
 
 export interface Notification {
@@ -131,6 +133,21 @@ export interface Report {
   config?: ReportConfig;
 }
 
+// A server-side render of a saved report; poll until status is 'done', then fetch downloadUrl.
+export interface ReportRender {
+  id: string;
+  reportId: string;
+  status: 'running' | 'done' | 'failed';
+  createdAt: string;
+  rows?: number;
+  bytes?: number;
+  durationMs?: number;
+  cached?: boolean;
+  error?: string;
+  fileName?: string;
+  downloadUrl?: string;
+}
+
 export interface ReportSchedule {
     id: string;
     name: string;
@@ -140,6 +157,9 @@ export interface ReportSchedule {
     reportConfig: ReportConfig;
     isEnabled: boolean;
     lastRun?: string;
+    lastRunStatus?: 'running' | 'queued' | 'sent' | 'failed';
+    lastRunRows?: number;
+    lastRunDurationMs?: number;
 }
 
 export type WidgetType = 'dataCard' | 'sensorChart' | 'windRose';
@@ -173,4 +193,69 @@ export interface NetworkStats {
     activePercentage: number;
     lastPacketTime: string | null;
     systemLoad: string;
-}
\ No newline at end of file
+}
+export type AggregateBucket = '1m' | '5m' | '15m' | '30m' | '1h' | '3h' | '6h' | '1d';
+export type AggregateFn = 'avg' | 'min' | 'max' | 'sum' | 'count' | 'last';
+
+export interface AggregatePoint {
+    timestamp: string; // Bucket start
+    avg?: number;
+    min?: number;
+    max?: number;
+    sum?: number;
+    count?: number;
+    last?: number;
+}
+
+export interface AggregateSeries {
+    sensorId: string;
+    sensorName: string;
+    stationId: string | null;
+    sensorType: string;
+    unit: string | null;
+    interface: string;
+    key: string | null;
+    points: AggregatePoint[];
+}
+
+export interface AggregateResponse {
+    bucket: AggregateBucket;
+    fn: AggregateFn[];
+    start: string;
+    end: string;
+    source: 'rollup' | 'raw';
+    series: AggregateSeries[];
+}
+
+// One page of a keyset-paginated history endpoint. `next` pages toward older rows,
+// `prev` toward newer ones; null means there is nothing further in that direction.
+export interface CursorPage<T> {
+    items: T[];
+    next: string | null;
+    prev: string | null;
+}
+
+// Response of GET /api/sync. `version` is passed back as `since` on the next call; with
+// `reset` the `changed` lists are a full snapshot that replaces the client's state.
+export interface SyncResponse {
+    version: number;
+    reset: boolean;
+    changed: {
+        stations: Station[];
+        sensors: Sensor[];
+        cameras: Camera[];
+        notifications: Notification[];
+        stationTypes: { id: number; name: string }[];
+        sensorTypes: { id: number; name: string }[];
+        cameraTypes: { id: number; name: string }[];
+    };
+    deleted: {
+        stations: string[];
+        sensors: string[];
+        cameras: string[];
+        notifications: string[];
+        stationTypes: number[];
+        sensorTypes: number[];
+        cameraTypes: number[];
+    };
+}
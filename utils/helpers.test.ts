@@ -0,0 +1,28 @@
+import { describe, expect, it } from 'vitest';
+import { mergeById } from './helpers';
+
+const item = (id: string, name = id) => ({ id, name });
+
+describe('mergeById', () => {
+    it('returns the same list when nothing changed', () => {
+        const list = [item('a'), item('b')];
+        expect(mergeById(list, [], [])).toBe(list);
+    });
+
+    it('replaces changed items in place and appends new ones', () => {
+        const list = [item('a'), item('b'), item('c')];
+        expect(mergeById(list, [item('d'), item('b', 'B')], [])).toEqual([item('a'), item('b', 'B'), item('c'), item('d')]);
+    });
+
+    it('drops deleted items', () => {
+        expect(mergeById([item('a'), item('b')], [], ['a', 'x'])).toEqual([item('b')]);
+    });
+
+    it('does not modify its arguments', () => {
+        const list = [item('a')];
+        const changed = [item('a', 'A')];
+        mergeById(list, changed, []);
+        expect(list).toEqual([item('a')]);
+        expect(changed).toEqual([item('a', 'A')]);
+    });
+});
@@ -1,3 +1,5 @@
+import { AggregateBucket } from '../types.ts';
+
 
 export const getNumericValue = (value: any, sensorType?: string, sensorInterface?: string): number | null => {
     if (value === null || value === undefined) return null;
@@ -97,6 +99,15 @@ const isValidNumber = (val: any): boolean => {
     return typeof val === 'number' && isFinite(val);
 };
 
+// Picks a bucket size for /readings/aggregate that keeps a chart to a few hundred points.
+export const pickAggregateBucket = (startMs: number, endMs: number): AggregateBucket => {
+    const days = (endMs - startMs) / (24 * 60 * 60 * 1000);
+    if (days <= 2) return '5m';
+    if (days <= 7) return '30m';
+    if (days <= 31) return '3h';
+    return '1d';
+};
+
 export const formatTimeAgo = (isoString: string | undefined | null): string => {
     if (!isoString) return 'veri yok';
     const date = new Date(isoString);
@@ -126,3 +137,17 @@ export const toDateTimeLocal = (date: Date) => {
   const localISOTime = new Date(date.getTime() - tzoffset).toISOString().slice(0, 16);
   return localISOTime;
 };
+
+// Applies one entity list of a delta sync: changed rows replace the ones with the same id in
+// place, new rows are appended and deleted ids are dropped.
+export const mergeById = <T extends { id: string }>(list: T[], changed: T[], deleted: string[]): T[] => {
+    if (changed.length === 0 && deleted.length === 0) return list;
+    const updates = new Map(changed.map(item => [item.id, item]));
+    const removed = new Set(deleted);
+    const merged = list.filter(item => !removed.has(item.id)).map(item => {
+        const updated = updates.get(item.id);
+        updates.delete(item.id);
+        return updated ?? item;
+    });
+    return [...merged, ...updates.values()];
+};
@@ -1,3 +1,4 @@
+/// <reference types="vitest" />
 // FIX: Import 'process' to provide types for 'process.cwd()'
 import process from 'process';
 import { defineConfig, loadEnv } from 'vite';
@@ -23,6 +24,10 @@ export default defineConfig(({ mode }) => {
         }
       },
       plugins: [react()],
+      test: {
+        // backend/ and raspiagent-ts/ run their own tests with node --test.
+        include: ['utils/**/*.test.ts', 'services/**/*.test.ts', 'components/**/*.test.{ts,tsx}', 'pages/**/*.test.{ts,tsx}'],
+      },
       define: {
         // FIX: Use env.API_KEY as per the coding guidelines to source the API key.
         'process.env.API_KEY': JSON.stringify(env.API_KEY),